@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del caricamento dei gironi da Supabase.
+
+Confronta il vecchio caricamento con query annidate (una per torneo e due per
+girone) con il caricamento in blocco di db_manager.carica_gironi_da_db,
+misurando numero di richieste e tempo contro lo stub PostgREST locale con
+una latenza di rete simulata.
+
+Uso: python benchmark_gironi.py [tornei] [gironi_per_torneo] [latenza_ms]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+
+def popola_stub(stub, num_tornei, gironi_per_torneo, squadre_per_girone=6):
+    """Riempie lo stub con tornei, gironi, squadre e partite di esempio."""
+    tornei, gironi, girone_squadre, partite = [], [], [], []
+    girone_id = 0
+    for t in range(1, num_tornei + 1):
+        tornei.append({
+            'id': t, 'nome': f"Torneo {t}", 'categoria': 'U14', 'genere': 'Maschile',
+            'data_inizio': '2025-03-01', 'data_fine': '2025-05-31', 'descrizione': ''
+        })
+        for g in range(gironi_per_torneo):
+            girone_id += 1
+            gironi.append({'id': girone_id, 'torneo_id': t, 'nome': f"Girone {chr(65 + g)}", 'descrizione': ''})
+            squadre = [f"Squadra {girone_id}-{s}" for s in range(squadre_per_girone)]
+            girone_squadre.extend({'girone_id': girone_id, 'squadra': s} for s in squadre)
+            for i in range(len(squadre)):
+                for j in range(i + 1, len(squadre)):
+                    partite.append({
+                        'id': len(partite) + 1, 'girone_id': girone_id, 'data_partita': '2025-03-15',
+                        'squadra1': squadre[i], 'squadra2': squadre[j], 'punteggio1': (i * 7) % 40,
+                        'punteggio2': (j * 5) % 40, 'mete1': i % 5, 'mete2': j % 5, 'luogo': '', 'ora': ''
+                    })
+    stub.tabelle.update({
+        'tornei': tornei,
+        'gironi': gironi,
+        'girone_squadre': girone_squadre,
+        'partite_girone': partite
+    })
+
+def carica_gironi_query_annidate(supabase):
+    """Replica del caricamento precedente, con una query per torneo e due per girone."""
+    gironi_data = {"tornei": []}
+    for torneo in supabase.table('tornei').select('*').execute().data:
+        torneo_id = torneo.get('id')
+        torneo_obj = {
+            "id": torneo_id,
+            "nome": torneo.get('nome'),
+            "categoria": torneo.get('categoria'),
+            "genere": torneo.get('genere'),
+            "data_inizio": torneo.get('data_inizio'),
+            "data_fine": torneo.get('data_fine'),
+            "descrizione": torneo.get('descrizione', ''),
+            "gironi": []
+        }
+        for girone in supabase.table('gironi').select('*').eq('torneo_id', torneo_id).execute().data:
+            girone_id = girone.get('id')
+            squadre = supabase.table('girone_squadre').select('squadra').eq('girone_id', girone_id).execute().data
+            partite = supabase.table('partite_girone').select('*').eq('girone_id', girone_id).execute().data
+            torneo_obj["gironi"].append({
+                "id": girone_id,
+                "nome": girone.get('nome'),
+                "descrizione": girone.get('descrizione', ''),
+                "squadre": [item.get('squadra') for item in squadre],
+                "partite": partite
+            })
+        gironi_data["tornei"].append(torneo_obj)
+    return gironi_data
+
+def misura(stub, funzione, ripetizioni=3):
+    """Esegue la funzione e restituisce risultato, richieste per chiamata e tempo medio."""
+    stub.azzera_richieste()
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        risultato = funzione()
+    durata = (time.perf_counter() - inizio) / ripetizioni
+    return risultato, stub.conta_richieste() // ripetizioni, durata
+
+def main():
+    """Funzione principale."""
+    num_tornei = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    gironi_per_torneo = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    latenza_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    
+    stub = StubSupabase(latenza=latenza_ms / 1000).avvia()
+    try:
+        db = collega_db_manager(stub)
+        popola_stub(stub, num_tornei, gironi_per_torneo)
+        
+        print(f"Tornei: {num_tornei}, gironi per torneo: {gironi_per_torneo}, latenza simulata: {latenza_ms:.0f} ms")
+        
+        vecchio, richieste_vecchio, tempo_vecchio = misura(stub, lambda: carica_gironi_query_annidate(db.supabase))
+        nuovo, richieste_nuovo, tempo_nuovo = misura(stub, db.carica_gironi_da_db)
+        
+        print(f"{'Caricamento':<20}{'Richieste':>12}{'Tempo (ms)':>14}")
+        print(f"{'Query annidate':<20}{richieste_vecchio:>12}{tempo_vecchio * 1000:>14.1f}")
+        print(f"{'In blocco':<20}{richieste_nuovo:>12}{tempo_nuovo * 1000:>14.1f}")
+        print(f"Speedup: {tempo_vecchio / tempo_nuovo:.1f}x")
+        
+        if vecchio != nuovo:
+            print("❌ I due caricamenti hanno prodotto strutture diverse")
+            return False
+        print("✅ Le strutture caricate coincidono")
+        return True
+    finally:
+        stub.ferma()
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del trasporto HTTP del client Supabase.
+
+Confronta le richieste senza pool (una nuova connessione per ogni query, come
+con le funzioni requests.get/post a livello di modulo) con il trasporto
+condiviso di db_manager (connessioni persistenti e risposte compresse),
+misurando connessioni aperte, byte ricevuti e tempo contro lo stub PostgREST
+locale con una latenza di connessione simulata.
+
+Uso: python benchmark_trasporto.py [richieste] [latenza_connessione_ms] [latenza_ms]
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+
+class TrasportoSenzaPool:
+    """Replica del trasporto precedente: nessuna sessione, nessuna compressione."""
+    
+    def richiesta(self, metodo, url, tabella=None, **kwargs):
+        headers = dict(kwargs.pop('headers', {}), **{'Accept-Encoding': 'identity'})
+        return requests.request(metodo, url, headers=headers, **kwargs)
+
+def popola_stub(stub, num_risultati=300):
+    """Riempie lo stub con risultati di esempio."""
+    stub.tabelle['risultati'] = [{
+        'id': i + 1, 'categoria': 'U14', 'genere': 'Maschile', 'data_partita': f"{i % 28 + 1:02d}/03/2025",
+        'squadra1': f"Squadra {i}", 'squadra2': f"Squadra {i + 1}", 'punteggio1': i % 40,
+        'punteggio2': (i * 7) % 40, 'mete1': i % 6, 'mete2': (i * 3) % 6, 'arbitro': 'Mario Rossi'
+    } for i in range(num_risultati)]
+
+def misura(stub, client, richieste):
+    """Esegue le query e restituisce dati letti, connessioni, byte ricevuti e tempo medio per richiesta."""
+    stub.azzera_richieste()
+    inizio = time.perf_counter()
+    for i in range(richieste):
+        # Alterna letture complete e letture filtrate, come fanno i gestori del bot
+        if i % 2:
+            dati = client.table('risultati').select('*').eq('categoria', 'U14').execute().data
+        else:
+            dati = client.table('risultati').select('*').execute().data
+    durata = (time.perf_counter() - inizio) / richieste
+    return dati, stub.connessioni, stub.byte_inviati, durata
+
+def main():
+    """Funzione principale."""
+    richieste = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latenza_connessione_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    latenza_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    
+    stub = StubSupabase(latenza=latenza_ms / 1000, latenza_connessione=latenza_connessione_ms / 1000).avvia()
+    try:
+        db = collega_db_manager(stub)
+        popola_stub(stub)
+        
+        print(f"Richieste: {richieste}, latenza di connessione: {latenza_connessione_ms:.0f} ms, "
+              f"latenza per richiesta: {latenza_ms:.0f} ms")
+        
+        senza_pool = db.SupabaseClient(stub.url, db.SUPABASE_KEY, trasporto=TrasportoSenzaPool())
+        trasporto = db.TrasportoHTTP()
+        con_pool = db.SupabaseClient(stub.url, db.SUPABASE_KEY, trasporto=trasporto)
+        
+        vecchio, connessioni_vecchio, byte_vecchio, tempo_vecchio = misura(stub, senza_pool, richieste)
+        nuovo, connessioni_nuovo, byte_nuovo, tempo_nuovo = misura(stub, con_pool, richieste)
+        
+        print(f"{'Trasporto':<20}{'Connessioni':>12}{'KB ricevuti':>14}{'ms/richiesta':>14}")
+        print(f"{'Senza pool':<20}{connessioni_vecchio:>12}{byte_vecchio / 1024:>14.1f}{tempo_vecchio * 1000:>14.2f}")
+        print(f"{'Pool condiviso':<20}{connessioni_nuovo:>12}{byte_nuovo / 1024:>14.1f}{tempo_nuovo * 1000:>14.2f}")
+        print(f"Speedup: {tempo_vecchio / tempo_nuovo:.1f}x")
+        
+        contatori = trasporto.statistiche()['risultati']
+        print(f"Contatori della tabella 'risultati': {contatori['richieste']} richieste, "
+              f"media {contatori['tempo_medio'] * 1000:.2f} ms, massimo {contatori['tempo_massimo'] * 1000:.2f} ms")
+        trasporto.chiudi()
+        
+        if vecchio != nuovo:
+            print("❌ I due trasporti hanno restituito dati diversi")
+            return False
+        print("✅ I dati letti coincidono")
+        return True
+    finally:
+        stub.ferma()
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -2,7 +2,6 @@
 # -*- coding: utf-8 -*-
 
 import logging
-import json
 import os
 import time
 import pandas as pd
@@ -10,12 +9,18 @@ import threading
 import socket
 import sys
 import atexit
+import asyncio
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from datetime import datetime, timedelta
+from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler, CallbackQueryHandler
 from modules.export_manager import genera_excel_riepilogo_weekend, genera_pdf_riepilogo_weekend
-from modules.db_manager import carica_utenti, salva_utenti, carica_risultati, salva_risultati, carica_squadre, salva_squadre
+from modules.db_manager import carica_utenti, carica_risultati, carica_squadre
+from modules import db_async
+from modules.risultati_manager import indice_risultati, date_weekend
+from modules.reazioni_manager import archivio_reazioni, pianificatore_pulsanti, EMOJI_REAZIONI
+from modules.bus_invalidazioni import bus_invalidazioni
+from modules.user_manager import registro_utenti
 
 # Abilita logging
 logging.basicConfig(
@@ -117,124 +122,21 @@ REAZIONI_FILE = "reazioni.json"
 # ID degli amministratori del bot (possono approvare altri utenti)
 ADMIN_IDS = [30658851]  # Sostituisci con il tuo ID Telegram
 
-# Cache per i dati
-_cache = {
-    'risultati': None,
-    'utenti': None,
-    'reazioni': None,
-    'last_load': {
-        'risultati': 0,
-        'utenti': 0,
-        'reazioni': 0
-    }
-}
-
-# Tempo di validità della cache in secondi (5 secondi)
-CACHE_TTL = 5
-
-# Le funzioni carica_risultati e salva_risultati sono ora importate dal modulo db_manager
-
-# Le funzioni carica_utenti e salva_utenti sono ora importate dal modulo db_manager
-
-# Cache per gli utenti autorizzati
-_utenti_autorizzati_cache = {}
-_utenti_autorizzati_last_update = 0
+# Le funzioni di caricamento sono importate dal modulo db_manager, i salvataggi passano per modules.db_async
 
 # Funzione per verificare se un utente è autorizzato
 def is_utente_autorizzato(user_id):
-    global _utenti_autorizzati_cache, _utenti_autorizzati_last_update
-    current_time = time.time()
-    
-    # Verifica se l'utente è un amministratore (non richiede cache)
+    # Verifica se l'utente è un amministratore
     if user_id in ADMIN_IDS:
         return True
     
-    # Aggiorna la cache degli utenti autorizzati se necessario (ogni 10 secondi)
-    if not _utenti_autorizzati_cache or (current_time - _utenti_autorizzati_last_update) > 10:
-        utenti = carica_utenti()
-        _utenti_autorizzati_cache = {}
-        
-        # Popola la cache con gli ID degli utenti autorizzati
-        for utente in utenti["autorizzati"]:
-            if isinstance(utente, dict):
-                _utenti_autorizzati_cache[utente.get("id")] = True
-            else:
-                _utenti_autorizzati_cache[utente] = True
-                
-        _utenti_autorizzati_last_update = current_time
-    
-    # Verifica se l'utente è nella cache degli autorizzati
-    return _utenti_autorizzati_cache.get(user_id, False)
+    # Verifica nel registro degli utenti, aggiornato da db_manager.salva_utenti
+    return registro_utenti.is_autorizzato(user_id)
 
 # Funzione per verificare se un utente è amministratore
 def is_admin(user_id):
     return user_id in ADMIN_IDS
 
-# Funzione per caricare le reazioni
-def carica_reazioni(force_reload=False):
-    current_time = time.time()
-    
-    # Usa la cache se disponibile e non scaduta
-    if not force_reload and _cache['reazioni'] is not None and (current_time - _cache['last_load']['reazioni']) < CACHE_TTL:
-        return _cache['reazioni']
-    
-    if os.path.exists(REAZIONI_FILE):
-        with open(REAZIONI_FILE, 'r', encoding='utf-8') as file:
-            try:
-                reazioni = json.load(file)
-                # Aggiorna la cache
-                _cache['reazioni'] = reazioni
-                _cache['last_load']['reazioni'] = current_time
-                return reazioni
-            except json.JSONDecodeError:
-                logger.error("Errore nel parsing del file delle reazioni")
-                return {}
-    return {}
-
-# Funzione per salvare le reazioni
-def salva_reazioni(reazioni):
-    with open(REAZIONI_FILE, 'w', encoding='utf-8') as file:
-        json.dump(reazioni, file, indent=2, ensure_ascii=False)
-    
-    # Aggiorna la cache
-    _cache['reazioni'] = reazioni
-    _cache['last_load']['reazioni'] = time.time()
-
-# Funzione per aggiungere una reazione
-def aggiungi_reazione(message_id, user_id, user_name, reaction_type):
-    """Aggiunge una reazione a un messaggio."""
-    reazioni = carica_reazioni()
-    
-    # Converti message_id in stringa per usarlo come chiave del dizionario
-    message_id_str = str(message_id)
-    
-    # Inizializza la struttura per il messaggio se non esiste
-    if message_id_str not in reazioni:
-        reazioni[message_id_str] = {
-            "like": [],
-            "love": [],
-            "fire": [],
-            "clap": [],
-            "rugby": []
-        }
-    
-    # Rimuovi l'utente da tutte le reazioni per questo messaggio
-    for tipo in reazioni[message_id_str]:
-        reazioni[message_id_str][tipo] = [r for r in reazioni[message_id_str][tipo] if r["id"] != user_id]
-    
-    # Aggiungi la nuova reazione
-    reazioni[message_id_str][reaction_type].append({
-        "id": user_id,
-        "name": user_name,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
-    
-    # Salva le reazioni
-    salva_reazioni(reazioni)
-    
-    # Restituisci il conteggio delle reazioni per questo messaggio
-    return {tipo: len(utenti) for tipo, utenti in reazioni[message_id_str].items()}
-
 # Funzione per verificare la congruenza tra punteggio e mete
 def verifica_congruenza_punteggio_mete(punteggio, mete):
     """
@@ -344,6 +246,30 @@ def crea_pulsanti_reazione(message_id=None, include_export=False):
     
     return keyboard
 
+# Funzione per mostrare i conteggi delle reazioni nei pulsanti di un messaggio del canale
+def aggiorna_conteggi_pulsanti(reply_markup, conteggi):
+    """
+    Restituisce una copia della tastiera con i conteggi nei pulsanti di reazione.
+    
+    Gli altri pulsanti (vedi reazioni, esportazione) restano invariati.
+    
+    Args:
+        reply_markup: Tastiera attuale del messaggio
+        conteggi: Numero di reazioni per tipo
+    """
+    keyboard = []
+    for riga in reply_markup.inline_keyboard:
+        nuova_riga = []
+        for button in riga:
+            if button.callback_data and button.callback_data.startswith("reaction:"):
+                tipo = button.callback_data.split(":")[1]
+                emoji = EMOJI_REAZIONI.get(tipo, "")
+                numero = conteggi.get(tipo, 0)
+                button = InlineKeyboardButton(f"{emoji} {numero}" if numero else emoji, callback_data=button.callback_data)
+            nuova_riga.append(button)
+        keyboard.append(nuova_riga)
+    return InlineKeyboardMarkup(keyboard)
+
 # Funzione per inviare un risultato di partita (versione asincrona per l'interfaccia web)
 async def invia_risultato_partita(bot, risultato):
     """Invia un messaggio con il risultato della partita al canale Telegram (versione asincrona)."""
@@ -418,19 +344,6 @@ async def invia_risultato_partita(bot, risultato):
             reply_markup=reply_markup
         )
         
-        # Inizializza le reazioni per questo messaggio
-        reazioni = carica_reazioni()
-        message_id_str = str(message_id)
-        if message_id_str not in reazioni:
-            reazioni[message_id_str] = {
-                "like": [],
-                "love": [],
-                "fire": [],
-                "clap": [],
-                "rugby": []
-            }
-            salva_reazioni(reazioni)
-        
         logger.info(f"Messaggio inviato al canale {CHANNEL_ID} con ID {message_id}")
         return sent_message
     
@@ -581,19 +494,6 @@ async def invia_messaggio_canale(context, risultato):
             reply_markup=reply_markup
         )
         
-        # Inizializza le reazioni per questo messaggio
-        reazioni = carica_reazioni()
-        message_id_str = str(message_id)
-        if message_id_str not in reazioni:
-            reazioni[message_id_str] = {
-                "like": [],
-                "love": [],
-                "fire": [],
-                "clap": [],
-                "rugby": []
-            }
-            salva_reazioni(reazioni)
-        
         logger.info(f"Messaggio inviato al canale {CHANNEL_ID} con ID {message_id}")
         return True, message_id
     
@@ -604,57 +504,24 @@ async def invia_messaggio_canale(context, risultato):
 # Funzione per generare il riepilogo del weekend
 def genera_riepilogo_weekend():
     """Genera un riepilogo delle partite del weekend corrente o precedente."""
-    risultati = carica_risultati()
+    # Se oggi è lunedì, martedì, mercoledì o giovedì, mostra il weekend precedente,
+    # altrimenti quello in corso (venerdì, sabato, domenica)
+    inizio_weekend, fine_weekend = date_weekend()
     
-    if not risultati:
-        return None, None, None, []
-    
-    # Ottieni la data corrente
-    oggi = datetime.now()
-    
-    # Calcola l'inizio e la fine del weekend corrente (venerdì, sabato, domenica)
-    giorno_settimana = oggi.weekday()  # 0 = lunedì, 6 = domenica
-    
-    # Se oggi è lunedì, martedì, mercoledì o giovedì, mostra il weekend precedente
-    if giorno_settimana < 4:  # lunedì, martedì, mercoledì, giovedì
-        # Calcola il venerdì della settimana precedente
-        giorni_da_venerdi_scorso = giorno_settimana + 3  # +3 perché venerdì è 4 giorni prima di lunedì
-        inizio_weekend = oggi - timedelta(days=giorni_da_venerdi_scorso)
-        fine_weekend = inizio_weekend + timedelta(days=2)  # domenica
-    else:  # venerdì, sabato, domenica
-        # Calcola il venerdì di questa settimana
-        giorni_da_venerdi = giorno_settimana - 4  # -4 perché venerdì è il giorno 4 della settimana
-        inizio_weekend = oggi - timedelta(days=giorni_da_venerdi)
-        fine_weekend = inizio_weekend + timedelta(days=2)  # domenica
-    
-    # Formatta le date per il confronto
+    # Formatta le date per il messaggio
     inizio_weekend_str = inizio_weekend.strftime("%d/%m/%Y")
     fine_weekend_str = fine_weekend.strftime("%d/%m/%Y")
     
-    # Filtra i risultati per il weekend
-    risultati_weekend = []
-    for r in risultati:
-        try:
-            data_partita_raw = r.get('data_partita')
-            if data_partita_raw is None or data_partita_raw == '':
-                # Salta i risultati senza data
-                continue
-                
-            data_partita = datetime.strptime(data_partita_raw, '%d/%m/%Y')
-            data_partita_str = data_partita.strftime("%d/%m/%Y")
-            
-            # Verifica se la data è nel weekend
-            if inizio_weekend_str <= data_partita_str <= fine_weekend_str:
-                risultati_weekend.append(r)
-        except ValueError:
-            # Ignora le date in formato non valido
-            continue
+    # Solo i risultati del weekend, letti dall'indice per data senza scorrere tutto lo storico
+    if not indice_risultati.conta():
+        return None, None, None, []
+    risultati_weekend = indice_risultati.intervallo(inizio_weekend, fine_weekend)
     
     if not risultati_weekend:
         return inizio_weekend_str, fine_weekend_str, None, []
     
-    # Ordina i risultati per categoria e data
-    risultati_weekend.sort(key=lambda x: (x.get('categoria', ''), x.get('data_partita', '')))
+    # Ordina i risultati per categoria (l'ordinamento è stabile: l'indice li restituisce già in ordine di data)
+    risultati_weekend.sort(key=lambda x: x.get('categoria', ''))
     
     # Raggruppa i risultati per categoria
     risultati_per_categoria = {}
@@ -1027,20 +894,29 @@ async def reaction_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         user_id = query.from_user.id
         user_name = f"{query.from_user.first_name} {query.from_user.last_name if query.from_user.last_name else ''}".strip()
         
-        # Aggiungi la reazione e ottieni il conteggio aggiornato
-        conteggio = aggiungi_reazione(message_id, user_id, user_name, reaction_type)
+        # Registra la reazione (un secondo tocco sulla stessa la rimuove) e ottieni il conteggio aggiornato
+        try:
+            attiva, conteggio = await archivio_reazioni.registra_reazione_async(message_id, user_id, user_name, reaction_type)
+        except ValueError:
+            await query.answer("Reazione non valida", show_alert=True)
+            return
         
         # Crea un messaggio di conferma
-        emoji_map = {
-            "like": "👍",
-            "love": "❤️",
-            "fire": "🔥",
-            "clap": "👏",
-            "rugby": "🏉"
-        }
-        emoji = emoji_map.get(reaction_type, "")
+        emoji = EMOJI_REAZIONI.get(reaction_type, "")
         
-        await query.answer(f"Hai reagito con {emoji} {reaction_type.capitalize()}", show_alert=False)
+        if attiva:
+            await query.answer(f"Hai reagito con {emoji} {reaction_type.capitalize()}", show_alert=False)
+        else:
+            await query.answer(f"Hai rimosso la reazione {emoji} {reaction_type.capitalize()}", show_alert=False)
+        
+        # Aggiorna i conteggi nei pulsanti: le reazioni ravvicinate sullo stesso
+        # messaggio producono un'unica modifica
+        messaggio = query.message
+        if messaggio is not None and messaggio.reply_markup is not None:
+            async def aggiorna_pulsanti(conteggi):
+                await messaggio.edit_reply_markup(reply_markup=aggiorna_conteggi_pulsanti(messaggio.reply_markup, conteggi))
+            
+            pianificatore_pulsanti.pianifica(message_id, aggiorna_pulsanti)
         
     elif callback_data.startswith("view_reactions:"):
         # Formato: "view_reactions:message_id"
@@ -1052,29 +928,15 @@ async def reaction_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         message_id = int(parts[1])
         
         # Carica le reazioni per questo messaggio
-        reazioni = carica_reazioni()
-        message_id_str = str(message_id)
-        
-        if message_id_str not in reazioni:
-            await query.answer("Nessuna reazione per questo messaggio", show_alert=True)
-            return
+        reazioni = await asyncio.to_thread(archivio_reazioni.reazioni_messaggio, message_id)
         
         # Crea un messaggio con le reazioni
         messaggio = "<b>🔍 Chi ha reagito:</b>\n\n"
         
-        # Emoji per ogni tipo di reazione
-        emoji_map = {
-            "like": "👍",
-            "love": "❤️",
-            "fire": "🔥",
-            "clap": "👏",
-            "rugby": "🏉"
-        }
-        
         # Aggiungi le reazioni al messaggio
-        for tipo, utenti in reazioni[message_id_str].items():
+        for tipo, utenti in reazioni.items():
             if utenti:
-                emoji = emoji_map.get(tipo, "")
+                emoji = EMOJI_REAZIONI.get(tipo, "")
                 messaggio += f"<b>{emoji} {tipo.capitalize()}:</b>\n"
                 for utente in utenti:
                     messaggio += f"• {utente['name']}\n"
@@ -1104,7 +966,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
     else:
         # Verifica se l'utente è già in attesa di approvazione
-        utenti = carica_utenti()
+        utenti = await db_async.carica_utenti()
         utente_in_attesa = False
         for utente in utenti["in_attesa"]:
             if isinstance(utente, dict) and utente.get("id") == user_id:
@@ -1131,8 +993,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             }
             
             # Aggiungi l'utente alla lista di attesa
-            utenti["in_attesa"].append(nuovo_utente)
-            salva_utenti(utenti)
+            await db_async.upsert_utente(nuovo_utente, "in_attesa")
             
             # Informa l'utente
             await update.message.reply_html(
@@ -1221,10 +1082,10 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         )
     
     elif azione == "risultati":
-        # Mostra gli ultimi risultati
-        risultati = carica_risultati()
+        # Mostra gli ultimi 5 risultati (dal più recente), ordinati e limitati dal database
+        ultimi_risultati = (await db_async.list_risultati(limit=5))['risultati']
         
-        if not risultati:
+        if not ultimi_risultati:
             await query.edit_message_text(
                 "Non ci sono ancora risultati inseriti.",
                 parse_mode='HTML',
@@ -1235,26 +1096,6 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         # Mostra gli ultimi 5 risultati
         messaggio = "<b>📋 ULTIMI RISULTATI</b>\n\n"
         
-        # Ordina i risultati per data (dal più recente)
-        def get_date_key(x):
-            data_partita = x.get('data_partita')
-            if data_partita is None or data_partita == '':
-                return datetime.strptime('01/01/2000', '%d/%m/%Y')
-            try:
-                return datetime.strptime(data_partita, '%d/%m/%Y')
-            except ValueError:
-                # In caso di formato data non valido, usa una data predefinita
-                return datetime.strptime('01/01/2000', '%d/%m/%Y')
-        
-        risultati_ordinati = sorted(
-            risultati, 
-            key=get_date_key,
-            reverse=True
-        )
-        
-        # Prendi gli ultimi 5 risultati
-        ultimi_risultati = risultati_ordinati[:5]
-        
         for i, risultato in enumerate(ultimi_risultati, 1):
             categoria = risultato.get('categoria', 'N/D')
             genere = risultato.get('genere', '')
@@ -1352,7 +1193,7 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     elif azione == "statistiche":
         # Mostra le statistiche delle partite
-        risultati = carica_risultati()
+        risultati = await db_async.carica_risultati()
         
         if not risultati:
             await query.edit_message_text(
@@ -1536,7 +1377,7 @@ async def approva_utente_callback(update: Update, context: ContextTypes.DEFAULT_
         return
     
     # Carica gli utenti
-    utenti = carica_utenti()
+    utenti = await db_async.carica_utenti()
     
     # Cerca l'utente nella lista di attesa
     utente_da_approvare = None
@@ -1574,8 +1415,12 @@ async def approva_utente_callback(update: Update, context: ContextTypes.DEFAULT_
         return
     
     # Aggiungi l'utente alla lista degli autorizzati
-    utenti["autorizzati"].append(utente_da_approvare)
-    salva_utenti(utenti)
+    if not await db_async.set_stato_utente(user_id, "autorizzato"):
+        await query.edit_message_text(
+            f"⚠️ Errore durante l'approvazione dell'utente {user_id}. Riprova più tardi.",
+            parse_mode='HTML'
+        )
+        return
     
     # Aggiorna il messaggio
     await query.edit_message_text(
@@ -1624,7 +1469,7 @@ async def rifiuta_utente_callback(update: Update, context: ContextTypes.DEFAULT_
         return
     
     # Carica gli utenti
-    utenti = carica_utenti()
+    utenti = await db_async.carica_utenti()
     
     # Cerca l'utente nella lista di attesa
     utente_trovato = False
@@ -1646,8 +1491,13 @@ async def rifiuta_utente_callback(update: Update, context: ContextTypes.DEFAULT_
         )
         return
     
-    # Salva le modifiche
-    salva_utenti(utenti)
+    # Elimina l'utente rifiutato
+    if not await db_async.elimina_utente(user_id):
+        await query.edit_message_text(
+            f"⚠️ Errore durante il rifiuto dell'utente {user_id}. Riprova più tardi.",
+            parse_mode='HTML'
+        )
+        return
     
     # Aggiorna il messaggio
     await query.edit_message_text(
@@ -1813,7 +1663,7 @@ async def gestione_utenti_callback(update: Update, context: ContextTypes.DEFAULT
     # Gestione del pulsante "mostra_in_attesa"
     if query.data.startswith("mostra_in_attesa"):
         # Carica gli utenti
-        utenti = carica_utenti()
+        utenti = await db_async.carica_utenti()
         
         # Estrai il parametro di pagina se presente
         parts = query.data.split(":")
@@ -1943,7 +1793,7 @@ async def gestione_utenti_callback(update: Update, context: ContextTypes.DEFAULT
     # Gestione del pulsante "mostra_autorizzati"
     if query.data.startswith("mostra_autorizzati"):
         # Carica gli utenti
-        utenti = carica_utenti()
+        utenti = await db_async.carica_utenti()
         
         # Estrai il parametro di pagina se presente
         parts = query.data.split(":")
@@ -2113,7 +1963,7 @@ async def gestione_utenti_callback(update: Update, context: ContextTypes.DEFAULT
             return
         
         # Carica gli utenti
-        utenti = carica_utenti()
+        utenti = await db_async.carica_utenti()
         
         # Cerca l'utente nella lista degli autorizzati
         trovato = False
@@ -2127,10 +1977,7 @@ async def gestione_utenti_callback(update: Update, context: ContextTypes.DEFAULT
                 trovato = True
                 break
         
-        if trovato:
-            # Salva le modifiche
-            salva_utenti(utenti)
-            
+        if trovato and await db_async.elimina_utente(user_id):
             # Aggiorna il messaggio
             await query.edit_message_text(
                 f"✅ <b>Utente rimosso</b>\n\n"
@@ -2191,7 +2038,7 @@ async def nuova_partita(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         return ConversationHandler.END
     
     # Carica le squadre
-    context.user_data['squadre_disponibili'] = carica_squadre()
+    context.user_data['squadre_disponibili'] = await db_async.carica_squadre()
     
     # Crea una tastiera con le categorie
     keyboard = []
@@ -3135,14 +2982,15 @@ async def conferma_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
             nuovo_risultato["mete1"] = int(context.user_data['mete1'])
             nuovo_risultato["mete2"] = int(context.user_data['mete2'])
         
-        # Carica i risultati esistenti
-        risultati = carica_risultati()
-        
-        # Aggiungi il nuovo risultato
-        risultati.append(nuovo_risultato)
-        
-        # Salva i risultati aggiornati
-        salva_risultati(risultati)
+        # Salva solo il nuovo risultato, senza riscrivere l'intero elenco
+        if not await db_async.salva_risultato(nuovo_risultato):
+            await query.edit_message_text(
+                "❌ <b>Si è verificato un errore durante il salvataggio della partita.</b>\n\n"
+                "Usa /nuova per riprovare.",
+                parse_mode='HTML'
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
         
         # Invia il messaggio al canale Telegram
         invio_riuscito, messaggio_errore = await invia_messaggio_canale(context, nuovo_risultato)
@@ -3269,10 +3117,10 @@ async def risultati_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
     
-    # Carica i risultati
-    risultati = carica_risultati()
+    # Carica solo gli ultimi 5 risultati (dal più recente), ordinati e limitati dal database
+    ultimi_risultati = (await db_async.list_risultati(limit=5))['risultati']
     
-    if not risultati:
+    if not ultimi_risultati:
         await update.message.reply_html(
             "Non ci sono ancora risultati inseriti."
         )
@@ -3281,26 +3129,6 @@ async def risultati_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Mostra gli ultimi 5 risultati
     messaggio = "<b>📋 ULTIMI RISULTATI</b>\n\n"
     
-    # Ordina i risultati per data (dal più recente)
-    def get_date_key(x):
-        data_partita = x.get('data_partita')
-        if data_partita is None or data_partita == '':
-            return datetime.strptime('01/01/2000', '%d/%m/%Y')
-        try:
-            return datetime.strptime(data_partita, '%d/%m/%Y')
-        except ValueError:
-            # In caso di formato data non valido, usa una data predefinita
-            return datetime.strptime('01/01/2000', '%d/%m/%Y')
-    
-    risultati_ordinati = sorted(
-        risultati, 
-        key=get_date_key,
-        reverse=True
-    )
-    
-    # Prendi gli ultimi 5 risultati
-    ultimi_risultati = risultati_ordinati[:5]
-    
     for i, risultato in enumerate(ultimi_risultati, 1):
         categoria = risultato.get('categoria', 'N/D')
         genere = risultato.get('genere', '')
@@ -3336,7 +3164,7 @@ async def cerca_utente_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     # Carica gli utenti
-    utenti = carica_utenti()
+    utenti = await db_async.carica_utenti()
     
     # Cerca l'utente tra gli autorizzati
     utente_trovato = None
@@ -3505,13 +3333,16 @@ def main() -> None:
             logger.warning("Continuando con l'avvio del bot nonostante il rilevamento di un'altra istanza...")
     
     # Crea l'applicazione con configurazioni ottimizzate
-    application = Application.builder().token(TOKEN).build()
+    application = Application.builder().token(TOKEN).post_shutdown(db_async.chiudi_client).build()
 
+    # Ricevi le invalidazioni della cache dall'interfaccia web e pubblica le proprie
+    bus_invalidazioni.avvia()
+    
     # Precarica i dati in cache all'avvio
     logger.info("Precaricamento dati in cache...")
     carica_risultati()
     carica_utenti()
-    carica_reazioni()
+    archivio_reazioni.carica()
     carica_squadre()
     logger.info("Precaricamento completato")
 
@@ -1662,7 +1662,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_html(help_text)
     
     # Registra il completamento del comando
-    bot_monitor.track_command_completion(start_time)
+    bot_monitor.track_command_completion(start_time, "/help")
 
 # Comando /health per mostrare lo stato di salute del bot
 async def health_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -1712,7 +1712,7 @@ async def health_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     )
     
     # Registra il completamento del comando
-    bot_monitor.track_command_completion(start_time)
+    bot_monitor.track_command_completion(start_time, "/health")
 
 # Callback per il comando health
 async def health_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -6501,6 +6501,11 @@ def check_single_instance():
         logger.warning("Ignorando l'errore e continuando con l'avvio del bot...")
         return True
 
+async def registra_loop_monitorato(application: Application) -> None:
+    """Registra il loop del bot nel campionatore delle risorse, che ne misura il ritardo."""
+    import asyncio
+    bot_monitor.sampler.watch_loop(asyncio.get_running_loop(), 'bot')
+
 # Funzione principale per avviare il bot
 def main() -> None:
     """Avvia il bot."""
@@ -6517,7 +6522,7 @@ def main() -> None:
     # Crea l'applicazione con configurazioni ottimizzate
     try:
         # Crea l'applicazione
-        application = Application.builder().token(TOKEN).build()
+        application = Application.builder().token(TOKEN).post_init(registra_loop_monitorato).build()
         
         # Importa il JobManager alternativo
         try:
@@ -6719,7 +6724,10 @@ def main() -> None:
                 await invia_riepilogo_automatico(fake_context)
                 
                # Pianifica il job con il JobManager alternativo
-            job_manager.run_daily(job_wrapper, job_time, days=[6], name="riepilogo_automatico")
+            # Job persistente: un riepilogo perso durante un riavvio viene inviato appena possibile
+            # (entro 12 ore), uno già avviato non viene mai inviato di nuovo
+            job_manager.run_daily(job_wrapper, job_time, days=[6], name="riepilogo_automatico",
+                                  tolleranza=12 * 3600, persistente=True)
             logger.info("Job scheduler alternativo configurato per inviare il riepilogo ogni domenica alle 18:00")
         except Exception as alt_error:
             logger.error(f"Errore nella configurazione del job scheduler alternativo: {alt_error}")
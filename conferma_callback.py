@@ -7,7 +7,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 # Importa le funzioni necessarie
-from modules.db_manager import carica_risultati, salva_risultati
+from modules.db_manager import salva_risultato
 from modules.message_manager import invia_messaggio_canale
 from modules.config import CHANNEL_ID
 
@@ -28,8 +28,7 @@ async def conferma_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 "squadra2": context.user_data['squadra2'],
                 "arbitro": context.user_data['arbitro'],
                 "sezione_arbitrale": context.user_data.get('sezione_arbitrale', 'Non specificata'),
-                "inserito_da": update.effective_user.full_name,
-                "id": int(datetime.now().timestamp())  # Genera un ID univoco basato sul timestamp
+                "inserito_da": update.effective_user.full_name
             }
             
             # Converti la data nel formato ISO
@@ -82,14 +81,15 @@ async def conferma_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
             from modules.db_manager import is_supabase_configured
             db_connesso = is_supabase_configured()
             
-            # Carica i risultati esistenti
-            risultati = carica_risultati()
-            
-            # Aggiungi il nuovo risultato
-            risultati.append(nuovo_risultato)
-            
-            # Salva i risultati aggiornati
-            salva_risultati(risultati)
+            # Salva solo il nuovo risultato, senza riscrivere l'intero elenco: l'ID viene assegnato al salvataggio
+            if not salva_risultato(nuovo_risultato):
+                await query.edit_message_text(
+                    "❌ <b>Si è verificato un errore durante il salvataggio della partita.</b>\n\n"
+                    "Usa /nuova per riprovare.",
+                    parse_mode='HTML'
+                )
+                context.user_data.clear()
+                return ConversationHandler.END
             
             # Avvisa l'utente se il database non è connesso
             if not db_connesso:
@@ -110,14 +110,8 @@ async def conferma_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 # Aggiorna il risultato con l'ID del messaggio
                 nuovo_risultato["message_id"] = messaggio_errore
                 
-                # Aggiorna il risultato nell'elenco
-                for i, r in enumerate(risultati):
-                    if r.get('id') == nuovo_risultato.get('id'):
-                        risultati[i] = nuovo_risultato
-                        break
-                
-                # Salva nuovamente i risultati
-                salva_risultati(risultati)
+                # Salva nuovamente il risultato
+                salva_risultato(nuovo_risultato)
             
             messaggio_successo = "✅ <b>Partita registrata con successo!</b>\n\n"
             
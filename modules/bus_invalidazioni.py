@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from typing import Iterable, Optional, Set
+
+from modules.cache_manager import cache
+
+# Percorso del database SQLite condiviso dai processi (bot e worker dell'interfaccia web)
+if os.environ.get('BUS_INVALIDAZIONI_FILE'):
+    BUS_FILE = os.environ['BUS_INVALIDAZIONI_FILE']
+elif os.environ.get('AWS_EXECUTION_ENV'):
+    # Siamo in AWS Lambda, usa /tmp
+    BUS_FILE = '/tmp/invalidazioni.db'
+else:
+    BUS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'invalidazioni.db')
+
+# Intervallo tra due controlli dei nuovi eventi, in secondi
+INTERVALLO_POLLING = 1.0
+
+# Gli eventi più vecchi di un'ora vengono eliminati
+CONSERVAZIONE_EVENTI = 3600
+
+# Indici in memoria da scartare quando un altro processo modifica i dati da cui
+# dipendono: nel processo che scrive sono aggiornati in modo incrementale
+INDICI_REMOTI = {
+    'risultati': ('modules.risultati_manager', 'indice_risultati'),
+    'statistiche': ('modules.statistiche_manager', 'aggregati_arbitri'),
+    'impegni': ('modules.disponibilita_manager', 'indice_disponibilita'),
+    'utenti': ('modules.user_manager', 'registro_utenti')
+}
+
+class BusInvalidazioni:
+    """
+    Bus delle invalidazioni della cache tra processi.
+    
+    Ogni invalidazione locale (cache.invalida_tag) viene scritta come evento in
+    una tabella SQLite condivisa; un thread di ogni processo controlla i nuovi
+    eventi (con PRAGMA data_version il controllo non legge la tabella se nessun
+    altro processo ha scritto) e invalida solo i namespace e gli indici che
+    dipendono dai tag modificati. Così ogni processo può tenere in cache i dati
+    a lungo e ricevere comunque le modifiche fatte dagli altri in circa un secondo.
+    """
+    
+    def __init__(self, percorso: Optional[str] = None, intervallo: float = INTERVALLO_POLLING):
+        self.percorso = percorso or BUS_FILE
+        self.intervallo = intervallo
+        self.lock = threading.Lock()
+        self.lock_ricezione = threading.Lock()
+        # Connessione SQLite e ultimo PRAGMA data_version letto, per thread
+        self.locale = threading.local()
+        # Processo in cui il bus è stato avviato: dopo un fork (worker di gunicorn)
+        # connessione, thread e origine vanno ricreati
+        self.pid = None
+        self.ultimo_id = 0
+        self.thread = None
+        self.fermo = threading.Event()
+        self.registrato = False
+        self.contatori = {'pubblicati': 0, 'ricevuti': 0, 'errori': 0}
+    
+    @property
+    def origine(self) -> str:
+        """Identificativo del processo che pubblica gli eventi."""
+        return str(os.getpid())
+    
+    def _connessione(self) -> sqlite3.Connection:
+        """Restituisce la connessione SQLite del thread corrente, creando la tabella se manca."""
+        connessione = getattr(self.locale, 'connessione', None)
+        if connessione is None or getattr(self.locale, 'pid', None) != os.getpid():
+            connessione = sqlite3.connect(self.percorso, timeout=5, isolation_level=None)
+            connessione.execute('PRAGMA journal_mode=WAL')
+            connessione.execute('''
+                CREATE TABLE IF NOT EXISTS eventi (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tag TEXT NOT NULL,
+                    origine TEXT NOT NULL,
+                    creato REAL NOT NULL
+                )
+            ''')
+            self.locale.connessione = connessione
+            self.locale.pid = os.getpid()
+        return connessione
+    
+    def pubblica(self, tag: Iterable[str]) -> None:
+        """
+        Scrive un evento di invalidazione per gli altri processi.
+        
+        Gli errori vengono solo registrati: un bus non disponibile non deve far
+        fallire la scrittura che ha generato l'invalidazione.
+        
+        Args:
+            tag: Tag invalidati (già espansi con le dipendenze)
+        """
+        # Le invalidazioni ricevute da un altro processo non vengono ripubblicate
+        if getattr(self.locale, 'in_ricezione', False):
+            return
+        try:
+            connessione = self._connessione()
+            ora = time.time()
+            connessione.execute('INSERT INTO eventi (tag, origine, creato) VALUES (?, ?, ?)',
+                                (json.dumps(sorted(tag)), self.origine, ora))
+            with self.lock:
+                self.contatori['pubblicati'] += 1
+                pulizia = self.contatori['pubblicati'] % 100 == 0
+            if pulizia:
+                connessione.execute('DELETE FROM eventi WHERE creato < ?', (ora - CONSERVAZIONE_EVENTI,))
+        except sqlite3.Error as e:
+            with self.lock:
+                self.contatori['errori'] += 1
+            print(f"Errore nella pubblicazione dell'invalidazione della cache: {e}")
+    
+    def ricevi(self) -> int:
+        """
+        Applica gli eventi pubblicati dagli altri processi dopo l'ultimo controllo.
+        
+        Returns:
+            Numero di eventi applicati
+        """
+        with self.lock_ricezione:
+            try:
+                connessione = self._connessione()
+                # data_version cambia solo se un'altra connessione ha scritto nel database
+                versione = connessione.execute('PRAGMA data_version').fetchone()[0]
+                if versione == getattr(self.locale, 'versione', None):
+                    return 0
+                righe = connessione.execute('SELECT id, tag, origine FROM eventi WHERE id > ? ORDER BY id',
+                                            (self.ultimo_id,)).fetchall()
+                self.locale.versione = versione
+            except sqlite3.Error as e:
+                with self.lock:
+                    self.contatori['errori'] += 1
+                print(f"Errore nella lettura delle invalidazioni della cache: {e}")
+                return 0
+            
+            tag = set()
+            applicati = 0
+            for id, tag_evento, origine in righe:
+                self.ultimo_id = id
+                if origine != self.origine:
+                    tag.update(json.loads(tag_evento))
+                    applicati += 1
+        if tag:
+            self._applica(tag)
+        with self.lock:
+            self.contatori['ricevuti'] += applicati
+        return applicati
+    
+    def _applica(self, tag: Set[str]) -> None:
+        """Invalida namespace e indici in memoria che dipendono dai tag ricevuti."""
+        self.locale.in_ricezione = True
+        try:
+            cache.invalida_tag(*tag)
+        finally:
+            self.locale.in_ricezione = False
+        for chiave, (modulo, nome) in INDICI_REMOTI.items():
+            if chiave in tag and modulo in sys.modules:
+                getattr(sys.modules[modulo], nome).invalida()
+    
+    def _ciclo(self) -> None:
+        """Controlla i nuovi eventi fino all'arresto del bus."""
+        while not self.fermo.wait(self.intervallo):
+            self.ricevi()
+    
+    def avvia(self) -> None:
+        """
+        Avvia il bus nel processo corrente: pubblica le invalidazioni locali e
+        controlla quelle degli altri processi. Può essere chiamato più volte
+        (ad esempio a ogni richiesta), anche dopo un fork.
+        """
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            if not self.registrato:
+                cache.aggiungi_ascoltatore(self.pubblica)
+                self.registrato = True
+        
+        # Gli eventi già presenti si riferiscono a dati caricati da zero da questo processo
+        try:
+            connessione = self._connessione()
+            self.ultimo_id = connessione.execute('SELECT COALESCE(MAX(id), 0) FROM eventi').fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Errore nell'avvio del bus delle invalidazioni: {e}")
+        
+        self.fermo = threading.Event()
+        self.thread = threading.Thread(target=self._ciclo, name='bus-invalidazioni', daemon=True)
+        self.thread.start()
+    
+    def ferma(self) -> None:
+        """Ferma il controllo degli eventi (le invalidazioni locali non vengono più pubblicate)."""
+        with self.lock:
+            self.pid = None
+            if self.registrato:
+                cache.rimuovi_ascoltatore(self.pubblica)
+                self.registrato = False
+        self.fermo.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.intervallo + 1)
+        self.thread = None
+
+# Bus delle invalidazioni condiviso dal processo
+bus_invalidazioni = BusInvalidazioni()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+# Tempo di validità predefinito delle voci in cache (5 minuti). Le scritture
+# invalidano le voci che dipendono dai dati modificati, anche negli altri
+# processi tramite modules.bus_invalidazioni, quindi il TTL è solo un limite
+# per le modifiche fatte fuori dall'applicazione.
+CACHE_TTL = 300
+
+# Numero massimo predefinito di voci per namespace
+DIMENSIONE_MASSIMA = 256
+
+# Dipendenze tra i tag: la modifica di un dato invalida anche i dati derivati
+# (ad esempio una partita modificata cambia classifica, statistiche e impegni)
+DIPENDENZE = {
+    'stagioni': {'campionati'},
+    'campionati': {'partite'},
+    'partite': {'classifica', 'statistiche', 'impegni'},
+    'designazioni': {'statistiche', 'impegni'},
+    'tutor_partite': {'statistiche', 'impegni'},
+    'arbitri': {'statistiche'},
+    'tutor': {'statistiche'}
+}
+
+# Valore sentinella per le voci mancanti
+MANCANTE = object()
+
+def espandi_tag(tag: Iterable[str]) -> Set[str]:
+    """
+    Restituisce i tag indicati e tutti quelli che ne dipendono, anche indirettamente.
+    
+    Args:
+        tag: Tag dei dati modificati
+    
+    Returns:
+        Insieme dei tag da invalidare
+    """
+    da_visitare = list(tag)
+    espansi = set()
+    while da_visitare:
+        corrente = da_visitare.pop()
+        if corrente not in espansi:
+            espansi.add(corrente)
+            da_visitare.extend(DIPENDENZE.get(corrente, ()))
+    return espansi
+
+class NamespaceCache:
+    """
+    Insieme di voci in cache dello stesso tipo (ad esempio 'arbitri' o 'classifica_campionato').
+    
+    Le voci scadono dopo il TTL del namespace e, oltre la dimensione massima,
+    vengono espulse le meno usate di recente. Un namespace è associato ai tag
+    dei dati da cui dipende e viene svuotato quando uno di essi viene modificato.
+    """
+    
+    def __init__(self, nome: str, ttl: float, dimensione_massima: int, tag: Set[str]):
+        self.nome = nome
+        self.ttl = ttl
+        self.dimensione_massima = dimensione_massima
+        self.tag = tag
+        self.lock = threading.RLock()
+        # Chiave -> (valore, scadenza)
+        self.voci = OrderedDict()
+        # Incrementata a ogni invalidazione: un caricamento iniziato prima non
+        # deve salvare in cache dati che potrebbero essere già superati
+        self.generazione = 0
+        self.contatori = {'hit': 0, 'miss': 0, 'espulsioni': 0, 'invalidazioni': 0}
+    
+    def leggi(self, chiave: Any = None) -> Any:
+        """Restituisce il valore in cache per la chiave, o MANCANTE se assente o scaduto."""
+        with self.lock:
+            voce = self.voci.get(chiave)
+            if voce is None or voce[1] <= time.time():
+                if voce is not None:
+                    del self.voci[chiave]
+                self.contatori['miss'] += 1
+                return MANCANTE
+            self.voci.move_to_end(chiave)
+            self.contatori['hit'] += 1
+            return voce[0]
+    
+    def imposta(self, chiave: Any, valore: Any, generazione: Optional[int] = None) -> None:
+        """
+        Memorizza un valore in cache.
+        
+        Args:
+            chiave: Chiave della voce
+            valore: Valore da memorizzare
+            generazione: Generazione letta prima del caricamento del valore; se nel
+                frattempo il namespace è stato invalidato il valore viene scartato
+        """
+        with self.lock:
+            if generazione is not None and generazione != self.generazione:
+                return
+            self.voci[chiave] = (valore, time.time() + self.ttl)
+            self.voci.move_to_end(chiave)
+            while len(self.voci) > self.dimensione_massima:
+                self.voci.popitem(last=False)
+                self.contatori['espulsioni'] += 1
+    
+    def ottieni(self, chiave: Any, carica: Callable[[], Any], force_reload: bool = False) -> Any:
+        """
+        Restituisce il valore in cache o lo carica con la funzione indicata.
+        
+        Args:
+            chiave: Chiave della voce
+            carica: Funzione senza argomenti che legge il valore dal database;
+                se restituisce None (errore o database non configurato) il valore non viene memorizzato
+            force_reload: Se True, ignora la voce in cache
+        
+        Returns:
+            Il valore in cache o quello appena caricato
+        """
+        if not force_reload:
+            valore = self.leggi(chiave)
+            if valore is not MANCANTE:
+                return valore
+        else:
+            with self.lock:
+                self.contatori['miss'] += 1
+        
+        with self.lock:
+            generazione = self.generazione
+        valore = carica()
+        if valore is not None:
+            self.imposta(chiave, valore, generazione)
+        return valore
+    
+    def invalida(self, chiave: Any = MANCANTE) -> None:
+        """Rimuove una voce, o tutte le voci del namespace se la chiave non è indicata."""
+        with self.lock:
+            if chiave is MANCANTE:
+                self.voci.clear()
+            else:
+                self.voci.pop(chiave, None)
+            self.generazione += 1
+            self.contatori['invalidazioni'] += 1
+    
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce dimensione e contatori del namespace."""
+        with self.lock:
+            richieste = self.contatori['hit'] + self.contatori['miss']
+            return dict(self.contatori, voci=len(self.voci), ttl=self.ttl,
+                        hit_ratio=round(self.contatori['hit'] / richieste, 3) if richieste else 0.0)
+
+class ServizioCache:
+    """
+    Cache condivisa dal processo per i dati letti da Supabase.
+    
+    Ogni manager registra i propri namespace con i tag dei dati da cui dipendono
+    e, dopo ogni scrittura, chiama invalida_tag con il tag del dato modificato:
+    vengono svuotati i namespace con quel tag e con i tag che ne dipendono
+    secondo DIPENDENZE.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.namespace_registrati = {}
+        # Funzioni chiamate con i tag espansi a ogni invalidazione
+        self.ascoltatori = []
+    
+    def namespace(self, nome: str, ttl: float = CACHE_TTL, dimensione_massima: int = DIMENSIONE_MASSIMA,
+                  tag: Iterable[str] = ()) -> NamespaceCache:
+        """
+        Restituisce il namespace indicato, creandolo se non esiste.
+        
+        Args:
+            nome: Nome del namespace
+            ttl: Tempo di validità delle voci in secondi
+            dimensione_massima: Numero massimo di voci (LRU)
+            tag: Tag dei dati da cui dipendono le voci; il nome del namespace è sempre incluso
+        """
+        with self.lock:
+            if nome not in self.namespace_registrati:
+                self.namespace_registrati[nome] = NamespaceCache(nome, ttl, dimensione_massima, set(tag) | {nome})
+            return self.namespace_registrati[nome]
+    
+    def invalida_tag(self, *tag: str) -> Set[str]:
+        """
+        Invalida i namespace che dipendono dai tag indicati, anche indirettamente.
+        
+        Returns:
+            Insieme dei tag invalidati
+        """
+        espansi = espandi_tag(tag)
+        with self.lock:
+            namespace = list(self.namespace_registrati.values())
+            ascoltatori = list(self.ascoltatori)
+        for ns in namespace:
+            if ns.tag & espansi:
+                ns.invalida()
+        for ascoltatore in ascoltatori:
+            try:
+                ascoltatore(espansi)
+            except Exception as e:
+                print(f"Errore nella notifica dell'invalidazione della cache: {e}")
+        return espansi
+    
+    def aggiungi_ascoltatore(self, ascoltatore: Callable[[Set[str]], None]) -> None:
+        """Registra una funzione da chiamare con i tag espansi a ogni invalidazione."""
+        with self.lock:
+            self.ascoltatori.append(ascoltatore)
+    
+    def rimuovi_ascoltatore(self, ascoltatore: Callable[[Set[str]], None]) -> None:
+        """Rimuove una funzione registrata con aggiungi_ascoltatore."""
+        with self.lock:
+            if ascoltatore in self.ascoltatori:
+                self.ascoltatori.remove(ascoltatore)
+    
+    def svuota(self) -> None:
+        """Svuota tutti i namespace."""
+        with self.lock:
+            namespace = list(self.namespace_registrati.values())
+        for ns in namespace:
+            ns.invalida()
+    
+    def statistiche(self) -> Dict[str, Dict[str, Any]]:
+        """Restituisce i contatori di tutti i namespace."""
+        with self.lock:
+            namespace = list(self.namespace_registrati.values())
+        return {ns.nome: ns.statistiche() for ns in namespace}
+
+# Cache condivisa dal processo
+cache = ServizioCache()
+
+def invalida_dopo(*tag: str) -> Callable:
+    """
+    Decoratore per le funzioni di scrittura (sincrone o asincrone): al termine,
+    anche in caso di errore o di salvataggio parziale, invalida i tag indicati.
+    
+    Args:
+        *tag: Tag dei dati modificati dalla funzione
+    """
+    def decoratore(funzione):
+        if inspect.iscoroutinefunction(funzione):
+            @functools.wraps(funzione)
+            async def wrapper_async(*args, **kwargs):
+                try:
+                    return await funzione(*args, **kwargs)
+                finally:
+                    cache.invalida_tag(*tag)
+            return wrapper_async
+        
+        @functools.wraps(funzione)
+        def wrapper(*args, **kwargs):
+            try:
+                return funzione(*args, **kwargs)
+            finally:
+                cache.invalida_tag(*tag)
+        return wrapper
+    return decoratore
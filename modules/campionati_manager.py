@@ -3,19 +3,11 @@
 
 import os
 import json
-import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Union, Tuple
 
-# Cache per i dati
-_cache = {
-    'stagioni': None,
-    'campionati': None,
-    'arbitri': None,
-    'last_load_stagioni': 0,
-    'last_load_campionati': 0,
-    'last_load_arbitri': 0
-}
+from modules.classifica_manager import calcola_classifica as calcola_classifica_squadre, REGOLAMENTO_CAMPIONATI
+from modules.cache_manager import cache
 
 # Importa le funzioni per la gestione dei tutor arbitrali
 from modules.tutor_manager import (
@@ -23,8 +15,46 @@ from modules.tutor_manager import (
     get_tutor_partita, assegna_tutor_partita, rimuovi_tutor_partita
 )
 
-# Tempo di validità della cache in secondi (5 secondi)
-CACHE_TTL = 5
+# Cache per i dati, invalidate dalle funzioni di scrittura tramite i tag
+_cache_stagioni = cache.namespace('stagioni', dimensione_massima=1)
+_cache_campionati = cache.namespace('campionati', dimensione_massima=64)
+_cache_arbitri = cache.namespace('arbitri', dimensione_massima=1)
+_cache_squadre = cache.namespace('squadre_campionato', tag=('campionati',))
+_cache_partite = cache.namespace('partite_campionato', tag=('partite',))
+_cache_designazioni = cache.namespace('designazioni_partita', dimensione_massima=2048, tag=('designazioni', 'partite'))
+_cache_classifica = cache.namespace('classifica_campionato', tag=('classifica',))
+
+# Tag dei dati modificati da ciascun evento di aggiorna_indici
+TAG_EVENTI = {
+    'registra_partita': 'partite',
+    'rimuovi_partita': 'partite',
+    'registra_designazione': 'designazioni',
+    'rimuovi_designazione': 'designazioni',
+    'registra_tutor_partita': 'tutor_partite',
+    'rimuovi_tutor_partita': 'tutor_partite',
+    'invalida': 'campionati'
+}
+
+def aggiorna_indici(evento: str, *args) -> None:
+    """
+    Propaga una modifica agli indici in memoria costruiti sulle designazioni
+    e invalida le voci in cache che dipendono dai dati modificati.
+    
+    Gli aggregati delle statistiche degli arbitri e l'indice delle disponibilità
+    espongono gli stessi metodi di aggiornamento (registra_designazione,
+    rimuovi_designazione, registra_tutor_partita, rimuovi_tutor_partita,
+    registra_partita, rimuovi_partita, invalida).
+    
+    Args:
+        evento: Nome del metodo di aggiornamento
+        *args: Argomenti del metodo
+    """
+    from modules.statistiche_manager import aggregati_arbitri
+    from modules.disponibilita_manager import indice_disponibilita
+    
+    for indice in (aggregati_arbitri, indice_disponibilita):
+        getattr(indice, evento)(*args)
+    cache.invalida_tag(TAG_EVENTI[evento])
 
 # Funzioni per la gestione delle stagioni sportive
 def carica_stagioni(force_reload=False) -> List[Dict[str, Any]]:
@@ -37,31 +67,22 @@ def carica_stagioni(force_reload=False) -> List[Dict[str, Any]]:
     Returns:
         Lista delle stagioni sportive
     """
-    current_time = time.time()
-    
-    # Usa la cache se disponibile e non scaduta
-    if not force_reload and _cache['stagioni'] is not None and (current_time - _cache['last_load_stagioni']) < CACHE_TTL:
-        return _cache['stagioni']
-    
-    # Carica dal database
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            response = supabase.table('stagioni').select('*').order('data_inizio', desc=True).execute()
-            stagioni = response.data
-            
-            # Aggiorna la cache
-            _cache['stagioni'] = stagioni
-            _cache['last_load_stagioni'] = current_time
-            return stagioni
-    except Exception as e:
-        print(f"Errore nel caricamento delle stagioni dal database: {e}")
+                response = supabase.table('stagioni').select('*').order('data_inizio', desc=True).execute()
+                return response.data
+        except Exception as e:
+            print(f"Errore nel caricamento delle stagioni dal database: {e}")
+        return None
     
-    # Se non ci sono dati o si è verificato un errore, restituisci una lista vuota
-    return []
+    # Usa la cache se disponibile e non scaduta; se non ci sono dati o si è
+    # verificato un errore, restituisci una lista vuota
+    return _cache_stagioni.ottieni('tutte', carica, force_reload) or []
 
 def crea_stagione(nome: str, data_inizio: str, data_fine: str, attiva: bool = False) -> Optional[Dict[str, Any]]:
     """
@@ -98,7 +119,7 @@ def crea_stagione(nome: str, data_inizio: str, data_fine: str, attiva: bool = Fa
             
             if response.data:
                 # Invalida la cache
-                _cache['stagioni'] = None
+                cache.invalida_tag('stagioni')
                 return response.data[0]
     except Exception as e:
         print(f"Errore nella creazione della stagione: {e}")
@@ -140,7 +161,7 @@ def aggiorna_stagione(stagione_id: int, nome: str, data_inizio: str, data_fine:
             supabase.table('stagioni').update(stagione_data).eq('id', stagione_id).execute()
             
             # Invalida la cache
-            _cache['stagioni'] = None
+            cache.invalida_tag('stagioni')
             return True
     except Exception as e:
         print(f"Errore nell'aggiornamento della stagione: {e}")
@@ -167,7 +188,7 @@ def elimina_stagione(stagione_id: int) -> bool:
             supabase.table('stagioni').delete().eq('id', stagione_id).execute()
             
             # Invalida la cache
-            _cache['stagioni'] = None
+            cache.invalida_tag('stagioni')
             return True
     except Exception as e:
         print(f"Errore nell'eliminazione della stagione: {e}")
@@ -205,42 +226,27 @@ def carica_campionati(stagione_id: Optional[int] = None, force_reload=False) ->
     Returns:
         Lista dei campionati
     """
-    current_time = time.time()
-    
-    # Usa la cache se disponibile e non scaduta
-    if not force_reload and _cache['campionati'] is not None and (current_time - _cache['last_load_campionati']) < CACHE_TTL:
-        campionati = _cache['campionati']
-        if stagione_id is not None:
-            return [c for c in campionati if c.get('stagione_id') == stagione_id]
-        return campionati
-    
-    # Carica dal database
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
-            
-            query = supabase.table('campionati').select('*')
-            
-            if stagione_id is not None:
-                query = query.eq('stagione_id', stagione_id)
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            response = query.execute()
-            campionati = response.data
+                query = supabase.table('campionati').select('*')
             
-            # Aggiorna la cache
-            _cache['campionati'] = campionati
-            _cache['last_load_campionati'] = current_time
+                if stagione_id is not None:
+                    query = query.eq('stagione_id', stagione_id)
             
-            if stagione_id is not None:
-                return [c for c in campionati if c.get('stagione_id') == stagione_id]
-            return campionati
-    except Exception as e:
-        print(f"Errore nel caricamento dei campionati dal database: {e}")
+                response = query.execute()
+                return response.data
+        except Exception as e:
+            print(f"Errore nel caricamento dei campionati dal database: {e}")
+        return None
     
-    # Se non ci sono dati o si è verificato un errore, restituisci una lista vuota
-    return []
+    # Il filtro è applicato dal server: ogni stagione ha la propria voce in cache,
+    # separata dall'elenco completo
+    return _cache_campionati.ottieni(stagione_id, carica, force_reload) or []
 
 def get_campionato(campionato_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -310,7 +316,7 @@ def crea_campionato(stagione_id: int, nome: str, categoria: str, genere: str,
             
             if response.data:
                 # Invalida la cache
-                _cache['campionati'] = None
+                cache.invalida_tag('campionati')
                 return response.data[0]
     except Exception as e:
         print(f"Errore nella creazione del campionato: {e}")
@@ -350,8 +356,8 @@ def aggiorna_campionato(campionato_id: int, nome: str, categoria: str, genere: s
             
             supabase.table('campionati').update(campionato_data).eq('id', campionato_id).execute()
             
-            # Invalida la cache
-            _cache['campionati'] = None
+            # Invalida la cache e gli indici in memoria
+            aggiorna_indici('invalida')
             return True
     except Exception as e:
         print(f"Errore nell'aggiornamento del campionato: {e}")
@@ -377,8 +383,8 @@ def elimina_campionato(campionato_id: int) -> bool:
             # Elimina il campionato
             supabase.table('campionati').delete().eq('id', campionato_id).execute()
             
-            # Invalida la cache
-            _cache['campionati'] = None
+            # Invalida la cache e gli indici in memoria
+            aggiorna_indici('invalida')
             return True
     except Exception as e:
         print(f"Errore nell'eliminazione del campionato: {e}")
@@ -396,19 +402,21 @@ def carica_squadre_campionato(campionato_id: int) -> List[str]:
     Returns:
         Lista dei nomi delle squadre
     """
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            response = supabase.table('campionato_squadre').select('squadra').eq('campionato_id', campionato_id).execute()
+                response = supabase.table('campionato_squadre').select('squadra').eq('campionato_id', campionato_id).execute()
             
-            return [item.get('squadra') for item in response.data]
-    except Exception as e:
-        print(f"Errore nel caricamento delle squadre del campionato: {e}")
+                return [item.get('squadra') for item in response.data]
+        except Exception as e:
+            print(f"Errore nel caricamento delle squadre del campionato: {e}")
+        return None
     
-    return []
+    return list(_cache_squadre.ottieni(campionato_id, carica) or [])
 
 def aggiungi_squadra_campionato(campionato_id: int, squadra: str) -> bool:
     """
@@ -436,6 +444,7 @@ def aggiungi_squadra_campionato(campionato_id: int, squadra: str) -> bool:
                     'campionato_id': campionato_id,
                     'squadra': squadra
                 }).execute()
+                _cache_squadre.invalida(campionato_id)
             
             return True
     except Exception as e:
@@ -462,6 +471,7 @@ def rimuovi_squadra_campionato(campionato_id: int, squadra: str) -> bool:
             
             # Rimuovi la squadra
             supabase.table('campionato_squadre').delete().eq('campionato_id', campionato_id).eq('squadra', squadra).execute()
+            _cache_squadre.invalida(campionato_id)
             
             return True
     except Exception as e:
@@ -480,31 +490,22 @@ def carica_arbitri(force_reload=False) -> List[Dict[str, Any]]:
     Returns:
         Lista degli arbitri
     """
-    current_time = time.time()
-    
-    # Usa la cache se disponibile e non scaduta
-    if not force_reload and _cache['arbitri'] is not None and (current_time - _cache['last_load_arbitri']) < CACHE_TTL:
-        return _cache['arbitri']
-    
-    # Carica dal database
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
-            
-            response = supabase.table('arbitri').select('*').order('cognome').execute()
-            arbitri = response.data
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            # Aggiorna la cache
-            _cache['arbitri'] = arbitri
-            _cache['last_load_arbitri'] = current_time
-            return arbitri
-    except Exception as e:
-        print(f"Errore nel caricamento degli arbitri dal database: {e}")
+                response = supabase.table('arbitri').select('*').order('cognome').execute()
+                return response.data
+        except Exception as e:
+            print(f"Errore nel caricamento degli arbitri dal database: {e}")
+        return None
     
-    # Se non ci sono dati o si è verificato un errore, restituisci una lista vuota
-    return []
+    # Usa la cache se disponibile e non scaduta; se non ci sono dati o si è
+    # verificato un errore, restituisci una lista vuota
+    return _cache_arbitri.ottieni('tutti', carica, force_reload) or []
 
 def get_arbitro(arbitro_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -576,7 +577,7 @@ def crea_arbitro(nome: str, cognome: str, email: str = "", telefono: str = "",
             
             if response.data:
                 # Invalida la cache
-                _cache['arbitri'] = None
+                cache.invalida_tag('arbitri')
                 return response.data[0]
     except Exception as e:
         print(f"Errore nella creazione dell'arbitro: {e}")
@@ -621,7 +622,7 @@ def aggiorna_arbitro(arbitro_id: int, nome: str, cognome: str, email: str = "",
             supabase.table('arbitri').update(arbitro_data).eq('id', arbitro_id).execute()
             
             # Invalida la cache
-            _cache['arbitri'] = None
+            cache.invalida_tag('arbitri')
             return True
     except Exception as e:
         print(f"Errore nell'aggiornamento dell'arbitro: {e}")
@@ -648,7 +649,7 @@ def elimina_arbitro(arbitro_id: int) -> bool:
             supabase.table('arbitri').delete().eq('id', arbitro_id).execute()
             
             # Invalida la cache
-            _cache['arbitri'] = None
+            cache.invalida_tag('arbitri')
             return True
     except Exception as e:
         print(f"Errore nell'eliminazione dell'arbitro: {e}")
@@ -666,19 +667,22 @@ def carica_partite_campionato(campionato_id: int) -> List[Dict[str, Any]]:
     Returns:
         Lista delle partite
     """
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            response = supabase.table('partite_campionato').select('*').eq('campionato_id', campionato_id).order('data_partita').execute()
+                response = supabase.table('partite_campionato').select('*').eq('campionato_id', campionato_id).order('data_partita').execute()
             
-            return response.data
-    except Exception as e:
-        print(f"Errore nel caricamento delle partite del campionato: {e}")
+                return response.data
+        except Exception as e:
+            print(f"Errore nel caricamento delle partite del campionato: {e}")
+        return None
     
-    return []
+    # Copie delle righe: le pagine vi aggiungono arbitri e tutor
+    return [dict(p) for p in _cache_partite.ottieni(campionato_id, carica) or []]
 
 def get_partita(partita_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -753,6 +757,7 @@ def crea_partita(campionato_id: int, data_partita: str, squadra_casa: str, squad
             response = supabase.table('partite_campionato').insert(partita_data).execute()
             
             if response.data:
+                aggiorna_indici('registra_partita', response.data[0])
                 return response.data[0]
     except Exception as e:
         print(f"Errore nella creazione della partita: {e}")
@@ -817,13 +822,19 @@ def aggiorna_partita(partita_id: int, data_partita: str, squadra_casa: str, squa
             if mete_trasferta is not None:
                 partita_data['mete_trasferta'] = mete_trasferta
             
+            # Versione precedente della partita, per sostituirne il contributo in classifica
+            partita_precedente = get_partita(partita_id)
+            
             supabase.table('partite_campionato').update(partita_data).eq('id', partita_id).execute()
             
-            # Se la partita è completata, aggiorna la classifica
-            if stato == "completata" and punteggio_casa is not None and punteggio_trasferta is not None:
-                partita = get_partita(partita_id)
-                if partita:
-                    aggiorna_classifica_dopo_partita(partita)
+            # Aggiorna la classifica se la partita era o è diventata completata
+            if partita_precedente:
+                partita = dict(partita_precedente)
+                partita.update(partita_data)
+                aggiorna_classifica_dopo_partita(partita, partita_precedente)
+            
+            # Aggiorna statistiche e disponibilità degli arbitri (data e stato della partita)
+            aggiorna_indici('registra_partita', dict(partita_data, id=partita_id))
             
             return True
     except Exception as e:
@@ -847,9 +858,18 @@ def elimina_partita(partita_id: int) -> bool:
         if is_supabase_configured():
             from modules.db_manager import supabase
             
+            partita = get_partita(partita_id)
+            
             # Elimina la partita
             supabase.table('partite_campionato').delete().eq('id', partita_id).execute()
             
+            # Annulla il contributo della partita in classifica
+            if partita:
+                aggiorna_classifica_dopo_partita(None, partita)
+            
+            # Le designazioni della partita non contano più per statistiche e disponibilità
+            aggiorna_indici('rimuovi_partita', partita_id)
+            
             return True
     except Exception as e:
         print(f"Errore nell'eliminazione della partita: {e}")
@@ -867,19 +887,21 @@ def carica_designazioni_partita(partita_id: int) -> List[Dict[str, Any]]:
     Returns:
         Lista delle designazioni arbitrali
     """
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            response = supabase.table('designazioni_arbitrali').select('*').eq('partita_id', partita_id).execute()
+                response = supabase.table('designazioni_arbitrali').select('*').eq('partita_id', partita_id).execute()
             
-            return response.data
-    except Exception as e:
-        print(f"Errore nel caricamento delle designazioni arbitrali: {e}")
+                return response.data
+        except Exception as e:
+            print(f"Errore nel caricamento delle designazioni arbitrali: {e}")
+        return None
     
-    return []
+    return [dict(d) for d in _cache_designazioni.ottieni(partita_id, carica) or []]
 
 def aggiungi_designazione(partita_id: int, arbitro_id: int, ruolo: str, 
                          confermata: bool = False, note: str = "") -> Optional[Dict[str, Any]]:
@@ -912,6 +934,8 @@ def aggiungi_designazione(partita_id: int, arbitro_id: int, ruolo: str,
                     'note': note
                 }).eq('id', response.data[0].get('id')).execute()
                 
+                aggiorna_indici('registra_designazione', dict(response.data[0], confermata=confermata, note=note))
+                
                 return response.data[0]
             else:
                 # Crea una nuova designazione
@@ -926,6 +950,7 @@ def aggiungi_designazione(partita_id: int, arbitro_id: int, ruolo: str,
                 response = supabase.table('designazioni_arbitrali').insert(designazione_data).execute()
                 
                 if response.data:
+                    aggiorna_indici('registra_designazione', response.data[0])
                     return response.data[0]
     except Exception as e:
         print(f"Errore nell'aggiunta della designazione arbitrale: {e}")
@@ -951,6 +976,9 @@ def rimuovi_designazione(designazione_id: int) -> bool:
             # Rimuovi la designazione
             supabase.table('designazioni_arbitrali').delete().eq('id', designazione_id).execute()
             
+            # Aggiorna statistiche e disponibilità degli arbitri
+            aggiorna_indici('rimuovi_designazione', designazione_id)
+            
             return True
     except Exception as e:
         print(f"Errore nella rimozione della designazione arbitrale: {e}")
@@ -968,19 +996,22 @@ def carica_classifica_campionato(campionato_id: int) -> List[Dict[str, Any]]:
     Returns:
         Lista delle squadre con i relativi punteggi
     """
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            response = supabase.table('classifica_campionato').select('*').eq('campionato_id', campionato_id).order('punti', desc=True).execute()
+                response = supabase.table('classifica_campionato').select('*').eq('campionato_id', campionato_id).order('punti', desc=True).execute()
             
-            return response.data
-    except Exception as e:
-        print(f"Errore nel caricamento della classifica del campionato: {e}")
+                return response.data
+        except Exception as e:
+            print(f"Errore nel caricamento della classifica del campionato: {e}")
+        return None
     
-    return []
+    # Copie delle righe: le pagine le riordinano e le modificano
+    return [dict(r) for r in _cache_classifica.ottieni(campionato_id, carica) or []]
 
 def inizializza_classifica_campionato(campionato_id: int) -> bool:
     """
@@ -1004,25 +1035,151 @@ def inizializza_classifica_campionato(campionato_id: int) -> bool:
             # Elimina la classifica esistente
             supabase.table('classifica_campionato').delete().eq('campionato_id', campionato_id).execute()
             
-            # Crea una nuova riga per ogni squadra
-            for squadra in squadre:
-                supabase.table('classifica_campionato').insert({
-                    'campionato_id': campionato_id,
-                    'squadra': squadra
-                }).execute()
+            # Crea una riga per ogni squadra con un unico inserimento
+            if squadre:
+                supabase.table('classifica_campionato').insert([
+                    {'campionato_id': campionato_id, 'squadra': squadra} for squadra in squadre
+                ]).execute()
             
+            cache.invalida_tag('classifica')
             return True
     except Exception as e:
         print(f"Errore nell'inizializzazione della classifica del campionato: {e}")
     
     return False
 
-def aggiorna_classifica_dopo_partita(partita: Dict[str, Any]) -> bool:
+# Colonne della classifica calcolate dai risultati delle partite
+COLONNE_CLASSIFICA = ['punti', 'partite_giocate', 'vittorie', 'pareggi', 'sconfitte', 'mete_fatte', 'mete_subite',
+                      'punti_fatti', 'punti_subiti', 'bonus_offensivi', 'bonus_difensivi']
+
+def _partita_conteggiata(partita: Optional[Dict[str, Any]]) -> bool:
+    """Verifica se una partita contribuisce alla classifica (completata e con punteggio)."""
+    return (partita is not None
+            and partita.get('stato', 'completata') == 'completata'
+            and partita.get('punteggio_casa') is not None
+            and partita.get('punteggio_trasferta') is not None)
+
+def calcola_contributo_partita(partita: Dict[str, Any]) -> Tuple[Dict[str, int], Dict[str, int]]:
     """
-    Aggiorna la classifica dopo una partita.
+    Calcola il contributo di una partita alla classifica delle due squadre.
+    
+    Le regole (4 punti per la vittoria, 2 per il pareggio, bonus offensivo con
+    almeno 4 mete e bonus difensivo per la sconfitta con al massimo 7 punti di
+    scarto) sono quelle di REGOLAMENTO_CAMPIONATI.
     
     Args:
         partita: Dizionario con i dati della partita
+    
+    Returns:
+        Tupla (contributo squadra di casa, contributo squadra in trasferta)
+    """
+    punteggio_casa = partita.get('punteggio_casa')
+    punteggio_trasferta = partita.get('punteggio_trasferta')
+    mete_casa = partita.get('mete_casa') or 0
+    mete_trasferta = partita.get('mete_trasferta') or 0
+    
+    return (REGOLAMENTO_CAMPIONATI.contributo(punteggio_casa, punteggio_trasferta, mete_casa, mete_trasferta),
+            REGOLAMENTO_CAMPIONATI.contributo(punteggio_trasferta, punteggio_casa, mete_trasferta, mete_casa))
+
+def calcola_classifica(campionato_id: int, squadre: List[str], partite: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Calcola in memoria la classifica di un campionato con un solo passaggio sulle partite.
+    
+    Args:
+        campionato_id: ID del campionato
+        squadre: Squadre iscritte al campionato
+        partite: Partite del campionato (vengono considerate solo quelle completate)
+    
+    Returns:
+        Dizionario squadra -> riga della classifica
+    """
+    righe = calcola_classifica_squadre(
+        [(p.get('squadra_casa'), p.get('squadra_trasferta'), p.get('punteggio_casa'), p.get('punteggio_trasferta'),
+          p.get('mete_casa'), p.get('mete_trasferta')) for p in partite if _partita_conteggiata(p)],
+        REGOLAMENTO_CAMPIONATI,
+        squadre
+    )
+    
+    classifica = {}
+    for riga in righe:
+        dati = {'campionato_id': campionato_id, 'squadra': riga['squadra']}
+        dati.update({colonna: riga[colonna] for colonna in COLONNE_CLASSIFICA})
+        classifica[riga['squadra']] = dati
+    
+    return classifica
+
+def _salva_righe_classifica(righe: List[Dict[str, Any]]) -> bool:
+    """Salva le righe della classifica con un unico upsert."""
+    from modules.db_manager import supabase
+    
+    if not righe:
+        return True
+    response = supabase.table('classifica_campionato').upsert(righe, on_conflict='campionato_id,squadra').execute()
+    cache.invalida_tag('classifica')
+    return response.data is not None
+
+def _applica_delta_classifica(partita: Optional[Dict[str, Any]], partita_precedente: Optional[Dict[str, Any]]) -> bool:
+    """
+    Aggiorna la classifica sostituendo il contributo della versione precedente
+    di una partita con quello della versione attuale.
+    
+    Args:
+        partita: Versione attuale della partita, o None se eliminata
+        partita_precedente: Versione già conteggiata della partita, o None
+    
+    Returns:
+        True se l'aggiornamento è riuscito, False altrimenti
+    """
+    from modules.db_manager import supabase
+    
+    # Contributi da sommare (+1) e da annullare (-1)
+    contributi = []
+    if _partita_conteggiata(partita):
+        contributi.append((partita, 1))
+    if _partita_conteggiata(partita_precedente):
+        contributi.append((partita_precedente, -1))
+    
+    if not contributi:
+        return True
+    
+    campionato_id = (partita or partita_precedente).get('campionato_id')
+    
+    delta = {}
+    for p, segno in contributi:
+        contributo_casa, contributo_trasferta = calcola_contributo_partita(p)
+        for squadra, contributo in ((p.get('squadra_casa'), contributo_casa),
+                                    (p.get('squadra_trasferta'), contributo_trasferta)):
+            dati = delta.setdefault(squadra, {colonna: 0 for colonna in COLONNE_CLASSIFICA})
+            for colonna, valore in contributo.items():
+                dati[colonna] += segno * valore
+    
+    # Carica con una sola query le righe delle squadre coinvolte
+    response = supabase.table('classifica_campionato').select('*').eq('campionato_id', campionato_id).in_('squadra', list(delta)).execute()
+    righe = {r.get('squadra'): r for r in response.data or []}
+    
+    # Se manca una squadra la classifica non è allineata: ricalcolala da zero
+    if len(righe) < len(delta):
+        return ricalcola_classifica_campionato(campionato_id)
+    
+    aggiornate = []
+    for squadra, variazioni in delta.items():
+        dati = {'campionato_id': campionato_id, 'squadra': squadra}
+        for colonna in COLONNE_CLASSIFICA:
+            dati[colonna] = (righe[squadra].get(colonna) or 0) + variazioni[colonna]
+        aggiornate.append(dati)
+    
+    return _salva_righe_classifica(aggiornate)
+
+def aggiorna_classifica_dopo_partita(partita: Optional[Dict[str, Any]], partita_precedente: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Aggiorna la classifica dopo una partita.
+    
+    Se viene indicata la versione precedente della partita, il suo contributo
+    viene annullato, così un cambio di punteggio o di stato non viene contato due volte.
+    
+    Args:
+        partita: Dizionario con i dati della partita, o None se eliminata
+        partita_precedente: Dati della partita prima della modifica
         
     Returns:
         True se l'aggiornamento è riuscito, False altrimenti
@@ -1031,110 +1188,7 @@ def aggiorna_classifica_dopo_partita(partita: Dict[str, Any]) -> bool:
         from modules.db_manager import is_supabase_configured
         
         if is_supabase_configured():
-            from modules.db_manager import supabase
-            
-            campionato_id = partita.get('campionato_id')
-            squadra_casa = partita.get('squadra_casa')
-            squadra_trasferta = partita.get('squadra_trasferta')
-            punteggio_casa = partita.get('punteggio_casa')
-            punteggio_trasferta = partita.get('punteggio_trasferta')
-            mete_casa = partita.get('mete_casa', 0)
-            mete_trasferta = partita.get('mete_trasferta', 0)
-            
-            # Verifica che i punteggi siano presenti
-            if punteggio_casa is None or punteggio_trasferta is None:
-                return False
-            
-            # Carica le righe della classifica per le due squadre
-            response_casa = supabase.table('classifica_campionato').select('*').eq('campionato_id', campionato_id).eq('squadra', squadra_casa).execute()
-            response_trasferta = supabase.table('classifica_campionato').select('*').eq('campionato_id', campionato_id).eq('squadra', squadra_trasferta).execute()
-            
-            # Se le righe non esistono, inizializza la classifica
-            if not response_casa.data or not response_trasferta.data:
-                inizializza_classifica_campionato(campionato_id)
-                response_casa = supabase.table('classifica_campionato').select('*').eq('campionato_id', campionato_id).eq('squadra', squadra_casa).execute()
-                response_trasferta = supabase.table('classifica_campionato').select('*').eq('campionato_id', campionato_id).eq('squadra', squadra_trasferta).execute()
-            
-            # Ottieni i dati attuali
-            classifica_casa = response_casa.data[0] if response_casa.data else None
-            classifica_trasferta = response_trasferta.data[0] if response_trasferta.data else None
-            
-            if not classifica_casa or not classifica_trasferta:
-                return False
-            
-            # Calcola i punti per la partita
-            punti_casa = 0
-            punti_trasferta = 0
-            vittoria_casa = False
-            vittoria_trasferta = False
-            pareggio = False
-            
-            if punteggio_casa > punteggio_trasferta:
-                punti_casa = 4  # Vittoria
-                vittoria_casa = True
-            elif punteggio_trasferta > punteggio_casa:
-                punti_trasferta = 4  # Vittoria
-                vittoria_trasferta = True
-            else:
-                punti_casa = 2  # Pareggio
-                punti_trasferta = 2  # Pareggio
-                pareggio = True
-            
-            # Bonus offensivo (4+ mete)
-            bonus_offensivo_casa = 1 if mete_casa >= 4 else 0
-            bonus_offensivo_trasferta = 1 if mete_trasferta >= 4 else 0
-            
-            punti_casa += bonus_offensivo_casa
-            punti_trasferta += bonus_offensivo_trasferta
-            
-            # Bonus difensivo (sconfitta con meno di 8 punti di scarto)
-            if vittoria_casa and (punteggio_casa - punteggio_trasferta) < 8:
-                punti_trasferta += 1  # Bonus difensivo
-                bonus_difensivo_trasferta = 1
-            else:
-                bonus_difensivo_trasferta = 0
-            
-            if vittoria_trasferta and (punteggio_trasferta - punteggio_casa) < 8:
-                punti_casa += 1  # Bonus difensivo
-                bonus_difensivo_casa = 1
-            else:
-                bonus_difensivo_casa = 0
-            
-            # Aggiorna la classifica della squadra di casa
-            dati_casa = {
-                'punti': classifica_casa.get('punti', 0) + punti_casa,
-                'partite_giocate': classifica_casa.get('partite_giocate', 0) + 1,
-                'vittorie': classifica_casa.get('vittorie', 0) + (1 if vittoria_casa else 0),
-                'pareggi': classifica_casa.get('pareggi', 0) + (1 if pareggio else 0),
-                'sconfitte': classifica_casa.get('sconfitte', 0) + (1 if vittoria_trasferta else 0),
-                'mete_fatte': classifica_casa.get('mete_fatte', 0) + mete_casa,
-                'mete_subite': classifica_casa.get('mete_subite', 0) + mete_trasferta,
-                'punti_fatti': classifica_casa.get('punti_fatti', 0) + punteggio_casa,
-                'punti_subiti': classifica_casa.get('punti_subiti', 0) + punteggio_trasferta,
-                'bonus_offensivi': classifica_casa.get('bonus_offensivi', 0) + bonus_offensivo_casa,
-                'bonus_difensivi': classifica_casa.get('bonus_difensivi', 0) + bonus_difensivo_casa
-            }
-            
-            supabase.table('classifica_campionato').update(dati_casa).eq('id', classifica_casa.get('id')).execute()
-            
-            # Aggiorna la classifica della squadra in trasferta
-            dati_trasferta = {
-                'punti': classifica_trasferta.get('punti', 0) + punti_trasferta,
-                'partite_giocate': classifica_trasferta.get('partite_giocate', 0) + 1,
-                'vittorie': classifica_trasferta.get('vittorie', 0) + (1 if vittoria_trasferta else 0),
-                'pareggi': classifica_trasferta.get('pareggi', 0) + (1 if pareggio else 0),
-                'sconfitte': classifica_trasferta.get('sconfitte', 0) + (1 if vittoria_casa else 0),
-                'mete_fatte': classifica_trasferta.get('mete_fatte', 0) + mete_trasferta,
-                'mete_subite': classifica_trasferta.get('mete_subite', 0) + mete_casa,
-                'punti_fatti': classifica_trasferta.get('punti_fatti', 0) + punteggio_trasferta,
-                'punti_subiti': classifica_trasferta.get('punti_subiti', 0) + punteggio_casa,
-                'bonus_offensivi': classifica_trasferta.get('bonus_offensivi', 0) + bonus_offensivo_trasferta,
-                'bonus_difensivi': classifica_trasferta.get('bonus_difensivi', 0) + bonus_difensivo_trasferta
-            }
-            
-            supabase.table('classifica_campionato').update(dati_trasferta).eq('id', classifica_trasferta.get('id')).execute()
-            
-            return True
+            return _applica_delta_classifica(partita, partita_precedente)
     except Exception as e:
         print(f"Errore nell'aggiornamento della classifica dopo la partita: {e}")
     
@@ -1144,6 +1198,9 @@ def ricalcola_classifica_campionato(campionato_id: int) -> bool:
     """
     Ricalcola la classifica di un campionato.
     
+    La classifica viene calcolata in memoria dalle partite completate e
+    salvata con un unico upsert; le righe di squadre non più presenti vengono eliminate.
+    
     Args:
         campionato_id: ID del campionato
         
@@ -1156,17 +1213,21 @@ def ricalcola_classifica_campionato(campionato_id: int) -> bool:
         if is_supabase_configured():
             from modules.db_manager import supabase
             
-            # Inizializza la classifica
-            inizializza_classifica_campionato(campionato_id)
+            squadre = carica_squadre_campionato(campionato_id)
             
             # Carica tutte le partite completate
             response = supabase.table('partite_campionato').select('*').eq('campionato_id', campionato_id).eq('stato', 'completata').execute()
             
-            # Aggiorna la classifica per ogni partita
-            for partita in response.data:
-                aggiorna_classifica_dopo_partita(partita)
+            classifica = calcola_classifica(campionato_id, squadre, response.data or [])
             
-            return True
+            # Elimina le righe delle squadre che non fanno più parte del campionato
+            esistenti = supabase.table('classifica_campionato').select('squadra').eq('campionato_id', campionato_id).execute()
+            obsolete = [r.get('squadra') for r in esistenti.data or [] if r.get('squadra') not in classifica]
+            if obsolete:
+                supabase.table('classifica_campionato').delete().eq('campionato_id', campionato_id).in_('squadra', obsolete).execute()
+                cache.invalida_tag('classifica')
+            
+            return _salva_righe_classifica(list(classifica.values()))
     except Exception as e:
         print(f"Errore nel ricalcolo della classifica del campionato: {e}")
     
@@ -1284,21 +1345,15 @@ def get_partite_squadra(squadra: str) -> List[Dict[str, Any]]:
         from modules.db_manager import is_supabase_configured
         
         if is_supabase_configured():
-            from modules.db_manager import supabase
+            from modules.db_manager import supabase, SupabaseTable
             
-            # Carica le partite in casa
-            response_casa = supabase.table('partite_campionato').select('*').eq('squadra_casa', squadra).execute()
+            # Carica le partite in casa e in trasferta, ordinate per data, con un'unica query
+            valore = SupabaseTable.valore_in_lista(squadra)
+            response = supabase.table('partite_campionato').select('*').or_(
+                f"squadra_casa.eq.{valore},squadra_trasferta.eq.{valore}"
+            ).order('data_partita').execute()
             
-            # Carica le partite in trasferta
-            response_trasferta = supabase.table('partite_campionato').select('*').eq('squadra_trasferta', squadra).execute()
-            
-            # Unisci i risultati
-            partite = response_casa.data + response_trasferta.data
-            
-            # Ordina per data
-            partite.sort(key=lambda x: x.get('data_partita', ''))
-            
-            return partite
+            return response.data
     except Exception as e:
         print(f"Errore nel caricamento delle partite della squadra: {e}")
     
@@ -1358,6 +1413,8 @@ def genera_calendario_campionato(campionato_id: int, data_inizio: str, intervall
         from modules.db_manager import is_supabase_configured, supabase
         if is_supabase_configured():
             supabase.table('partite_campionato').delete().eq('campionato_id', campionato_id).execute()
+            # Le partite eliminate non contano più per indici e cache
+            aggiorna_indici('invalida')
         
         # Crea le partite nel database
         for giornata, partite_giornata in enumerate(calendario, 1):
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
+
+# Colonne numeriche calcolate per ogni squadra
+COLONNE = ['punti', 'partite_giocate', 'vittorie', 'pareggi', 'sconfitte', 'mete_fatte', 'mete_subite',
+           'punti_fatti', 'punti_subiti', 'bonus_offensivi', 'bonus_difensivi']
+
+# Numero massimo di classifiche mantenute in cache
+CACHE_MAX = 256
+
+def bonus_offensivo(mete_minime: int = 4, anche_in_sconfitta: bool = True) -> Callable:
+    """
+    Regola del bonus offensivo: 1 punto alla squadra che segna almeno 'mete_minime' mete.
+    
+    Args:
+        mete_minime: Numero minimo di mete per ottenere il bonus
+        anche_in_sconfitta: Se False il bonus spetta solo in caso di vittoria o pareggio
+    """
+    def regola(punti_fatti, punti_subiti, mete_fatte, mete_subite):
+        if mete_fatte >= mete_minime and (anche_in_sconfitta or punti_fatti >= punti_subiti):
+            return 'bonus_offensivi', 1
+        return None
+    return regola
+
+def bonus_difensivo(scarto_massimo: int = 7) -> Callable:
+    """
+    Regola del bonus difensivo: 1 punto alla squadra sconfitta con al massimo 'scarto_massimo' punti di scarto.
+    
+    Args:
+        scarto_massimo: Scarto massimo per ottenere il bonus
+    """
+    def regola(punti_fatti, punti_subiti, mete_fatte, mete_subite):
+        if punti_fatti < punti_subiti and punti_subiti - punti_fatti <= scarto_massimo:
+            return 'bonus_difensivi', 1
+        return None
+    return regola
+
+def differenza_punti(riga: Dict[str, Any]) -> int:
+    """Criterio di ordinamento: differenza tra punti fatti e subiti."""
+    return riga['punti_fatti'] - riga['punti_subiti']
+
+def differenza_mete(riga: Dict[str, Any]) -> int:
+    """Criterio di ordinamento: differenza tra mete fatte e subite."""
+    return riga['mete_fatte'] - riga['mete_subite']
+
+class Regolamento:
+    """
+    Regole di punteggio e criteri di ordinamento di una classifica.
+    
+    Args:
+        nome: Nome del regolamento, usato anche nella chiave della cache
+        punti_vittoria: Punti assegnati per la vittoria
+        punti_pareggio: Punti assegnati per il pareggio
+        punti_sconfitta: Punti assegnati per la sconfitta
+        bonus: Regole di bonus, funzioni (punti_fatti, punti_subiti, mete_fatte, mete_subite)
+            che restituiscono (colonna, punti) oppure None
+        criteri: Criteri di ordinamento decrescente, nomi di colonna o funzioni della riga
+    """
+    
+    def __init__(self, nome: str, punti_vittoria: int = 4, punti_pareggio: int = 2, punti_sconfitta: int = 0,
+                 bonus: Optional[List[Callable]] = None, criteri: Optional[List[Any]] = None):
+        self.nome = nome
+        self.punti_vittoria = punti_vittoria
+        self.punti_pareggio = punti_pareggio
+        self.punti_sconfitta = punti_sconfitta
+        self.bonus = bonus or []
+        self.criteri = criteri or ['punti', differenza_punti]
+    
+    def contributo(self, punti_fatti: int, punti_subiti: int, mete_fatte: int, mete_subite: int) -> Dict[str, int]:
+        """
+        Calcola il contributo di una partita alla classifica di una squadra.
+        
+        Returns:
+            Dizionario colonna -> valore da sommare
+        """
+        vittoria = punti_fatti > punti_subiti
+        sconfitta = punti_fatti < punti_subiti
+        
+        contributo = dict.fromkeys(COLONNE, 0)
+        contributo['partite_giocate'] = 1
+        contributo['vittorie'] = 1 if vittoria else 0
+        contributo['sconfitte'] = 1 if sconfitta else 0
+        contributo['pareggi'] = 0 if vittoria or sconfitta else 1
+        contributo['punti'] = (self.punti_vittoria if vittoria
+                               else self.punti_sconfitta if sconfitta
+                               else self.punti_pareggio)
+        contributo['mete_fatte'] = mete_fatte
+        contributo['mete_subite'] = mete_subite
+        contributo['punti_fatti'] = punti_fatti
+        contributo['punti_subiti'] = punti_subiti
+        
+        for regola in self.bonus:
+            esito = regola(punti_fatti, punti_subiti, mete_fatte, mete_subite)
+            if esito:
+                colonna, punti = esito
+                contributo[colonna] += punti
+                contributo['punti'] += punti
+        
+        return contributo
+    
+    def chiave_ordinamento(self, riga: Dict[str, Any]) -> Tuple:
+        """Restituisce la chiave di ordinamento (decrescente) di una riga."""
+        return tuple(criterio(riga) if callable(criterio) else riga[criterio] for criterio in self.criteri)
+
+# Regolamento dei gironi dei tornei: bonus offensivo solo per chi non perde
+REGOLAMENTO_GIRONI = Regolamento(
+    'gironi',
+    bonus=[bonus_offensivo(4, anche_in_sconfitta=False), bonus_difensivo(7)],
+    criteri=['punti', differenza_punti, 'mete_fatte']
+)
+
+# Regolamento dei campionati: bonus offensivo per entrambe le squadre
+REGOLAMENTO_CAMPIONATI = Regolamento(
+    'campionati',
+    bonus=[bonus_offensivo(4), bonus_difensivo(7)],
+    criteri=['punti', differenza_punti, 'mete_fatte']
+)
+
+# Statistiche generali dei risultati: nessun bonus, ordinamento per vittorie
+REGOLAMENTO_STATISTICHE = Regolamento(
+    'statistiche',
+    criteri=['vittorie']
+)
+
+# Cache delle classifiche calcolate, indicizzata per hash dell'insieme di partite
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _hash_partite(regolamento: Regolamento, partite: List[Tuple], squadre: Optional[Dict[Any, List[str]]]) -> str:
+    """Calcola l'hash dell'insieme di partite e squadre per la cache."""
+    contenuto = repr((regolamento.nome, partite, sorted((repr(k), v) for k, v in (squadre or {}).items())))
+    return hashlib.sha1(contenuto.encode('utf-8')).hexdigest()
+
+def _copia(classifiche: Dict[Any, List[Dict[str, Any]]]) -> Dict[Any, List[Dict[str, Any]]]:
+    """Copia le righe, così i chiamanti possono modificarle senza alterare la cache."""
+    return {gruppo: [dict(riga) for riga in righe] for gruppo, righe in classifiche.items()}
+
+def calcola_classifiche(partite: Iterable[Tuple], regolamento: Regolamento,
+                        squadre: Optional[Dict[Any, List[str]]] = None) -> Dict[Any, List[Dict[str, Any]]]:
+    """
+    Calcola in un solo passaggio le classifiche di più gruppi (gironi o campionati).
+    
+    Le statistiche sono accumulate in array colonnari, uno per colonna, indicizzati
+    per squadra; le righe vengono costruite solo alla fine. Il risultato è
+    memorizzato in cache con chiave l'hash dell'insieme di partite, quindi una
+    classifica già calcolata viene restituita senza ricalcolo.
+    
+    Args:
+        partite: Tuple (gruppo, squadra1, squadra2, punteggio1, punteggio2, mete1, mete2).
+            Le partite senza punteggio vengono ignorate, le mete mancanti valgono 0.
+        regolamento: Regole di punteggio e criteri di ordinamento
+        squadre: Dizionario gruppo -> squadre da includere anche senza partite giocate
+    
+    Returns:
+        Dizionario gruppo -> lista di righe della classifica, ordinata
+    """
+    partite = [p for p in partite if p[3] is not None and p[4] is not None]
+    chiave = _hash_partite(regolamento, partite, squadre)
+    
+    with _cache_lock:
+        if chiave in _cache:
+            _cache.move_to_end(chiave)
+            return _copia(_cache[chiave])
+    
+    # Indice (gruppo, squadra) -> posizione negli array colonnari
+    indice = {}
+    gruppi = []
+    nomi = []
+    
+    def posizione(gruppo, squadra):
+        chiave_squadra = (gruppo, squadra)
+        if chiave_squadra not in indice:
+            indice[chiave_squadra] = len(nomi)
+            gruppi.append(gruppo)
+            nomi.append(squadra)
+        return indice[chiave_squadra]
+    
+    for gruppo, elenco in (squadre or {}).items():
+        for squadra in elenco:
+            posizione(gruppo, squadra)
+    
+    # Posizioni delle squadre e contributi di ogni partita
+    posizioni = []
+    contributi = []
+    for gruppo, squadra1, squadra2, punteggio1, punteggio2, mete1, mete2 in partite:
+        mete1 = mete1 or 0
+        mete2 = mete2 or 0
+        posizioni.append(posizione(gruppo, squadra1))
+        contributi.append(regolamento.contributo(punteggio1, punteggio2, mete1, mete2))
+        posizioni.append(posizione(gruppo, squadra2))
+        contributi.append(regolamento.contributo(punteggio2, punteggio1, mete2, mete1))
+    
+    # Accumula i contributi colonna per colonna
+    colonne = {}
+    for colonna in COLONNE:
+        valori = array('l', bytes(array('l').itemsize * len(nomi)))
+        for pos, contributo in zip(posizioni, contributi):
+            valori[pos] += contributo[colonna]
+        colonne[colonna] = valori
+    
+    classifiche = {gruppo: [] for gruppo in (squadre or {})}
+    for pos, squadra in enumerate(nomi):
+        riga = {'squadra': squadra}
+        for colonna in COLONNE:
+            riga[colonna] = colonne[colonna][pos]
+        riga['differenza_punti'] = riga['punti_fatti'] - riga['punti_subiti']
+        classifiche.setdefault(gruppi[pos], []).append(riga)
+    
+    for righe in classifiche.values():
+        righe.sort(key=regolamento.chiave_ordinamento, reverse=True)
+    
+    with _cache_lock:
+        _cache[chiave] = classifiche
+        if len(_cache) > CACHE_MAX:
+            _cache.popitem(last=False)
+    
+    return _copia(classifiche)
+
+def calcola_classifica(partite: Iterable[Tuple], regolamento: Regolamento,
+                       squadre: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Calcola la classifica di un singolo gruppo.
+    
+    Args:
+        partite: Tuple (squadra1, squadra2, punteggio1, punteggio2, mete1, mete2)
+        regolamento: Regole di punteggio e criteri di ordinamento
+        squadre: Squadre da includere anche senza partite giocate
+    
+    Returns:
+        Lista di righe della classifica, ordinata
+    """
+    classifiche = calcola_classifiche(((None,) + tuple(p) for p in partite), regolamento,
+                                      {None: list(squadre)} if squadre else None)
+    return classifiche.get(None, [])
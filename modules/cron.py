@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Espressioni cron per la pianificazione dei job ricorrenti (modules/job_manager.py).
+"""
+
+import calendar
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+# Abbreviazioni accettate per mesi e giorni della settimana
+MESI = {nome: i for i, nome in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                                           'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+GIORNI = {nome: i for i, nome in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+# Espressioni predefinite
+ALIAS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *'
+}
+
+# Campi dell'espressione: nome, minimo, massimo, abbreviazioni
+CAMPI = [
+    ('secondi', 0, 59, {}),
+    ('minuti', 0, 59, {}),
+    ('ore', 0, 23, {}),
+    ('giorni_mese', 1, 31, {}),
+    ('mesi', 1, 12, MESI),
+    ('giorni_settimana', 0, 7, GIORNI)
+]
+
+# Anni esaminati al massimo per trovare la prossima esecuzione (29 febbraio di un lunedì)
+ANNI_RICERCA = 28
+
+class EspressioneCron:
+    """
+    Espressione cron con calcolo diretto della prossima esecuzione.
+    
+    Accetta il formato a cinque campi (minuti, ore, giorno del mese, mese, giorno della
+    settimana) o a sei campi con i secondi in testa, con '*', liste, intervalli, passi,
+    abbreviazioni inglesi di mesi e giorni e gli alias come '@weekly'. Come in cron, se
+    sono limitati sia il giorno del mese sia quello della settimana basta che ne valga uno.
+    
+    I valori ammessi di ogni campo sono precalcolati come liste ordinate e i giorni validi
+    di ogni mese vengono memorizzati, quindi la prossima esecuzione si trova con poche
+    ricerche binarie invece di avanzare un giorno (o un minuto) alla volta.
+    """
+    
+    def __init__(self, espressione: str):
+        self.espressione = espressione.strip()
+        campi = ALIAS.get(self.espressione.lower(), self.espressione).split()
+        if len(campi) == 5:
+            campi = ['0'] + campi
+        if len(campi) != 6:
+            raise ValueError(f"Espressione cron non valida: '{espressione}'")
+        
+        valori = [self._analizza_campo(testo, *campo[1:]) for testo, campo in zip(campi, CAMPI)]
+        self.secondi, self.minuti, self.ore, giorni_mese, mesi, giorni_settimana = valori
+        self.giorni_mese = set(giorni_mese)
+        self.mesi = set(mesi)
+        # 7 e 0 indicano entrambi la domenica
+        self.giorni_settimana = {giorno % 7 for giorno in giorni_settimana}
+        self.limita_mese = not campi[3].startswith('*')
+        self.limita_settimana = not campi[5].startswith('*')
+        self._giorni: Dict[Tuple[int, int], List[int]] = {}
+    
+    def __repr__(self) -> str:
+        return f"EspressioneCron('{self.espressione}')"
+    
+    def __eq__(self, altra) -> bool:
+        return isinstance(altra, EspressioneCron) and self.espressione == altra.espressione
+    
+    def __hash__(self) -> int:
+        return hash(self.espressione)
+    
+    @staticmethod
+    def _analizza_campo(testo: str, minimo: int, massimo: int, nomi: Dict[str, int]) -> List[int]:
+        """
+        Converte un campo dell'espressione nella lista ordinata dei valori ammessi.
+        
+        Args:
+            testo: Campo dell'espressione (es. '*/15', '1-5', 'mon,wed')
+            minimo: Valore minimo del campo
+            massimo: Valore massimo del campo
+            nomi: Abbreviazioni accettate al posto dei numeri
+        
+        Returns:
+            List[int]: Valori ammessi
+        """
+        def valore(parte):
+            numero = nomi.get(parte.lower()) if not parte.isdigit() else int(parte)
+            if numero is None or not minimo <= numero <= massimo:
+                raise ValueError(f"Valore '{parte}' non valido nel campo cron '{testo}'")
+            return numero
+        
+        valori = set()
+        for parte in testo.split(','):
+            intervallo, _, passo = parte.partition('/')
+            if intervallo == '*':
+                inizio, fine = minimo, massimo
+            elif '-' in intervallo:
+                inizio, fine = (valore(estremo) for estremo in intervallo.split('-', 1))
+            else:
+                inizio = valore(intervallo)
+                # 'a/n' va da a fino al massimo del campo
+                fine = massimo if passo else inizio
+            if not passo.isdigit() and passo or passo == '0' or inizio > fine:
+                raise ValueError(f"Campo cron non valido: '{testo}'")
+            valori.update(range(inizio, fine + 1, int(passo or 1)))
+        return sorted(valori)
+    
+    def giorni_validi(self, anno: int, mese: int) -> List[int]:
+        """
+        Restituisce i giorni del mese in cui l'espressione può scattare.
+        
+        Args:
+            anno: Anno
+            mese: Mese (1-12)
+        
+        Returns:
+            List[int]: Giorni validi in ordine crescente
+        """
+        chiave = (anno, mese)
+        giorni = self._giorni.get(chiave)
+        if giorni is None:
+            giorni = []
+            if mese in self.mesi:
+                primo, durata = calendar.monthrange(anno, mese)
+                for giorno in range(1, durata + 1):
+                    # weekday() ha il lunedì a 0, cron la domenica
+                    settimana = (primo + giorno) % 7
+                    nel_mese = giorno in self.giorni_mese
+                    in_settimana = settimana in self.giorni_settimana
+                    if self.limita_mese and self.limita_settimana:
+                        valido = nel_mese or in_settimana
+                    else:
+                        valido = nel_mese and in_settimana
+                    if valido:
+                        giorni.append(giorno)
+            if len(self._giorni) > 64:
+                self._giorni.clear()
+            self._giorni[chiave] = giorni
+        return giorni
+    
+    def prossima(self, dopo: datetime) -> datetime:
+        """
+        Calcola la prima esecuzione successiva a un istante.
+        
+        Args:
+            dopo: Istante di riferimento (esclusa)
+        
+        Returns:
+            datetime: Prossima esecuzione
+        
+        Raises:
+            ValueError: Se l'espressione non scatta mai (es. 30 febbraio)
+        """
+        istante = dopo.replace(microsecond=0) + timedelta(seconds=1)
+        limite = istante.year + ANNI_RICERCA
+        while istante.year <= limite:
+            giorni = self.giorni_validi(istante.year, istante.month)
+            i = bisect_left(giorni, istante.day)
+            if i == len(giorni):
+                # Nessun giorno valido nel resto del mese: primo giorno del mese successivo
+                anno, mese = divmod(istante.year * 12 + istante.month, 12)
+                istante = datetime(anno, mese + 1, 1)
+                continue
+            if giorni[i] != istante.day:
+                istante = istante.replace(day=giorni[i], hour=0, minute=0, second=0)
+            
+            i = bisect_left(self.ore, istante.hour)
+            if i == len(self.ore):
+                istante = istante.replace(hour=0, minute=0, second=0) + timedelta(days=1)
+                continue
+            if self.ore[i] != istante.hour:
+                istante = istante.replace(hour=self.ore[i], minute=0, second=0)
+            
+            i = bisect_left(self.minuti, istante.minute)
+            if i == len(self.minuti):
+                istante = istante.replace(minute=0, second=0) + timedelta(hours=1)
+                continue
+            if self.minuti[i] != istante.minute:
+                istante = istante.replace(minute=self.minuti[i], second=0)
+            
+            i = bisect_left(self.secondi, istante.second)
+            if i == len(self.secondi):
+                istante = istante.replace(second=0) + timedelta(minutes=1)
+                continue
+            return istante.replace(second=self.secondi[i])
+        
+        raise ValueError(f"L'espressione cron '{self.espressione}' non ha esecuzioni future")
@@ -9,7 +9,8 @@ from datetime import datetime, timedelta
 logger = logging.getLogger(__name__)
 
 # Importa le costanti dal modulo di configurazione
-from modules.config import RISULTATI_FILE, UTENTI_FILE, REAZIONI_FILE
+from modules.config import RISULTATI_FILE, UTENTI_FILE
+from modules.journal_manager import get_store
 
 # Funzione per caricare le squadre dal file JSON
 def carica_squadre():
@@ -81,21 +82,22 @@ def salva_squadre(squadre):
 
 # Funzione per caricare le reazioni
 def carica_reazioni():
-    """Carica le reazioni dal file JSON."""
-    if os.path.exists(REAZIONI_FILE):
-        try:
-            with open(REAZIONI_FILE, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        except Exception as e:
-            logger.error(f"Errore nel caricamento delle reazioni: {e}")
+    """Carica le reazioni dall'archivio SQLite, nel formato del vecchio file JSON."""
+    from modules.reazioni_manager import archivio_reazioni
+    
+    try:
+        return archivio_reazioni.esporta()
+    except Exception as e:
+        logger.error(f"Errore nel caricamento delle reazioni: {e}")
     return {}
 
 # Funzione per salvare le reazioni
 def salva_reazioni(reazioni):
-    """Salva le reazioni nel file JSON."""
+    """Sostituisce tutte le reazioni nell'archivio SQLite."""
+    from modules.reazioni_manager import archivio_reazioni
+    
     try:
-        with open(REAZIONI_FILE, 'w', encoding='utf-8') as file:
-            json.dump(reazioni, file, indent=2, ensure_ascii=False)
+        archivio_reazioni.sostituisci(reazioni)
         return True
     except Exception as e:
         logger.error(f"Errore nel salvare le reazioni: {e}")
@@ -103,19 +105,17 @@ def salva_reazioni(reazioni):
 
 # Funzione per caricare i risultati esistenti
 def carica_risultati():
-    if os.path.exists(RISULTATI_FILE):
-        with open(RISULTATI_FILE, 'r', encoding='utf-8') as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError:
-                logger.error("Errore nel parsing del file JSON")
-                return []
-    return []
+    """Carica i risultati dallo snapshot locale e dal relativo journal."""
+    try:
+        return get_store(RISULTATI_FILE).carica()
+    except Exception as e:
+        logger.error(f"Errore nel caricamento dei risultati: {e}")
+        return []
 
 # Funzione per salvare i risultati
 def salva_risultati(risultati):
-    with open(RISULTATI_FILE, 'w', encoding='utf-8') as file:
-        json.dump(risultati, file, indent=2, ensure_ascii=False)
+    """Salva i risultati scrivendo nel journal solo i record modificati."""
+    get_store(RISULTATI_FILE).salva_tutti(risultati)
 
 # Funzione per caricare gli utenti autorizzati
 def carica_utenti():
@@ -153,41 +153,15 @@ def salva_utenti(utenti):
 
 # Funzione per ottenere i risultati del weekend
 def ottieni_risultati_weekend():
-    risultati = carica_risultati()
-    
-    # Ottieni la data di oggi
-    oggi = datetime.now().date()
-    
-    # Trova il venerdì precedente (inizio weekend)
-    inizio_weekend = oggi - timedelta(days=(oggi.weekday() + 3) % 7)
+    """Restituisce i risultati del weekend (da venerdì a domenica) in ordine di data, dall'indice per data."""
+    from modules.risultati_manager import indice_risultati, date_weekend
     
-    # Trova la domenica successiva (fine weekend)
-    fine_weekend = inizio_weekend + timedelta(days=2)
+    inizio_weekend, fine_weekend = date_weekend()
     
     # Log per debug
-    logger.info(f"Inizio weekend: {inizio_weekend}, Fine weekend: {fine_weekend}, Oggi: {oggi}")
-    
-    # Filtra i risultati del weekend
-    risultati_weekend = []
-    for risultato in risultati:
-        try:
-            data_str = risultato.get('data_partita')
-            if not data_str:
-                continue  # Salta i risultati senza data
-                
-            data_partita = datetime.strptime(data_str, '%d/%m/%Y').date()
-            if data_partita >= inizio_weekend and data_partita <= fine_weekend:
-                risultati_weekend.append(risultato)
-        except (ValueError, KeyError, TypeError) as e:
-            # Log per debug
-            logger.warning(f"Errore nel parsing della data: {e}, risultato: {risultato}")
-            # Ignora risultati con date non valide
-            pass
-    
-    # Ordina i risultati per data
-    risultati_weekend.sort(key=lambda x: datetime.strptime(x.get('data_partita', '01/01/2000'), '%d/%m/%Y'))
+    logger.info(f"Inizio weekend: {inizio_weekend}, Fine weekend: {fine_weekend}, Oggi: {datetime.now().date()}")
     
-    return risultati_weekend
+    return indice_risultati.intervallo(inizio_weekend, fine_weekend)
 
 # Funzione per verificare la congruenza tra punteggio e mete
 def verifica_congruenza_punteggio_mete(punteggio, mete):
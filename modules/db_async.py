@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Accesso asincrono a Supabase per i gestori del bot.
+
+Espone versioni awaitable delle funzioni di modules/db_manager.py, così i
+gestori delle conversazioni non bloccano l'event loop durante le richieste di
+rete. Tutte le richieste passano per un unico httpx.AsyncClient per event loop,
+che mantiene un pool di connessioni keep-alive e usa HTTP/2 se il pacchetto h2
+è installato. Le operazioni sui file locali vengono eseguite in un thread.
+"""
+
+import asyncio
+import traceback
+import weakref
+from typing import List, Dict, Any, Optional
+
+import httpx
+
+from modules import db_manager
+from modules.cache_manager import invalida_dopo
+
+try:
+    import h2  # noqa: F401
+    HTTP2_DISPONIBILE = True
+except ImportError:
+    HTTP2_DISPONIBILE = False
+
+# Limiti del pool di connessioni condiviso
+LIMITI_POOL = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+
+# Timeout delle richieste (secondi)
+TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+
+# Client condivisi: event loop -> {(url, chiave): httpx.AsyncClient}
+_clients = weakref.WeakKeyDictionary()
+
+def _get_client() -> httpx.AsyncClient:
+    """
+    Restituisce il client HTTP condiviso dell'event loop corrente.
+    
+    Un httpx.AsyncClient è legato all'event loop in cui apre le connessioni,
+    quindi ne viene mantenuto uno per loop (e per configurazione di Supabase).
+    """
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    chiave = (db_manager.SUPABASE_URL, db_manager.SUPABASE_KEY)
+    
+    client = clients.get(chiave)
+    if client is None or client.is_closed:
+        # Le intestazioni di autenticazione sono aggiunte a ogni richiesta da TabellaAsync
+        client = httpx.AsyncClient(
+            http2=HTTP2_DISPONIBILE,
+            limits=LIMITI_POOL,
+            timeout=TIMEOUT
+        )
+        clients[chiave] = client
+    return client
+
+async def chiudi_client(*_) -> None:
+    """
+    Chiude i client HTTP dell'event loop corrente.
+    
+    Accetta argomenti posizionali ignorati per poter essere usata come
+    callback post_shutdown dell'Application di python-telegram-bot.
+    """
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+class TabellaAsync(db_manager.SupabaseTable):
+    """
+    Query su una tabella di Supabase, eseguita con 'await execute()'.
+    
+    Offre gli stessi metodi di SupabaseTable in db_manager.py, di cui riusa
+    la costruzione dei parametri e l'interpretazione delle risposte.
+    """
+    
+    async def execute(self) -> 'db_manager.SupabaseResponse':
+        """Invia la richiesta sul client HTTP condiviso dell'event loop."""
+        response = await _get_client().request(
+            self.METODI_HTTP[self.operation],
+            self.base_url,
+            params=self._parametri(),
+            headers=self._intestazioni(),
+            json=self.payload
+        )
+        return self._risposta(response)
+
+def table(nome: str) -> TabellaAsync:
+    """Crea una query asincrona sulla tabella indicata del client Supabase configurato."""
+    return TabellaAsync(db_manager.supabase, nome)
+
+async def leggi_tutte(crea_query, dimensione_pagina: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Versione asincrona di db_manager.leggi_tutte: legge tutte le righe di una
+    select a pagine ordinate per ID.
+    
+    Raises:
+        db_manager.ErroreLetturaSupabase: Se la lettura di una pagina non è riuscita
+    """
+    lettura = db_manager._LetturaPaginata(crea_query, dimensione_pagina)
+    while not lettura.completa:
+        query = lettura.prossima_query()
+        lettura.aggiungi(query, await query.execute())
+    return lettura.righe
+
+async def _inserisci_raggruppati(tabella: str, righe: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> bool:
+    """
+    Inserisce le righe con un inserimento multiplo per ogni insieme di campi.
+    
+    Args:
+        tabella: Nome della tabella
+        righe: Righe da inserire
+        on_conflict: Se indicato, le righe vengono inserite o aggiornate (upsert) su questo vincolo
+    """
+    esito = True
+    for gruppo in db_manager._raggruppa_per_campi(righe):
+        query = table(tabella)
+        query = query.upsert(gruppo, on_conflict=on_conflict) if on_conflict else query.insert(gruppo)
+        response = await query.execute()
+        if response.data is None:
+            print(f"Errore nell'inserimento di {len(gruppo)} righe nella tabella {tabella}")
+            esito = False
+    return esito
+
+# Funzioni per la gestione degli utenti
+async def carica_utenti() -> Dict[str, List]:
+    """Versione asincrona di db_manager.carica_utenti."""
+    if not db_manager.is_supabase_configured():
+        return await asyncio.to_thread(db_manager._carica_utenti_da_file)
+    
+    try:
+        # Le due letture vengono eseguite in parallelo sul pool condiviso
+        autorizzati, in_attesa = await asyncio.gather(
+            table('utenti').select('*').eq('stato', 'autorizzato').execute(),
+            table('utenti').select('*').eq('stato', 'in_attesa').execute()
+        )
+        return {
+            "autorizzati": autorizzati.data,
+            "in_attesa": in_attesa.data
+        }
+    except Exception as e:
+        print(f"Errore nel caricamento degli utenti da Supabase: {e}")
+        # Fallback al file JSON
+        return await asyncio.to_thread(db_manager._carica_utenti_da_file)
+
+@invalida_dopo('utenti')
+async def salva_utenti(utenti_data: Dict[str, List]) -> bool:
+    """
+    Versione asincrona di db_manager.salva_utenti.
+    
+    Gli utenti vengono salvati con un upsert multiplo per gruppo di campi e poi
+    vengono eliminati solo quelli non più presenti.
+    """
+    # Salva sempre nel file JSON per compatibilità
+    await asyncio.to_thread(db_manager._salva_utenti_su_file, utenti_data)
+    db_manager._aggiorna_registro_utenti('sostituisci', utenti_data)
+    
+    if not db_manager.is_supabase_configured():
+        return True
+    
+    try:
+        righe = [db_manager._prepara_utente_db(utente, stato)
+                 for stato, chiave in (('autorizzato', 'autorizzati'), ('in_attesa', 'in_attesa'))
+                 for utente in utenti_data[chiave]]
+        if not await _inserisci_raggruppati('utenti', righe, on_conflict='id'):
+            return False
+        
+        # Elimina gli utenti che non fanno più parte dell'elenco
+        if not (await table('utenti').delete().not_in('id', [riga['id'] for riga in righe]).execute()).data:
+            print("Errore nell'eliminazione degli utenti rimossi da Supabase")
+            return False
+        return True
+    except Exception as e:
+        print(f"Errore nel salvataggio degli utenti su Supabase: {e}")
+        return False
+
+@invalida_dopo('utenti')
+async def upsert_utente(utente: Dict[str, Any], stato: str) -> bool:
+    """
+    Versione asincrona di db_manager.upsert_utente.
+    
+    Args:
+        utente: Dati dell'utente
+        stato: Stato dell'utente ('autorizzato' o 'in_attesa')
+    
+    Returns:
+        True se il salvataggio è riuscito, False altrimenti
+    """
+    # Il registro deve contenere gli altri utenti prima della modifica, per riscrivere il file
+    await asyncio.to_thread(db_manager._aggiorna_registro_utenti, 'assicura')
+    
+    if db_manager.is_supabase_configured():
+        try:
+            riga = db_manager._prepara_utente_db(utente, stato)
+            response = await table('utenti').upsert(riga, on_conflict='id').execute()
+            if response.data is None:
+                print(f"Errore nel salvataggio dell'utente {utente.get('id')} su Supabase")
+                return False
+        except Exception as e:
+            print(f"Errore nel salvataggio dell'utente su Supabase: {e}")
+            return False
+    
+    await asyncio.to_thread(db_manager._registra_utente_salvato, utente, stato)
+    return True
+
+@invalida_dopo('utenti')
+async def set_stato_utente(user_id: Any, stato: str) -> bool:
+    """
+    Versione asincrona di db_manager.set_stato_utente.
+    
+    Args:
+        user_id: ID dell'utente
+        stato: Nuovo stato ('autorizzato' o 'in_attesa')
+    
+    Returns:
+        True se l'utente esiste ed è stato aggiornato, False altrimenti
+    """
+    from modules.user_manager import registro_utenti
+    
+    utente = await asyncio.to_thread(registro_utenti.utente, user_id)
+    if db_manager.is_supabase_configured():
+        try:
+            response = await table('utenti').update({'stato': stato}).eq('id', user_id).execute()
+            if response.data is None:
+                print(f"Errore nell'aggiornamento dello stato dell'utente {user_id} su Supabase")
+                return False
+            if not response.data:
+                # Utente presente solo nel file locale: viene inserito con il nuovo stato
+                if utente is None:
+                    return False
+                return await upsert_utente(utente, stato)
+        except Exception as e:
+            print(f"Errore nell'aggiornamento dello stato dell'utente su Supabase: {e}")
+            return False
+    elif utente is None:
+        return False
+    
+    await asyncio.to_thread(db_manager._registra_utente_salvato, utente, stato)
+    return True
+
+@invalida_dopo('utenti')
+async def elimina_utente(user_id: Any) -> bool:
+    """
+    Versione asincrona di db_manager.elimina_utente.
+    
+    Args:
+        user_id: ID dell'utente
+    
+    Returns:
+        True se l'eliminazione è riuscita, False altrimenti
+    """
+    await asyncio.to_thread(db_manager._aggiorna_registro_utenti, 'assicura')
+    
+    if db_manager.is_supabase_configured():
+        try:
+            if not (await table('utenti').delete().eq('id', user_id).execute()).data:
+                print(f"Errore nell'eliminazione dell'utente {user_id} da Supabase")
+                return False
+        except Exception as e:
+            print(f"Errore nell'eliminazione dell'utente da Supabase: {e}")
+            return False
+    
+    await asyncio.to_thread(db_manager._registra_utente_eliminato, user_id)
+    return True
+
+# Funzioni per la gestione dei risultati
+async def _upsert_risultati(righe_db: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Versione asincrona di db_manager._upsert_risultati."""
+    salvate = []
+    for righe in db_manager._raggruppa_per_campi(righe_db):
+        response = await table('risultati').upsert(righe, on_conflict='id').execute()
+        if response.data is None:
+            print(f"Errore nell'upsert di {len(righe)} risultati su Supabase")
+            continue
+        salvate.extend(righe)
+    
+    return salvate
+
+async def _carica_snapshot_risultati() -> Dict[Any, str]:
+    """Versione asincrona di db_manager._carica_snapshot_risultati."""
+    if not db_manager._snapshot_risultati['caricato']:
+        db_manager._aggiorna_snapshot_risultati(await leggi_tutte(lambda: table('risultati').select('*')))
+    
+    return db_manager._copia_snapshot_risultati()
+
+async def carica_risultati() -> List[Dict[str, Any]]:
+    """Versione asincrona di db_manager.carica_risultati."""
+    if not db_manager.is_supabase_configured():
+        print("Supabase non configurato. Caricamento risultati dal file locale.")
+        return await asyncio.to_thread(db_manager._carica_risultati_da_file)
+    
+    try:
+        risultati = await leggi_tutte(lambda: table('risultati').select('*'))
+        # Le righe appena lette sono lo stato persistito: aggiorna lo snapshot
+        db_manager._aggiorna_snapshot_risultati(risultati)
+        return risultati
+    except Exception as e:
+        print(f"Errore nel caricamento dei risultati da Supabase: {e}")
+        # In caso di errore, carica dal file locale
+        return await asyncio.to_thread(db_manager._carica_risultati_da_file)
+
+async def list_risultati(after: Optional[str] = None, limit: int = 20, order: str = 'data_partita_iso desc',
+                         data_da: Optional[str] = None, data_a: Optional[str] = None, **filtri) -> Dict[str, Any]:
+    """Versione asincrona di db_manager.list_risultati."""
+    limit = db_manager._valida_pagina(limit, filtri)
+    
+    if db_manager.is_supabase_configured():
+        try:
+            query, colonna = db_manager._query_pagina_risultati(table('risultati'), after, limit, order,
+                                                                data_da, data_a, filtri)
+            return db_manager._pagina_risultati((await query.execute()).data, limit, colonna)
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"Errore nel caricamento della pagina di risultati da Supabase: {e}")
+    
+    return await asyncio.to_thread(db_manager._pagina_risultati_da_file, after, limit, order, data_da, data_a, filtri)
+
+@invalida_dopo('risultati')
+async def salva_risultati(risultati: List[Dict[str, Any]]) -> bool:
+    """
+    Versione asincrona di db_manager.salva_risultati: invia solo le differenze.
+    
+    Il confronto con lo stato persistito e l'aggiornamento dello snapshot sono
+    quelli di db_manager; qui cambiano solo le richieste a Supabase.
+    """
+    # Salva sempre nel file locale per sicurezza: se non riesce è un errore critico
+    if not await asyncio.to_thread(db_manager._salva_risultati_su_file, risultati):
+        return False
+    
+    if not db_manager.is_supabase_configured():
+        print("Supabase non configurato. I risultati sono stati salvati solo localmente.")
+        return True
+    
+    try:
+        snapshot = await _carica_snapshot_risultati()
+        da_salvare, da_eliminare, hash_nuovi = db_manager._piano_sync_risultati(risultati, snapshot)
+        
+        salvate = await _upsert_risultati(da_salvare) if da_salvare else []
+        
+        eliminate = []
+        if da_eliminare:
+            response = await table('risultati').delete().in_('id', da_eliminare).execute()
+            if response.data:
+                eliminate = da_eliminare
+            else:
+                print(f"Errore nell'eliminazione dei risultati {da_eliminare} da Supabase")
+        
+        db_manager._applica_esito_sync_risultati(salvate, hash_nuovi, eliminate)
+        return True
+    except Exception as e:
+        print(f"Errore nel salvataggio dei risultati su Supabase: {e}")
+        traceback.print_exc()
+        print("I risultati sono stati salvati nel file JSON ma non su Supabase.")
+        return True
+
+@invalida_dopo('risultati')
+async def salva_risultato(risultato: Dict[str, Any]) -> bool:
+    """
+    Versione asincrona di db_manager.salva_risultato.
+    
+    Args:
+        risultato: Risultato da salvare. Se non ha un ID ne viene assegnato uno nuovo.
+    
+    Returns:
+        True se il salvataggio è riuscito, False altrimenti
+    """
+    primo_id = 1
+    if risultato.get('id') is None and db_manager.is_supabase_configured():
+        try:
+            response = await db_manager._query_ultimo_id_risultato(table('risultati')).execute()
+            primo_id = db_manager._primo_id_risultato(response)
+        except Exception as e:
+            print(f"Errore nella lettura dell'ultimo ID dei risultati da Supabase: {e}")
+            return False
+    
+    # Aggiunge la riga al journal del file locale
+    if not await asyncio.to_thread(db_manager._salva_risultato_su_file, risultato, primo_id):
+        return False
+    
+    if not db_manager.is_supabase_configured():
+        print("Supabase non configurato. Il risultato è stato salvato solo localmente.")
+        return True
+    
+    try:
+        # Nessuna richiesta se la riga è identica a quella già persistita
+        da_inviare = db_manager._riga_risultato_da_inviare(risultato)
+        if da_inviare is None:
+            return True
+        
+        risultato_db, hash_riga = da_inviare
+        salvate = await _upsert_risultati([risultato_db])
+        db_manager._applica_esito_sync_risultati(salvate, {risultato_db['id']: hash_riga})
+        return True
+    except Exception as e:
+        print(f"Errore nel salvataggio del risultato su Supabase: {e}")
+        print("Il risultato è stato salvato nel file JSON ma non su Supabase.")
+        return True
+
+# Funzioni per la gestione delle squadre
+async def carica_squadre() -> List[str]:
+    """Versione asincrona di db_manager.carica_squadre."""
+    if not db_manager.is_supabase_configured():
+        print("Supabase non configurato. Caricamento squadre dal file.")
+        return await asyncio.to_thread(db_manager._carica_squadre_da_file)
+    
+    try:
+        squadre = (await table('squadre').select('nome').execute()).data
+        squadre_list = sorted(squadra.get('nome') for squadra in squadre if squadra.get('nome'))
+        
+        # Se non ci sono squadre nel database, prova a caricarle dal file
+        if not squadre_list:
+            squadre_list = await asyncio.to_thread(db_manager._carica_squadre_da_file)
+        
+        return squadre_list
+    except Exception as e:
+        print(f"Errore nel caricamento delle squadre da Supabase: {e}")
+        return await asyncio.to_thread(db_manager._carica_squadre_da_file)
+
+@invalida_dopo('squadre')
+async def salva_squadre(squadre: List[str]) -> bool:
+    """Versione asincrona di db_manager.salva_squadre, con un unico inserimento multiplo."""
+    await asyncio.to_thread(db_manager._salva_squadre_su_file, squadre)
+    
+    if not db_manager.is_supabase_configured():
+        return True
+    
+    try:
+        # Elimina tutte le squadre esistenti
+        await table('squadre').delete().neq('id', 0).execute()
+        
+        righe = [{'nome': nome} for nome in squadre if nome and isinstance(nome, str)]
+        return await _inserisci_raggruppati('squadre', righe) if righe else True
+    except Exception as e:
+        print(f"Errore nel salvataggio delle squadre su Supabase: {e}")
+        return False
@@ -3,11 +3,19 @@
 
 import os
 import json
+import base64
+import time
+import random
+import hashlib
 import requests
+import threading
 import traceback
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Union
 from dotenv import load_dotenv
+from modules.journal_manager import get_store
+from modules.risultati_manager import data_ordinale
+from modules.cache_manager import invalida_dopo
 
 def format_date(date_str: str) -> str:
     """
@@ -35,15 +43,148 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+# Configurazione del trasporto HTTP verso Supabase (timeout in secondi)
+TIMEOUT_CONNESSIONE = float(os.getenv("SUPABASE_TIMEOUT_CONNESSIONE", "5"))
+TIMEOUT_LETTURA = float(os.getenv("SUPABASE_TIMEOUT_LETTURA", "30"))
+TENTATIVI_MASSIMI = int(os.getenv("SUPABASE_TENTATIVI", "3"))
+DIMENSIONE_POOL = int(os.getenv("SUPABASE_DIMENSIONE_POOL", "10"))
+BACKOFF_BASE = 0.2
+BACKOFF_MASSIMO = 5.0
+
+# Metodi HTTP idempotenti, che possono essere ripetuti senza effetti collaterali
+METODI_IDEMPOTENTI = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+# Stati HTTP transitori (sovraccarico o errori del gateway), per cui ha senso ripetere
+STATI_TRANSITORI = {429, 502, 503, 504}
+
 # Inizializza il client Supabase
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    
+    class TrasportoHTTP:
+        """
+        Trasporto HTTP condiviso dai client Supabase.
+        
+        Mantiene una requests.Session con un pool di connessioni persistenti
+        (keep-alive, risposte compresse con gzip), applica i timeout e ripete le
+        richieste idempotenti fallite per errori transitori, con backoff
+        esponenziale e jitter. Per ogni tabella tiene il conto delle richieste
+        e dei tempi di risposta.
+        
+        Args:
+            timeout: Timeout (connessione, lettura) in secondi
+            tentativi: Numero massimo di tentativi per le richieste idempotenti
+            backoff: Attesa base in secondi tra un tentativo e il successivo
+            dimensione_pool: Numero massimo di connessioni mantenute per host
+        """
+        
+        def __init__(self, timeout=(TIMEOUT_CONNESSIONE, TIMEOUT_LETTURA), tentativi=TENTATIVI_MASSIMI,
+                     backoff=BACKOFF_BASE, dimensione_pool=DIMENSIONE_POOL):
+            self.timeout = timeout
+            self.tentativi = max(1, tentativi)
+            self.backoff = backoff
+            
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=dimensione_pool, pool_maxsize=dimensione_pool)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+            
+            self._contatori = {}
+            self._lock = threading.Lock()
+        
+        def _attesa(self, tentativo):
+            """Attesa prima del tentativo successivo: backoff esponenziale con jitter completo."""
+            return random.uniform(0, min(BACKOFF_MASSIMO, self.backoff * 2 ** tentativo))
+        
+        def richiesta(self, metodo, url, tabella=None, **kwargs):
+            """
+            Esegue una richiesta HTTP sul pool di connessioni.
+            
+            Args:
+                metodo: Metodo HTTP
+                url: URL completo della richiesta
+                tabella: Tabella interessata, usata per le statistiche
+                **kwargs: Argomenti passati a requests.Session.request
+            
+            Returns:
+                La risposta dell'ultimo tentativo
+            
+            Raises:
+                requests.RequestException: Se la connessione fallisce dopo tutti i tentativi
+            """
+            kwargs.setdefault('timeout', self.timeout)
+            ripetibile = metodo in METODI_IDEMPOTENTI
+            inizio = time.perf_counter()
+            tentativo = 0
+            response = None
+            
+            try:
+                while True:
+                    ultimo = not ripetibile or tentativo + 1 >= self.tentativi
+                    try:
+                        response = self.session.request(metodo, url, **kwargs)
+                    except (requests.ConnectionError, requests.Timeout):
+                        if ultimo:
+                            raise
+                    else:
+                        if ultimo or response.status_code not in STATI_TRANSITORI:
+                            return response
+                    
+                    time.sleep(self._attesa(tentativo))
+                    tentativo += 1
+            finally:
+                errore = response is None or response.status_code >= 400
+                self._registra(tabella, time.perf_counter() - inizio, tentativo, errore)
+        
+        def _registra(self, tabella, durata, ripetizioni, errore):
+            """Aggiorna i contatori della tabella."""
+            with self._lock:
+                contatori = self._contatori.setdefault(tabella, {
+                    'richieste': 0,
+                    'ripetizioni': 0,
+                    'errori': 0,
+                    'tempo_totale': 0.0,
+                    'tempo_massimo': 0.0
+                })
+                contatori['richieste'] += 1
+                contatori['ripetizioni'] += ripetizioni
+                contatori['errori'] += 1 if errore else 0
+                contatori['tempo_totale'] += durata
+                contatori['tempo_massimo'] = max(contatori['tempo_massimo'], durata)
+        
+        def statistiche(self):
+            """
+            Restituisce i contatori delle richieste per tabella.
+            
+            Returns:
+                Dizionario tabella -> richieste, ripetizioni, errori e tempi (totale, medio e massimo) in secondi
+            """
+            with self._lock:
+                statistiche = {tabella: dict(contatori) for tabella, contatori in self._contatori.items()}
+            for contatori in statistiche.values():
+                contatori['tempo_medio'] = contatori['tempo_totale'] / contatori['richieste']
+            return statistiche
+        
+        def azzera_statistiche(self):
+            """Azzera i contatori delle richieste."""
+            with self._lock:
+                self._contatori = {}
+        
+        def chiudi(self):
+            """Chiude le connessioni del pool."""
+            self.session.close()
+    
+    # Trasporto condiviso da tutti i client Supabase del processo
+    trasporto_http = TrasportoHTTP()
     
     # Classe semplificata per interagire con Supabase tramite API REST
     class SupabaseClient:
-        def __init__(self, url, key):
+        def __init__(self, url, key, trasporto=None):
             self.url = url
             self.key = key
+            self.trasporto = trasporto or trasporto_http
             self.headers = {
                 "apikey": key,
                 "Authorization": f"Bearer {key}",
@@ -54,160 +195,278 @@ try:
         def table(self, table_name):
             return SupabaseTable(self, table_name)
     
+    class SupabaseResponse:
+        """
+        Risposta di una query.
+        
+        Attributes:
+            data: Righe restituite (o esito dell'operazione per le eliminazioni)
+            count: Numero totale di righe che soddisfano i filtri, se richiesto con select(count='exact')
+            status_code: Stato HTTP della risposta, per distinguere una select fallita da una senza righe
+        """
+        
+        def __init__(self, data, count=None, status_code=None):
+            self.data = data
+            self.count = count
+            self.status_code = status_code
+                
+        def execute(self):
+            # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
+            return self
+                
+        def neq(self, column, value):
+            # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
+            return self
+            
     # Classe per operazioni su tabelle Supabase
     class SupabaseTable:
+        """
+        Costruttore di query PostgREST su una tabella.
+        
+        Filtri, ordinamento, paginazione e proiezione delle colonne vengono
+        tradotti nei parametri della richiesta, così il server restituisce solo
+        le righe e le colonne necessarie. La richiesta viene inviata da execute().
+        """
+            
+        # Metodo HTTP di ogni operazione
+        METODI_HTTP = {"select": "GET", "insert": "POST", "upsert": "POST", "update": "PATCH", "delete": "DELETE"}
+                
         def __init__(self, client, table_name):
             self.client = client
             self.table_name = table_name
             self.base_url = f"{client.url}/rest/v1/{table_name}"
-            self.filters = []
+            self.operation = "select"
             self.select_columns = "*"
+            self.filters = []
+            self.ordering = []
+            self.limit_rows = None
+            self.offset_rows = None
+            self.count_mode = None
+            self.payload = None
+            self.on_conflict = None
+            self.ignore_duplicates = False
+        
+        @staticmethod
+        def _formatta_valore(value):
+            """Converte un valore Python nella sua rappresentazione nei filtri PostgREST."""
+            if value is None:
+                return "null"
+            if isinstance(value, bool):
+                return "true" if value else "false"
+            return str(value)
         
-        def select(self, columns="*"):
+        def _filtro(self, column, operator, value):
+            self.filters.append((column, f"{operator}.{self._formatta_valore(value)}"))
+            return self
+                
+        # Proiezione
+        def select(self, columns="*", count=None):
+            """
+            Seleziona le colonne da restituire.
+            
+            Args:
+                columns: Colonne separate da virgola ('*' per tutte)
+                count: 'exact', 'planned' o 'estimated' per ottenere in response.count
+                    il numero totale di righe che soddisfano i filtri
+            """
             self.select_columns = columns
+            self.count_mode = count
             return self
-        
+            
+        # Filtri
         def eq(self, column, value):
-            self.filters.append(f"{column}=eq.{value}")
-            return self
+            return self._filtro(column, "eq", value)
         
         def neq(self, column, value):
-            self.filters.append(f"{column}=neq.{value}")
+            return self._filtro(column, "neq", value)
+        
+        def gt(self, column, value):
+            return self._filtro(column, "gt", value)
+        
+        def gte(self, column, value):
+            return self._filtro(column, "gte", value)
+        
+        def lt(self, column, value):
+            return self._filtro(column, "lt", value)
+        
+        def lte(self, column, value):
+            return self._filtro(column, "lte", value)
+        
+        def like(self, column, pattern):
+            return self._filtro(column, "like", pattern)
+        
+        def ilike(self, column, pattern):
+            return self._filtro(column, "ilike", pattern)
+        
+        def is_(self, column, value):
+            return self._filtro(column, "is", value)
+        
+        @classmethod
+        def valore_in_lista(cls, value):
+            """Formatta un valore da usare in una lista PostgREST (filtri in_ e or_)."""
+            value = cls._formatta_valore(value)
+            # I valori con caratteri riservati vanno racchiusi tra virgolette
+            if any(c in value for c in ',()" '):
+                value = '"' + value.replace('"', '\\"') + '"'
+            return value
+        
+        def in_(self, column, values):
+            """Aggiunge un filtro di appartenenza a una lista di valori."""
+            valori = [self.valore_in_lista(value) for value in values]
+            self.filters.append((column, f"in.({','.join(valori)})"))
             return self
         
-        def execute(self):
-            # Se l'operazione è delete, esegui l'operazione di eliminazione
-            if hasattr(self, 'operation') and self.operation == "delete":
-                return self._execute_delete()
-            
-            # Se l'operazione è update, esegui l'operazione di aggiornamento
-            if hasattr(self, 'update_data'):
-                return self._execute_update()
-            
-            # Altrimenti, esegui l'operazione di selezione (comportamento predefinito)
-            url = f"{self.base_url}?select={self.select_columns}"
-            if self.filters:
-                url += "&" + "&".join(self.filters)
-            
-            response = requests.get(
-                url,
-                headers=self.client.headers
-            )
-            
-            class Response:
-                def __init__(self, data):
-                    self.data = data
-                
-                def execute(self):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
-                
-                def neq(self, column, value):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
+        def not_in(self, column, values):
+            """Aggiunge un filtro di esclusione da una lista di valori."""
+            valori = [self.valore_in_lista(value) for value in values]
+            self.filters.append((column, f"not.in.({','.join(valori)})"))
+            return self
+        
+        def or_(self, filters):
+            """
+            Aggiunge una disgiunzione di filtri.
             
-            if response.status_code == 200:
-                return Response(response.json())
-            return Response([])
+            Args:
+                filters: Condizioni 'colonna.operatore.valore' separate da virgola,
+                    con i valori formattati da valore_in_lista
+            """
+            self.filters.append(("or", f"({filters})"))
+            return self
+        
+        # Ordinamento e paginazione
+        def order(self, column, desc=False, nullsfirst=None):
+            """Aggiunge un criterio di ordinamento; più chiamate si applicano in sequenza."""
+            criterio = f"{column}.{'desc' if desc else 'asc'}"
+            if nullsfirst is not None:
+                criterio += ".nullsfirst" if nullsfirst else ".nullslast"
+            self.ordering.append(criterio)
+            return self
         
+        def limit(self, count):
+            """Limita il numero di righe restituite."""
+            self.limit_rows = count
+            return self
+        
+        def offset(self, count):
+            """Salta le prime 'count' righe."""
+            self.offset_rows = count
+            return self
+        
+        def range(self, start, end):
+            """Restituisce le righe dalla posizione 'start' alla posizione 'end' incluse."""
+            self.offset_rows = start
+            self.limit_rows = end - start + 1
+            return self
+        
+        # Scritture
         def insert(self, data):
-            response = requests.post(
-                self.base_url,
-                headers=self.client.headers,
-                json=data
-            )
-            
-            class Response:
-                def __init__(self, data):
-                    self.data = data
-                
-                def execute(self):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
-                
-                def neq(self, column, value):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
-            
-            if response.status_code in [200, 201]:
-                return Response(response.json())
-            return Response(None)
-            
-        def update(self, data):
-            """Aggiorna un record esistente."""
-            self.update_data = data
+            """Inserisce uno o più record (una lista viene inserita con un'unica richiesta)."""
+            self.operation = "insert"
+            self.payload = data
             return self
             
-        def eq(self, column, value):
-            """Aggiunge un filtro di uguaglianza."""
-            self.filters.append(f"{column}=eq.{value}")
+        def update(self, data):
+            """Aggiorna i record che soddisfano i filtri."""
+            self.operation = "update"
+            self.payload = data
             return self
             
-        def _execute_update(self):
-            """Esegue l'operazione di aggiornamento."""
-            if not hasattr(self, 'update_data'):
-                raise ValueError("Nessun dato da aggiornare")
-                
-            url = self.base_url
-            if self.filters:
-                url += "?" + "&".join(self.filters)
-            
-            response = requests.patch(
-                url,
-                headers=self.client.headers,
-                json=self.update_data
-            )
+        def upsert(self, data, on_conflict=None, ignore_duplicates=False):
+            """
+            Inserisce o aggiorna uno o più record in un'unica richiesta.
             
-            class Response:
-                def __init__(self, data):
-                    self.data = data
-                
-                def execute(self):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
-                
-                def neq(self, column, value):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
+            Args:
+                data: Record o lista di record (con le stesse chiavi)
+                on_conflict: Colonne del vincolo di unicità, separate da virgola
+                ignore_duplicates: Se True i record già esistenti non vengono modificati
+            """
+            self.operation = "upsert"
+            self.payload = data
+            self.on_conflict = on_conflict
+            self.ignore_duplicates = ignore_duplicates
+            return self
             
-            if response.status_code in [200, 201, 204]:
-                return Response(response.json() if response.content else None)
-            return Response(None)
-        
         def delete(self):
-            # Questo metodo è diverso dagli altri: invece di eseguire immediatamente la richiesta,
-            # restituisce self per consentire di concatenare altri metodi come neq() ed execute()
+            """Elimina i record che soddisfano i filtri."""
             self.operation = "delete"
             return self
             
-        def _execute_delete(self):
-            url = self.base_url
-            if self.filters:
-                url += "?" + "&".join(self.filters)
+        def _parametri(self):
+            """Parametri della query string per l'operazione corrente."""
+            parametri = []
+            if self.operation == "select":
+                parametri.append(("select", self.select_columns))
+            if self.operation in ("select", "update", "delete"):
+                parametri.extend(self.filters)
+            if self.operation == "select":
+                if self.ordering:
+                    parametri.append(("order", ",".join(self.ordering)))
+                if self.limit_rows is not None:
+                    parametri.append(("limit", str(self.limit_rows)))
+                if self.offset_rows:
+                    parametri.append(("offset", str(self.offset_rows)))
+            if self.operation == "upsert" and self.on_conflict:
+                parametri.append(("on_conflict", self.on_conflict))
+            return parametri
             
-            response = requests.delete(
-                url,
-                headers=self.client.headers
-            )
+        def _intestazioni(self):
+            """Intestazioni della richiesta, con le preferenze PostgREST dell'operazione."""
+            preferenze = ["return=representation"]
+            if self.operation == "upsert":
+                preferenze.append("resolution=ignore-duplicates" if self.ignore_duplicates
+                                  else "resolution=merge-duplicates")
+            if self.count_mode:
+                preferenze.append(f"count={self.count_mode}")
             
-            class Response:
-                def __init__(self, data):
-                    self.data = data
+            headers = dict(self.client.headers)
+            headers["Prefer"] = ",".join(preferenze)
+            return headers
+        
+        @staticmethod
+        def _conteggio(response):
+            """Estrae il totale dall'intestazione Content-Range ('0-9/42')."""
+            totale = response.headers.get("Content-Range", "").rpartition("/")[2]
+            return int(totale) if totale.isdigit() else None
                 
-                def execute(self):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
+        def execute(self):
+            """
+            Invia la richiesta.
                 
-                def neq(self, column, value):
-                    # Questo metodo è necessario per mantenere la compatibilità con il codice esistente
-                    return self
+            Returns:
+                SupabaseResponse con le righe restituite: lista vuota se una select fallisce,
+                None se fallisce una scrittura; per le eliminazioni True se la richiesta è riuscita
+            """
+            response = self.client.trasporto.richiesta(
+                self.METODI_HTTP[self.operation],
+                self.base_url,
+                self.table_name,
+                params=self._parametri(),
+                headers=self._intestazioni(),
+                json=self.payload
+            )
+            return self._risposta(response)
+            
+        def _risposta(self, response):
+            """Converte la risposta HTTP in una SupabaseResponse."""
+            if self.operation == "select":
+                if response.status_code in [200, 206]:
+                    return SupabaseResponse(response.json(), self._conteggio(response), response.status_code)
+                return SupabaseResponse([], status_code=response.status_code)
             
-            return Response(response.status_code in [200, 204])
+            if self.operation == "delete":
+                return SupabaseResponse(response.status_code in [200, 204], status_code=response.status_code)
+            
+            if response.status_code in [200, 201, 204]:
+                vuota = [] if self.operation == "upsert" else None
+                return SupabaseResponse(response.json() if response.content else vuota, self._conteggio(response),
+                                        response.status_code)
+            return SupabaseResponse(None, status_code=response.status_code)
     
     # Inizializza il client Supabase
     supabase = SupabaseClient(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
 except ImportError:
     print("Libreria requests non installata. Utilizzando i file JSON.")
+    trasporto_http = None
     supabase = None
 
 # Percorsi dei file JSON (per compatibilità e migrazione)
@@ -245,27 +504,104 @@ def is_supabase_configured() -> bool:
     """Verifica se Supabase è configurato correttamente."""
     return supabase is not None
 
+# Righe per pagina nelle letture complete di una tabella. PostgREST tronca ogni
+# select al limite max-rows del server (1000 su Supabase), quindi una tabella
+# più grande va letta a pagine
+DIMENSIONE_PAGINA_LETTURA = 1000
+
+class ErroreLetturaSupabase(Exception):
+    """Lettura da Supabase non riuscita: le righe ottenute non sono lo stato completo della tabella."""
+
+def righe_lette(response: Any, tabella: str) -> List[Dict[str, Any]]:
+    """
+    Restituisce le righe di una select, verificando che la lettura sia riuscita.
+    
+    Una select fallita restituisce una lista vuota, che non va confusa con una
+    tabella senza righe.
+    
+    Raises:
+        ErroreLetturaSupabase: Se il server ha risposto con un errore
+    """
+    if response.status_code not in (200, 206):
+        raise ErroreLetturaSupabase(f"Lettura della tabella {tabella} non riuscita (stato {response.status_code})")
+    return response.data
+
+class _LetturaPaginata:
+    """
+    Stato di una lettura completa a pagine, condiviso dalle versioni sincrona
+    (leggi_tutte) e asincrona (db_async.leggi_tutte), che eseguono le query.
+    
+    Le pagine sono ordinate per ID, così ognuna riprende esattamente dalla
+    precedente; la lettura termina alla prima pagina incompleta.
+    """
+    
+    def __init__(self, crea_query, dimensione_pagina: Optional[int] = None):
+        self.crea_query = crea_query
+        self.dimensione_pagina = dimensione_pagina or DIMENSIONE_PAGINA_LETTURA
+        self.righe = []
+        self.completa = False
+    
+    def prossima_query(self):
+        """Restituisce la query della pagina successiva."""
+        inizio = len(self.righe)
+        return self.crea_query().order('id').range(inizio, inizio + self.dimensione_pagina - 1)
+    
+    def aggiungi(self, query, response) -> None:
+        """Aggiunge le righe di una pagina letta con la query restituita da prossima_query."""
+        pagina = righe_lette(response, query.table_name)
+        self.righe.extend(pagina)
+        self.completa = len(pagina) < self.dimensione_pagina
+
+def leggi_tutte(crea_query, dimensione_pagina: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Legge tutte le righe di una select, una pagina alla volta.
+    
+    Args:
+        crea_query: Funzione senza argomenti che restituisce una nuova select
+            (con eventuali filtri), ad es. lambda: supabase.table('risultati').select('*')
+        dimensione_pagina: Righe per pagina, non oltre il limite max-rows del server
+            (predefinito DIMENSIONE_PAGINA_LETTURA)
+    
+    Returns:
+        Lista di tutte le righe, ordinate per ID
+    
+    Raises:
+        ErroreLetturaSupabase: Se la lettura di una pagina non è riuscita
+    """
+    lettura = _LetturaPaginata(crea_query, dimensione_pagina)
+    while not lettura.completa:
+        query = lettura.prossima_query()
+        lettura.aggiungi(query, query.execute())
+    return lettura.righe
+
 # Funzioni per la gestione degli utenti
 def carica_utenti() -> Dict[str, List]:
     """Carica gli utenti dal database o dal file JSON."""
-    if is_supabase_configured():
-        try:
-            # Carica gli utenti autorizzati
-            autorizzati = supabase.table('utenti').select('*').eq('stato', 'autorizzato').execute().data
-            
-            # Carica gli utenti in attesa
-            in_attesa = supabase.table('utenti').select('*').eq('stato', 'in_attesa').execute().data
-            
-            return {
-                "autorizzati": autorizzati,
-                "in_attesa": in_attesa
-            }
-        except Exception as e:
-            print(f"Errore nel caricamento degli utenti da Supabase: {e}")
-            # Fallback al file JSON
-            return _carica_utenti_da_file()
-    else:
+    try:
+        return leggi_utenti()
+    except Exception as e:
+        print(f"Errore nel caricamento degli utenti da Supabase: {e}")
+        # Fallback al file JSON
+        return _carica_utenti_da_file()
+
+def leggi_utenti() -> Dict[str, List]:
+    """
+    Legge gli utenti dal database (dal file JSON se Supabase non è configurato).
+    
+    A differenza di carica_utenti non ripiega sul file JSON se la lettura da
+    Supabase fallisce, così il chiamante può distinguere un errore da una
+    tabella vuota.
+    
+    Raises:
+        ErroreLetturaSupabase: Se la lettura non è riuscita
+    """
+    if not is_supabase_configured():
         return _carica_utenti_da_file()
+    
+    return {
+        "autorizzati": leggi_tutte(lambda: supabase.table('utenti').select('*').eq('stato', 'autorizzato')),
+        "in_attesa": leggi_tutte(lambda: supabase.table('utenti').select('*').eq('stato', 'in_attesa'))
+    }
 
 def _carica_utenti_da_file() -> Dict[str, List]:
     """Carica gli utenti dal file JSON."""
@@ -278,76 +614,140 @@ def _carica_utenti_da_file() -> Dict[str, List]:
     else:
         return {"autorizzati": [], "in_attesa": []}
 
-def salva_utenti(utenti_data: Dict[str, List]) -> bool:
-    """Salva gli utenti nel database e nel file JSON."""
-    # Salva sempre nel file JSON per compatibilità
-    with open(UTENTI_FILE, 'w', encoding='utf-8') as file:
-        json.dump(utenti_data, file, indent=2, ensure_ascii=False)
+def _prepara_utente_db(utente: Any, stato: str) -> Dict[str, Any]:
+    """
+    Converte un utente nel formato della tabella 'utenti' di Supabase.
     
-    if is_supabase_configured():
-        try:
-            # Elimina tutti gli utenti esistenti
-            supabase.table('utenti').delete().neq('id', 0).execute()
-            
-            # Inserisci gli utenti autorizzati
-            for utente in utenti_data["autorizzati"]:
-                if isinstance(utente, dict):
-                    # Crea una copia dell'utente per non modificare l'originale
-                    utente_db = utente.copy()
-                    
-                    # Converti l'ID in intero se è una stringa
-                    if isinstance(utente_db.get('id'), str) and utente_db['id'].isdigit():
-                        utente_db['id'] = int(utente_db['id'])
-                    
-                    # Aggiungi lo stato
-                    utente_db['stato'] = 'autorizzato'
-                    
-                    # Rimuovi il campo data_registrazione e lascia che il database usi il valore predefinito
-                    if 'data_registrazione' in utente_db:
-                        del utente_db['data_registrazione']
-                    
-                    # Inserisci l'utente
-                    supabase.table('utenti').insert(utente_db).execute()
-                else:
-                    # Gestisci il vecchio formato (solo ID)
-                    supabase.table('utenti').insert({
-                        'id': int(utente) if isinstance(utente, str) and utente.isdigit() else utente,
-                        'nome': f'Utente {utente}',
-                        'username': None,
-                        'data_registrazione': datetime.now().isoformat(),
-                        'ruolo': 'utente',
-                        'stato': 'autorizzato'
-                    }).execute()
+    Args:
+        utente: Dizionario dell'utente (non viene modificato) o solo ID nel vecchio formato
+        stato: Stato dell'utente ('autorizzato' o 'in_attesa')
             
-            # Inserisci gli utenti in attesa
-            for utente in utenti_data["in_attesa"]:
-                if isinstance(utente, dict):
-                    # Crea una copia dell'utente per non modificare l'originale
-                    utente_db = utente.copy()
+    Returns:
+        Riga da inserire nella tabella
+    """
+    if not isinstance(utente, dict):
+        # Gestisci il vecchio formato (solo ID)
+        return {
+            'id': int(utente) if isinstance(utente, str) and utente.isdigit() else utente,
+            'nome': f'Utente {utente}',
+            'username': None,
+            'data_registrazione': datetime.now().isoformat(),
+            'ruolo': 'utente',
+            'stato': stato
+        }
+    
+    # Crea una copia dell'utente per non modificare l'originale
+    utente_db = utente.copy()
                     
-                    # Converti l'ID in intero se è una stringa
-                    if isinstance(utente_db.get('id'), str) and utente_db['id'].isdigit():
-                        utente_db['id'] = int(utente_db['id'])
+    # Converti l'ID in intero se è una stringa
+    if isinstance(utente_db.get('id'), str) and utente_db['id'].isdigit():
+        utente_db['id'] = int(utente_db['id'])
                     
-                    # Aggiungi lo stato
-                    utente_db['stato'] = 'in_attesa'
+    # Aggiungi lo stato
+    utente_db['stato'] = stato
                     
-                    # Rimuovi il campo data_registrazione e lascia che il database usi il valore predefinito
-                    if 'data_registrazione' in utente_db:
-                        del utente_db['data_registrazione']
+    # Rimuovi il campo data_registrazione e lascia che il database usi il valore predefinito
+    if 'data_registrazione' in utente_db:
+        del utente_db['data_registrazione']
                     
-                    # Inserisci l'utente
-                    supabase.table('utenti').insert(utente_db).execute()
-                else:
-                    # Gestisci il vecchio formato (solo ID)
-                    supabase.table('utenti').insert({
-                        'id': int(utente) if isinstance(utente, str) and utente.isdigit() else utente,
-                        'nome': f'Utente {utente}',
-                        'username': None,
-                        'data_registrazione': datetime.now().isoformat(),
-                        'ruolo': 'utente',
-                        'stato': 'in_attesa'
-                    }).execute()
+    return utente_db
+            
+def _salva_utenti_su_file(utenti_data: Dict[str, List]) -> None:
+    """Salva gli utenti nel file JSON."""
+    with open(UTENTI_FILE, 'w', encoding='utf-8') as file:
+        json.dump(utenti_data, file, indent=2, ensure_ascii=False)
+
+def _aggiorna_registro_utenti(evento: str, *args) -> None:
+    """
+    Propaga un salvataggio al registro in memoria degli utenti (modules.user_manager).
+    
+    Args:
+        evento: Nome del metodo di aggiornamento (sostituisci, registra_utente, rimuovi_utente)
+        *args: Argomenti del metodo
+    """
+    from modules.user_manager import registro_utenti
+    
+    getattr(registro_utenti, evento)(*args)
+
+def _salva_registro_utenti_su_file() -> None:
+    """Riscrive il file JSON degli utenti a partire dal registro in memoria."""
+    from modules.user_manager import registro_utenti
+    
+    utenti = registro_utenti.esporta()
+    # Un registro non ancora letto dal database non è l'elenco completo degli utenti
+    if not registro_utenti.costruito:
+        print("Registro degli utenti non disponibile: file JSON degli utenti non aggiornato")
+        return
+    _salva_utenti_su_file(utenti)
+
+def _registra_utente_salvato(utente: Optional[Dict[str, Any]], stato: str) -> None:
+    """
+    Propaga il salvataggio di un singolo utente al registro in memoria e al file JSON.
+    
+    Args:
+        utente: Dati dell'utente, o None se non ancora noto al registro (che verrà riletto)
+        stato: Stato salvato ('autorizzato' o 'in_attesa')
+    """
+    if utente is not None:
+        _aggiorna_registro_utenti('registra_utente', utente, stato)
+    else:
+        _aggiorna_registro_utenti('invalida')
+    _salva_registro_utenti_su_file()
+
+def _registra_utente_eliminato(user_id: Any) -> None:
+    """Propaga l'eliminazione di un singolo utente al registro in memoria e al file JSON."""
+    _aggiorna_registro_utenti('rimuovi_utente', user_id)
+    _salva_registro_utenti_su_file()
+
+# Numero massimo di utenti inviati con un singolo upsert multiplo
+DIMENSIONE_LOTTO_UTENTI = 500
+
+def upsert_utenti(utenti_data: Dict[str, List], dimensione_lotto: int = DIMENSIONE_LOTTO_UTENTI) -> bool:
+    """
+    Inserisce o aggiorna gli utenti su Supabase con upsert multipli, senza eliminare gli altri.
+    
+    Usata per le migrazioni e da salva_utenti: le righe vengono inviate a lotti
+    di al massimo dimensione_lotto utenti, con una richiesta per insieme di campi.
+    
+    Args:
+        utenti_data: Dizionario con le liste 'autorizzati' e 'in_attesa'
+        dimensione_lotto: Numero massimo di righe per richiesta
+    
+    Returns:
+        True se tutti i lotti sono stati salvati, False altrimenti
+    """
+    righe = [_prepara_utente_db(utente, stato)
+             for stato, chiave in (('autorizzato', 'autorizzati'), ('in_attesa', 'in_attesa'))
+             for utente in utenti_data.get(chiave, [])]
+    esito = True
+    for inizio in range(0, len(righe), dimensione_lotto):
+        esito = _upsert_righe('utenti', righe[inizio:inizio + dimensione_lotto], 'id') and esito
+    return esito
+
+@invalida_dopo('utenti')
+def salva_utenti(utenti_data: Dict[str, List]) -> bool:
+    """
+    Salva l'elenco completo degli utenti nel database e nel file JSON.
+    
+    Gli utenti vengono salvati con upsert a lotti e poi vengono eliminati solo
+    quelli non più presenti, quindi la tabella non resta mai vuota. Per
+    modificare un solo utente usare upsert_utente, set_stato_utente o elimina_utente.
+    """
+    # Salva sempre nel file JSON per compatibilità
+    _salva_utenti_su_file(utenti_data)
+    _aggiorna_registro_utenti('sostituisci', utenti_data)
+    
+    if is_supabase_configured():
+        try:
+            if not upsert_utenti(utenti_data):
+                return False
+            
+            # Elimina gli utenti che non fanno più parte dell'elenco
+            ids = [_prepara_utente_db(utente, '')['id']
+                   for chiave in ('autorizzati', 'in_attesa') for utente in utenti_data.get(chiave, [])]
+            if not supabase.table('utenti').delete().not_in('id', ids).execute().data:
+                print("Errore nell'eliminazione degli utenti rimossi da Supabase")
+                return False
             
             return True
         except Exception as e:
@@ -356,12 +756,348 @@ def salva_utenti(utenti_data: Dict[str, List]) -> bool:
     
     return True
 
+@invalida_dopo('utenti')
+def upsert_utente(utente: Dict[str, Any], stato: str) -> bool:
+    """
+    Inserisce o aggiorna un singolo utente con un'unica richiesta.
+    
+    Args:
+        utente: Dati dell'utente
+        stato: Stato dell'utente ('autorizzato' o 'in_attesa')
+    
+    Returns:
+        True se il salvataggio è riuscito, False altrimenti
+    """
+    # Il registro deve contenere gli altri utenti prima della modifica, per riscrivere il file
+    _aggiorna_registro_utenti('assicura')
+    
+    if is_supabase_configured():
+        try:
+            response = supabase.table('utenti').upsert(_prepara_utente_db(utente, stato), on_conflict='id').execute()
+            if response.data is None:
+                print(f"Errore nel salvataggio dell'utente {utente.get('id')} su Supabase")
+                return False
+        except Exception as e:
+            print(f"Errore nel salvataggio dell'utente su Supabase: {e}")
+            return False
+    
+    _registra_utente_salvato(utente, stato)
+    return True
+
+@invalida_dopo('utenti')
+def set_stato_utente(user_id: Any, stato: str) -> bool:
+    """
+    Cambia lo stato di un utente (ad esempio da 'in_attesa' ad 'autorizzato') con un'unica richiesta.
+    
+    Args:
+        user_id: ID dell'utente
+        stato: Nuovo stato ('autorizzato' o 'in_attesa')
+    
+    Returns:
+        True se l'utente esiste ed è stato aggiornato, False altrimenti
+    """
+    from modules.user_manager import registro_utenti
+    
+    utente = registro_utenti.utente(user_id)
+    if is_supabase_configured():
+        try:
+            response = supabase.table('utenti').update({'stato': stato}).eq('id', user_id).execute()
+            if response.data is None:
+                print(f"Errore nell'aggiornamento dello stato dell'utente {user_id} su Supabase")
+                return False
+            if not response.data:
+                # Utente presente solo nel file locale: viene inserito con il nuovo stato
+                if utente is None:
+                    return False
+                return upsert_utente(utente, stato)
+        except Exception as e:
+            print(f"Errore nell'aggiornamento dello stato dell'utente su Supabase: {e}")
+            return False
+    elif utente is None:
+        return False
+    
+    # Un utente non ancora noto al registro viene riletto al prossimo accesso
+    _registra_utente_salvato(utente, stato)
+    return True
+
+@invalida_dopo('utenti')
+def elimina_utente(user_id: Any) -> bool:
+    """
+    Elimina un singolo utente (rifiutato o revocato) con un'unica richiesta.
+    
+    Args:
+        user_id: ID dell'utente
+    
+    Returns:
+        True se l'eliminazione è riuscita, False altrimenti
+    """
+    _aggiorna_registro_utenti('assicura')
+    
+    if is_supabase_configured():
+        try:
+            if not supabase.table('utenti').delete().eq('id', user_id).execute().data:
+                print(f"Errore nell'eliminazione dell'utente {user_id} da Supabase")
+                return False
+        except Exception as e:
+            print(f"Errore nell'eliminazione dell'utente da Supabase: {e}")
+            return False
+    
+    _registra_utente_eliminato(user_id)
+    return True
+
 # Funzioni per la gestione dei risultati
+
+# Campi della tabella 'risultati' su Supabase
+CAMPI_RISULTATI = ['id', 'categoria', 'squadra1', 'squadra2', 'squadra3', 'punteggio1', 'punteggio2', 'punteggio3',
+                   'mete1', 'mete2', 'mete3', 'arbitro', 'inserito_da', 'genere', 'data_partita',
+                   'data_partita_iso', 'modificato_da', 'message_id',
+                   # Campi specifici per i triangolari
+                   'partita1_punteggio1', 'partita1_punteggio2', 'partita1_mete1', 'partita1_mete2',
+                   'partita2_punteggio1', 'partita2_punteggio2', 'partita2_mete1', 'partita2_mete2',
+                   'partita3_punteggio1', 'partita3_punteggio2', 'partita3_mete1', 'partita3_mete2']
+
+# Snapshot dell'ultimo stato persistito su Supabase (id -> hash del contenuto della riga)
+_snapshot_risultati = {
+    'hash': {},
+    'caricato': False
+}
+_snapshot_risultati_lock = threading.Lock()
+
+def _prepara_risultato_db(risultato: Dict[str, Any], indice: int = 0) -> Dict[str, Any]:
+    """
+    Converte un risultato nel formato della tabella 'risultati' di Supabase.
+    
+    Args:
+        risultato: Risultato da convertire (non viene modificato)
+        indice: Posizione del risultato nella lista, usata come ID se mancante
+    
+    Returns:
+        Dizionario con i soli campi validi per la tabella
+    """
+    # Crea una copia del risultato per non modificare l'originale
+    risultato_db = risultato.copy()
+    
+    # Aggiungi un ID se non esiste
+    if 'id' not in risultato_db:
+        risultato_db['id'] = indice + 1
+    
+    # Converti le date nel formato ISO (la conversione di ogni data viene memorizzata)
+    if 'data_partita' in risultato_db and risultato_db['data_partita']:
+        ordinale = data_ordinale(risultato_db['data_partita'])
+        risultato_db['data_partita_iso'] = datetime.fromordinal(ordinale).isoformat() if ordinale else None
+    
+    # Gestione speciale per la sezione arbitrale
+    if 'sezione_arbitrale' in risultato_db:
+        # Combina arbitro e sezione arbitrale in un unico campo
+        if risultato_db.get('arbitro') and risultato_db.get('sezione_arbitrale'):
+            risultato_db['arbitro'] = f"{risultato_db['arbitro']} ({risultato_db['sezione_arbitrale']})"
+    
+    # Mantieni solo i campi che sappiamo esistere nella tabella
+    # (timestamp_modifica viene lasciato al valore predefinito del database)
+    return {campo: risultato_db[campo] for campo in CAMPI_RISULTATI if campo in risultato_db}
+
+def _hash_risultato(risultato_db: Dict[str, Any]) -> str:
+    """Calcola l'hash del contenuto di una riga della tabella 'risultati'."""
+    contenuto = json.dumps(risultato_db, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(contenuto.encode('utf-8')).hexdigest()
+
+def _aggiorna_snapshot_risultati(righe_db: List[Dict[str, Any]]) -> None:
+    """Sostituisce lo snapshot con le righe lette da Supabase."""
+    hash_righe = {}
+    for i, riga in enumerate(righe_db):
+        riga_db = _prepara_risultato_db(riga, i)
+        hash_righe[riga_db['id']] = _hash_risultato(riga_db)
+    
+    with _snapshot_risultati_lock:
+        _snapshot_risultati['hash'] = hash_righe
+        _snapshot_risultati['caricato'] = True
+
+def _aggiorna_indice_risultati(evento: str, *args) -> None:
+    """
+    Propaga un salvataggio all'indice per data dei risultati (modules.risultati_manager).
+    
+    Args:
+        evento: Nome del metodo di aggiornamento (sostituisci, registra_risultato, rimuovi_risultato)
+        *args: Argomenti del metodo
+    """
+    from modules.risultati_manager import indice_risultati
+    
+    getattr(indice_risultati, evento)(*args)
+
+def _copia_snapshot_risultati() -> Dict[Any, str]:
+    """Restituisce una copia dello snapshot corrente (id -> hash)."""
+    with _snapshot_risultati_lock:
+        return dict(_snapshot_risultati['hash'])
+
+def _carica_snapshot_risultati() -> Dict[Any, str]:
+    """
+    Restituisce lo snapshot, leggendolo da Supabase se non ancora disponibile.
+    
+    Raises:
+        ErroreLetturaSupabase: Se la lettura non è riuscita (lo snapshot resta da caricare)
+    """
+    if not _snapshot_risultati['caricato']:
+        _aggiorna_snapshot_risultati(leggi_tutte(lambda: supabase.table('risultati').select('*')))
+    
+    return _copia_snapshot_risultati()
+
+def _piano_sync_risultati(risultati: List[Dict[str, Any]], snapshot: Dict[Any, str]) -> tuple:
+    """
+    Confronta i risultati con lo snapshot dello stato persistito.
+    
+    Args:
+        risultati: Lista completa dei risultati
+        snapshot: Stato persistito (id -> hash)
+    
+    Returns:
+        Tupla (da_salvare, da_eliminare, hash_nuovi): righe nuove o modificate,
+        ID non più presenti e hash di tutte le righe dei risultati
+    """
+    da_salvare = []
+    hash_nuovi = {}
+    for i, risultato in enumerate(risultati):
+        risultato_db = _prepara_risultato_db(risultato, i)
+        hash_riga = _hash_risultato(risultato_db)
+        hash_nuovi[risultato_db['id']] = hash_riga
+        if snapshot.get(risultato_db['id']) != hash_riga:
+            da_salvare.append(risultato_db)
+    
+    # Le righe presenti nello snapshot ma non più nei risultati vanno eliminate
+    da_eliminare = [id for id in snapshot if id not in hash_nuovi]
+    
+    print(f"Sincronizzazione risultati: {len(da_salvare)} da salvare, {len(da_eliminare)} da eliminare")
+    return da_salvare, da_eliminare, hash_nuovi
+
+def _riga_risultato_da_inviare(risultato: Dict[str, Any]) -> Optional[tuple]:
+    """
+    Prepara la riga di un singolo risultato se differisce dallo stato persistito.
+    
+    Returns:
+        Tupla (riga, hash) da inviare, o None se la riga è già persistita identica
+    """
+    risultato_db = _prepara_risultato_db(risultato)
+    hash_riga = _hash_risultato(risultato_db)
+    with _snapshot_risultati_lock:
+        if _snapshot_risultati['hash'].get(risultato_db['id']) == hash_riga:
+            return None
+    return risultato_db, hash_riga
+
+def _applica_esito_sync_risultati(salvate: List[Dict[str, Any]], hash_nuovi: Dict[Any, str],
+                                  eliminate: List[Any] = ()) -> None:
+    """
+    Aggiorna lo snapshot con le sole operazioni riuscite, così il prossimo
+    salvataggio ritenta quelle fallite.
+    
+    Args:
+        salvate: Righe salvate con successo
+        hash_nuovi: Hash delle righe salvate, per ID
+        eliminate: ID eliminati con successo
+    """
+    with _snapshot_risultati_lock:
+        for riga in salvate:
+            _snapshot_risultati['hash'][riga['id']] = hash_nuovi[riga['id']]
+        for id in eliminate:
+            _snapshot_risultati['hash'].pop(id, None)
+
+def _salva_risultati_su_file(risultati: List[Dict[str, Any]]) -> bool:
+    """
+    Salva la lista completa dei risultati nel file locale (solo i record
+    modificati finiscono nel journal) e aggiorna l'indice per data.
+    
+    Returns:
+        True se il salvataggio è riuscito, False altrimenti
+    """
+    try:
+        get_store(RISULTATI_FILE).salva_tutti(risultati)
+        print("Risultati salvati nel file JSON locale.")
+    except Exception as e:
+        print(f"Errore nel salvataggio dei risultati nel file JSON: {e}")
+        return False
+    _aggiorna_indice_risultati('sostituisci', risultati)
+    return True
+
+def _salva_risultato_su_file(risultato: Dict[str, Any], primo_id: int = 1) -> bool:
+    """
+    Aggiunge un risultato al journal del file locale e aggiorna l'indice per data.
+    Un risultato senza ID riceve il primo ID libero.
+    
+    Args:
+        risultato: Risultato da salvare
+        primo_id: ID minimo per un nuovo risultato (vedi _primo_id_risultato)
+    
+    Returns:
+        True se il salvataggio è riuscito, False altrimenti
+    """
+    try:
+        if risultato.get('id') is None:
+            get_store(RISULTATI_FILE).inserisci(risultato, primo_id)
+        else:
+            get_store(RISULTATI_FILE).salva(risultato)
+    except Exception as e:
+        print(f"Errore nel salvataggio del risultato nel file JSON: {e}")
+        return False
+    _aggiorna_indice_risultati('registra_risultato', risultato)
+    return True
+
+def _raggruppa_per_campi(righe: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Raggruppa le righe per insieme di campi: PostgREST richiede che tutti gli
+    oggetti di un inserimento multiplo abbiano le stesse chiavi.
+    """
+    gruppi = {}
+    for riga in righe:
+        gruppi.setdefault(tuple(sorted(riga.keys())), []).append(riga)
+    return list(gruppi.values())
+
+def _query_ultimo_id_risultato(tabella):
+    """Restituisce la query dell'ID più alto tra i risultati su Supabase."""
+    return tabella.select('id').order('id', desc=True).limit(1)
+
+def _primo_id_risultato(response: Any) -> int:
+    """
+    Restituisce l'ID minimo per un nuovo risultato: il successivo al più alto
+    su Supabase (letto con _query_ultimo_id_risultato) e nello snapshot. Il
+    file locale completa il calcolo in JournalStore.inserisci.
+    
+    Args:
+        response: Risposta della query di _query_ultimo_id_risultato
+    
+    Raises:
+        ErroreLetturaSupabase: Se la lettura non è riuscita: un ID stimato
+            potrebbe coincidere con quello di un'altra partita, che l'upsert sovrascriverebbe
+    """
+    ids = [riga.get('id') for riga in righe_lette(response, 'risultati')]
+    with _snapshot_risultati_lock:
+        ids.extend(_snapshot_risultati['hash'])
+    return max((id for id in ids if isinstance(id, int) and not isinstance(id, bool)), default=0) + 1
+
+def _upsert_risultati(righe_db: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Invia le righe a Supabase con upsert raggruppati.
+    
+    PostgREST richiede che tutti gli oggetti di un inserimento multiplo abbiano
+    le stesse chiavi, quindi le righe vengono raggruppate per insieme di campi.
+    
+    Returns:
+        Lista delle righe effettivamente salvate
+    """
+    salvate = []
+    for righe in _raggruppa_per_campi(righe_db):
+        response = supabase.table('risultati').upsert(righe, on_conflict='id').execute()
+        if response.data is None:
+            print(f"Errore nell'upsert di {len(righe)} risultati su Supabase")
+            continue
+        salvate.extend(righe)
+    
+    return salvate
+
 def carica_risultati() -> List[Dict[str, Any]]:
     """Carica i risultati dal database o dal file JSON locale."""
     if is_supabase_configured():
         try:
-            risultati = supabase.table('risultati').select('*').execute().data
+            risultati = leggi_tutte(lambda: supabase.table('risultati').select('*'))
+            # Le righe appena lette sono lo stato persistito: aggiorna lo snapshot
+            _aggiorna_snapshot_risultati(risultati)
             return risultati
         except Exception as e:
             print(f"Errore nel caricamento dei risultati da Supabase: {e}")
@@ -374,17 +1110,193 @@ def carica_risultati() -> List[Dict[str, Any]]:
 def _carica_risultati_da_file() -> List[Dict[str, Any]]:
     """
     Funzione di supporto per la migrazione da file JSON a database.
-    Carica i risultati dal file JSON.
+    Carica i risultati dallo snapshot locale e dal relativo journal.
     """
-    if os.path.exists(RISULTATI_FILE):
-        with open(RISULTATI_FILE, 'r', encoding='utf-8') as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError:
-                return []
-    else:
+    try:
+        return get_store(RISULTATI_FILE).carica()
+    except Exception as e:
+        print(f"Errore nel caricamento dei risultati dal file locale: {e}")
         return []
 
+# Paginazione dei risultati
+
+# Numero massimo di risultati per pagina
+LIMITE_PAGINA_MASSIMO = 200
+
+def _codifica_cursore(valore: Any, id: Any) -> str:
+    """Codifica la posizione (valore della colonna di ordinamento, ID) dell'ultima riga di una pagina."""
+    return base64.urlsafe_b64encode(json.dumps([valore, id]).encode('utf-8')).decode('ascii')
+
+def _decodifica_cursore(cursore: str) -> tuple:
+    """
+    Decodifica un cursore creato da _codifica_cursore.
+    
+    Raises:
+        ValueError: Se il cursore non è valido
+    """
+    try:
+        valore, id = json.loads(base64.urlsafe_b64decode(cursore.encode('ascii')))
+        return valore, id
+    except Exception:
+        raise ValueError(f"Cursore non valido: {cursore}")
+
+def _ordinamento_risultati(order: str) -> tuple:
+    """
+    Interpreta un ordinamento 'colonna [asc|desc]' dei risultati.
+    
+    Returns:
+        Tupla (colonna, decrescente)
+    
+    Raises:
+        ValueError: Se la colonna o la direzione non sono valide
+    """
+    parti = order.split()
+    colonna = parti[0] if parti else ''
+    direzione = parti[1].lower() if len(parti) > 1 else 'asc'
+    if colonna not in CAMPI_RISULTATI or direzione not in ('asc', 'desc') or len(parti) > 2:
+        raise ValueError(f"Ordinamento non valido: {order}")
+    return colonna, direzione == 'desc'
+
+def _dopo_cursore(valore: Any, id: Any, cursore: tuple, decrescente: bool) -> bool:
+    """
+    Verifica se una riga segue il cursore nell'ordinamento keyset (colonna, id),
+    con i valori nulli in fondo. È la stessa condizione inviata a Supabase da _query_pagina_risultati.
+    """
+    valore_cursore, id_cursore = cursore
+    id_successivo = id < id_cursore if decrescente else id > id_cursore
+    if valore_cursore is None:
+        return valore is None and id_successivo
+    if valore is None:
+        return True
+    if valore == valore_cursore:
+        return id_successivo
+    return valore < valore_cursore if decrescente else valore > valore_cursore
+
+def _query_pagina_risultati(tabella, after: Optional[str], limit: int, order: str,
+                            data_da: Optional[str], data_a: Optional[str], filtri: Dict[str, Any]):
+    """
+    Applica a una query sulla tabella 'risultati' i filtri, l'ordinamento e il cursore di una pagina.
+    
+    Viene usata sia dal client sincrono sia da quello asincrono di db_async.
+    
+    Returns:
+        Tupla (query, colonna di ordinamento)
+    """
+    colonna, decrescente = _ordinamento_risultati(order)
+    
+    query = tabella.select('*')
+    for campo, valore in filtri.items():
+        query = query.eq(campo, valore)
+    if data_da:
+        query = query.gte('data_partita_iso', data_da)
+    if data_a:
+        # data_partita_iso contiene anche l'ora (YYYY-MM-DDT00:00:00)
+        query = query.lte('data_partita_iso', f"{data_a}T23:59:59")
+    
+    if after:
+        valore_cursore, id_cursore = _decodifica_cursore(after)
+        confronto = 'lt' if decrescente else 'gt'
+        if valore_cursore is None:
+            query = getattr(query.is_(colonna, None), confronto)('id', id_cursore)
+        else:
+            valore_cursore = query.valore_in_lista(valore_cursore)
+            id_cursore = query.valore_in_lista(id_cursore)
+            query = query.or_(f"{colonna}.{confronto}.{valore_cursore},"
+                              f"and({colonna}.eq.{valore_cursore},id.{confronto}.{id_cursore}),"
+                              f"{colonna}.is.null")
+    
+    query = query.order(colonna, desc=decrescente, nullsfirst=False).order('id', desc=decrescente)
+    return query.limit(limit + 1), colonna
+
+def _valida_pagina(limit: int, filtri: Dict[str, Any]) -> int:
+    """
+    Controlla i filtri di una pagina di risultati e riporta il limite nell'intervallo consentito.
+    
+    Raises:
+        ValueError: Se un filtro non corrisponde a una colonna dei risultati
+    """
+    for campo in filtri:
+        if campo not in CAMPI_RISULTATI:
+            raise ValueError(f"Filtro non valido: {campo}")
+    return max(1, min(int(limit), LIMITE_PAGINA_MASSIMO))
+
+def _pagina_risultati(righe: List[Dict[str, Any]], limit: int, colonna: str) -> Dict[str, Any]:
+    """Costruisce la pagina dalle righe lette (una in più del limite per sapere se ce ne sono altre)."""
+    pagina = righe[:limit]
+    cursore = None
+    if len(righe) > limit and pagina:
+        ultima = pagina[-1]
+        cursore = _codifica_cursore(ultima.get(colonna), ultima.get('id'))
+    return {'risultati': pagina, 'cursore': cursore}
+
+def list_risultati(after: Optional[str] = None, limit: int = 20, order: str = 'data_partita_iso desc',
+                   data_da: Optional[str] = None, data_a: Optional[str] = None, **filtri) -> Dict[str, Any]:
+    """
+    Restituisce una pagina di risultati con paginazione keyset.
+    
+    Su Supabase filtri, ordinamento e limite vengono applicati dal server, quindi
+    viene letto solo quanto serve alla pagina. Il cursore contiene il valore della
+    colonna di ordinamento e l'ID dell'ultima riga, così le pagine successive
+    restano coerenti anche se nel frattempo vengono inseriti nuovi risultati.
+    
+    Args:
+        after: Cursore restituito dalla pagina precedente (None per la prima pagina)
+        limit: Numero massimo di risultati della pagina
+        order: Colonna e direzione dell'ordinamento, es. 'data_partita_iso desc'
+        data_da: Se specificata, solo i risultati da questa data (YYYY-MM-DD)
+        data_a: Se specificata, solo i risultati fino a questa data inclusa (YYYY-MM-DD)
+        **filtri: Filtri di uguaglianza sulle colonne, es. categoria='U14'
+    
+    Returns:
+        Dizionario con 'risultati' (la pagina) e 'cursore' (per la pagina successiva, None se è l'ultima)
+    
+    Raises:
+        ValueError: Se il cursore, l'ordinamento o un filtro non sono validi
+    """
+    limit = _valida_pagina(limit, filtri)
+    
+    if is_supabase_configured():
+        try:
+            query, colonna = _query_pagina_risultati(supabase.table('risultati'), after, limit, order,
+                                                     data_da, data_a, filtri)
+            return _pagina_risultati(query.execute().data, limit, colonna)
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"Errore nel caricamento della pagina di risultati da Supabase: {e}")
+    
+    return _pagina_risultati_da_file(after, limit, order, data_da, data_a, filtri)
+
+def _pagina_risultati_da_file(after: Optional[str], limit: int, order: str, data_da: Optional[str],
+                              data_a: Optional[str], filtri: Dict[str, Any]) -> Dict[str, Any]:
+    """Versione locale di list_risultati: stessa semantica, calcolata sui risultati del file."""
+    colonna, decrescente = _ordinamento_risultati(order)
+    cursore = _decodifica_cursore(after) if after else None
+    
+    righe = []
+    for i, risultato in enumerate(_carica_risultati_da_file()):
+        # Le colonne derivate (data_partita_iso) sono calcolate come per Supabase
+        risultato_db = _prepara_risultato_db(risultato, i)
+        riga = dict(risultato, id=risultato_db['id'], data_partita_iso=risultato_db.get('data_partita_iso'))
+        if any(str(riga.get(campo)) != str(valore) for campo, valore in filtri.items()):
+            continue
+        data_iso = riga.get('data_partita_iso')
+        if (data_da or data_a) and not data_iso:
+            continue
+        if data_da and data_iso < data_da:
+            continue
+        if data_a and data_iso > f"{data_a}T23:59:59":
+            continue
+        if cursore and not _dopo_cursore(riga.get(colonna), riga['id'], cursore, decrescente):
+            continue
+        righe.append(riga)
+    
+    # Valori nulli in fondo, qualunque sia la direzione
+    valorizzate = sorted((r for r in righe if r.get(colonna) is not None),
+                         key=lambda r: (r[colonna], r['id']), reverse=decrescente)
+    nulle = sorted((r for r in righe if r.get(colonna) is None), key=lambda r: r['id'], reverse=decrescente)
+    return _pagina_risultati((valorizzate + nulle)[:limit + 1], limit, colonna)
+
 def migra_risultati_da_file_a_db() -> bool:
     """
     Migra i risultati dal file JSON al database.
@@ -403,16 +1315,17 @@ def migra_risultati_da_file_a_db() -> bool:
     # Salva i risultati nel database
     return salva_risultati(risultati)
 
+@invalida_dopo('risultati')
 def salva_risultati(risultati: List[Dict[str, Any]]) -> bool:
-    """Salva i risultati nel database."""
-    # Salva sempre nel file JSON locale per sicurezza
-    try:
-        with open(RISULTATI_FILE, 'w', encoding='utf-8') as file:
-            json.dump(risultati, file, indent=2, ensure_ascii=False)
-        print("Risultati salvati nel file JSON locale.")
-    except Exception as e:
-        print(f"Errore nel salvataggio dei risultati nel file JSON: {e}")
-        # Se non riusciamo a salvare nel file JSON, è un errore critico
+    """
+    Salva i risultati nel database.
+    
+    Su Supabase vengono inviate solo le differenze rispetto all'ultimo stato
+    persistito: le righe nuove o modificate con upsert raggruppati e quelle
+    rimosse con un'unica eliminazione.
+    """
+    # Salva sempre nel file locale per sicurezza: se non riesce è un errore critico
+    if not _salva_risultati_su_file(risultati):
         return False
     
     # Se Supabase non è configurato, termina qui (abbiamo già salvato nel file JSON)
@@ -421,139 +1334,73 @@ def salva_risultati(risultati: List[Dict[str, Any]]) -> bool:
         return True
     
     try:
-        # Ottieni gli ID dei risultati esistenti
-        response = supabase.table('risultati').select('id').execute()
-        existing_ids = [item.get('id') for item in response.data]
-        print(f"ID esistenti in Supabase: {existing_ids}")
-        
-        # Prepara i risultati da inserire e aggiornare
-        to_insert = []
-        to_update = []
-        
-        for i, risultato in enumerate(risultati):
-            # Crea una copia del risultato per non modificare l'originale
-            risultato_db = risultato.copy()
-            
-            # Aggiungi un ID se non esiste
-            if 'id' not in risultato_db:
-                risultato_db['id'] = i + 1
-            
-            # Converti le date nel formato ISO
-            if 'data_partita' in risultato_db and risultato_db['data_partita']:
-                try:
-                    data = datetime.strptime(risultato_db['data_partita'], '%d/%m/%Y')
-                    risultato_db['data_partita_iso'] = data.isoformat()
-                except ValueError:
-                    risultato_db['data_partita_iso'] = None
-            
-            # Rimuovi il campo timestamp_modifica e lascia che il database usi il valore predefinito
-            if 'timestamp_modifica' in risultato_db:
-                del risultato_db['timestamp_modifica']
-            
-            # Mantieni solo i campi che sappiamo esistere nella tabella
-            campi_validi = ['id', 'categoria', 'squadra1', 'squadra2', 'squadra3', 'punteggio1', 'punteggio2', 'punteggio3',
-                           'mete1', 'mete2', 'mete3', 'arbitro', 'inserito_da', 'genere', 'data_partita', 
-                           'data_partita_iso', 'modificato_da', 'message_id',
-                           # Campi specifici per i triangolari
-                           'partita1_punteggio1', 'partita1_punteggio2', 'partita1_mete1', 'partita1_mete2',
-                           'partita2_punteggio1', 'partita2_punteggio2', 'partita2_mete1', 'partita2_mete2',
-                           'partita3_punteggio1', 'partita3_punteggio2', 'partita3_mete1', 'partita3_mete2']
-            
-            # Gestione speciale per la sezione arbitrale
-            if 'sezione_arbitrale' in risultato_db:
-                # Combina arbitro e sezione arbitrale in un unico campo
-                if risultato_db.get('arbitro') and risultato_db.get('sezione_arbitrale'):
-                    risultato_db['arbitro'] = f"{risultato_db['arbitro']} ({risultato_db['sezione_arbitrale']})"
-                # Rimuovi il campo sezione_arbitrale che non esiste nella tabella
-                del risultato_db['sezione_arbitrale']
-            
-            # Rimuovi esplicitamente i campi che non esistono nella tabella
-            for campo in ['timestamp', 'tipo_partita']:
-                if campo in risultato_db:
-                    del risultato_db[campo]
-            
-            # Crea un nuovo dizionario con solo i campi validi
-            risultato_filtrato = {}
-            for campo in campi_validi:
-                if campo in risultato_db:
-                    risultato_filtrato[campo] = risultato_db[campo]
-            
-            # Usa il dizionario filtrato
-            risultato_db = risultato_filtrato
-            
-            # Determina se il risultato deve essere inserito o aggiornato
-            if risultato_db['id'] in existing_ids:
-                to_update.append(risultato_db)
+        da_salvare, da_eliminare, hash_nuovi = _piano_sync_risultati(risultati, _carica_snapshot_risultati())
+            
+        salvate = _upsert_risultati(da_salvare) if da_salvare else []
+            
+        eliminate = []
+        if da_eliminare:
+            response = supabase.table('risultati').delete().in_('id', da_eliminare).execute()
+            if response.data:
+                eliminate = da_eliminare
             else:
-                to_insert.append(risultato_db)
-        
-        # Inserisci i nuovi risultati
-        if to_insert:
-            for risultato in to_insert:
-                print(f"Inserimento nuovo risultato in Supabase con ID {risultato['id']}")
-                try:
-                    # Stampa il risultato che stiamo per inserire
-                    print(f"Dati da inserire: {json.dumps(risultato, indent=2)}")
-                    
-                    # Esegui l'inserimento
-                    response = supabase.table('risultati').insert(risultato).execute()
-                    
-                    # Stampa la risposta completa
-                    print(f"Risposta inserimento: {response.data}")
-                    
-                    # Verifica se l'inserimento è riuscito
-                    if not response.data:
-                        print("Attenzione: Nessun dato restituito dall'inserimento")
-                        
-                        # Verifica se il record è stato effettivamente inserito
-                        check = supabase.table('risultati').select('*').eq('id', risultato['id']).execute()
-                        if check.data:
-                            print(f"Verifica: Record trovato nel database: {check.data}")
-                        else:
-                            print(f"Verifica: Record NON trovato nel database!")
-                            
-                            # Prova a inserire il record con un altro metodo
-                            print("Tentativo di inserimento alternativo...")
-                            url = f"{supabase.url}/rest/v1/risultati"
-                            headers = supabase.headers
-                            response_raw = requests.post(url, headers=headers, json=risultato)
-                            print(f"Status code: {response_raw.status_code}")
-                            print(f"Risposta: {response_raw.text}")
-                            
-                            if response_raw.status_code in [200, 201]:
-                                print("Inserimento alternativo riuscito!")
-                            else:
-                                print(f"Errore nell'inserimento alternativo: {response_raw.text}")
-                except Exception as e:
-                    print(f"Errore durante l'inserimento: {e}")
-                    print("Traceback completo:")
-                    traceback.print_exc()
-        
-        # Aggiorna i risultati esistenti
-        if to_update:
-            for risultato in to_update:
-                print(f"Aggiornamento risultato esistente in Supabase con ID {risultato['id']}")
-                response = supabase.table('risultati').update(risultato).eq('id', risultato['id']).execute()
-                print(f"Risposta aggiornamento: {response.data}")
-        
-        # Trova gli ID da eliminare (quelli che esistono nel database ma non nei risultati)
-        result_ids = [r.get('id') for r in risultati if 'id' in r]
-        to_delete = [id for id in existing_ids if id not in result_ids]
-        
-        # Elimina i risultati che non esistono più
-        if to_delete:
-            for id in to_delete:
-                print(f"Eliminazione risultato da Supabase con ID {id}")
-                response = supabase.table('risultati').delete().eq('id', id).execute()
-                print(f"Risposta eliminazione: {response.data}")
-        
+                print(f"Errore nell'eliminazione dei risultati {da_eliminare} da Supabase")
+            
+        _applica_esito_sync_risultati(salvate, hash_nuovi, eliminate)
         return True
     except Exception as e:
         print(f"Errore nel salvataggio dei risultati su Supabase: {e}")
+        traceback.print_exc()
         # I risultati sono stati salvati nel file JSON, quindi possiamo considerare l'operazione parzialmente riuscita
         print("I risultati sono stati salvati nel file JSON ma non su Supabase.")
         return True
 
+@invalida_dopo('risultati')
+def salva_risultato(risultato: Dict[str, Any]) -> bool:
+    """
+    Salva un singolo risultato, nuovo o modificato.
+    
+    Aggiunge la riga al journal del file JSON locale e, se il contenuto è
+    cambiato rispetto all'ultimo stato persistito, la invia a Supabase con
+    un'unica richiesta di upsert.
+    
+    Args:
+        risultato: Risultato da salvare. Se non ha un ID ne viene assegnato uno nuovo.
+    
+    Returns:
+        True se il salvataggio è riuscito, False altrimenti
+    """
+    primo_id = 1
+    if risultato.get('id') is None and is_supabase_configured():
+        try:
+            primo_id = _primo_id_risultato(_query_ultimo_id_risultato(supabase.table('risultati')).execute())
+        except Exception as e:
+            print(f"Errore nella lettura dell'ultimo ID dei risultati da Supabase: {e}")
+            return False
+    
+    # Aggiunge la riga al journal del file locale
+    if not _salva_risultato_su_file(risultato, primo_id):
+        return False
+    
+    if not is_supabase_configured():
+        print("Supabase non configurato. Il risultato è stato salvato solo localmente.")
+        return True
+    
+    try:
+        # Nessuna richiesta se la riga è identica a quella già persistita
+        da_inviare = _riga_risultato_da_inviare(risultato)
+        if da_inviare is None:
+            return True
+        
+        risultato_db, hash_riga = da_inviare
+        salvate = _upsert_risultati([risultato_db])
+        _applica_esito_sync_risultati(salvate, {risultato_db['id']: hash_riga})
+        return True
+    except Exception as e:
+        print(f"Errore nel salvataggio del risultato su Supabase: {e}")
+        print("Il risultato è stato salvato nel file JSON ma non su Supabase.")
+        return True
+
 # Funzioni per la gestione delle squadre
 def carica_squadre() -> List[str]:
     """Carica le squadre dal database come lista semplice."""
@@ -624,14 +1471,19 @@ def migra_squadre_da_file_a_db() -> bool:
     # Salva le squadre nel database
     return salva_squadre(squadre)
 
-def salva_squadre(squadre: List[str]) -> bool:
-    """Salva le squadre nel database e nel file JSON."""
-    # Salva sempre nel file JSON per compatibilità
+def _salva_squadre_su_file(squadre: List[str]) -> None:
+    """Salva le squadre nel file JSON."""
     try:
         with open(SQUADRE_FILE, 'w', encoding='utf-8') as file:
             json.dump(squadre, file, indent=2, ensure_ascii=False)
     except Exception as e:
         print(f"Errore nel salvataggio delle squadre nel file JSON: {e}")
+
+@invalida_dopo('squadre')
+def salva_squadre(squadre: List[str]) -> bool:
+    """Salva le squadre nel database e nel file JSON."""
+    # Salva sempre nel file JSON per compatibilità
+    _salva_squadre_su_file(squadre)
     
     # Se Supabase è configurato, salva anche lì
     if is_supabase_configured():
@@ -694,29 +1546,125 @@ def aggiungi_squadra(nome_squadra: str, user_id: int = None) -> bool:
     return salva_squadre(squadre)
 
 # Funzioni per la gestione dei gironi
+
+# Ultimo stato dei gironi persistito su Supabase, come righe per tabella
+_snapshot_gironi = {
+    'righe': None,
+    # Albero restituito dall'ultima lettura (o salvataggio completo): solo le sue
+    # modifiche possono eliminare righe dal database
+    'albero': None
+}
+
+def _righe_gironi(gironi_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte l'albero dei gironi nelle righe delle tabelle di Supabase.
+    
+    Returns:
+        Dizionario tabella -> {chiave: riga}. Le partite senza ID sono raccolte
+        nella lista 'partite_nuove' perché l'ID viene assegnato dal database.
+    """
+    righe = {
+        'tornei': {},
+        'gironi': {},
+        'girone_squadre': {},
+        'partite_girone': {},
+        'partite_nuove': []
+    }
+    
+    for torneo in gironi_data.get("tornei", []):
+        torneo_id = torneo.get("id")
+        righe['tornei'][torneo_id] = {
+            "id": torneo_id,
+            "nome": torneo.get("nome"),
+            "categoria": torneo.get("categoria"),
+            "genere": torneo.get("genere"),
+            "data_inizio": torneo.get("data_inizio"),
+            "data_fine": torneo.get("data_fine"),
+            "descrizione": torneo.get("descrizione", "")
+        }
+        
+        for girone in torneo.get("gironi", []):
+            girone_id = girone.get("id")
+            righe['gironi'][girone_id] = {
+                "id": girone_id,
+                "torneo_id": torneo_id,
+                "nome": girone.get("nome"),
+                "descrizione": girone.get("descrizione", "")
+            }
+            
+            for squadra in girone.get("squadre", []):
+                righe['girone_squadre'][(girone_id, squadra)] = {
+                    "girone_id": girone_id,
+                    "squadra": squadra
+                }
+            
+            for partita in girone.get("partite", []):
+                partita_data = {
+                    "girone_id": girone_id,
+                    "data_partita": partita.get("data_partita"),
+                    "squadra1": partita.get("squadra1"),
+                    "squadra2": partita.get("squadra2"),
+                    "punteggio1": partita.get("punteggio1"),
+                    "punteggio2": partita.get("punteggio2"),
+                    "mete1": partita.get("mete1"),
+                    "mete2": partita.get("mete2"),
+                    "luogo": partita.get("luogo", ""),
+                    "ora": partita.get("ora", "")
+                }
+                
+                if partita.get("id") is not None:
+                    partita_data["id"] = partita.get("id")
+                    righe['partite_girone'][partita_data["id"]] = partita_data
+                else:
+                    righe['partite_nuove'].append((partita, partita_data))
+    
+    return righe
+
 def carica_gironi_da_db() -> Dict[str, Any]:
-    """Carica i gironi dal database Supabase."""
+    """
+    Carica i gironi dal database Supabase.
+    
+    Legge per intero ciascuna delle quattro tabelle (tornei, gironi, girone_squadre,
+    partite_girone), a pagine per non essere troncata dal limite max-rows di
+    PostgREST, e ricostruisce la struttura annidata in memoria tramite indici per ID.
+    Se una lettura fallisce restituisce None e lo snapshot resta invariato.
+    """
     if not is_supabase_configured():
         return None
     
     try:
-        # Carica i tornei
-        tornei_response = supabase.table('tornei').select('*').execute()
-        tornei_data = tornei_response.data
+        tornei_data = leggi_tutte(lambda: supabase.table('tornei').select('*'))
+        gironi_list = leggi_tutte(lambda: supabase.table('gironi').select('*'))
+        squadre_list = leggi_tutte(lambda: supabase.table('girone_squadre').select('girone_id,squadra'))
+        partite_list = leggi_tutte(lambda: supabase.table('partite_girone').select('*'))
+        
+        # Indicizza squadre e partite per girone
+        squadre_per_girone = {}
+        for item in squadre_list:
+            squadre_per_girone.setdefault(item.get('girone_id'), []).append(item.get('squadra'))
+        
+        partite_per_girone = {}
+        for partita in partite_list:
+            partite_per_girone.setdefault(partita.get('girone_id'), []).append(partita)
+        
+        # Indicizza i gironi per torneo
+        gironi_per_torneo = {}
+        for girone in gironi_list:
+            girone_id = girone.get('id')
+            gironi_per_torneo.setdefault(girone.get('torneo_id'), []).append({
+                "id": girone_id,
+                "nome": girone.get('nome'),
+                "descrizione": girone.get('descrizione', ''),
+                "squadre": squadre_per_girone.get(girone_id, []),
+                "partite": partite_per_girone.get(girone_id, [])
+            })
         
         # Struttura di base
         gironi_data = {"tornei": []}
         
-        # Per ogni torneo, carica i suoi gironi
         for torneo in tornei_data:
             torneo_id = torneo.get('id')
-            
-            # Carica i gironi del torneo
-            gironi_response = supabase.table('gironi').select('*').eq('torneo_id', torneo_id).execute()
-            gironi_list = gironi_response.data
-            
-            # Prepara la struttura del torneo
-            torneo_obj = {
+            gironi_data["tornei"].append({
                 "id": torneo_id,
                 "nome": torneo.get('nome'),
                 "categoria": torneo.get('categoria'),
@@ -724,152 +1672,200 @@ def carica_gironi_da_db() -> Dict[str, Any]:
                 "data_inizio": torneo.get('data_inizio'),
                 "data_fine": torneo.get('data_fine'),
                 "descrizione": torneo.get('descrizione', ''),
-                "gironi": []
-            }
-            
-            # Per ogni girone, carica le squadre e le partite
-            for girone in gironi_list:
-                girone_id = girone.get('id')
-                
-                # Carica le squadre del girone
-                squadre_response = supabase.table('girone_squadre').select('squadra').eq('girone_id', girone_id).execute()
-                squadre = [item.get('squadra') for item in squadre_response.data]
-                
-                # Carica le partite del girone
-                partite_response = supabase.table('partite_girone').select('*').eq('girone_id', girone_id).execute()
-                partite = partite_response.data
-                
-                # Prepara la struttura del girone
-                girone_obj = {
-                    "id": girone_id,
-                    "nome": girone.get('nome'),
-                    "descrizione": girone.get('descrizione', ''),
-                    "squadre": squadre,
-                    "partite": partite
-                }
-                
-                # Aggiungi il girone al torneo
-                torneo_obj["gironi"].append(girone_obj)
-            
-            # Aggiungi il torneo alla struttura principale
-            gironi_data["tornei"].append(torneo_obj)
+                "gironi": gironi_per_torneo.get(torneo_id, [])
+            })
+        
+        # Le righe appena lette sono lo stato persistito per il prossimo salvataggio
+        _snapshot_gironi['righe'] = _righe_gironi(gironi_data)
+        _snapshot_gironi['albero'] = gironi_data
         
         return gironi_data
     except Exception as e:
         print(f"Errore nel caricamento dei gironi da Supabase: {e}")
         return None
 
+def _upsert_righe(tabella: str, righe: List[Dict[str, Any]], on_conflict: str) -> bool:
+    """
+    Esegue l'upsert di più righe, con una richiesta per ogni insieme di campi.
+    
+    Returns:
+        True se tutte le richieste sono riuscite, False altrimenti
+    """
+    for gruppo in _raggruppa_per_campi(righe):
+        response = supabase.table(tabella).upsert(gruppo, on_conflict=on_conflict).execute()
+        if response.data is None:
+            print(f"Errore nell'upsert di {len(gruppo)} righe nella tabella {tabella}")
+            return False
+    return True
+
+def _elimina_righe(tabella: str, colonna: str, valori: List[Any], **filtri) -> bool:
+    """Elimina le righe il cui valore di 'colonna' è tra i valori indicati."""
+    query = supabase.table(tabella).delete()
+    for campo, valore in filtri.items():
+        query = query.eq(campo, valore)
+    return bool(query.in_(colonna, valori).execute().data)
+
+def _operazioni_gironi(precedenti: Dict[str, Any], nuove: Dict[str, Any], eliminazioni: bool = True) -> List[tuple]:
+    """
+    Calcola le operazioni minime per passare dallo stato persistito al nuovo.
+    
+    Args:
+        precedenti: Righe dello stato persistito
+        nuove: Righe del nuovo albero
+        eliminazioni: Se False le righe assenti dal nuovo albero non vengono eliminate
+    
+    Returns:
+        Lista di tuple (descrizione, operazione, inversa) dove operazione e
+        inversa sono funzioni senza argomenti che restituiscono True se riuscite.
+        Gli upsert sono ordinati dai tornei alle partite e le eliminazioni
+        dalle partite ai tornei, per rispettare le chiavi esterne.
+    """
+    operazioni = []
+    
+    def upsert_con_inversa(tabella, righe_vecchie, righe_nuove, on_conflict, chiave):
+        modificate = [r for k, r in righe_nuove.items() if righe_vecchie.get(k) != r]
+        if not modificate:
+            return
+        ripristino = [righe_vecchie[chiave(r)] for r in modificate if chiave(r) in righe_vecchie]
+        inserite = [chiave(r) for r in modificate if chiave(r) not in righe_vecchie]
+        
+        def inversa():
+            esito = _upsert_righe(tabella, ripristino, on_conflict) if ripristino else True
+            if inserite and tabella == 'girone_squadre':
+                per_girone = {}
+                for girone_id, squadra in inserite:
+                    per_girone.setdefault(girone_id, []).append(squadra)
+                for girone_id, squadre in per_girone.items():
+                    esito = _elimina_righe(tabella, 'squadra', squadre, girone_id=girone_id) and esito
+            elif inserite:
+                esito = _elimina_righe(tabella, 'id', inserite) and esito
+            return esito
+        
+        operazioni.append((
+            f"upsert di {len(modificate)} righe in {tabella}",
+            lambda: _upsert_righe(tabella, modificate, on_conflict),
+            inversa
+        ))
+    
+    def elimina_con_inversa(tabella, righe_vecchie, righe_nuove, on_conflict):
+        rimosse = [k for k in righe_vecchie if k not in righe_nuove]
+        if not rimosse:
+            return
+        if not eliminazioni:
+            print(f"Eliminazione di {len(rimosse)} righe da {tabella} ignorata: "
+                  f"i gironi salvati non derivano dall'ultimo stato del database")
+            return
+        ripristino = [righe_vecchie[k] for k in rimosse]
+        
+        if tabella == 'girone_squadre':
+            per_girone = {}
+            for girone_id, squadra in rimosse:
+                per_girone.setdefault(girone_id, []).append(squadra)
+            
+            def elimina():
+                return all(_elimina_righe(tabella, 'squadra', squadre, girone_id=girone_id)
+                           for girone_id, squadre in per_girone.items())
+        else:
+            def elimina():
+                return _elimina_righe(tabella, 'id', rimosse)
+        
+        operazioni.append((
+            f"eliminazione di {len(rimosse)} righe da {tabella}",
+            elimina,
+            lambda: _upsert_righe(tabella, ripristino, on_conflict)
+        ))
+    
+    per_id = lambda r: r['id']
+    upsert_con_inversa('tornei', precedenti['tornei'], nuove['tornei'], 'id', per_id)
+    upsert_con_inversa('gironi', precedenti['gironi'], nuove['gironi'], 'id', per_id)
+    upsert_con_inversa('girone_squadre', precedenti['girone_squadre'], nuove['girone_squadre'],
+                       'girone_id,squadra', lambda r: (r['girone_id'], r['squadra']))
+    upsert_con_inversa('partite_girone', precedenti['partite_girone'], nuove['partite_girone'], 'id', per_id)
+    
+    # Le partite senza ID vengono inserite e ricevono l'ID assegnato dal database
+    if nuove['partite_nuove']:
+        inserite = []
+        
+        def inserisci_partite():
+            response = supabase.table('partite_girone').insert([r for _, r in nuove['partite_nuove']]).execute()
+            if response.data is None:
+                return False
+            for (partita, partita_data), riga in zip(nuove['partite_nuove'], response.data):
+                partita["id"] = partita_data["id"] = riga.get("id")
+                nuove['partite_girone'][riga.get("id")] = partita_data
+                inserite.append(riga.get("id"))
+            return True
+        
+        operazioni.append((
+            f"inserimento di {len(nuove['partite_nuove'])} nuove partite",
+            inserisci_partite,
+            lambda: _elimina_righe('partite_girone', 'id', inserite) if inserite else True
+        ))
+    
+    elimina_con_inversa('partite_girone', precedenti['partite_girone'], nuove['partite_girone'], 'id')
+    elimina_con_inversa('girone_squadre', precedenti['girone_squadre'], nuove['girone_squadre'], 'girone_id,squadra')
+    elimina_con_inversa('gironi', precedenti['gironi'], nuove['gironi'], 'id')
+    elimina_con_inversa('tornei', precedenti['tornei'], nuove['tornei'], 'id')
+    
+    return operazioni
+
 def salva_gironi_su_db(gironi_data: Dict[str, Any]) -> bool:
-    """Salva i gironi nel database Supabase."""
+    """
+    Salva i gironi nel database Supabase.
+    
+    Confronta l'albero dei gironi con l'ultimo stato persistito e invia solo
+    upsert ed eliminazioni raggruppati per tabella. Se un'operazione fallisce,
+    quelle già eseguite vengono annullate in ordine inverso.
+    """
     if not is_supabase_configured():
         return False
     
     try:
-        # Ottieni tutti i tornei
-        tornei = gironi_data.get("tornei", [])
+        # Senza uno stato persistito noto, leggilo dal database
+        if _snapshot_gironi['righe'] is None and carica_gironi_da_db() is None:
+            return False
         
-        # Per ogni torneo
-        for torneo in tornei:
-            torneo_id = torneo.get("id")
-            
-            # Verifica se il torneo esiste già
-            torneo_exists = False
-            try:
-                response = supabase.table('tornei').select('id').eq('id', torneo_id).execute()
-                torneo_exists = len(response.data) > 0
-            except:
-                torneo_exists = False
-            
-            # Dati del torneo
-            torneo_data = {
-                "nome": torneo.get("nome"),
-                "categoria": torneo.get("categoria"),
-                "genere": torneo.get("genere"),
-                "data_inizio": torneo.get("data_inizio"),
-                "data_fine": torneo.get("data_fine"),
-                "descrizione": torneo.get("descrizione", "")
-            }
+        # Un albero non letto dal database (es. il file JSON usato dopo un errore di
+        # lettura) può non contenere dati presenti solo sul database: in quel caso
+        # si salvano le righe nuove o modificate ma non si elimina nulla
+        derivato = gironi_data is _snapshot_gironi['albero']
+        precedenti = _snapshot_gironi['righe']
+        nuove = _righe_gironi(gironi_data)
+        operazioni = _operazioni_gironi(precedenti, nuove, eliminazioni=derivato)
             
-            # Crea o aggiorna il torneo
-            if torneo_exists:
-                supabase.table('tornei').update(torneo_data).eq('id', torneo_id).execute()
-            else:
-                torneo_data["id"] = torneo_id
-                supabase.table('tornei').insert(torneo_data).execute()
+        # Registro delle operazioni inverse di quelle già eseguite
+        rollback = []
+        for descrizione, operazione, inversa in operazioni:
+            if operazione():
+                rollback.append((descrizione, inversa))
+                continue
             
-            # Ottieni i gironi del torneo
-            gironi = torneo.get("gironi", [])
+            print(f"Errore durante il salvataggio dei gironi: {descrizione} non riuscito")
+            ripristinato = True
+            for descrizione_eseguita, annulla in reversed(rollback):
+                if not annulla():
+                    print(f"Errore nell'annullamento di: {descrizione_eseguita}")
+                    ripristinato = False
+            if not ripristinato:
+                # Lo stato del database non è più certo: verrà riletto al prossimo salvataggio
+                _snapshot_gironi['righe'] = None
+                _snapshot_gironi['albero'] = None
+            return False
             
-            # Per ogni girone
-            for girone in gironi:
-                girone_id = girone.get("id")
-                
-                # Verifica se il girone esiste già
-                girone_exists = False
-                try:
-                    response = supabase.table('gironi').select('id').eq('id', girone_id).execute()
-                    girone_exists = len(response.data) > 0
-                except:
-                    girone_exists = False
-                
-                # Dati del girone
-                girone_data = {
-                    "torneo_id": torneo_id,
-                    "nome": girone.get("nome"),
-                    "descrizione": girone.get("descrizione", "")
-                }
-                
-                # Crea o aggiorna il girone
-                if girone_exists:
-                    supabase.table('gironi').update(girone_data).eq('id', girone_id).execute()
-                else:
-                    girone_data["id"] = girone_id
-                    supabase.table('gironi').insert(girone_data).execute()
-                
-                # Gestisci le squadre del girone
-                squadre = girone.get("squadre", [])
-                
-                # Elimina tutte le squadre esistenti per questo girone
-                supabase.table('girone_squadre').delete().eq('girone_id', girone_id).execute()
-                
-                # Inserisci le nuove squadre
-                for squadra in squadre:
-                    supabase.table('girone_squadre').insert({
-                        "girone_id": girone_id,
-                        "squadra": squadra
-                    }).execute()
-                
-                # Gestisci le partite del girone
-                partite = girone.get("partite", [])
-                
-                # Elimina tutte le partite esistenti per questo girone
-                supabase.table('partite_girone').delete().eq('girone_id', girone_id).execute()
-                
-                # Inserisci le nuove partite
-                for partita in partite:
-                    partita_data = {
-                        "girone_id": girone_id,
-                        "data_partita": partita.get("data_partita"),
-                        "squadra1": partita.get("squadra1"),
-                        "squadra2": partita.get("squadra2"),
-                        "punteggio1": partita.get("punteggio1"),
-                        "punteggio2": partita.get("punteggio2"),
-                        "mete1": partita.get("mete1"),
-                        "mete2": partita.get("mete2"),
-                        "luogo": partita.get("luogo", ""),
-                        "ora": partita.get("ora", "")
-                    }
-                    
-                    # Aggiungi l'ID se presente
-                    if "id" in partita:
-                        partita_data["id"] = partita.get("id")
-                    
-                    supabase.table('partite_girone').insert(partita_data).execute()
-        
+        del nuove['partite_nuove'][:]
+        if not derivato:
+            # Le righe non eliminate restano sul database e nello stato persistito
+            for tabella, righe in precedenti.items():
+                if tabella != 'partite_nuove':
+                    nuove[tabella] = {**righe, **nuove[tabella]}
+            _snapshot_gironi['albero'] = None
+        _snapshot_gironi['righe'] = nuove
         return True
     except Exception as e:
         print(f"Errore nel salvataggio dei gironi su Supabase: {e}")
         traceback.print_exc()
+        _snapshot_gironi['righe'] = None
+        _snapshot_gironi['albero'] = None
         return False
 
 def migra_gironi_a_supabase() -> bool:
@@ -951,7 +1947,7 @@ def migra_dati_a_supabase() -> bool:
     try:
         # Migra gli utenti
         utenti = _carica_utenti_da_file()
-        salva_utenti(utenti)
+        upsert_utenti(utenti)
         
         # Migra i risultati
         risultati = _carica_risultati_da_file()
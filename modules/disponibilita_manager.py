@@ -2,24 +2,242 @@
 # -*- coding: utf-8 -*-
 
 import time
+import threading
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
-from modules.campionati_manager import (
-    carica_designazioni_partita, get_partita, get_arbitro, get_tutor,
-    get_tutor_partita
-)
+from modules.campionati_manager import get_partita
 from modules.db_manager import format_date
 
-# Cache per i dati
-_cache = {
-    'impegni_arbitri': {},
-    'impegni_tutor': {},
-    'last_load_impegni': 0
-}
+# Intervallo dopo cui l'indice viene ricostruito dalle tabelle (5 minuti),
+# per riallineare le modifiche fatte da altri processi
+RICOSTRUZIONE_TTL = 300
 
-# Tempo di validità della cache in secondi (30 secondi)
-CACHE_TTL = 30
+# Colonne delle partite necessarie per descrivere un impegno
+COLONNE_PARTITA = 'id,data_partita,squadra_casa,squadra_trasferta,ora,luogo'
+
+class IndiceDisponibilita:
+    """
+    Indice degli impegni di arbitri e tutor per (persona, data).
+    
+    L'indice è costruito con un caricamento in blocco (designazioni, assegnazioni
+    dei tutor e partite, unite per ID partita) e aggiornato in modo incrementale
+    dalle funzioni che modificano designazioni, tutor e partite, quindi una
+    verifica di disponibilità è una lettura in memoria.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.invalida()
+    
+    def invalida(self) -> None:
+        """Scarta l'indice, che verrà ricostruito alla prossima lettura."""
+        with self.lock:
+            self.costruito = False
+            self.ultima_costruzione = 0
+            self.partite = {}
+            # (tipo, persona, data) -> ID riga -> (ID partita, ruolo)
+            self.impegni = {}
+            # (tipo, ID riga) -> (persona, ID partita, ruolo)
+            self.righe = {}
+            # ID partita -> righe (tipo, ID riga) che la riguardano
+            self.righe_partita = {}
+    
+    def assicura(self) -> None:
+        """Costruisce l'indice se manca o è scaduto."""
+        with self.lock:
+            if not self.costruito or time.time() - self.ultima_costruzione > RICOSTRUZIONE_TTL:
+                self.ricostruisci()
+    
+    def ricostruisci(self) -> None:
+        """
+        Ricostruisce l'indice con tre letture in blocco unite per ID partita.
+        
+        Le tabelle sono lette a pagine (il limite max-rows di PostgREST le
+        troncherebbe); se una lettura fallisce l'indice precedente resta valido.
+        """
+        from modules.db_manager import supabase, leggi_tutte
+        
+        partite = leggi_tutte(lambda: supabase.table('partite_campionato').select(COLONNE_PARTITA))
+        designazioni = leggi_tutte(lambda: supabase.table('designazioni_arbitrali').select('id,partita_id,arbitro_id,ruolo'))
+        assegnazioni = leggi_tutte(lambda: supabase.table('tutor_partite').select('id,partita_id,tutor_id'))
+        
+        with self.lock:
+            self.invalida()
+            self.partite = {p['id']: p for p in partite}
+            for designazione in designazioni:
+                self._collega('arbitro', designazione['id'], designazione.get('arbitro_id'),
+                              designazione.get('partita_id'), designazione.get('ruolo', ''))
+            for assegnazione in assegnazioni:
+                self._collega('tutor', assegnazione.get('id'), assegnazione.get('tutor_id'),
+                              assegnazione.get('partita_id'), '')
+            self.costruito = True
+            self.ultima_costruzione = time.time()
+    
+    def _chiave(self, tipo: str, persona_id: Any, partita_id: Any) -> Optional[Tuple]:
+        partita = self.partite.get(partita_id)
+        if not partita or not partita.get('data_partita'):
+            return None
+        return (tipo, persona_id, partita['data_partita'])
+    
+    def _collega(self, tipo: str, riga_id: Any, persona_id: Any, partita_id: Any, ruolo: str) -> None:
+        self.righe[(tipo, riga_id)] = (persona_id, partita_id, ruolo)
+        self.righe_partita.setdefault(partita_id, set()).add((tipo, riga_id))
+        chiave = self._chiave(tipo, persona_id, partita_id)
+        if chiave:
+            self.impegni.setdefault(chiave, {})[riga_id] = (partita_id, ruolo)
+    
+    def _scollega(self, tipo: str, riga_id: Any) -> None:
+        riga = self.righe.pop((tipo, riga_id), None)
+        if not riga:
+            return
+        persona_id, partita_id, _ = riga
+        self.righe_partita.get(partita_id, set()).discard((tipo, riga_id))
+        chiave = self._chiave(tipo, persona_id, partita_id)
+        if chiave in self.impegni:
+            self.impegni[chiave].pop(riga_id, None)
+            if not self.impegni[chiave]:
+                del self.impegni[chiave]
+    
+    def _aggiorna(self, modifica) -> None:
+        """Esegue una modifica dell'indice, scartandolo in caso di errore."""
+        with self.lock:
+            if not self.costruito:
+                return
+            try:
+                modifica()
+            except Exception as e:
+                print(f"Errore nell'aggiornamento dell'indice delle disponibilità: {e}")
+                self.invalida()
+    
+    def _assicura_partita(self, partita_id: Any) -> None:
+        """Carica una partita non ancora nota all'indice."""
+        if partita_id not in self.partite:
+            partita = get_partita(partita_id)
+            if partita:
+                self.partite[partita_id] = partita
+    
+    # Aggiornamenti incrementali
+    
+    def registra_designazione(self, designazione: Dict[str, Any]) -> None:
+        """Aggiorna l'indice dopo l'aggiunta o la modifica di una designazione."""
+        def modifica():
+            self._assicura_partita(designazione.get('partita_id'))
+            self._scollega('arbitro', designazione['id'])
+            self._collega('arbitro', designazione['id'], designazione.get('arbitro_id'),
+                          designazione.get('partita_id'), designazione.get('ruolo', ''))
+        
+        if designazione and designazione.get('id') is not None:
+            self._aggiorna(modifica)
+    
+    def rimuovi_designazione(self, designazione_id: Any) -> None:
+        """Aggiorna l'indice dopo la rimozione di una designazione."""
+        self._aggiorna(lambda: self._scollega('arbitro', designazione_id))
+    
+    def registra_tutor_partita(self, assegnazione: Dict[str, Any]) -> None:
+        """Aggiorna l'indice dopo l'assegnazione di un tutor a una partita."""
+        def modifica():
+            self._assicura_partita(assegnazione.get('partita_id'))
+            self._scollega('tutor', assegnazione.get('id'))
+            self._collega('tutor', assegnazione.get('id'), assegnazione.get('tutor_id'),
+                          assegnazione.get('partita_id'), '')
+        
+        if assegnazione:
+            self._aggiorna(modifica)
+    
+    def rimuovi_tutor_partita(self, assegnazione_id: Any) -> None:
+        """Aggiorna l'indice dopo la rimozione di un tutor da una partita."""
+        self._aggiorna(lambda: self._scollega('tutor', assegnazione_id))
+    
+    def registra_partita(self, partita: Dict[str, Any]) -> None:
+        """Aggiorna l'indice dopo la creazione o la modifica di una partita (ad esempio la data)."""
+        def modifica():
+            partita_id = partita['id']
+            righe = [(chiave, self.righe[chiave]) for chiave in self.righe_partita.get(partita_id, ())]
+            for (tipo, riga_id), _ in righe:
+                self._scollega(tipo, riga_id)
+            aggiornata = dict(self.partite.get(partita_id, {}))
+            aggiornata.update(partita)
+            self.partite[partita_id] = aggiornata
+            for (tipo, riga_id), (persona_id, _, ruolo) in righe:
+                self._collega(tipo, riga_id, persona_id, partita_id, ruolo)
+        
+        if partita and partita.get('id') is not None:
+            self._aggiorna(modifica)
+    
+    def rimuovi_partita(self, partita_id: Any) -> None:
+        """Aggiorna l'indice dopo l'eliminazione di una partita e delle sue designazioni."""
+        def modifica():
+            for tipo, riga_id in list(self.righe_partita.get(partita_id, ())):
+                self._scollega(tipo, riga_id)
+            self.righe_partita.pop(partita_id, None)
+            self.partite.pop(partita_id, None)
+        
+        self._aggiorna(modifica)
+    
+    # Letture
+    
+    def impegni_bulk(self, tipo: str, richieste: List[Tuple[Any, str]],
+                     partita_id: Optional[int] = None) -> Dict[Tuple[Any, str], List[Dict[str, Any]]]:
+        """
+        Restituisce gli impegni di più persone in più date con una sola lettura dell'indice.
+        
+        Args:
+            tipo: 'arbitro' o 'tutor'
+            richieste: Coppie (ID persona, data in formato ISO)
+            partita_id: ID della partita corrente, esclusa dagli impegni (opzionale)
+        
+        Returns:
+            Dizionario (ID persona, data) -> lista degli impegni
+        """
+        self.assicura()
+        risultato = {}
+        with self.lock:
+            for persona_id, data_partita in richieste:
+                impegni = []
+                for id_partita, ruolo in self.impegni.get((tipo, persona_id, data_partita), {}).values():
+                    if partita_id and id_partita == partita_id:
+                        continue
+                    partita = self.partite[id_partita]
+                    impegno = {
+                        'partita_id': id_partita,
+                        'squadra_casa': partita.get('squadra_casa') or '',
+                        'squadra_trasferta': partita.get('squadra_trasferta') or '',
+                        'ora': partita.get('ora') or '',
+                        'luogo': partita.get('luogo') or '',
+                        'data_formattata': format_date(data_partita)
+                    }
+                    if tipo == 'arbitro':
+                        impegno['ruolo'] = ruolo
+                    impegni.append(impegno)
+                risultato[(persona_id, data_partita)] = impegni
+        return risultato
+
+# Indice delle disponibilità condiviso dal processo
+indice_disponibilita = IndiceDisponibilita()
+
+def verifica_impegni_bulk(richieste: List[Tuple[int, str]], partita_id: Optional[int] = None,
+                          tipo: str = 'arbitro') -> Dict[Tuple[int, str], List[Dict[str, Any]]]:
+    """
+    Verifica in una sola chiamata gli impegni di più arbitri (o tutor) in più date.
+    
+    Args:
+        richieste: Coppie (ID arbitro, data della partita in formato ISO)
+        partita_id: ID della partita corrente (opzionale, per escluderla dalla verifica)
+        tipo: 'arbitro' oppure 'tutor'
+    
+    Returns:
+        Dizionario (ID, data) -> lista di partite in cui la persona è già impegnata
+    """
+    try:
+        from modules.db_manager import is_supabase_configured
+        
+        if is_supabase_configured():
+            return indice_disponibilita.impegni_bulk(tipo, richieste, partita_id)
+    except Exception as e:
+        print(f"Errore nella verifica degli impegni: {e}")
+    
+    return {(persona_id, data_partita): [] for persona_id, data_partita in richieste}
 
 def verifica_impegni_arbitro(arbitro_id: int, data_partita: str, partita_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """
@@ -33,57 +251,7 @@ def verifica_impegni_arbitro(arbitro_id: int, data_partita: str, partita_id: Opt
     Returns:
         Lista di partite in cui l'arbitro è già impegnato nella data specificata
     """
-    try:
-        from modules.db_manager import is_supabase_configured
-        
-        if is_supabase_configured():
-            from modules.db_manager import supabase
-            
-            # Verifica se i dati sono in cache e ancora validi
-            cache_key = f'impegni_arbitro_{arbitro_id}_{data_partita}'
-            current_time = time.time()
-            
-            if cache_key in _cache['impegni_arbitri'] and (current_time - _cache['last_load_impegni']) < CACHE_TTL:
-                impegni = _cache['impegni_arbitri'][cache_key]
-                # Filtra escludendo la partita corrente
-                if partita_id:
-                    return [i for i in impegni if i['partita_id'] != partita_id]
-                return impegni
-            
-            # Carica le designazioni dell'arbitro
-            response = supabase.table('designazioni_arbitrali').select('*').eq('arbitro_id', arbitro_id).execute()
-            designazioni = response.data
-            
-            # Filtra le designazioni per data
-            impegni = []
-            for designazione in designazioni:
-                partita = get_partita(designazione.get('partita_id'))
-                if partita and partita.get('data_partita') == data_partita:
-                    # Esclude la partita corrente
-                    if partita_id and partita.get('id') == partita_id:
-                        continue
-                    
-                    impegni.append({
-                        'partita_id': partita.get('id'),
-                        'squadra_casa': partita.get('squadra_casa', ''),
-                        'squadra_trasferta': partita.get('squadra_trasferta', ''),
-                        'ora': partita.get('ora', ''),
-                        'luogo': partita.get('luogo', ''),
-                        'ruolo': designazione.get('ruolo', ''),
-                        'data_formattata': format_date(data_partita)
-                    })
-            
-            # Aggiorna la cache
-            _cache['impegni_arbitri'][cache_key] = impegni
-            _cache['last_load_impegni'] = current_time
-            
-            return impegni
-        else:
-            # Dati di esempio se Supabase non è configurato
-            return []
-    except Exception as e:
-        print(f"Errore nella verifica degli impegni dell'arbitro: {e}")
-        return []
+    return verifica_impegni_bulk([(arbitro_id, data_partita)], partita_id)[(arbitro_id, data_partita)]
 
 def verifica_impegni_tutor(tutor_id: int, data_partita: str, partita_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """
@@ -97,56 +265,7 @@ def verifica_impegni_tutor(tutor_id: int, data_partita: str, partita_id: Optiona
     Returns:
         Lista di partite in cui il tutor è già impegnato nella data specificata
     """
-    try:
-        from modules.db_manager import is_supabase_configured
-        
-        if is_supabase_configured():
-            from modules.db_manager import supabase
-            
-            # Verifica se i dati sono in cache e ancora validi
-            cache_key = f'impegni_tutor_{tutor_id}_{data_partita}'
-            current_time = time.time()
-            
-            if cache_key in _cache['impegni_tutor'] and (current_time - _cache['last_load_impegni']) < CACHE_TTL:
-                impegni = _cache['impegni_tutor'][cache_key]
-                # Filtra escludendo la partita corrente
-                if partita_id:
-                    return [i for i in impegni if i['partita_id'] != partita_id]
-                return impegni
-            
-            # Carica le assegnazioni del tutor
-            response = supabase.table('tutor_partite').select('*').eq('tutor_id', tutor_id).execute()
-            assegnazioni = response.data
-            
-            # Filtra le assegnazioni per data
-            impegni = []
-            for assegnazione in assegnazioni:
-                partita = get_partita(assegnazione.get('partita_id'))
-                if partita and partita.get('data_partita') == data_partita:
-                    # Esclude la partita corrente
-                    if partita_id and partita.get('id') == partita_id:
-                        continue
-                    
-                    impegni.append({
-                        'partita_id': partita.get('id'),
-                        'squadra_casa': partita.get('squadra_casa', ''),
-                        'squadra_trasferta': partita.get('squadra_trasferta', ''),
-                        'ora': partita.get('ora', ''),
-                        'luogo': partita.get('luogo', ''),
-                        'data_formattata': format_date(data_partita)
-                    })
-            
-            # Aggiorna la cache
-            _cache['impegni_tutor'][cache_key] = impegni
-            _cache['last_load_impegni'] = current_time
-            
-            return impegni
-        else:
-            # Dati di esempio se Supabase non è configurato
-            return []
-    except Exception as e:
-        print(f"Errore nella verifica degli impegni del tutor: {e}")
-        return []
+    return verifica_impegni_bulk([(tutor_id, data_partita)], partita_id, tipo='tutor')[(tutor_id, data_partita)]
 
 def formatta_impegni_arbitro(impegni: List[Dict[str, Any]]) -> str:
     """
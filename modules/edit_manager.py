@@ -445,7 +445,7 @@ async def conferma_modifiche(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """Conferma le modifiche e aggiorna il risultato."""
     # Importa le funzioni necessarie
     from bot_fixed_corrected import CHANNEL_ID
-    from modules.db_manager import carica_risultati, salva_risultati
+    from modules.db_manager import carica_risultati, salva_risultato
     from modules.message_manager import formatta_messaggio_triangolare, formatta_messaggio_partita_normale
     
     query = update.callback_query
@@ -490,8 +490,8 @@ async def conferma_modifiche(update: Update, context: ContextTypes.DEFAULT_TYPE)
     risultati[indice_reale]['modificato_il'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     risultati[indice_reale]['modificato_da'] = query.from_user.full_name
     
-    # Salva i risultati aggiornati
-    salva_risultati(risultati)
+    # Salva solo il risultato modificato
+    salva_risultato(risultati[indice_reale])
     
     # Aggiorna il messaggio nel canale se possibile
     message_id = risultato.get('message_id')
@@ -533,7 +533,7 @@ async def conferma_modifiche(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 
                 # Aggiorna l'ID del messaggio nel risultato
                 risultati[indice_reale]['message_id'] = sent_message.message_id
-                salva_risultati(risultati)
+                salva_risultato(risultati[indice_reale])
                 
             except Exception as e2:
                 logger.error(f"Errore nell'invio del nuovo messaggio al canale: {e2}")
@@ -3,10 +3,12 @@
 
 import os
 import json
-import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Union
 
+from modules.classifica_manager import calcola_classifica, REGOLAMENTO_GIRONI
+from modules.cache_manager import cache, MANCANTE
+
 # Percorso del file JSON per i gironi
 if os.environ.get('AWS_EXECUTION_ENV'):
     # Siamo in AWS Lambda, usa /tmp
@@ -25,14 +27,8 @@ else:
     # Ambiente normale, usa i percorsi standard
     GIRONI_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gironi.json')
 
-# Cache per i dati
-_cache = {
-    'gironi': None,
-    'last_load': 0
-}
-
-# Tempo di validità della cache in secondi (5 secondi)
-CACHE_TTL = 5
+# Cache per i dati, aggiornata da salva_gironi
+_cache_gironi = cache.namespace('gironi', dimensione_massima=1)
 
 def carica_gironi(force_reload=False) -> Dict[str, Any]:
     """
@@ -44,22 +40,23 @@ def carica_gironi(force_reload=False) -> Dict[str, Any]:
     Returns:
         Dizionario con i dati dei gironi
     """
-    current_time = time.time()
-    
     # Usa la cache se disponibile e non scaduta
-    if not force_reload and _cache['gironi'] is not None and (current_time - _cache['last_load']) < CACHE_TTL:
-        return _cache['gironi']
+    if not force_reload:
+        gironi = _cache_gironi.leggi('tutti')
+        if gironi is not MANCANTE:
+            return gironi
     
     # Prova a caricare dal database
+    database_configurato = False
     try:
         from modules.db_manager import carica_gironi_da_db, is_supabase_configured
         
-        if is_supabase_configured():
+        database_configurato = is_supabase_configured()
+        if database_configurato:
             gironi = carica_gironi_da_db()
             if gironi is not None:
                 # Aggiorna la cache
-                _cache['gironi'] = gironi
-                _cache['last_load'] = current_time
+                _cache_gironi.imposta('tutti', gironi)
                 return gironi
     except Exception as e:
         print(f"Errore nel caricamento dei gironi dal database: {e}")
@@ -69,18 +66,23 @@ def carica_gironi(force_reload=False) -> Dict[str, Any]:
         with open(GIRONI_FILE, 'r', encoding='utf-8') as file:
             try:
                 gironi = json.load(file)
-                # Aggiorna la cache
-                _cache['gironi'] = gironi
-                _cache['last_load'] = current_time
-                return gironi
             except json.JSONDecodeError:
                 print(f"Errore nel parsing del file dei gironi: {GIRONI_FILE}")
                 return {"tornei": []}
-    else:
-        # Se il file non esiste, crea una struttura vuota
-        gironi = {"tornei": []}
-        salva_gironi(gironi)
+        # Se il database è configurato la copia locale sostituisce solo una lettura
+        # non riuscita: non va in cache, così la prossima lettura riprova il database
+        if not database_configurato:
+            _cache_gironi.imposta('tutti', gironi)
         return gironi
+    
+    # Se il file non esiste restituisce una struttura vuota, senza salvarla:
+    # dopo un errore di lettura sovrascriverebbe i gironi presenti sul database
+    return {"tornei": []}
+
+def _aggiorna_cache(gironi: Dict[str, Any]) -> None:
+    """Invalida i dati che dipendono dai gironi e memorizza la versione appena salvata."""
+    cache.invalida_tag('gironi')
+    _cache_gironi.imposta('tutti', gironi)
 
 def salva_gironi(gironi: Dict[str, Any]) -> bool:
     """
@@ -107,15 +109,13 @@ def salva_gironi(gironi: Dict[str, Any]) -> bool:
             db_result = salva_gironi_su_db(gironi)
             if db_result:
                 # Aggiorna la cache
-                _cache['gironi'] = gironi
-                _cache['last_load'] = time.time()
+                _aggiorna_cache(gironi)
                 return True
     except Exception as e:
         print(f"Errore nel salvataggio dei gironi nel database: {e}")
     
     # Aggiorna la cache anche se il salvataggio nel database fallisce
-    _cache['gironi'] = gironi
-    _cache['last_load'] = time.time()
+    _aggiorna_cache(gironi)
     return True
 
 def crea_torneo(nome: str, categoria: str, genere: str, data_inizio: str, data_fine: str, descrizione: str = "") -> int:
@@ -744,99 +744,10 @@ def calcola_classifica_girone(torneo_id: int, girone_id: int) -> List[Dict[str,
     if girone is None:
         return []
     
-    # Inizializza la classifica
-    classifica = {}
-    for squadra in girone["squadre"]:
-        classifica[squadra] = {
-            "squadra": squadra,
-            "punti": 0,
-            "partite_giocate": 0,
-            "vittorie": 0,
-            "pareggi": 0,
-            "sconfitte": 0,
-            "mete_fatte": 0,
-            "mete_subite": 0,
-            "punti_fatti": 0,
-            "punti_subiti": 0,
-            "differenza_punti": 0
-        }
-    
-    # Calcola le statistiche per ogni partita
-    for partita in girone["partite"]:
-        # Salta le partite senza punteggio
-        if "punteggio1" not in partita or "punteggio2" not in partita:
-            continue
-        
-        squadra1 = partita["squadra1"]
-        squadra2 = partita["squadra2"]
-        punteggio1 = partita["punteggio1"]
-        punteggio2 = partita["punteggio2"]
-        
-        # Aggiorna le partite giocate
-        classifica[squadra1]["partite_giocate"] += 1
-        classifica[squadra2]["partite_giocate"] += 1
-        
-        # Aggiorna i punti fatti e subiti
-        classifica[squadra1]["punti_fatti"] += punteggio1
-        classifica[squadra1]["punti_subiti"] += punteggio2
-        classifica[squadra2]["punti_fatti"] += punteggio2
-        classifica[squadra2]["punti_subiti"] += punteggio1
-        
-        # Aggiorna le mete fatte e subite se disponibili
-        if "mete1" in partita and "mete2" in partita:
-            classifica[squadra1]["mete_fatte"] += partita["mete1"]
-            classifica[squadra1]["mete_subite"] += partita["mete2"]
-            classifica[squadra2]["mete_fatte"] += partita["mete2"]
-            classifica[squadra2]["mete_subite"] += partita["mete1"]
-        
-        # Aggiorna vittorie, pareggi e sconfitte
-        if punteggio1 > punteggio2:
-            classifica[squadra1]["vittorie"] += 1
-            classifica[squadra2]["sconfitte"] += 1
-            classifica[squadra1]["punti"] += 4  # 4 punti per la vittoria
-            
-            # Bonus offensivo: 1 punto extra se la squadra segna 4 o più mete
-            if "mete1" in partita and partita["mete1"] >= 4:
-                classifica[squadra1]["punti"] += 1
-            
-            # Bonus difensivo: 1 punto extra se la squadra perde con 7 o meno punti di scarto
-            if punteggio2 >= punteggio1 - 7:
-                classifica[squadra2]["punti"] += 1
-                
-        elif punteggio1 < punteggio2:
-            classifica[squadra1]["sconfitte"] += 1
-            classifica[squadra2]["vittorie"] += 1
-            classifica[squadra2]["punti"] += 4  # 4 punti per la vittoria
-            
-            # Bonus offensivo: 1 punto extra se la squadra segna 4 o più mete
-            if "mete2" in partita and partita["mete2"] >= 4:
-                classifica[squadra2]["punti"] += 1
-            
-            # Bonus difensivo: 1 punto extra se la squadra perde con 7 o meno punti di scarto
-            if punteggio1 >= punteggio2 - 7:
-                classifica[squadra1]["punti"] += 1
-                
-        else:  # Pareggio
-            classifica[squadra1]["pareggi"] += 1
-            classifica[squadra2]["pareggi"] += 1
-            classifica[squadra1]["punti"] += 2  # 2 punti per il pareggio
-            classifica[squadra2]["punti"] += 2  # 2 punti per il pareggio
-            
-            # Bonus offensivo: 1 punto extra se la squadra segna 4 o più mete
-            if "mete1" in partita and partita["mete1"] >= 4:
-                classifica[squadra1]["punti"] += 1
-            if "mete2" in partita and partita["mete2"] >= 4:
-                classifica[squadra2]["punti"] += 1
-    
-    # Calcola la differenza punti
-    for squadra in classifica:
-        classifica[squadra]["differenza_punti"] = classifica[squadra]["punti_fatti"] - classifica[squadra]["punti_subiti"]
-    
-    # Converti il dizionario in una lista e ordina per punti (decrescente) e differenza punti (decrescente)
-    classifica_list = list(classifica.values())
-    classifica_list.sort(key=lambda x: (x["punti"], x["differenza_punti"], x["mete_fatte"]), reverse=True)
-    
-    return classifica_list
+    # Calcola la classifica con le regole dei gironi (ordinata per punti, differenza punti e mete fatte)
+    partite = [(p.get("squadra1"), p.get("squadra2"), p.get("punteggio1"), p.get("punteggio2"),
+                p.get("mete1"), p.get("mete2")) for p in girone["partite"]]
+    return calcola_classifica(partite, REGOLAMENTO_GIRONI, girone["squadre"])
 
 def ottieni_tornei_attivi() -> List[Dict[str, Any]]:
     """
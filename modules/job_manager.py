@@ -1,12 +1,20 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
 import threading
 import time
 import logging
 import asyncio
+import heapq
+import itertools
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from modules.cron import EspressioneCron
+
 # Configura il logger
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -14,98 +22,432 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Attesa massima del dispatcher: limita l'effetto di cambi dell'orologio di sistema
+ATTESA_MASSIMA = 300
+
+# Thread del pool usato per le callback sincrone
+MAX_WORKER = 4
+
+# Voci annullate oltre le quali la coda viene ricompattata
+SOGLIA_COMPATTAZIONE = 64
+
+# Database SQLite dei job persistenti
+if os.environ.get('JOB_DB_FILE'):
+    JOB_DB = os.environ['JOB_DB_FILE']
+elif os.environ.get('AWS_EXECUTION_ENV'):
+    # Siamo in AWS Lambda, usa /tmp
+    JOB_DB = '/tmp/job.db'
+else:
+    JOB_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'job.db')
+
+# Giorni di storico delle chiavi di idempotenza
+GIORNI_STORICO = 90
+
+class ArchivioJob:
+    """
+    Archivio SQLite dei job persistenti.
+    
+    Per ogni job registra l'espressione cron e la prossima esecuzione prevista, così al
+    riavvio le esecuzioni perse durante il fermo possono essere recuperate. Ogni
+    esecuzione ha una chiave di idempotenza (nome del job e istante previsto) che viene
+    prenotata prima di chiamare la callback: un'esecuzione già avviata non viene ripetuta
+    dopo un riavvio, nemmeno se il processo si era fermato mentre era in corso.
+    """
+    
+    def __init__(self, percorso=None):
+        self.percorso = percorso or JOB_DB
+        self.lock = threading.Lock()
+        self.connessione = None
+    
+    def _connessione(self):
+        """Restituisce la connessione SQLite, creando lo schema se manca. Da chiamare con il lock acquisito."""
+        if self.connessione is None:
+            connessione = sqlite3.connect(self.percorso, timeout=5, isolation_level=None, check_same_thread=False)
+            connessione.execute('PRAGMA journal_mode=WAL')
+            connessione.execute('''
+                CREATE TABLE IF NOT EXISTS job (
+                    nome TEXT PRIMARY KEY,
+                    espressione TEXT NOT NULL,
+                    prossima TEXT NOT NULL
+                )
+            ''')
+            connessione.execute('''
+                CREATE TABLE IF NOT EXISTS esecuzioni (
+                    chiave TEXT PRIMARY KEY,
+                    nome TEXT NOT NULL,
+                    stato TEXT NOT NULL,
+                    inizio TEXT NOT NULL,
+                    fine TEXT
+                )
+            ''')
+            limite = (datetime.now() - timedelta(days=GIORNI_STORICO)).isoformat()
+            connessione.execute('DELETE FROM esecuzioni WHERE inizio < ?', (limite,))
+            self.connessione = connessione
+        return self.connessione
+    
+    def prossima(self, nome, espressione):
+        """
+        Restituisce la prossima esecuzione registrata per un job.
+        
+        Args:
+            nome: Nome del job
+            espressione: Espressione cron attuale del job
+        
+        Returns:
+            datetime: Prossima esecuzione, o None se il job non è registrato o la pianificazione è cambiata
+        """
+        with self.lock:
+            riga = self._connessione().execute(
+                'SELECT prossima FROM job WHERE nome = ? AND espressione = ?', (nome, espressione)
+            ).fetchone()
+        return datetime.fromisoformat(riga[0]) if riga else None
+    
+    def salva_prossima(self, nome, espressione, prossima):
+        """
+        Registra la prossima esecuzione prevista di un job.
+        
+        Args:
+            nome: Nome del job
+            espressione: Espressione cron del job
+            prossima: Prossima esecuzione (datetime)
+        """
+        with self.lock:
+            self._connessione().execute(
+                'INSERT OR REPLACE INTO job VALUES (?, ?, ?)', (nome, espressione, prossima.isoformat())
+            )
+    
+    def prenota(self, chiave, nome, espressione, prossima):
+        """
+        Prenota un'esecuzione e registra la successiva in un'unica transazione.
+        
+        Args:
+            chiave: Chiave di idempotenza dell'esecuzione
+            nome: Nome del job
+            espressione: Espressione cron del job
+            prossima: Esecuzione successiva (datetime)
+        
+        Returns:
+            bool: True se l'esecuzione non era mai stata avviata
+        """
+        with self.lock:
+            connessione = self._connessione()
+            connessione.execute('BEGIN IMMEDIATE')
+            try:
+                nuova = connessione.execute(
+                    "INSERT OR IGNORE INTO esecuzioni (chiave, nome, stato, inizio) VALUES (?, ?, 'avviata', ?)",
+                    (chiave, nome, datetime.now().isoformat())
+                ).rowcount == 1
+                connessione.execute(
+                    'INSERT OR REPLACE INTO job VALUES (?, ?, ?)', (nome, espressione, prossima.isoformat())
+                )
+                connessione.execute('COMMIT')
+            except sqlite3.Error:
+                connessione.execute('ROLLBACK')
+                raise
+        return nuova
+    
+    def concludi(self, chiave, riuscita):
+        """
+        Registra l'esito di un'esecuzione prenotata.
+        
+        Args:
+            chiave: Chiave di idempotenza dell'esecuzione
+            riuscita: True se la callback è terminata senza errori
+        """
+        with self.lock:
+            self._connessione().execute(
+                'UPDATE esecuzioni SET stato = ?, fine = ? WHERE chiave = ?',
+                ('completata' if riuscita else 'fallita', datetime.now().isoformat(), chiave)
+            )
+    
+    def stato_esecuzione(self, chiave):
+        """
+        Restituisce lo stato di un'esecuzione ('avviata', 'completata', 'fallita') o None se non è mai stata avviata.
+        
+        Args:
+            chiave: Chiave di idempotenza dell'esecuzione
+        """
+        with self.lock:
+            riga = self._connessione().execute('SELECT stato FROM esecuzioni WHERE chiave = ?', (chiave,)).fetchone()
+        return riga[0] if riga else None
+
 class JobManager:
     """
     Gestore di job alternativo quando la job_queue di python-telegram-bot non è disponibile.
-    Implementa funzionalità simili a run_once e run_daily.
+    Implementa funzionalità simili a run_once, run_repeating e run_daily.
+    
+    I job sono ordinati in una coda a priorità (min-heap) per istante di esecuzione: il
+    dispatcher dorme su una condition variable fino alla scadenza più vicina e viene
+    risvegliato solo quando un nuovo job la anticipa. Le callback asincrone vengono eseguite
+    su un unico event loop di lunga durata, quelle sincrone su un pool limitato di thread.
+    
+    I job con espressione cron possono essere persistenti: la loro pianificazione viene
+    salvata in un ArchivioJob e ripresa al riavvio, recuperando le esecuzioni perse.
     """
     
-    def __init__(self):
-        self.jobs = []
+    def __init__(self, max_worker=MAX_WORKER, archivio=None):
+        self.jobs = {}
+        self.coda = []
         self.running = False
         self.thread = None
         self.lock = threading.Lock()
+        self.condizione = threading.Condition(self.lock)
+        self.loop = None
+        self.thread_loop = None
+        self.esecutore = ThreadPoolExecutor(max_workers=max_worker, thread_name_prefix='job_manager')
+        self.sequenza = itertools.count()
+        self.annullate = 0
+        self.risvegli = 0
+        # Contatori complessivi, inclusi i job già conclusi
+        self.totali = {"esecuzioni": 0, "errori": 0, "saltate": 0, "accorpate": 0, "duplicate": 0, "durata_totale": 0.0}
+        # Archivio dei job persistenti, aperto al primo utilizzo
+        self.archivio = archivio
     
     def start(self):
-        """Avvia il gestore di job in un thread separato."""
+        """Avvia il dispatcher e l'event loop di esecuzione in thread separati."""
         if self.running:
             return
         
         self.running = True
-        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.thread_loop = threading.Thread(target=self.loop.run_forever, name='job_manager_loop', daemon=True)
+        self.thread_loop.start()
+        self.thread = threading.Thread(target=self._run, name='job_manager', daemon=True)
         self.thread.start()
         logger.info("JobManager avviato")
     
     def stop(self):
         """Ferma il gestore di job."""
-        self.running = False
+        with self.condizione:
+            self.running = False
+            self.condizione.notify()
         if self.thread:
             self.thread.join(timeout=1.0)
             self.thread = None
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread_loop.join(timeout=1.0)
+            self.loop = None
+            self.thread_loop = None
         logger.info("JobManager fermato")
     
     def _run(self):
-        """Loop principale che controlla e esegue i job."""
-        while self.running:
-            now = datetime.now()
-            
-            with self.lock:
-                # Copia la lista dei job per evitare modifiche durante l'iterazione
-                jobs_to_check = self.jobs.copy()
-            
-            # Controlla quali job devono essere eseguiti
-            jobs_to_run = []
-            jobs_to_remove = []
-            
-            for job in jobs_to_check:
-                if job["next_run"] <= now:
-                    jobs_to_run.append(job)
-                    
-                    # Se è un job one-time, lo rimuoviamo
-                    if job["type"] == "once":
-                        jobs_to_remove.append(job)
-                    # Se è un job daily, calcoliamo la prossima esecuzione
-                    elif job["type"] == "daily":
-                        # Calcola il prossimo giorno valido
-                        next_day = now.date() + timedelta(days=1)
-                        while next_day.weekday() not in job["days"]:
-                            next_day += timedelta(days=1)
-                        
-                        # Imposta l'orario specificato
-                        next_run = datetime.combine(next_day, job["time"])
-                        job["next_run"] = next_run
-            
-            # Rimuovi i job completati
+        """Loop principale: esegue i job scaduti e attende la scadenza successiva."""
+        with self.condizione:
+            while self.running:
+                self.risvegli += 1
+                ora = time.time()
+                while self.coda and self.coda[0][0] <= ora:
+                    _, voce, job = heapq.heappop(self.coda)
+                    # Voce di un job rimosso o ripianificato
+                    if job.get("voce") != voce:
+                        self.annullate -= 1
+                        continue
+                    self._avvia_job(job, ora)
+                
+                attesa = min(self.coda[0][0] - ora, ATTESA_MASSIMA) if self.coda else None
+                self.condizione.wait(attesa)
+    
+    def _accoda(self, job, previsto):
+        """
+        Inserisce il job nella coda per l'istante previsto, con l'eventuale jitter.
+        Da chiamare con il lock acquisito.
+        
+        Args:
+            job: Job da pianificare
+            previsto: Istante nominale della prossima esecuzione (datetime)
+        """
+        if job.get("voce") is not None:
+            self.annullate += 1
+        job["previsto"] = previsto
+        job["next_run"] = previsto + timedelta(seconds=random.uniform(0, job["jitter"])) if job["jitter"] else previsto
+        job["voce"] = next(self.sequenza)
+        scadenza = job["next_run"].timestamp()
+        heapq.heappush(self.coda, (scadenza, job["voce"], job))
+        
+        # Risveglia il dispatcher solo se la scadenza più vicina è cambiata
+        if self.coda[0][1] == job["voce"]:
+            self.condizione.notify()
+    
+    def _annulla(self, job):
+        """Rimuove il job dalla coda lasciandone la voce nell'heap. Da chiamare con il lock acquisito."""
+        if job.get("voce") is not None:
+            job["voce"] = None
+            self.annullate += 1
+        self.jobs.pop(job["id"], None)
+        
+        # Ricompatta la coda quando le voci annullate sono la maggioranza
+        if self.annullate > SOGLIA_COMPATTAZIONE and self.annullate * 2 > len(self.coda):
+            self.coda = [voce for voce in self.coda if voce[2].get("voce") == voce[1]]
+            heapq.heapify(self.coda)
+            self.annullate = 0
+    
+    def _prossima_esecuzione(self, job, dopo):
+        """
+        Calcola l'istante nominale della prima esecuzione del job successiva a un istante.
+        
+        Args:
+            job: Job ripetuto
+            dopo: Istante di riferimento (datetime)
+        
+        Returns:
+            datetime: Prossima esecuzione
+        """
+        if job["type"] == "repeating":
+            return dopo + timedelta(seconds=job["interval"])
+        return job["cron"].prossima(dopo)
+        
+    def _archivio(self):
+        """Restituisce l'archivio dei job persistenti, aprendolo se necessario."""
+        if self.archivio is None:
+            self.archivio = ArchivioJob()
+        return self.archivio
+    
+    def _avvia_job(self, job, ora):
+        """
+        Applica la politica sulle esecuzioni mancate, ripianifica il job e ne avvia l'esecuzione.
+        Da chiamare con il lock acquisito.
+        
+        Args:
+            job: Job scaduto
+            ora: Istante corrente (timestamp)
+        """
+        metriche = job["metriche"]
+        ritardo = max(0.0, ora - job["next_run"].timestamp())
+        eseguita = job["previsto"]
+        # La voce è appena stata estratta dalla coda
+        job["voce"] = None
+        
+        if job["type"] == "once":
+            self._annulla(job)
+        else:
+            # Le occorrenze già passate vengono accorpate in un'unica esecuzione
+            adesso = datetime.fromtimestamp(ora)
+            prossima = self._prossima_esecuzione(job, job["previsto"])
+            while job["accorpa"] and prossima <= adesso:
+                metriche["accorpate"] += 1
+                self.totali["accorpate"] += 1
+                prossima = self._prossima_esecuzione(job, prossima)
+            self._accoda(job, prossima)
+        
+        esegui = True
+        if job["tolleranza"] is not None and ritardo > job["tolleranza"]:
+            metriche["saltate"] += 1
+            self.totali["saltate"] += 1
+            logger.warning(f"Job {job.get('name') or 'unnamed'} saltato: in ritardo di {ritardo:.1f}s")
+            esegui = False
+        elif job["in_esecuzione"] and job["accorpa"]:
+            # L'esecuzione precedente non è ancora terminata
+            metriche["accorpate"] += 1
+            self.totali["accorpate"] += 1
+            esegui = False
+        
+        chiave = None
+        if job["persistente"]:
+            if esegui:
+                # La prossima esecuzione viene salvata insieme alla prenotazione di questa
+                chiave = f"{job['name']}@{eseguita.isoformat()}"
+            else:
+                self._archivio().salva_prossima(job["name"], job["cron"].espressione, job["previsto"])
+        if esegui:
+            job["in_esecuzione"] += 1
+            asyncio.run_coroutine_threadsafe(self._execute_job(job, ritardo, chiave, job.get("previsto")), self.loop)
+    
+    def _prenota(self, job, chiave, prossima):
+        """
+        Prenota l'esecuzione di un job persistente nell'archivio.
+        
+        Returns:
+            bool: False se l'esecuzione era già stata avviata, anche da un processo precedente
+        """
+        try:
+            return self._archivio().prenota(chiave, job["name"], job["cron"].espressione, prossima)
+        except sqlite3.Error as e:
+            logger.error(f"Errore nella prenotazione dell'esecuzione {chiave}: {e}")
+            return True
+    
+    async def _execute_job(self, job, ritardo, chiave=None, prossima=None):
+        """
+        Esegue la callback del job sull'event loop del gestore e ne registra le metriche.
+        
+        Args:
+            job: Job da eseguire
+            ritardo: Ritardo dell'avvio rispetto all'istante pianificato, in secondi
+            chiave: Chiave di idempotenza dell'esecuzione (solo per i job persistenti)
+            prossima: Esecuzione successiva del job, salvata con la prenotazione
+        """
+        loop = asyncio.get_running_loop()
+        if chiave and not await loop.run_in_executor(self.esecutore, self._prenota, job, chiave, prossima):
+            logger.warning(f"Esecuzione {chiave} già avviata in precedenza: non viene ripetuta")
             with self.lock:
-                for job in jobs_to_remove:
-                    if job in self.jobs:
-                        self.jobs.remove(job)
-            
-            # Esegui i job in thread separati
-            for job in jobs_to_run:
-                threading.Thread(
-                    target=self._execute_job,
-                    args=(job["callback"], job["data"]),
-                    daemon=True
-                ).start()
-            
-            # Dormi per un secondo prima di controllare di nuovo
-            time.sleep(1)
-    
-    def _execute_job(self, callback, data):
-        """Esegue un job in modo asincrono."""
+                job["in_esecuzione"] -= 1
+                job["metriche"]["duplicate"] += 1
+                self.totali["duplicate"] += 1
+            return
+        
+        callback = job["callback"]
+        inizio = time.perf_counter()
+        errore = False
         try:
-            # Crea un nuovo event loop per questo thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Esegui la callback asincrona
-            loop.run_until_complete(callback(data))
-            loop.close()
+            if asyncio.iscoroutinefunction(callback):
+                await callback(job["data"])
+            else:
+                risultato = await loop.run_in_executor(self.esecutore, callback, job["data"])
+                if asyncio.iscoroutine(risultato):
+                    await risultato
         except Exception as e:
-            logger.error(f"Errore nell'esecuzione del job: {e}")
+            errore = True
+            logger.error(f"Errore nell'esecuzione del job {job.get('name') or 'unnamed'}: {e}")
+        
+        durata = time.perf_counter() - inizio
+        if chiave:
+            try:
+                await loop.run_in_executor(self.esecutore, self._archivio().concludi, chiave, not errore)
+            except sqlite3.Error as e:
+                logger.error(f"Errore nella registrazione dell'esecuzione {chiave}: {e}")
+        with self.lock:
+            metriche = job["metriche"]
+            job["in_esecuzione"] -= 1
+            metriche["esecuzioni"] += 1
+            metriche["errori"] += errore
+            metriche["durata_ultima"] = durata
+            metriche["durata_totale"] += durata
+            metriche["durata_max"] = max(metriche["durata_max"], durata)
+            metriche["ritardo_ultimo"] = ritardo
+            metriche["ritardo_max"] = max(metriche["ritardo_max"], ritardo)
+            metriche["ultima_esecuzione"] = datetime.now()
+            self.totali["esecuzioni"] += 1
+            self.totali["errori"] += errore
+            self.totali["durata_totale"] += durata
     
-    def run_once(self, callback, delay, data=None, name=None):
+    def _crea_job(self, tipo, callback, data, name, tolleranza, jitter, accorpa, **campi):
+        """Crea il dizionario di un job e lo pianifica per l'istante indicato in 'previsto'."""
+        previsto = campi.pop("previsto")
+        job = {
+            "id": next(self.sequenza),
+            "type": tipo,
+            "callback": callback,
+            "data": data,
+            "name": name,
+            "tolleranza": tolleranza,
+            "jitter": jitter,
+            "accorpa": accorpa,
+            "persistente": False,
+            "in_esecuzione": 0,
+            "metriche": {
+                "esecuzioni": 0, "errori": 0, "saltate": 0, "accorpate": 0, "duplicate": 0,
+                "durata_ultima": 0.0, "durata_totale": 0.0, "durata_max": 0.0,
+                "ritardo_ultimo": 0.0, "ritardo_max": 0.0, "ultima_esecuzione": None
+            },
+            **campi
+        }
+        
+        with self.condizione:
+            self.jobs[job["id"]] = job
+            self._accoda(job, previsto)
+        return job
+    
+    def run_once(self, callback, delay, data=None, name=None, tolleranza=None, jitter=0):
         """
         Pianifica un job da eseguire una sola volta dopo un certo ritardo.
         
@@ -114,24 +456,76 @@ class JobManager:
             delay: Ritardo in secondi
             data: Dati da passare alla callback
             name: Nome del job (opzionale)
+            tolleranza: Ritardo massimo in secondi oltre il quale l'esecuzione viene saltata (None = nessun limite)
+            jitter: Ritardo casuale massimo in secondi aggiunto all'esecuzione
+        """
+        job = self._crea_job("once", callback, data, name, tolleranza, jitter, True,
+                             previsto=datetime.now() + timedelta(seconds=delay))
+        logger.info(f"Job 'once' pianificato per {job['next_run']}")
+        return job
+    
+    def run_repeating(self, callback, interval, first=0, data=None, name=None, tolleranza=None, jitter=0, accorpa=True):
         """
-        next_run = datetime.now() + timedelta(seconds=delay)
+        Pianifica un job da eseguire a intervalli regolari.
         
-        job = {
-            "type": "once",
-            "callback": callback,
-            "next_run": next_run,
-            "data": data,
-            "name": name
-        }
+        Args:
+            callback: Funzione asincrona da chiamare
+            interval: Intervallo tra le esecuzioni in secondi
+            first: Ritardo della prima esecuzione in secondi
+            data: Dati da passare alla callback
+            name: Nome del job (opzionale)
+            tolleranza: Ritardo massimo in secondi oltre il quale un'esecuzione viene saltata (None = nessun limite)
+            jitter: Ritardo casuale massimo in secondi aggiunto a ogni esecuzione
+            accorpa: Se True le esecuzioni mancate o sovrapposte vengono accorpate in una sola
+        """
+        job = self._crea_job("repeating", callback, data, name, tolleranza, jitter, accorpa,
+                             interval=interval, previsto=datetime.now() + timedelta(seconds=first))
+        logger.info(f"Job 'repeating' pianificato per {job['next_run']} e successivamente ogni {interval}s")
+        return job
+    
+    def _crea_job_cron(self, tipo, callback, cron, data, name, tolleranza, jitter, accorpa, persistente, **campi):
+        """
+        Crea un job pianificato da un'espressione cron. Un job persistente riprende dall'archivio
+        la prossima esecuzione: se è già passata, il job viene eseguito subito per recuperarla.
+        """
+        if persistente and not name:
+            raise ValueError("Un job persistente deve avere un nome")
         
-        with self.lock:
-            self.jobs.append(job)
+        ora = datetime.now()
+        previsto = cron.prossima(ora)
+        if persistente:
+            archivio = self._archivio()
+            mancata = archivio.prossima(name, cron.espressione)
+            if mancata and mancata <= ora:
+                logger.info(f"Recupero dell'esecuzione del job {name} prevista per {mancata}")
+                previsto = mancata
+            archivio.salva_prossima(name, cron.espressione, previsto)
+        
+        return self._crea_job(tipo, callback, data, name, tolleranza, jitter, accorpa,
+                              previsto=previsto, cron=cron, persistente=persistente, **campi)
+    
+    def run_cron(self, callback, espressione, data=None, name=None, tolleranza=None, jitter=0, accorpa=True,
+                 persistente=False):
+        """
+        Pianifica un job secondo un'espressione cron.
         
-        logger.info(f"Job 'once' pianificato per {next_run}")
+        Args:
+            callback: Funzione asincrona da chiamare
+            espressione: Espressione cron a 5 campi, o a 6 con i secondi in testa (es. '0 18 * * sun')
+            data: Dati da passare alla callback
+            name: Nome del job (obbligatorio per i job persistenti)
+            tolleranza: Ritardo massimo in secondi oltre il quale un'esecuzione viene saltata (None = nessun limite)
+            jitter: Ritardo casuale massimo in secondi aggiunto a ogni esecuzione
+            accorpa: Se True le esecuzioni mancate o sovrapposte vengono accorpate in una sola
+            persistente: Se True la pianificazione sopravvive ai riavvii e ogni esecuzione avviene al più una volta
+        """
+        cron = EspressioneCron(espressione)
+        job = self._crea_job_cron("cron", callback, cron, data, name, tolleranza, jitter, accorpa, persistente)
+        logger.info(f"Job 'cron' pianificato per {job['next_run']} e successivamente secondo '{espressione}'")
         return job
     
-    def run_daily(self, callback, time, days, data=None, name=None):
+    def run_daily(self, callback, time, days, data=None, name=None, tolleranza=None, jitter=0, accorpa=True,
+                  persistente=False):
         """
         Pianifica un job da eseguire ogni giorno a un orario specifico.
         
@@ -140,38 +534,23 @@ class JobManager:
             time: Orario del giorno (datetime.time)
             days: Lista di giorni della settimana (0-6, dove 0 è lunedì)
             data: Dati da passare alla callback
-            name: Nome del job (opzionale)
+            name: Nome del job (obbligatorio per i job persistenti)
+            tolleranza: Ritardo massimo in secondi oltre il quale un'esecuzione viene saltata (None = nessun limite)
+            jitter: Ritardo casuale massimo in secondi aggiunto a ogni esecuzione
+            accorpa: Se True le esecuzioni mancate o sovrapposte vengono accorpate in una sola
+            persistente: Se True la pianificazione sopravvive ai riavvii e ogni esecuzione avviene al più una volta
         """
-        # Calcola la prossima esecuzione
-        now = datetime.now()
-        today = now.date()
-        
         # Converti days in una lista se è un singolo valore
         if not isinstance(days, list):
             days = [days]
         
-        # Trova il prossimo giorno valido
-        next_day = today
-        while next_day.weekday() not in days or (next_day == today and now.time() >= time):
-            next_day += timedelta(days=1)
-        
-        # Imposta l'orario specificato
-        next_run = datetime.combine(next_day, time)
+        # Espressione cron equivalente: in cron la domenica è 0, in weekday() è 6
+        giorni = ','.join(str((day + 1) % 7) for day in sorted(days))
+        cron = EspressioneCron(f"{time.second} {time.minute} {time.hour} * * {giorni}")
+        job = self._crea_job_cron("daily", callback, cron, data, name, tolleranza, jitter, accorpa, persistente,
+                                  time=time, days=days)
         
-        job = {
-            "type": "daily",
-            "callback": callback,
-            "next_run": next_run,
-            "time": time,
-            "days": days,
-            "data": data,
-            "name": name
-        }
-        
-        with self.lock:
-            self.jobs.append(job)
-        
-        logger.info(f"Job 'daily' pianificato per {next_run} e successivamente ogni giorno alle {time} nei giorni {days}")
+        logger.info(f"Job 'daily' pianificato per {job['next_run']} e successivamente ogni giorno alle {time} nei giorni {days}")
         return job
     
     def get_jobs_by_name(self, name):
@@ -180,29 +559,56 @@ class JobManager:
         
         Args:
             name: Nome del job da cercare
-            
+        
         Returns:
             Lista di job con il nome specificato
         """
         with self.lock:
-            return [job for job in self.jobs if job.get("name") == name]
+            return [job for job in self.jobs.values() if job.get("name") == name]
     
     def remove_job(self, job):
         """
-        Rimuove un job dalla lista.
+        Rimuove un job dalla coda.
         
         Args:
             job: Job da rimuovere
         """
         with self.lock:
-            if job in self.jobs:
-                self.jobs.remove(job)
-                logger.info(f"Job rimosso: {job.get('name', 'unnamed')}")
+            if job.get("id") in self.jobs:
+                self._annulla(job)
+                logger.info(f"Job rimosso: {job.get('name') or 'unnamed'}")
                 return True
         return False
+    
+    def statistiche(self):
+        """
+        Restituisce le metriche di esecuzione dei job pianificati.
+        
+        Returns:
+            dict: Contatori complessivi, metriche del dispatcher e di ogni job ancora in coda
+        """
+        with self.lock:
+            jobs = []
+            for job in self.jobs.values():
+                metriche = dict(job["metriche"])
+                esecuzioni = metriche["esecuzioni"]
+                metriche["durata_media"] = metriche["durata_totale"] / esecuzioni if esecuzioni else 0.0
+                jobs.append({
+                    "name": job.get("name"),
+                    "type": job["type"],
+                    "next_run": job["next_run"],
+                    "in_esecuzione": job["in_esecuzione"],
+                    **metriche
+                })
+            return {
+                **self.totali,
+                "job": jobs,
+                "in_coda": len(self.coda) - self.annullate,
+                "risvegli": self.risvegli
+            }
 
 # Istanza globale del JobManager
 job_manager = JobManager()
 
 # Avvia il JobManager all'importazione del modulo
-job_manager.start()
\ No newline at end of file
+job_manager.start()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import threading
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    # Su Windows il lock tra processi non è disponibile
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Dimensione del journal oltre la quale viene avviata la compattazione
+SOGLIA_COMPATTAZIONE = 256 * 1024
+
+class JournalStore:
+    """
+    Archivio locale di una lista di record JSON identificati da 'id'.
+    
+    Lo stato è formato da uno snapshot (il file JSON originale, scritto in forma
+    compatta) e da un journal in append ('<file>.journal') con una riga JSON per
+    ogni record inserito, modificato o eliminato. Ogni scrittura aggiunge solo le
+    righe necessarie al journal (con fsync), il caricamento legge lo snapshot e
+    riapplica il journal, e quando il journal supera la soglia viene compattato in
+    un nuovo snapshot in background (file temporaneo + fsync + rename atomico).
+    """
+    
+    def __init__(self, percorso, soglia_compattazione=SOGLIA_COMPATTAZIONE):
+        self.percorso = os.path.abspath(percorso)
+        self.percorso_journal = self.percorso + '.journal'
+        self.soglia_compattazione = soglia_compattazione
+        self.lock = threading.RLock()
+        self._record = None
+        self._senza_id = 0
+        self._firma_snapshot = None
+        self._offset_journal = 0
+        self._compattazione = None
+    
+    # --- Lettura ---
+    
+    def _firma(self, percorso):
+        """Restituisce una firma del file per rilevare modifiche esterne."""
+        try:
+            stat = os.stat(percorso)
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            return None
+    
+    def _chiave(self, record):
+        """Restituisce la chiave interna di un record."""
+        if isinstance(record, dict) and record.get('id') is not None:
+            return record['id']
+        # I record senza ID restano nello snapshot ma non possono comparire nel journal
+        self._senza_id += 1
+        return ('senza_id', self._senza_id)
+    
+    def _leggi_snapshot(self):
+        """Legge lo snapshot e ricostruisce l'indice dei record."""
+        self._record = {}
+        self._senza_id = 0
+        self._offset_journal = 0
+        self._firma_snapshot = self._firma(self.percorso)
+        
+        if not os.path.exists(self.percorso):
+            return
+        
+        try:
+            with open(self.percorso, 'r', encoding='utf-8') as file:
+                dati = json.load(file)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Errore nella lettura dello snapshot {self.percorso}: {e}")
+            return
+        
+        for record in dati if isinstance(dati, list) else []:
+            self._record[self._chiave(record)] = record
+    
+    def _applica_journal(self):
+        """Riapplica le operazioni del journal successive all'ultimo offset letto."""
+        if not os.path.exists(self.percorso_journal):
+            self._offset_journal = 0
+            return
+        
+        with open(self.percorso_journal, 'rb') as file:
+            file.seek(self._offset_journal)
+            for riga in file:
+                # Una riga incompleta indica una scrittura interrotta: la si ignora
+                if not riga.endswith(b'\n'):
+                    break
+                try:
+                    operazione = json.loads(riga.decode('utf-8'))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    logger.warning(f"Riga non valida nel journal {self.percorso_journal}, ignorata")
+                    self._offset_journal += len(riga)
+                    continue
+                
+                if operazione.get('op') == 'upsert':
+                    self._record[operazione['id']] = operazione['record']
+                elif operazione.get('op') == 'delete':
+                    self._record.pop(operazione['id'], None)
+                self._offset_journal += len(riga)
+    
+    def _sincronizza(self):
+        """Allinea lo stato in memoria con i file, anche se modificati da altri processi."""
+        dimensione_journal = os.path.getsize(self.percorso_journal) if os.path.exists(self.percorso_journal) else 0
+        
+        # Snapshot sostituito o journal troncato: ricarica tutto
+        if (self._record is None
+                or self._firma(self.percorso) != self._firma_snapshot
+                or dimensione_journal < self._offset_journal):
+            self._leggi_snapshot()
+        
+        if dimensione_journal > self._offset_journal:
+            self._applica_journal()
+    
+    def carica(self):
+        """
+        Carica i record dallo snapshot e dal journal.
+        
+        Returns:
+            Lista di copie dei record, nell'ordine di inserimento
+        """
+        with self.lock:
+            self._sincronizza()
+            return [dict(record) if isinstance(record, dict) else record for record in self._record.values()]
+    
+    # --- Scrittura ---
+    
+    def _lock_file(self, file):
+        if fcntl:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+    
+    def _scrivi_journal(self, operazioni, file=None):
+        """
+        Aggiunge le operazioni al journal e le rende persistenti con fsync.
+        
+        Args:
+            operazioni: Operazioni da aggiungere
+            file: Journal già aperto in append e bloccato dal chiamante (opzionale)
+        """
+        if not operazioni:
+            return
+        if file is None:
+            with open(self.percorso_journal, 'ab') as file:
+                self._lock_file(file)
+                self._scrivi_journal(operazioni, file)
+            return
+        
+        dati = ''.join(json.dumps(op, ensure_ascii=False, separators=(',', ':')) + '\n' for op in operazioni)
+        inizio = file.seek(0, os.SEEK_END)
+        file.write(dati.encode('utf-8'))
+        file.flush()
+        os.fsync(file.fileno())
+        posizione = file.tell()
+        
+        # Le righe appena scritte vengono applicate in memoria dal chiamante. Se nel
+        # frattempo un altro processo ha scritto nel journal, l'offset resta invariato
+        # e la prossima lettura riapplica tutto (le operazioni sono idempotenti)
+        if inizio == self._offset_journal:
+            self._offset_journal = posizione
+        
+        if posizione > self.soglia_compattazione:
+            self._avvia_compattazione()
+    
+    def salva(self, record):
+        """
+        Inserisce o aggiorna un singolo record.
+        
+        Args:
+            record: Record da salvare, deve avere un 'id'
+        """
+        if record.get('id') is None:
+            raise ValueError("Il record da salvare non ha un ID")
+        
+        with self.lock:
+            self._sincronizza()
+            if self._record.get(record['id']) == record:
+                return
+            record = dict(record)
+            self._scrivi_journal([{'op': 'upsert', 'id': record['id'], 'record': record}])
+            self._record[record['id']] = record
+    
+    def inserisci(self, record, primo_id=1):
+        """
+        Inserisce un nuovo record assegnandogli un ID intero non ancora usato.
+        
+        L'ID è il successivo al massimo tra quelli presenti e viene scelto
+        tenendo bloccato il journal, quindi due inserimenti concorrenti, anche
+        da processi diversi, non possono ricevere lo stesso ID.
+        
+        Args:
+            record: Record da inserire; il suo 'id' viene impostato
+            primo_id: ID minimo da assegnare (es. successivo a quelli già sul database)
+        
+        Returns:
+            ID assegnato
+        """
+        with self.lock:
+            with open(self.percorso_journal, 'ab') as file:
+                self._lock_file(file)
+                self._sincronizza()
+                ids = [k for k in self._record if isinstance(k, int) and not isinstance(k, bool)]
+                record['id'] = max(max(ids, default=0) + 1, primo_id)
+                copia = dict(record)
+                self._scrivi_journal([{'op': 'upsert', 'id': copia['id'], 'record': copia}], file)
+                self._record[copia['id']] = copia
+        return record['id']
+    
+    def elimina(self, id_record):
+        """
+        Elimina un record.
+        
+        Args:
+            id_record: ID del record da eliminare
+        """
+        with self.lock:
+            self._sincronizza()
+            if id_record not in self._record:
+                return
+            self._scrivi_journal([{'op': 'delete', 'id': id_record}])
+            del self._record[id_record]
+    
+    def salva_tutti(self, records):
+        """
+        Salva l'intera lista di record scrivendo nel journal solo le differenze.
+        
+        Se l'ordine della lista non è ottenibile dallo stato attuale con
+        inserimenti in coda ed eliminazioni (ad esempio dopo un ordinamento),
+        o se ci sono record senza ID, la lista viene scritta come nuovo snapshot.
+        
+        Args:
+            records: Lista completa dei record
+        """
+        # Le differenze sono calcolate sullo stato letto tenendo bloccato il journal,
+        # così nessun altro processo può aggiungere righe prima della scrittura
+        with self.lock, open(self.percorso_journal, 'ab') as journal:
+            self._lock_file(journal)
+            self._sincronizza()
+            
+            if any(not isinstance(r, dict) or r.get('id') is None for r in records):
+                self._scrivi_snapshot(records, journal)
+                return
+            
+            nuovi = {r['id']: r for r in records}
+            if len(nuovi) != len(records):
+                # ID duplicati: il journal non può rappresentarli
+                self._scrivi_snapshot(records, journal)
+                return
+            
+            # Ordine risultante applicando le operazioni allo stato attuale
+            ordine_atteso = [k for k in self._record if k in nuovi]
+            ordine_atteso += [r['id'] for r in records if r['id'] not in self._record]
+            if ordine_atteso != [r['id'] for r in records]:
+                self._scrivi_snapshot(records, journal)
+                return
+            
+            operazioni = [{'op': 'delete', 'id': k} for k in self._record if k not in nuovi]
+            for record in records:
+                if self._record.get(record['id']) != record:
+                    operazioni.append({'op': 'upsert', 'id': record['id'], 'record': dict(record)})
+            
+            self._scrivi_journal(operazioni, journal)
+            for operazione in operazioni:
+                if operazione['op'] == 'delete':
+                    del self._record[operazione['id']]
+                else:
+                    self._record[operazione['id']] = operazione['record']
+    
+    # --- Compattazione ---
+    
+    def _scrivi_snapshot(self, records, journal):
+        """
+        Scrive i record come nuovo snapshot e svuota il journal.
+        
+        Il chiamante deve tenere bloccato il journal da prima di leggere lo stato
+        da cui derivano i record: una riga aggiunta da un altro processo dopo la
+        lettura andrebbe altrimenti persa con lo svuotamento.
+        
+        Args:
+            records: Lista completa dei record
+            journal: Journal aperto in append e bloccato dal chiamante
+        """
+        cartella = os.path.dirname(self.percorso)
+        temporaneo = f"{self.percorso}.{os.getpid()}.tmp"
+        
+        with open(temporaneo, 'w', encoding='utf-8') as file:
+            json.dump(records, file, ensure_ascii=False, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        
+        os.replace(temporaneo, self.percorso)
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(cartella, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        # Se il processo si interrompe qui il journal viene riapplicato allo
+        # snapshot nuovo: le operazioni sono idempotenti, quindi è sicuro
+        journal.truncate(0)
+        os.fsync(journal.fileno())
+        
+        self._record = {}
+        self._senza_id = 0
+        for record in records:
+            self._record[self._chiave(record)] = dict(record) if isinstance(record, dict) else record
+        self._firma_snapshot = self._firma(self.percorso)
+        self._offset_journal = 0
+    
+    def compatta(self):
+        """Compatta snapshot e journal in un nuovo snapshot."""
+        with self.lock, open(self.percorso_journal, 'ab') as journal:
+            self._lock_file(journal)
+            self._sincronizza()
+            if self._offset_journal == 0 and os.path.exists(self.percorso):
+                return
+            self._scrivi_snapshot(list(self._record.values()), journal)
+            logger.info(f"Journal di {self.percorso} compattato")
+    
+    def _avvia_compattazione(self):
+        """Avvia la compattazione in un thread separato, se non è già in corso."""
+        if self._compattazione and self._compattazione.is_alive():
+            return
+        
+        def esegui():
+            try:
+                self.compatta()
+            except Exception as e:
+                logger.error(f"Errore nella compattazione di {self.percorso}: {e}")
+        
+        self._compattazione = threading.Thread(target=esegui, daemon=True)
+        self._compattazione.start()
+    
+    def attendi_compattazione(self, timeout=None):
+        """Attende la fine di un'eventuale compattazione in corso."""
+        if self._compattazione:
+            self._compattazione.join(timeout)
+
+# Archivi aperti, uno per file
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(percorso):
+    """
+    Restituisce l'archivio associato a un file, creandolo se necessario.
+    
+    Args:
+        percorso: Percorso del file snapshot
+    
+    Returns:
+        Istanza di JournalStore condivisa per quel file
+    """
+    percorso = os.path.abspath(percorso)
+    with _stores_lock:
+        if percorso not in _stores:
+            _stores[percorso] = JournalStore(percorso)
+        return _stores[percorso]
@@ -25,15 +25,12 @@ def crea_pulsanti_reazione(message_id=None, include_export=False):
     # Se message_id è specificato, carica i conteggi reali
     if message_id:
         try:
-            from modules.data_manager import carica_reazioni
-            reazioni_data = carica_reazioni()
-            message_id_str = str(message_id)
+            from modules.reazioni_manager import archivio_reazioni
+            conteggi = archivio_reazioni.conteggi_messaggio(message_id)
             
-            if message_id_str in reazioni_data:
-                for i, reazione in enumerate(reazioni):
-                    name = reazione["name"]
-                    count = len(reazioni_data[message_id_str].get(name, []))
-                    reazioni[i]["text"] = f"{reazione['text'].split(' (')[0]} ({count})"
+            for i, reazione in enumerate(reazioni):
+                count = conteggi.get(reazione["name"], 0)
+                reazioni[i]["text"] = f"{reazione['text'].split(' (')[0]} ({count})"
         except Exception as e:
             print(f"Errore nel caricamento delle reazioni: {e}")
     
@@ -88,9 +85,6 @@ def crea_pulsanti_reazione(message_id=None, include_export=False):
 async def invia_messaggio_canale(context, risultato, channel_id=None):
     """Invia un messaggio con il risultato della partita al canale Telegram."""
     try:
-        # Importa le funzioni necessarie
-        from modules.data_manager import carica_reazioni, salva_reazioni
-        
         # Usa il channel_id passato come parametro o il valore predefinito
         channel_id = channel_id or CHANNEL_ID
         
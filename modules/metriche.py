@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Esposizione delle metriche del bot nel formato testuale di Prometheus/OpenMetrics.
+
+Le metriche vengono lette dallo stato già aggregato dei vari moduli (monitor del bot,
+trasporto HTTP verso Supabase, cache, job, bus delle invalidazioni, aggiornamento dei
+pulsanti delle reazioni): generare il testo non campiona risorse di sistema e non
+esegue richieste, quindi la risposta a /metrics non blocca.
+"""
+
+import logging
+import math
+import sys
+import time
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tipo di contenuto del formato di esposizione testuale
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Prefisso dei nomi delle metriche
+PREFISSO = 'crv'
+
+# Limiti superiori (in secondi) degli intervalli degli istogrammi delle latenze
+LIMITI_LATENZA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _modulo(nome: str):
+    """
+    Restituisce un modulo solo se è già stato importato dal processo.
+    
+    Le metriche di un componente vengono esposte solo se il processo lo usa: importarlo
+    qui avvierebbe thread o connessioni (es. il JobManager) alla prima richiesta.
+    """
+    return sys.modules.get(nome)
+
+def _formatta_valore(valore: Any) -> str:
+    """Formatta un valore numerico secondo il formato di esposizione."""
+    valore = float(valore)
+    if math.isnan(valore):
+        return 'NaN'
+    if math.isinf(valore):
+        return '+Inf' if valore > 0 else '-Inf'
+    return repr(int(valore)) if valore.is_integer() and abs(valore) < 1e15 else repr(valore)
+
+def _formatta_etichette(etichette: Dict[str, Any]) -> str:
+    """Formatta le etichette di un campione, con l'escape dei valori."""
+    if not etichette:
+        return ''
+    coppie = []
+    for nome, valore in etichette.items():
+        testo = str(valore).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        coppie.append(f'{nome}="{testo}"')
+    return '{' + ','.join(coppie) + '}'
+
+class Esposizione:
+    """
+    Accumula famiglie di metriche e campioni nel formato testuale di Prometheus.
+    I campioni sono raggruppati per famiglia anche se vengono aggiunti in ordine sparso.
+    """
+    
+    def __init__(self):
+        self.famiglie = {}
+    
+    def famiglia(self, nome: str, tipo: str, descrizione: str) -> str:
+        """
+        Dichiara una famiglia di metriche (righe HELP e TYPE), una sola volta.
+        
+        Args:
+            nome: Nome della metrica senza prefisso
+            tipo: counter, gauge, histogram o summary
+            descrizione: Descrizione della metrica
+        
+        Returns:
+            str: Nome completo della metrica
+        """
+        completo = f"{PREFISSO}_{nome}"
+        if completo not in self.famiglie:
+            self.famiglie[completo] = [f"# HELP {completo} {descrizione}", f"# TYPE {completo} {tipo}"]
+        return completo
+    
+    def campione(self, famiglia: str, valore: Any, etichette: Optional[Dict[str, Any]] = None,
+                 suffisso: str = '') -> None:
+        """
+        Aggiunge un campione a una famiglia già dichiarata.
+        
+        Args:
+            famiglia: Nome completo della famiglia
+            valore: Valore del campione
+            etichette: Etichette del campione
+            suffisso: Suffisso del nome del campione (es. '_bucket' per gli istogrammi)
+        """
+        riga = f"{famiglia}{suffisso}{_formatta_etichette(etichette or {})} {_formatta_valore(valore)}"
+        self.famiglie[famiglia].append(riga)
+    
+    def metrica(self, nome: str, tipo: str, descrizione: str, valore: Any,
+                etichette: Optional[Dict[str, Any]] = None) -> None:
+        """Dichiara la famiglia (se necessario) e aggiunge un campione."""
+        self.campione(self.famiglia(nome, tipo, descrizione), valore, etichette)
+    
+    def istogramma(self, nome: str, descrizione: str, istogramma, etichette: Optional[Dict[str, Any]] = None,
+                   limiti: Iterable[float] = LIMITI_LATENZA) -> None:
+        """
+        Aggiunge un istogramma cumulativo a partire da un LatencyHistogram del monitor.
+        
+        Args:
+            nome: Nome della metrica senza prefisso
+            descrizione: Descrizione della metrica
+            istogramma: Istogramma delle latenze (modules.monitor.LatencyHistogram)
+            etichette: Etichette comuni a tutti i campioni
+            limiti: Limiti superiori degli intervalli, in secondi
+        """
+        completo = self.famiglia(nome, 'histogram', descrizione)
+        etichette = etichette or {}
+        limiti = list(limiti)
+        for limite, conteggio in zip(limiti, istogramma.cumulative_counts(limiti)):
+            self.campione(completo, conteggio, {**etichette, 'le': _formatta_valore(limite)}, '_bucket')
+        self.campione(completo, istogramma.count, {**etichette, 'le': '+Inf'}, '_bucket')
+        self.campione(completo, istogramma.sum, etichette, '_sum')
+        self.campione(completo, istogramma.count, etichette, '_count')
+    
+    def testo(self) -> str:
+        """Restituisce il testo completo dell'esposizione."""
+        return '\n'.join(riga for righe in self.famiglie.values() for riga in righe) + '\n'
+
+def _metriche_bot(esposizione: Esposizione, monitor) -> None:
+    """Comandi, errori, utenti attivi e latenze dei comandi dal monitor del bot."""
+    attivita = monitor.get_activity()
+    latenza, latenze_comandi = monitor.latency_histograms()
+    
+    esposizione.metrica('bot_uptime_seconds', 'gauge', "Secondi dall'avvio del bot",
+                        monitor.clock() - monitor.start_time)
+    esposizione.metrica('bot_commands_total', 'counter', 'Comandi processati', attivita['commands']['total'])
+    esposizione.metrica('bot_errors_total', 'counter', 'Errori registrati', attivita['errors']['total'])
+    for finestra in ('minute', 'hour', 'day'):
+        esposizione.metrica('bot_commands_window', 'gauge', 'Comandi processati nella finestra mobile',
+                            attivita['commands'][finestra], {'window': finestra})
+        esposizione.metrica('bot_errors_window', 'gauge', 'Errori registrati nella finestra mobile',
+                            attivita['errors'][finestra], {'window': finestra})
+    esposizione.metrica('bot_active_users', 'gauge', 'Utenti attivi nelle ultime 24 ore',
+                        attivita['active_users_24h'], {'window': '24h'})
+    
+    for comando, conteggio in sorted(dict(monitor.command_counts).items()):
+        esposizione.metrica('bot_command_invocations_total', 'counter', 'Invocazioni per comando',
+                            conteggio, {'command': comando})
+    esposizione.istogramma('bot_response_seconds', 'Tempo di risposta di tutti i comandi', latenza)
+    for comando, istogramma in sorted(latenze_comandi.items()):
+        esposizione.istogramma('bot_command_duration_seconds', 'Tempo di risposta per comando',
+                               istogramma, {'command': comando})
+    
+    # Ultimo campione del campionatore in background: qui non si misurano le risorse di sistema
+    campione = monitor.sampler.latest()
+    if campione is None:
+        return
+    for chiave in ('cpu_percent', 'memory_percent', 'disk_percent', 'memory_used', 'disk_used'):
+        nome = f'system_{chiave}' if chiave.endswith('percent') else f'system_{chiave}_bytes'
+        if campione[chiave] is not None:
+            esposizione.metrica(nome, 'gauge', f"Ultimo campione di sistema: {chiave}", campione[chiave])
+    for chiave, nome, descrizione in (('process_cpu_percent', 'process_cpu_percent', 'CPU usata dal processo'),
+                                      ('process_rss', 'process_resident_memory_bytes', 'Memoria residente del processo'),
+                                      ('open_fds', 'process_open_fds', 'File aperti dal processo'),
+                                      ('threads', 'process_threads', 'Thread del processo')):
+        if campione[chiave] is not None:
+            esposizione.metrica(nome, 'gauge', descrizione, campione[chiave])
+    for loop, ritardo in sorted(campione['loop_lag'].items()):
+        if ritardo is not None:
+            esposizione.metrica('event_loop_lag_seconds', 'gauge', "Ritardo nell'esecuzione di una callback sul loop",
+                                ritardo, {'loop': loop})
+
+def _metriche_database(esposizione: Esposizione, db_manager) -> None:
+    """Richieste a Supabase per tabella, con tempi totali e massimi."""
+    trasporto = getattr(db_manager, 'trasporto_http', None)
+    if trasporto is None:
+        return
+    for tabella, contatori in sorted(trasporto.statistiche().items(), key=lambda voce: str(voce[0])):
+        etichette = {'table': tabella or ''}
+        nome = esposizione.famiglia('db_request_duration_seconds', 'summary', 'Durata delle richieste a Supabase')
+        esposizione.campione(nome, contatori['tempo_totale'], etichette, '_sum')
+        esposizione.campione(nome, contatori['richieste'], etichette, '_count')
+        esposizione.metrica('db_request_duration_max_seconds', 'gauge', 'Durata massima di una richiesta a Supabase',
+                            contatori['tempo_massimo'], etichette)
+        esposizione.metrica('db_request_errors_total', 'counter', 'Richieste a Supabase non riuscite',
+                            contatori['errori'], etichette)
+        esposizione.metrica('db_request_retries_total', 'counter', 'Tentativi ripetuti delle richieste a Supabase',
+                            contatori['ripetizioni'], etichette)
+
+def _metriche_cache(esposizione: Esposizione, cache_manager) -> None:
+    """Hit, miss, espulsioni e dimensione dei namespace della cache."""
+    for namespace, contatori in sorted(cache_manager.cache.statistiche().items()):
+        etichette = {'namespace': namespace}
+        esposizione.metrica('cache_hits_total', 'counter', 'Letture trovate in cache', contatori['hit'], etichette)
+        esposizione.metrica('cache_misses_total', 'counter', 'Letture non trovate in cache', contatori['miss'], etichette)
+        esposizione.metrica('cache_evictions_total', 'counter', 'Voci espulse dalla cache',
+                            contatori['espulsioni'], etichette)
+        esposizione.metrica('cache_invalidations_total', 'counter', 'Invalidazioni del namespace',
+                            contatori['invalidazioni'], etichette)
+        esposizione.metrica('cache_entries', 'gauge', 'Voci presenti in cache', contatori['voci'], etichette)
+        esposizione.metrica('cache_hit_ratio', 'gauge', 'Rapporto tra letture trovate e letture totali',
+                            contatori['hit_ratio'], etichette)
+
+def _metriche_job(esposizione: Esposizione, job_manager) -> None:
+    """Esecuzioni, errori e tempi dei job pianificati."""
+    statistiche = job_manager.job_manager.statistiche()
+    for chiave, nome, descrizione in (('esecuzioni', 'runs', 'Esecuzioni dei job'),
+                                      ('errori', 'errors', 'Esecuzioni dei job con errore'),
+                                      ('saltate', 'skipped', 'Esecuzioni saltate perché oltre la tolleranza'),
+                                      ('accorpate', 'coalesced', 'Esecuzioni mancate o sovrapposte accorpate'),
+                                      ('duplicate', 'duplicates', 'Esecuzioni non ripetute dopo un riavvio')):
+        esposizione.metrica(f'jobs_{nome}_total', 'counter', descrizione, statistiche[chiave])
+    esposizione.metrica('jobs_duration_seconds_total', 'counter', 'Tempo complessivo di esecuzione dei job',
+                        statistiche['durata_totale'])
+    esposizione.metrica('jobs_scheduled', 'gauge', 'Job in coda', statistiche['in_coda'])
+    
+    for job in statistiche['job']:
+        if not job['name']:
+            continue
+        etichette = {'job': job['name']}
+        esposizione.metrica('job_runs_total', 'counter', 'Esecuzioni del job', job['esecuzioni'], etichette)
+        esposizione.metrica('job_errors_total', 'counter', 'Esecuzioni del job con errore', job['errori'], etichette)
+        esposizione.metrica('job_last_duration_seconds', 'gauge', "Durata dell'ultima esecuzione del job",
+                            job['durata_ultima'], etichette)
+        esposizione.metrica('job_max_duration_seconds', 'gauge', 'Durata massima di esecuzione del job',
+                            job['durata_max'], etichette)
+        esposizione.metrica('job_last_delay_seconds', 'gauge', "Ritardo di avvio dell'ultima esecuzione del job",
+                            job['ritardo_ultimo'], etichette)
+        esposizione.metrica('job_next_run_timestamp_seconds', 'gauge', 'Prossima esecuzione del job (epoch)',
+                            job['next_run'].timestamp(), etichette)
+
+def _metriche_bus(esposizione: Esposizione, bus_invalidazioni) -> None:
+    """Eventi pubblicati e ricevuti dal bus delle invalidazioni."""
+    contatori = dict(bus_invalidazioni.bus_invalidazioni.contatori)
+    for chiave, nome in (('pubblicati', 'published'), ('ricevuti', 'received'), ('errori', 'errors')):
+        esposizione.metrica(f'invalidation_bus_{nome}_total', 'counter',
+                            f"Eventi del bus delle invalidazioni: {chiave}", contatori[chiave])
+
+def _metriche_reazioni(esposizione: Esposizione, reazioni_manager) -> None:
+    """Aggiornamenti dei pulsanti delle reazioni eseguiti e risparmiati."""
+    statistiche = reazioni_manager.pianificatore_pulsanti.statistiche()
+    for chiave, nome in (('richieste', 'requests'), ('modifiche', 'edits'), ('risparmiate', 'saved')):
+        esposizione.metrica(f'reaction_buttons_{nome}_total', 'counter',
+                            f"Aggiornamenti dei pulsanti delle reazioni: {chiave}", statistiche[chiave])
+    esposizione.metrica('reaction_buttons_pending', 'gauge', 'Aggiornamenti dei pulsanti in attesa',
+                        statistiche['in_attesa'])
+
+# Sorgenti delle metriche: modulo da cui leggerle e funzione che le espone
+SORGENTI = [
+    ('modules.db_manager', _metriche_database),
+    ('modules.cache_manager', _metriche_cache),
+    ('modules.job_manager', _metriche_job),
+    ('modules.bus_invalidazioni', _metriche_bus),
+    ('modules.reazioni_manager', _metriche_reazioni)
+]
+
+def genera_metriche(monitor=None) -> str:
+    """
+    Genera il testo delle metriche nel formato di esposizione di Prometheus.
+    
+    Args:
+        monitor: Monitor del bot (predefinito: modules.monitor.bot_monitor)
+    
+    Returns:
+        str: Testo delle metriche
+    """
+    inizio = time.perf_counter()
+    esposizione = Esposizione()
+    
+    if monitor is None:
+        from modules.monitor import bot_monitor as monitor
+    try:
+        _metriche_bot(esposizione, monitor)
+    except Exception as e:
+        logger.error(f"Errore nella raccolta delle metriche del bot: {e}")
+    
+    # Una sorgente non disponibile non impedisce di esporre le altre
+    for nome_modulo, raccogli in SORGENTI:
+        modulo = _modulo(nome_modulo)
+        if modulo is None:
+            continue
+        try:
+            raccogli(esposizione, modulo)
+        except Exception as e:
+            logger.error(f"Errore nella raccolta delle metriche da {nome_modulo}: {e}")
+    
+    esposizione.metrica('metrics_render_seconds', 'gauge', 'Tempo di generazione delle metriche',
+                        time.perf_counter() - inizio)
+    return esposizione.testo()
@@ -6,8 +6,9 @@ import os
 import platform
 import logging
 import json
+import threading
 from datetime import datetime, timedelta
-from collections import deque
+from collections import deque, OrderedDict
 
 # Prova a importare psutil, ma gestisci il caso in cui non sia disponibile
 try:
@@ -19,33 +20,428 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Finestre mobili dei contatori: durata di ogni intervallo in secondi e numero di intervalli
+WINDOWS = {
+    'minute': (1, 60),
+    'hour': (60, 60),
+    'day': (3600, 24)
+}
+
+# Periodo dopo il quale un utente non è più considerato attivo
+ACTIVE_USER_TTL = 24 * 3600
+
+# Istogrammi delle latenze: 2^5 sotto-intervalli per ogni potenza di due (errore relativo < 3%)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Latenza massima registrata negli istogrammi, in microsecondi (1 ora)
+MAX_LATENCY_US = 3600 * 1000000
+
+# Campionamento delle risorse di sistema: intervallo in secondi e campioni conservati (1 ora)
+SAMPLE_INTERVAL = float(os.environ.get('SYSTEM_SAMPLE_INTERVAL', 5))
+SAMPLE_HISTORY = 720
+
+class TimeBuckets:
+    """
+    Contatore su un buffer circolare di intervalli di durata fissa.
+    
+    Ogni intervallo ricorda l'epoca (numero dell'intervallo dall'inizio del tempo) a cui
+    si riferisce, quindi un intervallo scaduto viene azzerato solo quando viene riusato:
+    l'aggiornamento costa O(1) e non serve alcuna pulizia periodica.
+    """
+    
+    def __init__(self, bucket_seconds, num_buckets):
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = num_buckets
+        self.values = [0] * num_buckets
+        self.epochs = [-1] * num_buckets
+    
+    def add(self, now, amount=1):
+        """
+        Aggiunge un valore all'intervallo corrente.
+        
+        Args:
+            now (float): Timestamp corrente
+            amount (int): Valore da aggiungere
+        """
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % self.num_buckets
+        if self.epochs[slot] != epoch:
+            self.epochs[slot] = epoch
+            self.values[slot] = 0
+        self.values[slot] += amount
+    
+    def total(self, now):
+        """
+        Restituisce la somma dei valori nella finestra che termina nell'istante indicato.
+        
+        Args:
+            now (float): Timestamp corrente
+        """
+        epoch = int(now // self.bucket_seconds)
+        oldest = epoch - self.num_buckets
+        return sum(value for value, bucket_epoch in zip(self.values, self.epochs) if oldest < bucket_epoch <= epoch)
+    
+    def series(self, now):
+        """
+        Restituisce i valori di tutti gli intervalli della finestra, dal più vecchio.
+        
+        Args:
+            now (float): Timestamp corrente
+        
+        Returns:
+            list: Coppie (timestamp di inizio dell'intervallo, valore)
+        """
+        epoch = int(now // self.bucket_seconds)
+        result = []
+        for bucket_epoch in range(epoch - self.num_buckets + 1, epoch + 1):
+            slot = bucket_epoch % self.num_buckets
+            value = self.values[slot] if self.epochs[slot] == bucket_epoch else 0
+            result.append((bucket_epoch * self.bucket_seconds, value))
+        return result
+
+class WindowedCounter:
+    """Contatore totale con finestre mobili sull'ultimo minuto, ora e giorno."""
+    
+    def __init__(self):
+        self.count = 0
+        self.windows = {name: TimeBuckets(*spec) for name, spec in WINDOWS.items()}
+    
+    def add(self, now, amount=1):
+        """Aggiunge un valore al totale e a tutte le finestre."""
+        self.count += amount
+        for window in self.windows.values():
+            window.add(now, amount)
+    
+    def totals(self, now):
+        """
+        Restituisce il totale e la somma di ogni finestra.
+        
+        Returns:
+            dict: Valori per 'minute', 'hour', 'day' e 'total'
+        """
+        totals = {name: window.total(now) for name, window in self.windows.items()}
+        totals['total'] = self.count
+        return totals
+
+class LatencyHistogram:
+    """
+    Istogramma delle latenze in stile HDR.
+    
+    Fino a 64 µs gli intervalli sono larghi 1 µs, oltre ogni potenza di due è divisa in
+    32 sotto-intervalli: l'errore relativo dei percentili resta sotto il 3% da pochi
+    microsecondi fino a un'ora, con meno di 900 contatori e registrazione in O(1).
+    """
+    
+    def __init__(self):
+        self.counts = [0] * (self._index(MAX_LATENCY_US) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    @staticmethod
+    def _index(microseconds):
+        """Restituisce l'intervallo che contiene una latenza in microsecondi."""
+        if microseconds < 2 * SUB_BUCKETS:
+            return microseconds
+        shift = microseconds.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + (microseconds >> shift) - SUB_BUCKETS
+    
+    @staticmethod
+    def _upper_bound(index):
+        """Restituisce il limite superiore (escluso) di un intervallo, in microsecondi."""
+        if index < 2 * SUB_BUCKETS:
+            return index + 1
+        shift = index // SUB_BUCKETS - 1
+        return (index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift
+    
+    def record(self, seconds):
+        """
+        Registra una latenza.
+        
+        Args:
+            seconds (float): Durata in secondi
+        """
+        microseconds = min(max(int(seconds * 1000000), 0), MAX_LATENCY_US)
+        self.counts[self._index(microseconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+    
+    def copy(self):
+        """Restituisce una copia indipendente dell'istogramma."""
+        histogram = LatencyHistogram.__new__(LatencyHistogram)
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        histogram.max = self.max
+        return histogram
+    
+    def mean(self):
+        """Restituisce la latenza media in secondi."""
+        return self.sum / self.count if self.count else 0.0
+    
+    def percentiles(self, percents=(50, 95, 99)):
+        """
+        Calcola i percentili delle latenze registrate.
+        
+        Args:
+            percents (tuple): Percentili da calcolare, in ordine crescente
+        
+        Returns:
+            dict: Percentile -> latenza in secondi (limite superiore dell'intervallo, al massimo la latenza massima)
+        """
+        result = {percent: 0.0 for percent in percents}
+        if not self.count:
+            return result
+        
+        targets = [(percent, max(1, -(-self.count * percent // 100))) for percent in percents]
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            cumulative += count
+            while targets and cumulative >= targets[0][1]:
+                result[targets.pop(0)[0]] = min(self._upper_bound(index) / 1000000, self.max)
+            if not targets:
+                break
+        return result
+    
+    def cumulative_counts(self, bounds):
+        """
+        Conta le latenze non superiori a ciascun limite (per gli istogrammi cumulativi).
+        
+        Args:
+            bounds (list): Limiti in secondi, in ordine crescente
+        
+        Returns:
+            list: Numero di latenze registrate fino a ciascun limite
+        """
+        result = []
+        cumulative = 0
+        index = 0
+        for bound in bounds:
+            bound_us = bound * 1000000
+            while index < len(self.counts) and self._upper_bound(index) <= bound_us:
+                cumulative += self.counts[index]
+                index += 1
+            result.append(cumulative)
+        return result
+
+class SystemSampler:
+    """
+    Campionatore in background delle risorse di sistema e del processo.
+    
+    Un thread dedicato raccoglie a intervalli regolari CPU, memoria, disco, memoria residente,
+    file aperti e thread del processo, più il ritardo dei loop asyncio registrati, e conserva
+    gli ultimi campioni in un buffer circolare. Chi legge le metriche prende l'ultimo campione
+    senza mai attendere una misura: la CPU è calcolata rispetto al campione precedente invece
+    di bloccare per un intervallo.
+    """
+    
+    def __init__(self, interval=SAMPLE_INTERVAL, history=SAMPLE_HISTORY, clock=time.time):
+        """
+        Inizializza il campionatore (il thread parte con start()).
+        
+        Args:
+            interval (float): Secondi tra due campioni
+            history (int): Numero massimo di campioni conservati
+            clock (callable): Funzione che restituisce il timestamp corrente
+        """
+        self.interval = interval
+        self.clock = clock
+        self.samples = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.process = psutil.Process() if PSUTIL_AVAILABLE else None
+        
+        # Loop asyncio osservati e ultimo ritardo misurato per ciascuno
+        self.loops = {}
+    
+    def start(self):
+        """Avvia il thread di campionamento, se non è già attivo."""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            if PSUTIL_AVAILABLE:
+                # La prima lettura senza intervallo fa solo da riferimento per le successive
+                psutil.cpu_percent(interval=None)
+                self.process.cpu_percent(interval=None)
+            self.thread = threading.Thread(target=self._run, name='system_sampler', daemon=True)
+            self.thread.start()
+    
+    def stop(self):
+        """Ferma il thread di campionamento."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 1)
+    
+    def watch_loop(self, loop, name='main'):
+        """
+        Registra un loop asyncio di cui misurare il ritardo.
+        
+        Args:
+            loop: Loop asyncio da osservare
+            name (str): Nome del loop nei campioni
+        """
+        with self.lock:
+            self.loops[name] = {'loop': loop, 'lag': None, 'scheduled': None}
+    
+    def _probe_loops(self):
+        """
+        Programma su ogni loop osservato una callback che misura dopo quanto viene eseguita.
+        
+        Il ritardo compare nel campione successivo, così il campionatore non attende mai il loop.
+        Se la callback precedente non è ancora partita il loop è bloccato: il ritardo è il tempo
+        trascorso da quando è stata programmata e non se ne accodano altre.
+        """
+        with self.lock:
+            loops = list(self.loops.items())
+        now = time.perf_counter()
+        for name, state in loops:
+            loop = state['loop']
+            if loop.is_closed():
+                with self.lock:
+                    self.loops.pop(name, None)
+                continue
+            if state['scheduled'] is not None:
+                state['lag'] = now - state['scheduled']
+                continue
+            
+            def measure(state=state):
+                state['lag'] = time.perf_counter() - state['scheduled']
+                state['scheduled'] = None
+            state['scheduled'] = now
+            try:
+                loop.call_soon_threadsafe(measure)
+            except RuntimeError:
+                # Loop chiuso nel frattempo
+                state['scheduled'] = None
+    
+    def sample(self):
+        """
+        Raccoglie un campione delle risorse senza attese.
+        
+        Returns:
+            dict: Campione con timestamp, risorse di sistema e del processo
+        """
+        sample = {
+            'timestamp': self.clock(),
+            'cpu_percent': 0,
+            'memory_percent': 0,
+            'memory_used': None,
+            'memory_total': None,
+            'disk_percent': 0,
+            'disk_used': None,
+            'disk_total': None,
+            'process_cpu_percent': 0,
+            'process_rss': None,
+            'open_fds': None,
+            'threads': threading.active_count(),
+            'loop_lag': {name: state['lag'] for name, state in list(self.loops.items())}
+        }
+        if PSUTIL_AVAILABLE:
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage('/')
+            sample.update({
+                'cpu_percent': psutil.cpu_percent(interval=None),
+                'memory_percent': memory.percent,
+                'memory_used': memory.used,
+                'memory_total': memory.total,
+                'disk_percent': disk.percent,
+                'disk_used': disk.used,
+                'disk_total': disk.total
+            })
+            with self.process.oneshot():
+                sample['process_cpu_percent'] = self.process.cpu_percent(interval=None)
+                sample['process_rss'] = self.process.memory_info().rss
+                sample['threads'] = self.process.num_threads()
+                if hasattr(self.process, 'num_fds'):
+                    sample['open_fds'] = self.process.num_fds()
+                else:
+                    sample['open_fds'] = self.process.num_handles()
+        return sample
+    
+    def _run(self):
+        """Ciclo del thread: un campione ogni intervallo fino allo stop."""
+        # Primo campione a breve, così la CPU ha già un riferimento ma le letture non restano vuote
+        wait = min(1.0, self.interval)
+        while not self.stop_event.wait(wait):
+            wait = self.interval
+            try:
+                self._probe_loops()
+                sample = self.sample()
+                with self.lock:
+                    self.samples.append(sample)
+            except Exception as e:
+                logger.error(f"Errore nel campionamento delle metriche di sistema: {e}")
+    
+    def latest(self):
+        """
+        Restituisce l'ultimo campione raccolto.
+        
+        Returns:
+            dict: Ultimo campione, o None se il thread non ne ha ancora raccolti
+        """
+        with self.lock:
+            return self.samples[-1] if self.samples else None
+    
+    def history(self, seconds=None):
+        """
+        Restituisce i campioni conservati, dal più vecchio.
+        
+        Args:
+            seconds (float): Limita ai campioni degli ultimi secondi indicati
+        
+        Returns:
+            list: Campioni
+        """
+        with self.lock:
+            samples = list(self.samples)
+        if seconds is not None:
+            since = self.clock() - seconds
+            samples = [sample for sample in samples if sample['timestamp'] >= since]
+        return samples
+
 class BotMonitor:
     """
     Classe per il monitoraggio della salute e delle prestazioni del bot.
     Raccoglie metriche su utilizzo, prestazioni e risorse di sistema.
     """
     
-    def __init__(self, max_history=100):
+    def __init__(self, max_history=100, clock=time.time, sampler=None):
         """
         Inizializza il monitor del bot.
         
         Args:
             max_history (int): Numero massimo di eventi da mantenere nella cronologia
+            clock (callable): Funzione che restituisce il timestamp corrente
+            sampler (SystemSampler): Campionatore delle risorse (predefinito: system_sampler)
         """
-        self.start_time = time.time()
+        self.clock = clock
+        self.sampler = sampler if sampler is not None else system_sampler
+        self.start_time = clock()
         self.max_history = max_history
+        self.lock = threading.Lock()
         
-        # Metriche di base
+        # Metriche di base; gli utenti attivi nelle ultime 24 ore sono ordinati per ultimo accesso
         self.metrics = {
             'commands_processed': 0,
             'errors': 0,
             'active_users': set(),
-            'active_users_24h': set(),
+            'active_users_24h': OrderedDict(),
             'active_admins': set()
         }
         
-        # Cronologia dei tempi di risposta (ultimi N comandi)
-        self.response_times = deque(maxlen=max_history)
+        # Comandi ed errori nell'ultimo minuto, ora e giorno
+        self.command_windows = WindowedCounter()
+        self.error_windows = WindowedCounter()
+        
+        # Istogrammi dei tempi di risposta, complessivo e per comando
+        self.latency = LatencyHistogram()
+        self.command_latency = {}
         
         # Cronologia degli errori (ultimi N errori)
         self.error_history = deque(maxlen=max_history)
@@ -56,17 +452,15 @@ class BotMonitor:
         # Contatori per tipo di comando
         self.command_counts = {}
         
-        # Timestamp dell'ultimo controllo delle metriche
-        self.last_metrics_check = time.time()
-        
-        # Metriche di sistema
+        # Metriche di sistema, copiate dall'ultimo campione del campionatore
         self.system_metrics = {
             'cpu_percent': 0,
             'memory_percent': 0,
             'disk_percent': 0
         }
         
-        # Aggiorna le metriche di sistema all'avvio
+        # Avvia il campionamento in background e legge il campione disponibile
+        self.sampler.start()
         self._update_system_metrics()
         
         logger.info("BotMonitor inizializzato")
@@ -81,44 +475,55 @@ class BotMonitor:
             command (str): Comando eseguito
             is_admin (bool): Se l'utente è un amministratore
         """
-        start_time = time.time()
-        
-        # Aggiorna le metriche di base
-        self.metrics['commands_processed'] += 1
-        self.metrics['active_users'].add(user_id)
-        
-        # Aggiorna gli utenti attivi nelle ultime 24 ore
-        self.metrics['active_users_24h'].add(user_id)
-        
-        # Traccia gli admin attivi
-        if is_admin:
-            self.metrics['active_admins'].add(user_id)
-        
-        # Aggiorna i contatori per tipo di comando
-        if command not in self.command_counts:
-            self.command_counts[command] = 0
-        self.command_counts[command] += 1
-        
-        # Aggiungi alla cronologia dei comandi
-        self.command_history.append({
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'user_id': user_id,
-            'user_name': user_name,
-            'command': command,
-            'is_admin': is_admin
-        })
+        start_time = self.clock()
+        
+        with self.lock:
+            # Aggiorna le metriche di base
+            self.metrics['commands_processed'] += 1
+            self.metrics['active_users'].add(user_id)
+            self.command_windows.add(start_time)
+        
+            # Aggiorna l'ultimo accesso dell'utente e rimuove quelli non più attivi
+            active_users_24h = self.metrics['active_users_24h']
+            active_users_24h[user_id] = start_time
+            active_users_24h.move_to_end(user_id)
+            self._clean_old_data(start_time)
+        
+            # Traccia gli admin attivi
+            if is_admin:
+                self.metrics['active_admins'].add(user_id)
+        
+            # Aggiorna i contatori per tipo di comando
+            if command not in self.command_counts:
+                self.command_counts[command] = 0
+            self.command_counts[command] += 1
+        
+            # Aggiungi alla cronologia dei comandi
+            self.command_history.append({
+                'timestamp': datetime.fromtimestamp(start_time).strftime('%Y-%m-%d %H:%M:%S'),
+                'user_id': user_id,
+                'user_name': user_name,
+                'command': command,
+                'is_admin': is_admin
+            })
         
         return start_time
     
-    def track_command_completion(self, start_time):
+    def track_command_completion(self, start_time, command=None):
         """
         Traccia il completamento di un comando e il suo tempo di risposta.
         
         Args:
             start_time (float): Timestamp di inizio del comando
+            command (str, optional): Comando completato, per l'istogramma del comando
         """
-        duration = time.time() - start_time
-        self.response_times.append(duration)
+        duration = self.clock() - start_time
+        with self.lock:
+            self.latency.record(duration)
+            if command is not None:
+                if command not in self.command_latency:
+                    self.command_latency[command] = LatencyHistogram()
+                self.command_latency[command].record(duration)
     
     def track_error(self, error_type, error_message, user_id=None, command=None):
         """
@@ -130,55 +535,44 @@ class BotMonitor:
             user_id (int, optional): ID dell'utente che ha riscontrato l'errore
             command (str, optional): Comando che ha generato l'errore
         """
-        self.metrics['errors'] += 1
-        
-        # Aggiungi alla cronologia degli errori
-        self.error_history.append({
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'error_type': error_type,
-            'error_message': str(error_message),
-            'user_id': user_id,
-            'command': command
-        })
+        now = self.clock()
+        with self.lock:
+            self.metrics['errors'] += 1
+            self.error_windows.add(now)
+        
+            # Aggiungi alla cronologia degli errori
+            self.error_history.append({
+                'timestamp': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+                'error_type': error_type,
+                'error_message': str(error_message),
+                'user_id': user_id,
+                'command': command
+            })
         
         # Log dell'errore
         logger.error(f"Bot error: {error_type} - {error_message} (User: {user_id}, Command: {command})")
     
     def _update_system_metrics(self):
-        """Aggiorna le metriche di sistema (CPU, memoria, disco)."""
+        """Aggiorna le metriche di sistema dall'ultimo campione, senza misurare nulla."""
         try:
-            # Aggiorna solo ogni 5 secondi per evitare sovraccarichi
-            current_time = time.time()
-            if current_time - self.last_metrics_check < 5:
-                return
-                
-            self.last_metrics_check = current_time
-            
-            # Verifica se psutil è disponibile
-            if PSUTIL_AVAILABLE:
-                # Metriche CPU
-                self.system_metrics['cpu_percent'] = psutil.cpu_percent(interval=0.1)
+            sample = self.sampler.latest()
+            if sample is None:
+                # Nessun campione ancora raccolto (o psutil non disponibile): valori di fallback
+                sample = {'cpu_percent': 0, 'memory_percent': 0, 'disk_percent': 0}
                 
-                # Metriche memoria
-                memory = psutil.virtual_memory()
-                self.system_metrics['memory_percent'] = memory.percent
-                self.system_metrics['memory_used'] = self._format_bytes(memory.used)
-                self.system_metrics['memory_total'] = self._format_bytes(memory.total)
-                
-                # Metriche disco
-                disk = psutil.disk_usage('/')
-                self.system_metrics['disk_percent'] = disk.percent
-                self.system_metrics['disk_used'] = self._format_bytes(disk.used)
-                self.system_metrics['disk_total'] = self._format_bytes(disk.total)
-            else:
-                # Valori di fallback quando psutil non è disponibile
-                self.system_metrics['cpu_percent'] = 0
-                self.system_metrics['memory_percent'] = 0
-                self.system_metrics['memory_used'] = "N/A"
-                self.system_metrics['memory_total'] = "N/A"
-                self.system_metrics['disk_percent'] = 0
-                self.system_metrics['disk_used'] = "N/A"
-                self.system_metrics['disk_total'] = "N/A"
+            metrics = {
+                'cpu_percent': sample['cpu_percent'],
+                'memory_percent': sample['memory_percent'],
+                'disk_percent': sample['disk_percent'],
+                'sampled_at': sample.get('timestamp'),
+                'threads': sample.get('threads', threading.active_count()),
+                'open_fds': sample.get('open_fds'),
+                'loop_lag': sample.get('loop_lag', {})
+            }
+            for key in ('memory_used', 'memory_total', 'disk_used', 'disk_total', 'process_rss'):
+                value = sample.get(key)
+                metrics[key] = self._format_bytes(value) if value is not None else "N/A"
+            self.system_metrics = metrics
             
         except Exception as e:
             logger.error(f"Errore nell'aggiornamento delle metriche di sistema: {e}")
@@ -191,12 +585,64 @@ class BotMonitor:
             bytes /= 1024
         return f"{bytes:.2f} PB"
     
-    def _clean_old_data(self):
-        """Pulisce i dati degli utenti attivi più vecchi di 24 ore."""
-        # Questa funzione verrebbe chiamata periodicamente per pulire i dati vecchi
-        # Per ora è una semplificazione, in un'implementazione reale si terrebbe traccia
-        # dei timestamp per ogni utente attivo
-        pass
+    def _clean_old_data(self, now=None):
+        """
+        Rimuove gli utenti attivi il cui ultimo accesso è più vecchio di 24 ore.
+        Gli utenti sono ordinati per ultimo accesso, quindi basta scorrere i più vecchi.
+        
+        Args:
+            now (float, optional): Timestamp corrente
+        """
+        limit = (self.clock() if now is None else now) - ACTIVE_USER_TTL
+        active_users_24h = self.metrics['active_users_24h']
+        while active_users_24h:
+            user_id, last_seen = next(iter(active_users_24h.items()))
+            if last_seen > limit:
+                break
+            active_users_24h.popitem(last=False)
+    
+    @staticmethod
+    def _latency_summary(histogram):
+        """Riassume un istogramma delle latenze con conteggio, media, percentili e massimo."""
+        percentiles = histogram.percentiles()
+        return {
+            'count': histogram.count,
+            'avg': histogram.mean(),
+            'p50': percentiles[50],
+            'p95': percentiles[95],
+            'p99': percentiles[99],
+            'max': histogram.max
+        }
+    
+    def latency_histograms(self):
+        """
+        Restituisce una copia coerente degli istogrammi delle latenze.
+        
+        Returns:
+            tuple: Istogramma complessivo e dizionario comando -> istogramma
+        """
+        with self.lock:
+            return self.latency.copy(), {command: histogram.copy() for command, histogram in self.command_latency.items()}
+    
+    def get_activity(self):
+        """
+        Restituisce le metriche di attività a finestre mobili, senza metriche di sistema.
+        
+        Returns:
+            dict: Comandi ed errori per finestra, utenti attivi e latenze per comando
+        """
+        now = self.clock()
+        with self.lock:
+            self._clean_old_data(now)
+            return {
+                'commands': self.command_windows.totals(now),
+                'errors': self.error_windows.totals(now),
+                'commands_per_minute': self.command_windows.windows['hour'].series(now),
+                'active_users_24h': len(self.metrics['active_users_24h']),
+                'latency': self._latency_summary(self.latency),
+                'command_latency': {command: self._latency_summary(histogram)
+                                    for command, histogram in self.command_latency.items()}
+            }
     
     def get_health_status(self):
         """
@@ -205,31 +651,21 @@ class BotMonitor:
         Returns:
             dict: Dizionario con tutte le metriche di salute
         """
-        # Aggiorna le metriche di sistema
-        try:
-            self._update_system_metrics()
-        except Exception as e:
-            logger.error(f"Errore nell'aggiornamento delle metriche di sistema: {e}")
-            # Imposta valori di default in caso di errore
-            self.system_metrics = {
-                'cpu_percent': 0,
-                'memory_percent': 0,
-                'memory_used': "N/A",
-                'memory_total': "N/A",
-                'disk_percent': 0,
-                'disk_used': "N/A",
-                'disk_total': "N/A"
-            }
+        # Legge l'ultimo campione delle metriche di sistema (non attende nessuna misura)
+        self._update_system_metrics()
+        
+        activity = self.get_activity()
         
         # Calcola l'uptime
-        uptime_seconds = time.time() - self.start_time
+        uptime_seconds = self.clock() - self.start_time
         days, remainder = divmod(uptime_seconds, 86400)
         hours, remainder = divmod(remainder, 3600)
         minutes, seconds = divmod(remainder, 60)
         uptime_str = f"{int(days)}d {int(hours)}h {int(minutes)}m {int(seconds)}s"
         
         # Calcola il tempo medio di risposta
-        avg_response_time = sum(self.response_times) / max(len(self.response_times), 1) if self.response_times else 0
+        latency = activity['latency']
+        avg_response_time = latency['avg']
         
         # Determina lo stato di salute
         if PSUTIL_AVAILABLE:
@@ -264,11 +700,19 @@ class BotMonitor:
             'uptime_seconds': uptime_seconds,
             'start_time': datetime.fromtimestamp(self.start_time).strftime('%Y-%m-%d %H:%M:%S'),
             'active_users': len(self.metrics['active_users']),
-            'active_users_24h': len(self.metrics['active_users_24h']),
+            'active_users_24h': activity['active_users_24h'],
             'active_admins': len(self.metrics['active_admins']),
             'commands_processed': self.metrics['commands_processed'],
+            'commands_last_minute': activity['commands']['minute'],
+            'commands_last_hour': activity['commands']['hour'],
+            'commands_last_day': activity['commands']['day'],
             'errors': self.metrics['errors'],
+            'errors_last_hour': activity['errors']['hour'],
             'avg_response_time': f"{avg_response_time:.4f}s",
+            'response_time_p50': f"{latency['p50']:.4f}s",
+            'response_time_p95': f"{latency['p95']:.4f}s",
+            'response_time_p99': f"{latency['p99']:.4f}s",
+            'command_latency': activity['command_latency'],
             'system': {
                 'platform': platform.platform(),
                 'python_version': platform.python_version(),
@@ -278,7 +722,12 @@ class BotMonitor:
                 'memory_total': self.system_metrics['memory_total'],
                 'disk_percent': f"{self.system_metrics['disk_percent']}%",
                 'disk_used': self.system_metrics['disk_used'],
-                'disk_total': self.system_metrics['disk_total']
+                'disk_total': self.system_metrics['disk_total'],
+                'process_rss': self.system_metrics['process_rss'],
+                'open_fds': self.system_metrics['open_fds'],
+                'threads': self.system_metrics['threads'],
+                'loop_lag': {name: f"{lag * 1000:.1f}ms" for name, lag in self.system_metrics['loop_lag'].items()
+                             if lag is not None}
             },
             'top_commands': top_commands,
             'recent_errors': recent_errors
@@ -319,7 +768,9 @@ class BotMonitor:
         # Statistiche comandi
         message += f"<b>📊 COMANDI</b>\n"
         message += f"• Comandi processati: <b>{health['commands_processed']}</b>\n"
+        message += f"• Ultima ora / 24h: <b>{health['commands_last_hour']}</b> / <b>{health['commands_last_day']}</b>\n"
         message += f"• Tempo medio risposta: <b>{health['avg_response_time']}</b>\n"
+        message += f"• Tempo di risposta p50/p95/p99: <b>{health['response_time_p50']}</b> / <b>{health['response_time_p95']}</b> / <b>{health['response_time_p99']}</b>\n"
         
         # Comandi più utilizzati
         if health['top_commands']:
@@ -330,6 +781,7 @@ class BotMonitor:
         # Statistiche errori
         message += f"\n<b>⚠️ ERRORI</b>\n"
         message += f"• Totale errori: <b>{health['errors']}</b>\n"
+        message += f"• Errori nell'ultima ora: <b>{health['errors_last_hour']}</b>\n"
         
         # Ultimi errori
         if health['recent_errors']:
@@ -347,10 +799,14 @@ class BotMonitor:
         message += f"• CPU: <b>{health['system']['cpu_percent']}</b>\n"
         message += f"• Memoria: <b>{health['system']['memory_percent']}</b> ({health['system']['memory_used']} / {health['system']['memory_total']})\n"
         message += f"• Disco: <b>{health['system']['disk_percent']}</b> ({health['system']['disk_used']} / {health['system']['disk_total']})\n"
+        message += f"• Processo: <b>{health['system']['process_rss']}</b>, {health['system']['threads']} thread, {health['system']['open_fds'] or 'N/A'} file aperti\n"
+        for name, lag in health['system']['loop_lag'].items():
+            message += f"• Ritardo loop {name}: <b>{lag}</b>\n"
         message += f"• Piattaforma: <b>{health['system']['platform']}</b>\n"
         message += f"• Python: <b>{health['system']['python_version']}</b>\n"
         
         return message
 
-# Istanza globale del monitor
+# Istanze globali del campionatore e del monitor
+system_sampler = SystemSampler()
 bot_monitor = BotMonitor()
\ No newline at end of file
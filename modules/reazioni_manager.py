@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import asyncio
+import sqlite3
+import logging
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CARTELLA_PROGETTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Database SQLite delle reazioni e vecchio file JSON, importato alla prima apertura
+if os.environ.get('REAZIONI_DB_FILE'):
+    REAZIONI_DB = os.environ['REAZIONI_DB_FILE']
+elif os.environ.get('AWS_EXECUTION_ENV'):
+    # Siamo in AWS Lambda, usa /tmp
+    REAZIONI_DB = '/tmp/reazioni.db'
+else:
+    REAZIONI_DB = os.path.join(CARTELLA_PROGETTO, 'reazioni.db')
+REAZIONI_FILE = os.path.join(CARTELLA_PROGETTO, 'reazioni.json')
+
+# Tipi di reazione disponibili sui messaggi del canale, con le relative emoji
+EMOJI_REAZIONI = {
+    "like": "👍",
+    "love": "❤️",
+    "fire": "🔥",
+    "clap": "👏",
+    "rugby": "🏉"
+}
+TIPI_REAZIONE = tuple(EMOJI_REAZIONI)
+
+# Attesa prima di aggiornare i pulsanti di un messaggio dopo una reazione: le
+# reazioni arrivate nel frattempo producono un'unica modifica del messaggio
+RITARDO_AGGIORNAMENTO = 2.0
+
+# Numero massimo di messaggi di cui ricordare i conteggi mostrati nei pulsanti
+MESSAGGI_PUBBLICATI = 1024
+
+# Versione dello schema (PRAGMA user_version): 1 indica che il file JSON è già stato importato
+VERSIONE_SCHEMA = 1
+
+class ArchivioReazioni:
+    """
+    Archivio delle reazioni ai messaggi del canale.
+    
+    Ogni reazione è una riga SQLite con chiave (message_id, user_id), quindi un
+    tocco su un pulsante scrive solo quella riga invece di riscrivere il file
+    con tutte le reazioni. In memoria vengono mantenuti la reazione scelta da
+    ogni utente e i conteggi per messaggio, aggiornati in O(1) a ogni tocco.
+    Un lock asyncio per messaggio serializza i tocchi concorrenti sullo stesso
+    messaggio senza bloccare quelli sugli altri.
+    """
+    
+    def __init__(self, percorso: Optional[str] = None, file_json: Optional[str] = None):
+        self.percorso = percorso or REAZIONI_DB
+        self.file_json = file_json or REAZIONI_FILE
+        self.lock = threading.RLock()
+        # Connessione SQLite per thread
+        self.locale = threading.local()
+        # (message_id, user_id) -> tipo di reazione, e message_id -> conteggi per tipo
+        self.scelte = None
+        self.conteggi = {}
+        # Lock asyncio dei messaggi con tocchi in corso
+        self.lock_messaggi = weakref.WeakValueDictionary()
+    
+    def _connessione(self) -> sqlite3.Connection:
+        """Restituisce la connessione SQLite del thread corrente, creando lo schema se manca."""
+        connessione = getattr(self.locale, 'connessione', None)
+        if connessione is None or getattr(self.locale, 'pid', None) != os.getpid():
+            connessione = sqlite3.connect(self.percorso, timeout=5, isolation_level=None)
+            connessione.execute('PRAGMA journal_mode=WAL')
+            connessione.execute('PRAGMA synchronous=NORMAL')
+            connessione.execute('''
+                CREATE TABLE IF NOT EXISTS reazioni (
+                    message_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    tipo TEXT NOT NULL,
+                    nome TEXT,
+                    timestamp TEXT,
+                    PRIMARY KEY (message_id, user_id)
+                )
+            ''')
+            if connessione.execute('PRAGMA user_version').fetchone()[0] < VERSIONE_SCHEMA:
+                self._importa_json(connessione)
+            self.locale.connessione = connessione
+            self.locale.pid = os.getpid()
+        return connessione
+    
+    @staticmethod
+    def _righe(reazioni: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> List[tuple]:
+        """Converte le reazioni nel formato del vecchio file JSON (message_id -> tipo -> utenti) in righe."""
+        return [(int(message_id), int(utente['id']), tipo, utente.get('name'), utente.get('timestamp'))
+                for message_id, per_tipo in reazioni.items()
+                for tipo, utenti in per_tipo.items()
+                for utente in utenti]
+    
+    def _importa_json(self, connessione: sqlite3.Connection) -> None:
+        """Importa le reazioni dal vecchio file JSON."""
+        righe = []
+        if os.path.exists(self.file_json):
+            try:
+                with open(self.file_json, 'r', encoding='utf-8') as file:
+                    righe = self._righe(json.load(file))
+            except (OSError, ValueError, KeyError, AttributeError) as e:
+                logger.error(f"Errore nell'importazione delle reazioni da {self.file_json}: {e}")
+                righe = []
+        
+        connessione.execute('BEGIN IMMEDIATE')
+        try:
+            # Un altro processo potrebbe aver già importato il file
+            if connessione.execute('PRAGMA user_version').fetchone()[0] < VERSIONE_SCHEMA:
+                connessione.executemany('INSERT OR REPLACE INTO reazioni VALUES (?, ?, ?, ?, ?)', righe)
+                connessione.execute(f'PRAGMA user_version={VERSIONE_SCHEMA}')
+                if righe:
+                    logger.info(f"Importate {len(righe)} reazioni da {self.file_json}")
+            connessione.execute('COMMIT')
+        except sqlite3.Error:
+            connessione.execute('ROLLBACK')
+            raise
+    
+    def carica(self) -> None:
+        """Carica in memoria le reazioni scelte e i conteggi, se non già caricati."""
+        with self.lock:
+            if self.scelte is not None:
+                return
+            scelte = {}
+            conteggi = {}
+            for message_id, user_id, tipo in self._connessione().execute(
+                    'SELECT message_id, user_id, tipo FROM reazioni'):
+                scelte[(message_id, user_id)] = tipo
+                conteggi.setdefault(message_id, Counter())[tipo] += 1
+            self.scelte = scelte
+            self.conteggi = conteggi
+    
+    # Scritture
+    
+    def registra_reazione(self, message_id: int, user_id: int, nome: str, tipo: str) -> Tuple[bool, Dict[str, int]]:
+        """
+        Registra il tocco di un utente su una reazione.
+        
+        Ogni utente ha al massimo una reazione per messaggio: una reazione diversa
+        sostituisce la precedente, la stessa reazione la rimuove.
+        
+        Args:
+            message_id: ID del messaggio del canale
+            user_id: ID dell'utente
+            nome: Nome dell'utente
+            tipo: Tipo di reazione (uno di TIPI_REAZIONE)
+        
+        Returns:
+            Tupla (reazione attiva dopo il tocco, conteggi del messaggio per tipo)
+        """
+        if tipo not in EMOJI_REAZIONI:
+            raise ValueError(f"Tipo di reazione non valido: {tipo}")
+        message_id, user_id = int(message_id), int(user_id)
+        
+        with self.lock:
+            self.carica()
+            precedente = self.scelte.get((message_id, user_id))
+            connessione = self._connessione()
+            if precedente == tipo:
+                connessione.execute('DELETE FROM reazioni WHERE message_id = ? AND user_id = ?', (message_id, user_id))
+                del self.scelte[(message_id, user_id)]
+            else:
+                connessione.execute('INSERT OR REPLACE INTO reazioni VALUES (?, ?, ?, ?, ?)',
+                                    (message_id, user_id, tipo, nome, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                self.scelte[(message_id, user_id)] = tipo
+            
+            conteggi = self.conteggi.setdefault(message_id, Counter())
+            if precedente is not None:
+                conteggi[precedente] -= 1
+            if precedente != tipo:
+                conteggi[tipo] += 1
+            return precedente != tipo, self._conteggi(message_id)
+    
+    def sostituisci(self, reazioni: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> None:
+        """
+        Sostituisce tutte le reazioni (compatibilità con data_manager.salva_reazioni).
+        
+        Args:
+            reazioni: Reazioni nel formato del vecchio file JSON
+        """
+        righe = self._righe(reazioni)
+        with self.lock:
+            connessione = self._connessione()
+            connessione.execute('BEGIN IMMEDIATE')
+            try:
+                connessione.execute('DELETE FROM reazioni')
+                connessione.executemany('INSERT OR REPLACE INTO reazioni VALUES (?, ?, ?, ?, ?)', righe)
+                connessione.execute('COMMIT')
+            except sqlite3.Error:
+                connessione.execute('ROLLBACK')
+                raise
+            # I conteggi vengono ricalcolati alla prossima lettura
+            self.scelte = None
+            self.conteggi = {}
+    
+    async def registra_reazione_async(self, message_id: int, user_id: int, nome: str,
+                                      tipo: str) -> Tuple[bool, Dict[str, int]]:
+        """
+        Versione asincrona di registra_reazione per i gestori del bot.
+        
+        I tocchi sullo stesso messaggio vengono serializzati da un lock asyncio e
+        la scrittura su SQLite viene eseguita in un thread, senza bloccare l'event loop.
+        """
+        async with self.lock_messaggio(message_id):
+            return await asyncio.to_thread(self.registra_reazione, message_id, user_id, nome, tipo)
+    
+    def lock_messaggio(self, message_id: int) -> asyncio.Lock:
+        """Restituisce il lock asyncio di un messaggio (eliminato quando nessuno lo usa più)."""
+        message_id = int(message_id)
+        with self.lock:
+            lock = self.lock_messaggi.get(message_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self.lock_messaggi[message_id] = lock
+            return lock
+    
+    # Letture
+    
+    def _conteggi(self, message_id: int) -> Dict[str, int]:
+        """Conteggi del messaggio per tutti i tipi di reazione (chiamare con il lock acquisito)."""
+        conteggi = self.conteggi.get(message_id, {})
+        return {tipo: conteggi.get(tipo, 0) for tipo in TIPI_REAZIONE}
+    
+    def conteggi_messaggio(self, message_id: int) -> Dict[str, int]:
+        """Restituisce il numero di reazioni del messaggio per tipo, senza leggere il database."""
+        with self.lock:
+            self.carica()
+            return self._conteggi(int(message_id))
+    
+    def reazioni_messaggio(self, message_id: int) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Restituisce chi ha reagito a un messaggio, nel formato del vecchio file JSON.
+        
+        Args:
+            message_id: ID del messaggio del canale
+        
+        Returns:
+            Dizionario tipo -> lista di {'id', 'name', 'timestamp'}, in ordine di reazione
+        """
+        reazioni = {tipo: [] for tipo in TIPI_REAZIONE}
+        righe = self._connessione().execute(
+            'SELECT user_id, tipo, nome, timestamp FROM reazioni WHERE message_id = ? ORDER BY rowid',
+            (int(message_id),)).fetchall()
+        for user_id, tipo, nome, timestamp in righe:
+            reazioni.setdefault(tipo, []).append({"id": user_id, "name": nome, "timestamp": timestamp})
+        return reazioni
+    
+    def esporta(self) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Restituisce tutte le reazioni nel formato del vecchio file JSON (message_id come stringa)."""
+        reazioni = {}
+        righe = self._connessione().execute(
+            'SELECT message_id, user_id, tipo, nome, timestamp FROM reazioni ORDER BY message_id, rowid').fetchall()
+        for message_id, user_id, tipo, nome, timestamp in righe:
+            per_tipo = reazioni.setdefault(str(message_id), {t: [] for t in TIPI_REAZIONE})
+            per_tipo.setdefault(tipo, []).append({"id": user_id, "name": nome, "timestamp": timestamp})
+        return reazioni
+
+# Archivio delle reazioni condiviso dal processo
+archivio_reazioni = ArchivioReazioni()
+
+class PianificatorePulsanti:
+    """
+    Pianificatore degli aggiornamenti dei pulsanti di reazione sui messaggi del canale.
+    
+    Telegram limita le modifiche ai messaggi, quindi un aggiornamento non viene
+    eseguito a ogni reazione: la prima reazione su un messaggio pianifica la
+    modifica dopo RITARDO_AGGIORNAMENTO secondi, le successive nella stessa
+    finestra vengono accorpate e la modifica usa i conteggi di quel momento.
+    Se i conteggi sono uguali a quelli già mostrati la modifica viene saltata.
+    """
+    
+    def __init__(self, archivio: ArchivioReazioni, ritardo: float = RITARDO_AGGIORNAMENTO):
+        self.archivio = archivio
+        self.ritardo = ritardo
+        # message_id -> funzione di aggiornamento più recente, per i messaggi con una modifica pianificata
+        self.in_attesa = {}
+        # message_id -> conteggi mostrati dall'ultima modifica riuscita (LRU)
+        self.pubblicati = OrderedDict()
+        # Riferimenti ai task in corso (asyncio mantiene solo riferimenti deboli)
+        self.task = set()
+        self.contatori = {'richieste': 0, 'modifiche': 0, 'accorpate': 0, 'invariate': 0, 'errori': 0}
+    
+    def pianifica(self, message_id: int, aggiorna: Callable[[Dict[str, int]], Awaitable[Any]]) -> None:
+        """
+        Pianifica l'aggiornamento dei pulsanti di un messaggio (da chiamare nell'event loop).
+        
+        Args:
+            message_id: ID del messaggio del canale
+            aggiorna: Funzione asincrona che riceve i conteggi per tipo e modifica i pulsanti
+        """
+        message_id = int(message_id)
+        self.contatori['richieste'] += 1
+        if message_id in self.in_attesa:
+            self.in_attesa[message_id] = aggiorna
+            self.contatori['accorpate'] += 1
+            return
+        self.in_attesa[message_id] = aggiorna
+        self._avvia(message_id, self.ritardo)
+    
+    def _avvia(self, message_id: int, ritardo: float) -> None:
+        """Avvia il task che esegue l'aggiornamento dopo il ritardo indicato."""
+        task = asyncio.get_running_loop().create_task(self._esegui(message_id, ritardo))
+        self.task.add(task)
+        task.add_done_callback(self.task.discard)
+    
+    async def _esegui(self, message_id: int, ritardo: float) -> None:
+        """Attende la fine della finestra e modifica i pulsanti, se i conteggi sono cambiati."""
+        await asyncio.sleep(ritardo)
+        aggiorna = self.in_attesa.pop(message_id, None)
+        if aggiorna is None:
+            return
+        
+        conteggi = self.archivio.conteggi_messaggio(message_id)
+        if self.pubblicati.get(message_id) == conteggi:
+            self.contatori['invariate'] += 1
+            return
+        
+        try:
+            await aggiorna(conteggi)
+            self.contatori['modifiche'] += 1
+        except Exception as e:
+            attesa = getattr(e, 'retry_after', None)
+            if attesa is not None:
+                # Limite di Telegram superato: riprova dopo l'attesa indicata,
+                # accorpando le reazioni arrivate nel frattempo
+                attesa = attesa.total_seconds() if hasattr(attesa, 'total_seconds') else float(attesa)
+                logger.warning(f"Aggiornamento dei pulsanti del messaggio {message_id} rimandato di {attesa} s")
+                if message_id not in self.in_attesa:
+                    self.in_attesa[message_id] = aggiorna
+                    self._avvia(message_id, attesa)
+                return
+            if 'not modified' not in str(e).lower():
+                self.contatori['errori'] += 1
+                logger.error(f"Errore nell'aggiornamento dei pulsanti del messaggio {message_id}: {e}")
+                return
+            # Il messaggio mostra già questi conteggi
+            self.contatori['invariate'] += 1
+        
+        self.pubblicati[message_id] = conteggi
+        self.pubblicati.move_to_end(message_id)
+        while len(self.pubblicati) > MESSAGGI_PUBBLICATI:
+            self.pubblicati.popitem(last=False)
+    
+    def statistiche(self) -> Dict[str, int]:
+        """Restituisce i contatori, con il numero di modifiche risparmiate (accorpate o invariate)."""
+        return dict(self.contatori, risparmiate=self.contatori['accorpate'] + self.contatori['invariate'],
+                    in_attesa=len(self.in_attesa))
+
+# Pianificatore degli aggiornamenti dei pulsanti di reazione condiviso dal processo
+pianificatore_pulsanti = PianificatorePulsanti(archivio_reazioni)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+# Intervallo dopo cui l'indice viene ricostruito (5 minuti), per riallineare
+# i risultati salvati da altri processi (bot e interfaccia web)
+RICOSTRUZIONE_TTL = 300
+
+@lru_cache(maxsize=4096)
+def data_ordinale(data_str: Optional[str]) -> Optional[int]:
+    """
+    Converte la data di una partita nel numero ordinale del giorno (date.toordinal()).
+    
+    Le date sono poche e si ripetono, quindi ogni stringa viene interpretata una sola volta.
+    
+    Args:
+        data_str: Data nel formato italiano (DD/MM/YYYY) o ISO (YYYY-MM-DD, anche con l'ora)
+    
+    Returns:
+        Ordinale del giorno, o None se la data manca o non è valida
+    """
+    if not data_str or not isinstance(data_str, str):
+        return None
+    try:
+        if '/' in data_str:
+            giorno, mese, anno = data_str.split('/')
+        else:
+            anno, mese, giorno = data_str[:10].split('-')
+        return date(int(anno), int(mese), int(giorno)).toordinal()
+    except ValueError:
+        return None
+
+def _ordinale(giorno: Union[date, str]) -> Optional[int]:
+    """Ordinale di una data passata come oggetto date/datetime o come stringa."""
+    if isinstance(giorno, datetime):
+        giorno = giorno.date()
+    if isinstance(giorno, date):
+        return giorno.toordinal()
+    return data_ordinale(giorno)
+
+def _chiave_id(id: Any) -> Tuple:
+    """Chiave confrontabile per l'ID di un risultato (gli ID sono di norma interi)."""
+    return (0, id) if isinstance(id, int) else (1, str(id))
+
+def date_weekend(riferimento: Optional[date] = None) -> Tuple[date, date]:
+    """
+    Calcola il weekend (da venerdì a domenica) a cui si riferisce una data.
+    
+    Dal lunedì al giovedì è il weekend appena trascorso, dal venerdì alla domenica quello in corso.
+    
+    Args:
+        riferimento: Data di riferimento (default: oggi)
+    
+    Returns:
+        Tupla (venerdì, domenica)
+    """
+    oggi = riferimento or datetime.now().date()
+    inizio_weekend = oggi - timedelta(days=(oggi.weekday() + 3) % 7)
+    return inizio_weekend, inizio_weekend + timedelta(days=2)
+
+class IndiceRisultati:
+    """
+    Indice ordinato per data dei risultati delle partite.
+    
+    Le date vengono convertite in ordinali una sola volta, al caricamento o al
+    salvataggio di un risultato, e le chiavi (ordinale, ID) sono mantenute in una
+    lista ordinata: una ricerca per intervallo di date costa O(log n + k) con
+    bisect, senza scorrere e reinterpretare tutto lo storico dei risultati.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.invalida()
+    
+    def invalida(self) -> None:
+        """Scarta l'indice, che verrà ricostruito alla prossima lettura."""
+        with self.lock:
+            self.costruito = False
+            self.ultima_costruzione = 0
+            # Chiave ID -> risultato
+            self.risultati = {}
+            # Chiave ID -> ordinale della data (None se la data manca)
+            self.ordinali = {}
+            # Coppie (ordinale, chiave ID) dei risultati con data, in ordine crescente
+            self.chiavi = []
+    
+    def assicura(self) -> None:
+        """Costruisce l'indice se manca o è scaduto."""
+        with self.lock:
+            if not self.costruito or time.time() - self.ultima_costruzione > RICOSTRUZIONE_TTL:
+                self.ricostruisci()
+    
+    def ricostruisci(self) -> None:
+        """Ricostruisce l'indice dai risultati del database (o del file locale)."""
+        from modules.db_manager import carica_risultati
+        
+        self.sostituisci(carica_risultati())
+    
+    def sostituisci(self, risultati: List[Dict[str, Any]]) -> None:
+        """
+        Ricostruisce l'indice da un elenco completo di risultati, ad esempio dopo un salvataggio.
+        
+        Args:
+            risultati: Tutti i risultati; quelli senza ID usano la posizione + 1, come su Supabase
+        """
+        voci = {}
+        for i, risultato in enumerate(risultati):
+            id = risultato.get('id', i + 1)
+            voci[_chiave_id(id)] = dict(risultato, id=id)
+        ordinali = {chiave: data_ordinale(r.get('data_partita')) for chiave, r in voci.items()}
+        chiavi = sorted((ordinale, chiave) for chiave, ordinale in ordinali.items() if ordinale is not None)
+        
+        with self.lock:
+            self.risultati = voci
+            self.ordinali = ordinali
+            self.chiavi = chiavi
+            self.costruito = True
+            self.ultima_costruzione = time.time()
+    
+    def _aggiorna(self, modifica) -> None:
+        """Esegue una modifica dell'indice, scartandolo in caso di errore."""
+        with self.lock:
+            if not self.costruito:
+                return
+            try:
+                modifica()
+            except Exception as e:
+                print(f"Errore nell'aggiornamento dell'indice dei risultati: {e}")
+                self.invalida()
+    
+    def _scollega(self, chiave: Tuple) -> None:
+        """Rimuove un risultato dall'indice."""
+        ordinale = self.ordinali.pop(chiave, None)
+        self.risultati.pop(chiave, None)
+        if ordinale is not None:
+            posizione = bisect_left(self.chiavi, (ordinale, chiave))
+            if posizione < len(self.chiavi) and self.chiavi[posizione] == (ordinale, chiave):
+                del self.chiavi[posizione]
+    
+    # Aggiornamenti incrementali
+    
+    def registra_risultato(self, risultato: Dict[str, Any]) -> None:
+        """Aggiorna l'indice dopo l'inserimento o la modifica di un risultato."""
+        def modifica():
+            chiave = _chiave_id(risultato['id'])
+            self._scollega(chiave)
+            ordinale = data_ordinale(risultato.get('data_partita'))
+            self.risultati[chiave] = dict(risultato)
+            self.ordinali[chiave] = ordinale
+            if ordinale is not None:
+                insort(self.chiavi, (ordinale, chiave))
+        
+        if risultato and risultato.get('id') is not None:
+            self._aggiorna(modifica)
+    
+    def rimuovi_risultato(self, risultato_id: Any) -> None:
+        """Aggiorna l'indice dopo l'eliminazione di un risultato."""
+        self._aggiorna(lambda: self._scollega(_chiave_id(risultato_id)))
+    
+    # Letture
+    
+    def conta(self) -> int:
+        """Restituisce il numero totale di risultati."""
+        self.assicura()
+        with self.lock:
+            return len(self.risultati)
+    
+    def intervallo(self, inizio: Union[date, str], fine: Union[date, str]) -> List[Dict[str, Any]]:
+        """
+        Restituisce i risultati con data compresa tra inizio e fine (inclusi).
+        
+        Args:
+            inizio: Prima data dell'intervallo (date o stringa DD/MM/YYYY o YYYY-MM-DD)
+            fine: Ultima data dell'intervallo
+        
+        Returns:
+            Copie dei risultati in ordine di data crescente (a parità di data, per ID)
+        """
+        ordinale_inizio, ordinale_fine = _ordinale(inizio), _ordinale(fine)
+        if ordinale_inizio is None or ordinale_fine is None:
+            return []
+        
+        self.assicura()
+        with self.lock:
+            da = bisect_left(self.chiavi, (ordinale_inizio,))
+            a = bisect_left(self.chiavi, (ordinale_fine + 1,))
+            return [dict(self.risultati[chiave]) for _, chiave in self.chiavi[da:a]]
+    
+    def weekend(self, riferimento: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Restituisce i risultati del weekend (da venerdì a domenica) calcolato da date_weekend."""
+        return self.intervallo(*date_weekend(riferimento))
+    
+    def ultimi_giorni(self, giorni: int, riferimento: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Restituisce i risultati degli ultimi giorni, da oggi - giorni a oggi inclusi."""
+        oggi = riferimento or datetime.now().date()
+        return self.intervallo(oggi - timedelta(days=giorni), oggi)
+    
+    def stagione(self, stagione: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Restituisce i risultati di una stagione sportiva.
+        
+        Args:
+            stagione: Stagione con 'data_inizio' e 'data_fine' (default: la stagione attiva)
+        """
+        if stagione is None:
+            from modules.campionati_manager import get_stagione_attiva
+            stagione = get_stagione_attiva()
+        if not stagione or not stagione.get('data_inizio') or not stagione.get('data_fine'):
+            return []
+        return self.intervallo(stagione['data_inizio'], stagione['data_fine'])
+
+# Indice dei risultati condiviso dal processo
+indice_risultati = IndiceRisultati()
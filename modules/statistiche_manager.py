@@ -2,209 +2,523 @@
 # -*- coding: utf-8 -*-
 
 import time
+import threading
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict, Counter
 
 from modules.campionati_manager import (
-    carica_arbitri, get_arbitro, carica_campionati, get_campionato,
-    carica_designazioni_partita, get_tutor, get_tutor_partita
+    carica_arbitri, get_arbitro, carica_campionati, get_campionato, get_partita, get_tutor
 )
 from modules.db_manager import format_date
+from modules.cache_manager import cache
 
-# Cache per i dati
-_cache = {
-    'statistiche_arbitri': None,
-    'last_load_statistiche': 0
-}
-
-# Tempo di validità della cache in secondi (30 secondi)
-CACHE_TTL = 30
+# Numero massimo di valori in un filtro in_, per contenere la lunghezza dell'URL
+DIMENSIONE_BLOCCO_IN = 200
 
-def carica_statistiche_arbitri(stagione_id=None, categoria=None, force_reload=False) -> Dict[str, Any]:
+def _seleziona_in(tabella: str, colonna: str, valori: List[Any], **filtri) -> List[Dict[str, Any]]:
     """
-    Carica le statistiche degli arbitri.
+    Seleziona le righe di una tabella il cui valore di colonna è tra quelli indicati.
+    
+    I valori vengono suddivisi in blocchi di DIMENSIONE_BLOCCO_IN, quindi il numero
+    di richieste dipende dal numero di valori e non dal numero di righe.
     
     Args:
-        stagione_id: ID della stagione per filtrare le statistiche (opzionale)
-        categoria: Categoria per filtrare le statistiche (opzionale)
-        force_reload: Se True, forza il ricaricamento anche se la cache è valida
-        
+        tabella: Nome della tabella
+        colonna: Colonna su cui applicare il filtro in_
+        valori: Valori ammessi
+        **filtri: Filtri di uguaglianza aggiuntivi
+    
     Returns:
-        Dizionario con le statistiche degli arbitri
+        Lista delle righe trovate
     """
-    cache_key = f'statistiche_arbitri_{stagione_id}_{categoria}'
-    current_time = time.time()
+    from modules.db_manager import supabase
     
-    # Usa la cache se disponibile e non scaduta
-    if not force_reload and _cache.get(cache_key) is not None and (current_time - _cache.get(f'last_load_{cache_key}', 0)) < CACHE_TTL:
-        return _cache[cache_key]
+    valori = list(dict.fromkeys(v for v in valori if v is not None))
+    righe = []
+    for inizio in range(0, len(valori), DIMENSIONE_BLOCCO_IN):
+        query = supabase.table(tabella).select('*')
+        for nome, valore in filtri.items():
+            query = query.eq(nome, valore)
+        response = query.in_(colonna, valori[inizio:inizio + DIMENSIONE_BLOCCO_IN]).execute()
+        righe.extend(response.data or [])
+    return righe
+
+def _carica_dati_statistiche() -> Dict[str, Any]:
+    """
+    Carica in blocco i dati necessari alle statistiche degli arbitri.
     
-    try:
-        from modules.db_manager import is_supabase_configured
+    Campionati, partite, designazioni e assegnazioni dei tutor vengono letti con
+    una query per tabella (a pagine, per non essere troncati dal limite max-rows
+    di PostgREST) e i tutor con un filtro in_ sugli ID raccolti, invece che con
+    una query per partita.
+    
+    Returns:
+        Dizionario con 'campionati' (ID -> campionato), 'partite' (lista),
+        'designazioni' (ID partita -> lista di designazioni) e 'tutor_partite'
+        (ID partita -> assegnazione del tutor, con il tutor in 'tutor')
+    
+    Raises:
+        ErroreLetturaSupabase: Se la lettura di una tabella non è riuscita
+    """
+    from modules.db_manager import supabase, leggi_tutte
+    
+    campionati = {c['id']: c for c in carica_campionati()}
+    partite = leggi_tutte(lambda: supabase.table('partite_campionato').select('*'))
+    
+    designazioni = defaultdict(list)
+    for designazione in leggi_tutte(lambda: supabase.table('designazioni_arbitrali').select('*')):
+        designazioni[designazione.get('partita_id')].append(designazione)
+    
+    # Assegnazioni dei tutor (una per partita) e anagrafica dei tutor coinvolti
+    partite_ids = [p['id'] for p in partite]
+    assegnazioni = leggi_tutte(lambda: supabase.table('tutor_partite').select('*'))
+    
+    tutor = {t['id']: t for t in _seleziona_in('tutor_arbitrali', 'id', [a.get('tutor_id') for a in assegnazioni])}
+    
+    assegnazioni_partita = {}
+    for assegnazione in assegnazioni:
+        if assegnazione.get('tutor_id') in tutor:
+            assegnazioni_partita.setdefault(assegnazione.get('partita_id'), assegnazione)
+    
+    # Nell'ordine delle partite, come la precedente lettura partita per partita
+    tutor_partite = {}
+    for partita_id in partite_ids:
+        if partita_id in assegnazioni_partita:
+            assegnazione = assegnazioni_partita[partita_id]
+            assegnazione['tutor'] = tutor[assegnazione['tutor_id']]
+            tutor_partite[partita_id] = assegnazione
+    
+    return {
+        'campionati': campionati,
+        'partite': partite,
+        'designazioni': designazioni,
+        'tutor_partite': tutor_partite
+    }
+
+# Etichette dei ruoli nei grafici
+RUOLI_ETICHETTE = {
+    'primo': 'Primo arbitro',
+    'secondo': 'Secondo arbitro',
+    'TMO': 'TMO',
+    'quarto_uomo': 'Quarto uomo',
+    'giudice_di_linea': 'Giudice di linea'
+}
+
+# Intervallo dopo cui gli aggregati vengono ricostruiti dalle tabelle (1 ora),
+# per riallineare le modifiche fatte da altri processi
+RICOSTRUZIONE_TTL = 3600
+
+def _somma(contatore: Counter, chiave: Any, valore: int) -> None:
+    """Somma un valore a un contatore, eliminando la chiave quando torna a zero."""
+    contatore[chiave] += valore
+    if not contatore[chiave]:
+        del contatore[chiave]
+
+class AggregatiArbitri:
+    """
+    Aggregati materializzati delle statistiche degli arbitri.
+    
+    Mantiene i contatori per arbitro × stagione × categoria × ruolo, le coppie
+    arbitro-tutor con le date delle partite e i totali delle partite per stagione
+    e categoria. Gli aggregati vengono costruiti una volta con il caricamento in
+    blocco e poi aggiornati in modo incrementale dalle funzioni che modificano
+    designazioni, tutor e partite, quindi le pagine delle statistiche non leggono
+    le tabelle a ogni richiesta.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.invalida()
+    
+    def invalida(self) -> None:
+        """Scarta gli aggregati, che verranno ricostruiti alla prossima lettura."""
+        with self.lock:
+            self.costruiti = False
+            self.ultima_costruzione = 0
+            
+            # Righe di riferimento
+            self.campionati = {}
+            self.partite = {}
+            self.designazioni = {}
+            self.assegnazioni = {}
+            self.tutor = {}
+            
+            # Indici
+            self.designazioni_partita = defaultdict(set)
+            self.designazioni_arbitro = defaultdict(set)
+            self.assegnazioni_partita = defaultdict(list)
+            
+            # Contatori: (arbitro, stagione, categoria, ruolo) -> designazioni
+            self.ruoli = Counter()
+            # (arbitro, stagione, categoria) -> designazioni in partite con tutor
+            self.con_tutor = Counter()
+            # (arbitro, tutor, stagione, categoria) -> data della partita -> designazioni
+            self.coppie_tutor = defaultdict(Counter)
+            # (stagione, categoria) -> partite, partite designate, partite con tutor
+            self.partite_gruppo = Counter()
+            self.partite_designate = Counter()
+            self.partite_tutor = Counter()
+    
+    def assicura(self, force_reload: bool = False) -> None:
+        """Costruisce gli aggregati se mancano, sono scaduti o se richiesto."""
+        with self.lock:
+            if force_reload or not self.costruiti or time.time() - self.ultima_costruzione > RICOSTRUZIONE_TTL:
+                self.ricostruisci()
+    
+    def ricostruisci(self) -> None:
+        """Ricostruisce gli aggregati con il caricamento in blocco delle tabelle."""
+        dati = _carica_dati_statistiche()
+        with self.lock:
+            self.invalida()
+            self.campionati = dati['campionati']
+            for partita in dati['partite']:
+                self.partite[partita['id']] = partita
+            for designazioni in dati['designazioni'].values():
+                for designazione in designazioni:
+                    self._indicizza_designazione(designazione)
+            for assegnazione in dati['tutor_partite'].values():
+                self.tutor[assegnazione['tutor_id']] = assegnazione.pop('tutor')
+                self._indicizza_assegnazione(assegnazione)
+            for partita_id in self.partite:
+                self._applica_partita(partita_id, 1)
+            self.costruiti = True
+            self.ultima_costruzione = time.time()
+    
+    # Indici e contributi
+    
+    def _indicizza_designazione(self, designazione: Dict[str, Any]) -> None:
+        self.designazioni[designazione['id']] = designazione
+        self.designazioni_partita[designazione.get('partita_id')].add(designazione['id'])
+        self.designazioni_arbitro[designazione.get('arbitro_id')].add(designazione['id'])
+    
+    def _rimuovi_indice_designazione(self, designazione_id: Any) -> Optional[Dict[str, Any]]:
+        designazione = self.designazioni.pop(designazione_id, None)
+        if designazione:
+            self.designazioni_partita[designazione.get('partita_id')].discard(designazione_id)
+            self.designazioni_arbitro[designazione.get('arbitro_id')].discard(designazione_id)
+        return designazione
+    
+    def _indicizza_assegnazione(self, assegnazione: Dict[str, Any]) -> None:
+        self.assegnazioni[assegnazione.get('id')] = assegnazione
+        self.assegnazioni_partita[assegnazione.get('partita_id')].append(assegnazione)
+    
+    def _rimuovi_indice_assegnazione(self, assegnazione_id: Any) -> Optional[Dict[str, Any]]:
+        assegnazione = self.assegnazioni.pop(assegnazione_id, None)
+        if assegnazione:
+            elenco = self.assegnazioni_partita[assegnazione.get('partita_id')]
+            elenco[:] = [a for a in elenco if a.get('id') != assegnazione_id]
+        return assegnazione
+    
+    def _gruppo(self, partita: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Restituisce la coppia (stagione, categoria) del campionato della partita."""
+        campionato = self.campionati.get(partita.get('campionato_id'))
+        if not campionato:
+            return (None, None)
+        return (campionato.get('stagione_id'), campionato.get('categoria', 'Sconosciuta'))
+    
+    def _assegnazione_partita(self, partita_id: Any) -> Optional[Dict[str, Any]]:
+        """Restituisce l'assegnazione del tutor valida per la partita (la prima)."""
+        elenco = self.assegnazioni_partita.get(partita_id)
+        return elenco[0] if elenco else None
+    
+    def _applica_partita(self, partita_id: Any, segno: int) -> None:
+        """Somma (segno 1) o sottrae (segno -1) il contributo di una partita agli aggregati."""
+        partita = self.partite.get(partita_id)
+        if partita is None:
+            return
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
-            
-            # Carica gli arbitri
-            arbitri = carica_arbitri()
-            
-            # Prepara la query per le partite
-            query = supabase.table('partite_campionato').select('*')
-            
-            # Applica i filtri
-            if stagione_id:
-                # Ottieni i campionati della stagione
-                campionati = carica_campionati(stagione_id)
-                campionati_ids = [c['id'] for c in campionati]
-                if campionati_ids:
-                    query = query.in_('campionato_id', campionati_ids)
-            
-            # Esegui la query
-            response = query.execute()
-            partite = response.data
-            
-            # Filtra per categoria se necessario
-            if categoria:
-                partite_filtrate = []
-                for partita in partite:
-                    campionato = get_campionato(partita['campionato_id'])
-                    if campionato and campionato.get('categoria') == categoria:
-                        partite_filtrate.append(partita)
-                partite = partite_filtrate
-            
-            # Carica le designazioni per ogni partita
-            designazioni = []
-            for partita in partite:
-                partita_designazioni = carica_designazioni_partita(partita['id'])
-                for designazione in partita_designazioni:
-                    designazione['partita'] = partita
-                    designazioni.append(designazione)
-            
-            # Carica i tutor per ogni partita
-            tutor_partite = {}
-            for partita in partite:
-                tutor_partita = get_tutor_partita(partita['id'])
-                if tutor_partita:
-                    tutor = get_tutor(tutor_partita['tutor_id'])
-                    if tutor:
-                        tutor_partita['tutor'] = tutor
-                        tutor_partite[partita['id']] = tutor_partita
+        gruppo = self._gruppo(partita)
+        assegnazione = self._assegnazione_partita(partita_id)
+        designazioni = [self.designazioni[d] for d in self.designazioni_partita.get(partita_id, ())]
+        
+        _somma(self.partite_gruppo, gruppo, segno)
+        if assegnazione:
+            _somma(self.partite_tutor, gruppo, segno)
+        if designazioni:
+            _somma(self.partite_designate, gruppo, segno)
+        
+        for designazione in designazioni:
+            arbitro_id = designazione.get('arbitro_id')
+            _somma(self.ruoli, (arbitro_id,) + gruppo + (designazione.get('ruolo', 'altro'),), segno)
+            if assegnazione:
+                _somma(self.con_tutor, (arbitro_id,) + gruppo, segno)
+                chiave = (arbitro_id, assegnazione['tutor_id']) + gruppo
+                _somma(self.coppie_tutor[chiave], partita.get('data_partita') or '', segno)
+                if not self.coppie_tutor[chiave]:
+                    del self.coppie_tutor[chiave]
+    
+    def _modifica_partita(self, partita_id: Any, modifica) -> None:
+        """
+        Applica una modifica ai dati di una partita aggiornando gli aggregati.
+        
+        Il contributo della partita viene sottratto, la modifica eseguita e il
+        nuovo contributo sommato; in caso di errore gli aggregati vengono scartati.
+        """
+        with self.lock:
+            if not self.costruiti:
+                return
+            try:
+                self._applica_partita(partita_id, -1)
+                modifica()
+                self._applica_partita(partita_id, 1)
+            except Exception as e:
+                print(f"Errore nell'aggiornamento delle statistiche degli arbitri: {e}")
+                self.invalida()
+    
+    def _assicura_partita(self, partita_id: Any) -> None:
+        """Carica una partita non ancora nota agli aggregati."""
+        if partita_id not in self.partite:
+            partita = get_partita(partita_id)
+            if partita:
+                self._assicura_campionato(partita.get('campionato_id'))
+                self.partite[partita_id] = partita
+    
+    def _assicura_campionato(self, campionato_id: Any) -> None:
+        """Carica un campionato non ancora noto agli aggregati."""
+        if campionato_id not in self.campionati:
+            campionato = get_campionato(campionato_id)
+            if campionato:
+                self.campionati[campionato_id] = campionato
+    
+    # Aggiornamenti incrementali
+    
+    def registra_designazione(self, designazione: Dict[str, Any]) -> None:
+        """Aggiorna gli aggregati dopo l'aggiunta o la modifica di una designazione."""
+        if not self.costruiti or not designazione or designazione.get('id') is None:
+            return
+        partita_id = designazione.get('partita_id')
+        
+        def modifica():
+            self._rimuovi_indice_designazione(designazione['id'])
+            self._indicizza_designazione(dict(designazione))
+        
+        with self.lock:
+            self._assicura_partita(partita_id)
+            self._modifica_partita(partita_id, modifica)
+    
+    def rimuovi_designazione(self, designazione_id: Any) -> None:
+        """Aggiorna gli aggregati dopo la rimozione di una designazione."""
+        with self.lock:
+            designazione = self.designazioni.get(designazione_id)
+            if designazione:
+                self._modifica_partita(designazione.get('partita_id'),
+                                       lambda: self._rimuovi_indice_designazione(designazione_id))
+    
+    def registra_tutor_partita(self, assegnazione: Dict[str, Any]) -> None:
+        """Aggiorna gli aggregati dopo l'assegnazione di un tutor a una partita."""
+        if not self.costruiti or not assegnazione:
+            return
+        partita_id = assegnazione.get('partita_id')
+        
+        def modifica():
+            self._rimuovi_indice_assegnazione(assegnazione.get('id'))
+            self._indicizza_assegnazione(dict(assegnazione))
+        
+        with self.lock:
+            tutor_id = assegnazione.get('tutor_id')
+            if tutor_id not in self.tutor:
+                tutor = get_tutor(tutor_id)
+                if not tutor:
+                    return
+                self.tutor[tutor_id] = tutor
+            self._assicura_partita(partita_id)
+            self._modifica_partita(partita_id, modifica)
+    
+    def rimuovi_tutor_partita(self, assegnazione_id: Any) -> None:
+        """Aggiorna gli aggregati dopo la rimozione di un tutor da una partita."""
+        with self.lock:
+            assegnazione = self.assegnazioni.get(assegnazione_id)
+            if assegnazione:
+                self._modifica_partita(assegnazione.get('partita_id'),
+                                       lambda: self._rimuovi_indice_assegnazione(assegnazione_id))
+    
+    def registra_partita(self, partita: Dict[str, Any]) -> None:
+        """Aggiorna gli aggregati dopo la creazione o la modifica di una partita."""
+        if not self.costruiti or not partita or partita.get('id') is None:
+            return
+        partita_id = partita['id']
+        
+        def modifica():
+            aggiornata = dict(self.partite.get(partita_id, {}))
+            aggiornata.update(partita)
+            self.partite[partita_id] = aggiornata
+        
+        with self.lock:
+            self._assicura_campionato(partita.get('campionato_id', self.partite.get(partita_id, {}).get('campionato_id')))
+            self._modifica_partita(partita_id, modifica)
+    
+    def rimuovi_partita(self, partita_id: Any) -> None:
+        """Aggiorna gli aggregati dopo l'eliminazione di una partita e delle sue designazioni."""
+        def modifica():
+            self.partite.pop(partita_id, None)
+            for designazione_id in list(self.designazioni_partita.pop(partita_id, ())):
+                self._rimuovi_indice_designazione(designazione_id)
+            for assegnazione in self.assegnazioni_partita.pop(partita_id, []):
+                self.assegnazioni.pop(assegnazione.get('id'), None)
+        
+        self._modifica_partita(partita_id, modifica)
+    
+    # Letture
+    
+    @staticmethod
+    def _nel_filtro(stagione: Any, categoria: Any, stagione_id=None, categoria_filtro=None) -> bool:
+        return (not stagione_id or stagione == stagione_id) and (not categoria_filtro or categoria == categoria_filtro)
+    
+    def statistiche(self, arbitri: List[Dict[str, Any]], stagione_id=None, categoria=None) -> Dict[str, Any]:
+        """
+        Calcola le statistiche di tutti gli arbitri dagli aggregati.
+        
+        Args:
+            arbitri: Anagrafica degli arbitri
+            stagione_id: ID della stagione per filtrare le statistiche (opzionale)
+            categoria: Categoria per filtrare le statistiche (opzionale)
+        
+        Returns:
+            Dizionario nel formato di carica_statistiche_arbitri
+        """
+        with self.lock:
+            ruoli_arbitro = defaultdict(Counter)
+            ruoli_counter = Counter()
+            for (arbitro_id, stagione, cat, ruolo), numero in self.ruoli.items():
+                if self._nel_filtro(stagione, cat, stagione_id, categoria):
+                    ruoli_arbitro[arbitro_id][ruolo] += numero
+                    ruoli_counter[ruolo] += numero
+            
+            con_tutor = Counter()
+            for (arbitro_id, stagione, cat), numero in self.con_tutor.items():
+                if self._nel_filtro(stagione, cat, stagione_id, categoria):
+                    con_tutor[arbitro_id] += numero
+            
+            coppie = defaultdict(lambda: defaultdict(Counter))
+            for (arbitro_id, tutor_id, stagione, cat), date in self.coppie_tutor.items():
+                if self._nel_filtro(stagione, cat, stagione_id, categoria):
+                    coppie[arbitro_id][tutor_id].update(date)
+            
+            totale_partite = 0
+            partite_con_tutor = 0
+            categorie_counter = Counter()
+            for gruppo, numero in self.partite_gruppo.items():
+                if self._nel_filtro(gruppo[0], gruppo[1], stagione_id, categoria):
+                    totale_partite += self.partite_designate.get(gruppo, 0)
+                    partite_con_tutor += self.partite_tutor.get(gruppo, 0)
+                    if gruppo != (None, None):
+                        categorie_counter[gruppo[1]] += numero
             
-            # Calcola le statistiche per ogni arbitro
             statistiche_arbitri = []
             for arbitro in arbitri:
                 if not arbitro.get('attivo', True):
                     continue
                 
-                # Filtra le designazioni per questo arbitro
-                arbitro_designazioni = [d for d in designazioni if d.get('arbitro_id') == arbitro['id']]
-                
-                # Calcola le statistiche
-                partite_totali = len(arbitro_designazioni)
-                partite_primo = len([d for d in arbitro_designazioni if d.get('ruolo') == 'primo'])
-                partite_secondo = len([d for d in arbitro_designazioni if d.get('ruolo') == 'secondo'])
-                partite_altri_ruoli = partite_totali - partite_primo - partite_secondo
-                
-                # Conta le partite con tutor
-                partite_con_tutor = 0
-                tutor_assegnati = defaultdict(int)
-                ultima_partita_tutor = {}
-                
-                for designazione in arbitro_designazioni:
-                    partita_id = designazione['partita']['id']
-                    if partita_id in tutor_partite:
-                        partite_con_tutor += 1
-                        tutor_id = tutor_partite[partita_id]['tutor_id']
-                        tutor_assegnati[tutor_id] += 1
-                        
-                        # Aggiorna l'ultima partita per questo tutor
-                        data_partita = designazione['partita'].get('data_partita')
-                        if data_partita:
-                            if tutor_id not in ultima_partita_tutor or data_partita > ultima_partita_tutor[tutor_id]:
-                                ultima_partita_tutor[tutor_id] = data_partita
+                ruoli = ruoli_arbitro.get(arbitro['id'], Counter())
+                partite_totali = sum(ruoli.values())
                 
                 # Formatta i dati dei tutor
                 tutor_formattati = []
-                for tutor_id, partite in tutor_assegnati.items():
-                    tutor_info = get_tutor(tutor_id)
-                    if tutor_info:
-                        tutor_formattati.append({
-                            'id': tutor_id,
-                            'nome': tutor_info.get('nome', ''),
-                            'cognome': tutor_info.get('cognome', ''),
-                            'qualifica': tutor_info.get('qualifica', ''),
-                            'partite': partite,
-                            'ultima_partita': format_date(ultima_partita_tutor.get(tutor_id, ''))
-                        })
+                for tutor_id, date in coppie.get(arbitro['id'], {}).items():
+                    tutor = self.tutor.get(tutor_id, {})
+                    tutor_formattati.append({
+                        'id': tutor_id,
+                        'nome': tutor.get('nome', ''),
+                        'cognome': tutor.get('cognome', ''),
+                        'qualifica': tutor.get('qualifica', ''),
+                        'partite': sum(date.values()),
+                        'ultima_partita': format_date(max(date))
+                    })
+                tutor_formattati.sort(key=lambda t: (t['cognome'], t['nome']))
                 
-                # Aggiungi le statistiche dell'arbitro
                 statistiche_arbitri.append({
                     'id': arbitro['id'],
                     'nome': arbitro.get('nome', ''),
                     'cognome': arbitro.get('cognome', ''),
                     'qualifica': arbitro.get('qualifica', ''),
                     'partite_totali': partite_totali,
-                    'partite_primo': partite_primo,
-                    'partite_secondo': partite_secondo,
-                    'partite_altri_ruoli': partite_altri_ruoli,
-                    'partite_con_tutor': partite_con_tutor,
+                    'partite_primo': ruoli['primo'],
+                    'partite_secondo': ruoli['secondo'],
+                    'partite_altri_ruoli': partite_totali - ruoli['primo'] - ruoli['secondo'],
+                    'partite_con_tutor': con_tutor[arbitro['id']],
                     'tutor_assegnati': tutor_formattati
                 })
             
-            # Calcola le statistiche generali
             totale_arbitri = len([a for a in arbitri if a.get('attivo', True)])
-            totale_partite = len(set([d['partita']['id'] for d in designazioni]))
-            media_partite = totale_partite / totale_arbitri if totale_arbitri > 0 else 0
-            partite_con_tutor = len(tutor_partite)
             
-            # Calcola la distribuzione per categoria
-            categorie_counter = Counter()
-            for partita in partite:
-                campionato = get_campionato(partita['campionato_id'])
-                if campionato:
-                    categorie_counter[campionato.get('categoria', 'Sconosciuta')] += 1
-            
-            # Calcola la distribuzione per ruolo
-            ruoli_counter = Counter()
-            for designazione in designazioni:
-                ruolo = designazione.get('ruolo', 'altro')
-                ruoli_counter[ruolo] += 1
-            
-            # Prepara i dati per i grafici
-            categorie_labels = list(categorie_counter.keys())
-            categorie_data = [categorie_counter[cat] for cat in categorie_labels]
-            
-            ruoli_mapping = {
-                'primo': 'Primo arbitro',
-                'secondo': 'Secondo arbitro',
-                'TMO': 'TMO',
-                'quarto_uomo': 'Quarto uomo',
-                'giudice_di_linea': 'Giudice di linea'
-            }
-            ruoli_labels = [ruoli_mapping.get(ruolo, ruolo) for ruolo in ruoli_counter.keys()]
-            ruoli_data = list(ruoli_counter.values())
-            
-            # Prepara il risultato
-            result = {
+            return {
                 'statistiche_arbitri': statistiche_arbitri,
                 'statistiche_generali': {
                     'totale_arbitri': totale_arbitri,
                     'totale_partite': totale_partite,
-                    'media_partite': media_partite,
+                    'media_partite': totale_partite / totale_arbitri if totale_arbitri > 0 else 0,
                     'partite_con_tutor': partite_con_tutor
                 },
-                'categorie_labels': categorie_labels,
-                'categorie_data': categorie_data,
-                'ruoli_labels': ruoli_labels,
-                'ruoli_data': ruoli_data
+                'categorie_labels': list(categorie_counter.keys()),
+                'categorie_data': list(categorie_counter.values()),
+                'ruoli_labels': [RUOLI_ETICHETTE.get(ruolo, ruolo) for ruolo in ruoli_counter.keys()],
+                'ruoli_data': list(ruoli_counter.values())
             }
+    
+    def dati_arbitro(self, arbitro_id: int, stagione_id=None) -> Dict[str, Any]:
+        """
+        Restituisce le partite designate a un arbitro, nel formato di _carica_dati_statistiche.
+        
+        Le righe restituite sono copie, quindi possono essere modificate dal chiamante.
+        """
+        with self.lock:
+            designazioni = defaultdict(list)
+            partite = {}
+            elenco = [self.designazioni[d] for d in self.designazioni_arbitro.get(arbitro_id, ())]
+            # In ordine di data, così la nota del tutor considerata è quella dell'ultima partita
+            elenco.sort(key=lambda d: (self.partite.get(d.get('partita_id'), {}).get('data_partita') or '', d['id']))
+            for designazione in elenco:
+                partita = self.partite.get(designazione.get('partita_id'))
+                if partita is None:
+                    continue
+                if stagione_id and self._gruppo(partita)[0] != stagione_id:
+                    continue
+                partite[partita['id']] = dict(partita)
+                designazioni[partita['id']].append(dict(designazione))
             
-            # Aggiorna la cache
-            _cache[cache_key] = result
-            _cache[f'last_load_{cache_key}'] = current_time
+            tutor_partite = {}
+            for partita_id in partite:
+                assegnazione = self._assegnazione_partita(partita_id)
+                if assegnazione:
+                    tutor_partite[partita_id] = dict(assegnazione, tutor=self.tutor.get(assegnazione['tutor_id'], {}))
             
-            return result
+            return {
+                'campionati': dict(self.campionati),
+                'partite': list(partite.values()),
+                'designazioni': designazioni,
+                'tutor_partite': tutor_partite
+            }
+
+# Aggregati delle statistiche degli arbitri condivisi dal processo
+aggregati_arbitri = AggregatiArbitri()
+
+def _invalida_aggregati(tag) -> None:
+    """Scarta gli aggregati quando cambiano i dati dei tutor, che non vengono aggiornati in modo incrementale."""
+    if 'tutor' in tag:
+        aggregati_arbitri.invalida()
+
+cache.aggiungi_ascoltatore(_invalida_aggregati)
+
+def carica_statistiche_arbitri(stagione_id=None, categoria=None, force_reload=False) -> Dict[str, Any]:
+    """
+    Carica le statistiche degli arbitri.
+    
+    Args:
+        stagione_id: ID della stagione per filtrare le statistiche (opzionale)
+        categoria: Categoria per filtrare le statistiche (opzionale)
+        force_reload: Se True, ricostruisce gli aggregati dalle tabelle
+        
+    Returns:
+        Dizionario con le statistiche degli arbitri
+    """
+    try:
+        from modules.db_manager import is_supabase_configured
+        
+        if is_supabase_configured():
+            # Gli aggregati vengono costruiti alla prima lettura e poi aggiornati a ogni modifica
+            aggregati_arbitri.assicura(force_reload)
+            return aggregati_arbitri.statistiche(carica_arbitri(), stagione_id, categoria)
         else:
             # Dati di esempio se Supabase non è configurato
             return {
@@ -302,47 +616,24 @@ def carica_statistiche_arbitro(arbitro_id: int, stagione_id=None) -> Dict[str, A
         from modules.db_manager import is_supabase_configured
         
         if is_supabase_configured():
-            from modules.db_manager import supabase
-            
             # Carica l'arbitro
             arbitro = get_arbitro(arbitro_id)
             if not arbitro:
                 return None
             
-            # Prepara la query per le partite
-            query = supabase.table('partite_campionato').select('*')
-            
-            # Applica i filtri per stagione
-            if stagione_id:
-                # Ottieni i campionati della stagione
-                campionati = carica_campionati(stagione_id)
-                campionati_ids = [c['id'] for c in campionati]
-                if campionati_ids:
-                    query = query.in_('campionato_id', campionati_ids)
-            
-            # Esegui la query
-            response = query.execute()
-            partite = response.data
+            # Partite designate all'arbitro e relativi tutor, dagli aggregati
+            aggregati_arbitri.assicura()
+            dati = aggregati_arbitri.dati_arbitro(arbitro_id, stagione_id)
+            campionati = dati['campionati']
             
-            # Carica le designazioni per ogni partita
             designazioni = []
-            for partita in partite:
-                partita_designazioni = carica_designazioni_partita(partita['id'])
-                for designazione in partita_designazioni:
-                    if designazione.get('arbitro_id') == arbitro_id:
-                        designazione['partita'] = partita
-                        designazioni.append(designazione)
+            for partita in dati['partite']:
+                for designazione in dati['designazioni'].get(partita['id'], []):
+                    designazione['partita'] = partita
+                    designazioni.append(designazione)
             
-            # Carica i tutor per ogni partita
-            tutor_partite = {}
-            for designazione in designazioni:
-                partita_id = designazione['partita']['id']
-                tutor_partita = get_tutor_partita(partita_id)
-                if tutor_partita:
-                    tutor = get_tutor(tutor_partita['tutor_id'])
-                    if tutor:
-                        tutor_partita['tutor'] = tutor
-                        tutor_partite[partita_id] = tutor_partita
+            tutor_partite = dati['tutor_partite']
+            partite_designate = {d['partita']['id']: d['partita'] for d in designazioni}
             
             # Calcola le statistiche
             partite_totali = len(designazioni)
@@ -360,39 +651,38 @@ def carica_statistiche_arbitro(arbitro_id: int, stagione_id=None) -> Dict[str, A
                 tutor_stats[tutor_id]['partite'] += 1
                 
                 # Trova la partita corrispondente
-                for designazione in designazioni:
-                    if designazione['partita']['id'] == partita_id:
-                        data_partita = designazione['partita'].get('data_partita')
-                        if data_partita:
-                            if tutor_stats[tutor_id]['prima_partita'] is None or data_partita < tutor_stats[tutor_id]['prima_partita']:
-                                tutor_stats[tutor_id]['prima_partita'] = data_partita
-                            if tutor_stats[tutor_id]['ultima_partita'] is None or data_partita > tutor_stats[tutor_id]['ultima_partita']:
-                                tutor_stats[tutor_id]['ultima_partita'] = data_partita
+                if partita_id in partite_designate:
+                    data_partita = partite_designate[partita_id].get('data_partita')
+                    if data_partita:
+                        if tutor_stats[tutor_id]['prima_partita'] is None or data_partita < tutor_stats[tutor_id]['prima_partita']:
+                            tutor_stats[tutor_id]['prima_partita'] = data_partita
+                        if tutor_stats[tutor_id]['ultima_partita'] is None or data_partita > tutor_stats[tutor_id]['ultima_partita']:
+                            tutor_stats[tutor_id]['ultima_partita'] = data_partita
                         
-                        # Aggiungi le note (prendiamo solo l'ultima)
-                        tutor_stats[tutor_id]['note'] = tutor_partita.get('note', '')
+                    # Aggiungi le note (prendiamo solo l'ultima)
+                    tutor_stats[tutor_id]['note'] = tutor_partita.get('note', '')
             
             # Formatta i dati dei tutor
             tutor_assegnati = []
+            tutor_info = {t['tutor_id']: t['tutor'] for t in tutor_partite.values()}
             for tutor_id, stats in tutor_stats.items():
-                tutor_info = get_tutor(tutor_id)
-                if tutor_info:
-                    tutor_assegnati.append({
-                        'id': tutor_id,
-                        'nome': tutor_info.get('nome', ''),
-                        'cognome': tutor_info.get('cognome', ''),
-                        'qualifica': tutor_info.get('qualifica', ''),
-                        'partite': stats['partite'],
-                        'prima_partita': format_date(stats['prima_partita']),
-                        'ultima_partita': format_date(stats['ultima_partita']),
-                        'note': stats['note']
-                    })
+                tutor = tutor_info[tutor_id]
+                tutor_assegnati.append({
+                    'id': tutor_id,
+                    'nome': tutor.get('nome', ''),
+                    'cognome': tutor.get('cognome', ''),
+                    'qualifica': tutor.get('qualifica', ''),
+                    'partite': stats['partite'],
+                    'prima_partita': format_date(stats['prima_partita']),
+                    'ultima_partita': format_date(stats['ultima_partita']),
+                    'note': stats['note']
+                })
             
             # Prepara i dati delle partite
             partite_info = []
             for designazione in sorted(designazioni, key=lambda d: d['partita'].get('data_partita', ''), reverse=True):
                 partita = designazione['partita']
-                campionato = get_campionato(partita.get('campionato_id'))
+                campionato = campionati.get(partita.get('campionato_id'))
                 
                 partita_info = {
                     'id': partita['id'],
@@ -419,7 +709,7 @@ def carica_statistiche_arbitro(arbitro_id: int, stagione_id=None) -> Dict[str, A
             # Calcola la distribuzione per categoria
             categorie_counter = Counter()
             for designazione in designazioni:
-                campionato = get_campionato(designazione['partita'].get('campionato_id'))
+                campionato = campionati.get(designazione['partita'].get('campionato_id'))
                 if campionato:
                     categorie_counter[campionato.get('categoria', 'Sconosciuta')] += 1
             
@@ -1,17 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import time
 from typing import List, Dict, Any, Optional
 
-# Cache per i dati
-_cache = {
-    'tutor_arbitrali': None,
-    'last_load_tutor_arbitrali': 0
-}
+from modules.cache_manager import cache
 
-# Tempo di validità della cache in secondi (5 secondi)
-CACHE_TTL = 5
+# Cache per i dati, invalidata dalle funzioni di scrittura tramite il tag 'tutor'
+_cache_tutor = cache.namespace('tutor', dimensione_massima=1)
 
 # Funzioni per la gestione dei tutor arbitrali
 def carica_tutor_arbitrali(force_reload=False) -> List[Dict[str, Any]]:
@@ -24,60 +19,47 @@ def carica_tutor_arbitrali(force_reload=False) -> List[Dict[str, Any]]:
     Returns:
         Lista dei tutor arbitrali
     """
-    current_time = time.time()
-    
-    # Usa la cache se disponibile e non scaduta
-    if not force_reload and _cache['tutor_arbitrali'] is not None and (current_time - _cache['last_load_tutor_arbitrali']) < CACHE_TTL:
-        return _cache['tutor_arbitrali']
-    
-    # Carica dal database
-    try:
-        from modules.db_manager import is_supabase_configured
+    def carica():
+        try:
+            from modules.db_manager import is_supabase_configured
         
-        if is_supabase_configured():
-            from modules.db_manager import supabase
-            
-            response = supabase.table('tutor_arbitrali').select('*').order('cognome').execute()
-            tutor_arbitrali = response.data
+            if is_supabase_configured():
+                from modules.db_manager import supabase
             
-            # Aggiorna la cache
-            _cache['tutor_arbitrali'] = tutor_arbitrali
-            _cache['last_load_tutor_arbitrali'] = current_time
-            
-            return tutor_arbitrali
-        else:
-            # Dati di esempio se Supabase non è configurato
-            tutor_arbitrali = [
-                {
-                    'id': 1,
-                    'nome': 'Mario',
-                    'cognome': 'Rossi',
-                    'email': 'mario.rossi@example.com',
-                    'telefono': '3331234567',
-                    'qualifica': 'nazionale',
-                    'attivo': True,
-                    'note': 'Tutor esperto'
-                },
-                {
-                    'id': 2,
-                    'nome': 'Giuseppe',
-                    'cognome': 'Verdi',
-                    'email': 'giuseppe.verdi@example.com',
-                    'telefono': '3339876543',
-                    'qualifica': 'regionale',
-                    'attivo': True,
-                    'note': ''
-                }
-            ]
-            
-            # Aggiorna la cache
-            _cache['tutor_arbitrali'] = tutor_arbitrali
-            _cache['last_load_tutor_arbitrali'] = current_time
+                response = supabase.table('tutor_arbitrali').select('*').order('cognome').execute()
+                return response.data
+            else:
+                # Dati di esempio se Supabase non è configurato
+                tutor_arbitrali = [
+                    {
+                        'id': 1,
+                        'nome': 'Mario',
+                        'cognome': 'Rossi',
+                        'email': 'mario.rossi@example.com',
+                        'telefono': '3331234567',
+                        'qualifica': 'nazionale',
+                        'attivo': True,
+                        'note': 'Tutor esperto'
+                    },
+                    {
+                        'id': 2,
+                        'nome': 'Giuseppe',
+                        'cognome': 'Verdi',
+                        'email': 'giuseppe.verdi@example.com',
+                        'telefono': '3339876543',
+                        'qualifica': 'regionale',
+                        'attivo': True,
+                        'note': ''
+                    }
+                ]
             
-            return tutor_arbitrali
-    except Exception as e:
-        print(f"Errore nel caricamento dei tutor arbitrali: {e}")
-        return []
+                return tutor_arbitrali
+        except Exception as e:
+            print(f"Errore nel caricamento dei tutor arbitrali: {e}")
+            return None
+    
+    # Usa la cache se disponibile e non scaduta
+    return _cache_tutor.ottieni('tutti', carica, force_reload) or []
 
 def get_tutor(tutor_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -146,7 +128,7 @@ def crea_tutor(nome: str, cognome: str, email: str, telefono: str, qualifica: st
             
             if response.data and len(response.data) > 0:
                 # Invalida la cache
-                _cache['tutor_arbitrali'] = None
+                cache.invalida_tag('tutor')
                 return response.data[0]
         else:
             # Simulazione di creazione se Supabase non è configurato
@@ -165,7 +147,7 @@ def crea_tutor(nome: str, cognome: str, email: str, telefono: str, qualifica: st
             }
             
             # Invalida la cache
-            _cache['tutor_arbitrali'] = None
+            cache.invalida_tag('tutor')
             return tutor_data
     except Exception as e:
         print(f"Errore nella creazione del tutor: {e}")
@@ -208,7 +190,7 @@ def aggiorna_tutor(tutor_id: int, nome: str, cognome: str, email: str, telefono:
             response = supabase.table('tutor_arbitrali').update(tutor_data).eq('id', tutor_id).execute()
             
             # Invalida la cache
-            _cache['tutor_arbitrali'] = None
+            cache.invalida_tag('tutor')
             return True
         else:
             # Simulazione di aggiornamento se Supabase non è configurato
@@ -227,7 +209,7 @@ def aggiorna_tutor(tutor_id: int, nome: str, cognome: str, email: str, telefono:
                     }
                     
                     # Invalida la cache
-                    _cache['tutor_arbitrali'] = None
+                    cache.invalida_tag('tutor')
                     return True
     except Exception as e:
         print(f"Errore nell'aggiornamento del tutor: {e}")
@@ -254,7 +236,7 @@ def elimina_tutor(tutor_id: int) -> bool:
             response = supabase.table('tutor_arbitrali').delete().eq('id', tutor_id).execute()
             
             # Invalida la cache
-            _cache['tutor_arbitrali'] = None
+            cache.invalida_tag('tutor')
             return True
         else:
             # Simulazione di eliminazione se Supabase non è configurato
@@ -264,7 +246,7 @@ def elimina_tutor(tutor_id: int) -> bool:
                     del tutor_arbitrali[i]
                     
                     # Invalida la cache
-                    _cache['tutor_arbitrali'] = None
+                    cache.invalida_tag('tutor')
                     return True
     except Exception as e:
         print(f"Errore nell'eliminazione del tutor: {e}")
@@ -331,6 +313,11 @@ def assegna_tutor_partita(partita_id: int, tutor_id: int, note: str) -> bool:
             
             response = supabase.table('tutor_partite').insert(tutor_partita_data).execute()
             
+            # Aggiorna statistiche e disponibilità
+            if response.data:
+                from modules.campionati_manager import aggiorna_indici
+                aggiorna_indici('registra_tutor_partita', response.data[0])
+            
             return True
         else:
             # Simulazione di assegnazione se Supabase non è configurato
@@ -359,6 +346,10 @@ def rimuovi_tutor_partita(tutor_partita_id: int) -> bool:
             # Rimuovi l'assegnazione
             response = supabase.table('tutor_partite').delete().eq('id', tutor_partita_id).execute()
             
+            # Aggiorna statistiche e disponibilità
+            from modules.campionati_manager import aggiorna_indici
+            aggiorna_indici('rimuovi_tutor_partita', tutor_partita_id)
+            
             return True
         else:
             # Simulazione di rimozione se Supabase non è configurato
@@ -1,30 +1,211 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
 import logging
+import threading
 from datetime import datetime
-from modules.data_manager import carica_utenti, salva_utenti
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 # Importa le costanti dal modulo di configurazione
 from modules.config import ADMIN_IDS
 
+# Intervallo dopo cui il registro viene ricostruito (5 minuti), per riallineare
+# le modifiche fatte fuori dall'applicazione; quelle degli altri processi
+# arrivano tramite modules.bus_invalidazioni
+RICOSTRUZIONE_TTL = 300
+
+# Attesa prima di ritentare la lettura degli utenti dopo un errore (secondi)
+RIPROVA_DOPO_ERRORE = 10
+
+def _id_utente(valore: Any) -> Any:
+    """Normalizza l'ID di un utente (gli ID numerici salvati come stringa diventano interi)."""
+    return int(valore) if isinstance(valore, str) and valore.isdigit() else valore
+
+def _record_utente(utente: Any) -> Dict[str, Any]:
+    """Restituisce una copia dell'utente come dizionario (nel vecchio formato gli utenti erano solo ID)."""
+    if isinstance(utente, dict):
+        return dict(utente, id=_id_utente(utente.get('id')))
+    return {"id": _id_utente(utente), "nome": "Utente", "username": None, "data_registrazione": None}
+
+class RegistroUtenti:
+    """
+    Registro in memoria degli utenti del bot.
+    
+    Gli utenti autorizzati e in attesa sono indicizzati per ID, insieme agli ID
+    degli amministratori, quindi le verifiche dei permessi fatte da quasi tutti
+    i gestori sono ricerche O(1) che non leggono né il file né Supabase. Il
+    registro viene caricato una volta e aggiornato dai salvataggi degli utenti
+    (db_manager.salva_utenti, upsert_utente, set_stato_utente, elimina_utente),
+    senza rileggere i dati.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.invalida()
+    
+    def invalida(self) -> None:
+        """Scarta il registro, che verrà ricostruito alla prossima lettura."""
+        with self.lock:
+            self.costruito = False
+            self.ultima_costruzione = 0
+            self.ultimo_errore = 0
+            # ID -> utente, nell'ordine di salvataggio
+            self.autorizzati = {}
+            self.in_attesa = {}
+            # ID degli utenti autorizzati con ruolo 'admin'
+            self.admin = set()
+    
+    def assicura(self) -> None:
+        """Costruisce il registro se manca o è scaduto (dopo un errore, non prima di RIPROVA_DOPO_ERRORE)."""
+        with self.lock:
+            if self.costruito and time.time() - self.ultima_costruzione <= RICOSTRUZIONE_TTL:
+                return
+            if time.time() - self.ultimo_errore < RIPROVA_DOPO_ERRORE:
+                return
+            self.ricostruisci()
+    
+    def ricostruisci(self) -> None:
+        """
+        Ricostruisce il registro dagli utenti del database (o del file locale se
+        Supabase non è configurato).
+        
+        Se la lettura fallisce il registro precedente resta in uso, senza essere
+        segnato come ricostruito, e la lettura viene ritentata. Se il registro non
+        è mai stato costruito vengono usati intanto gli utenti del file locale.
+        """
+        from modules.db_manager import leggi_utenti, _carica_utenti_da_file
+        
+        try:
+            utenti = leggi_utenti()
+        except Exception as e:
+            logger.error(f"Errore nel caricamento degli utenti, registro non aggiornato: {e}")
+            with self.lock:
+                self.ultimo_errore = time.time()
+                if not self.costruito and not self.autorizzati and not self.in_attesa:
+                    self._indicizza(_carica_utenti_da_file())
+            return
+        
+        self.sostituisci(utenti)
+    
+    def sostituisci(self, utenti_data: Dict[str, List]) -> None:
+        """
+        Ricostruisce il registro da un elenco completo di utenti, ad esempio dopo un salvataggio.
+        
+        Args:
+            utenti_data: Dizionario con le liste 'autorizzati' e 'in_attesa'
+        """
+        with self.lock:
+            self._indicizza(utenti_data)
+            self.costruito = True
+            self.ultima_costruzione = time.time()
+    
+    def _indicizza(self, utenti_data: Dict[str, List]) -> None:
+        """Sostituisce gli indici con gli utenti indicati."""
+        autorizzati = {}
+        for utente in utenti_data.get("autorizzati", []):
+            record = _record_utente(utente)
+            autorizzati[record['id']] = record
+        in_attesa = {}
+        for utente in utenti_data.get("in_attesa", []):
+            record = _record_utente(utente)
+            in_attesa[record['id']] = record
+        
+        with self.lock:
+            self.autorizzati = autorizzati
+            self.in_attesa = in_attesa
+            self.admin = {id for id, utente in autorizzati.items() if utente.get("ruolo") == "admin"}
+    
+    def _aggiorna(self, modifica) -> None:
+        """Esegue una modifica del registro, scartandolo in caso di errore."""
+        with self.lock:
+            if not self.costruito:
+                return
+            try:
+                modifica()
+            except Exception as e:
+                logger.error(f"Errore nell'aggiornamento del registro degli utenti: {e}")
+                self.invalida()
+    
+    def _scollega(self, user_id: Any) -> None:
+        """Rimuove un utente dal registro."""
+        self.autorizzati.pop(user_id, None)
+        self.in_attesa.pop(user_id, None)
+        self.admin.discard(user_id)
+    
+    # Aggiornamenti incrementali
+    
+    def registra_utente(self, utente: Dict[str, Any], stato: str) -> None:
+        """
+        Aggiorna il registro dopo l'inserimento o la modifica di un utente.
+        
+        Args:
+            utente: Dati dell'utente
+            stato: 'autorizzato' o 'in_attesa'
+        """
+        def modifica():
+            record = _record_utente(utente)
+            self._scollega(record['id'])
+            if stato == 'autorizzato':
+                self.autorizzati[record['id']] = record
+                if record.get("ruolo") == "admin":
+                    self.admin.add(record['id'])
+            else:
+                self.in_attesa[record['id']] = record
+        
+        self._aggiorna(modifica)
+    
+    def rimuovi_utente(self, user_id: Any) -> None:
+        """Aggiorna il registro dopo l'eliminazione di un utente."""
+        self._aggiorna(lambda: self._scollega(_id_utente(user_id)))
+    
+    # Letture
+    
+    def is_autorizzato(self, user_id: Any) -> bool:
+        """Verifica se l'utente è tra gli autorizzati."""
+        self.assicura()
+        return _id_utente(user_id) in self.autorizzati
+    
+    def is_in_attesa(self, user_id: Any) -> bool:
+        """Verifica se l'utente è in attesa di approvazione."""
+        self.assicura()
+        return _id_utente(user_id) in self.in_attesa
+    
+    def is_admin(self, user_id: Any) -> bool:
+        """Verifica se l'utente è un amministratore registrato nel database."""
+        self.assicura()
+        return _id_utente(user_id) in self.admin
+    
+    def utente(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        """Restituisce una copia dei dati dell'utente (autorizzato o in attesa), o None."""
+        self.assicura()
+        with self.lock:
+            user_id = _id_utente(user_id)
+            utente = self.autorizzati.get(user_id) or self.in_attesa.get(user_id)
+            return dict(utente) if utente else None
+    
+    def esporta(self) -> Dict[str, List]:
+        """Restituisce copie degli utenti nel formato di db_manager.carica_utenti."""
+        self.assicura()
+        with self.lock:
+            return {
+                "autorizzati": [dict(u) for u in self.autorizzati.values()],
+                "in_attesa": [dict(u) for u in self.in_attesa.values()]
+            }
+
+# Registro degli utenti condiviso dal processo
+registro_utenti = RegistroUtenti()
+
 # Funzione per verificare se un utente è autorizzato
 def is_utente_autorizzato(user_id):
-    utenti = carica_utenti()
     # Verifica se l'utente è un amministratore
     if user_id in ADMIN_IDS:
         return True
     
     # Verifica se l'utente è nella lista degli autorizzati
-    for utente in utenti["autorizzati"]:
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            return True
-        elif not isinstance(utente, dict) and utente == user_id:  # Compatibilità con il vecchio formato
-            return True
-    
-    return False
+    return registro_utenti.is_autorizzato(user_id)
 
 # Funzione per verificare se un utente è amministratore
 def is_admin(user_id):
@@ -33,145 +214,103 @@ def is_admin(user_id):
         return True
     
     # Verifica se l'utente è un admin nel database
-    utenti = carica_utenti()
-    for utente in utenti["autorizzati"]:
-        if isinstance(utente, dict) and utente.get("id") == user_id and utente.get("ruolo") == "admin":
-            return True
-    
-    return False
+    return registro_utenti.is_admin(user_id)
 
 # Funzione per aggiungere un utente alla lista di attesa
 def aggiungi_utente_in_attesa(user_id, nome, username=None):
-    utenti = carica_utenti()
+    from modules.db_manager import upsert_utente
     
     # Verifica se l'utente è già autorizzato
-    for utente in utenti["autorizzati"]:
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            return False, "Utente già autorizzato"
-        elif not isinstance(utente, dict) and utente == user_id:
-            return False, "Utente già autorizzato"
+    if registro_utenti.is_autorizzato(user_id):
+        return False, "Utente già autorizzato"
     
     # Verifica se l'utente è già in attesa
-    for utente in utenti["in_attesa"]:
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            return False, "Utente già in attesa di approvazione"
-        elif not isinstance(utente, dict) and utente == user_id:
-            return False, "Utente già in attesa di approvazione"
+    if registro_utenti.is_in_attesa(user_id):
+        return False, "Utente già in attesa di approvazione"
     
     # Aggiungi l'utente alla lista di attesa
-    utenti["in_attesa"].append({
+    utente = {
         "id": user_id,
         "nome": nome,
         "username": username,
         "data_registrazione": datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    })
-    
-    salva_utenti(utenti)
+    }
+    if not upsert_utente(utente, "in_attesa"):
+        return False, "Errore nel salvataggio dell'utente"
     return True, "Utente aggiunto alla lista di attesa"
 
 # Funzione per approvare un utente
 def approva_utente(user_id):
-    utenti = carica_utenti()
-    
-    # Cerca l'utente nella lista di attesa
-    for i, utente in enumerate(utenti["in_attesa"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            # Rimuovi l'utente dalla lista di attesa
-            utente_da_approvare = utenti["in_attesa"].pop(i)
-            # Aggiungi l'utente alla lista degli autorizzati
-            utenti["autorizzati"].append(utente_da_approvare)
-            salva_utenti(utenti)
-            return True, "Utente approvato con successo"
-        elif not isinstance(utente, dict) and utente == user_id:
-            # Compatibilità con il vecchio formato
-            utente_da_approvare = utenti["in_attesa"].pop(i)
-            utenti["autorizzati"].append({"id": user_id, "nome": "Utente", "username": None, "data_registrazione": datetime.now().strftime("%d/%m/%Y %H:%M:%S")})
-            salva_utenti(utenti)
-            return True, "Utente approvato con successo"
-    
-    return False, "Utente non trovato nella lista di attesa"
+    from modules.db_manager import set_stato_utente
+    
+    if not registro_utenti.is_in_attesa(user_id):
+        return False, "Utente non trovato nella lista di attesa"
+    
+    # Sposta l'utente dalla lista di attesa a quella degli autorizzati
+    if not set_stato_utente(_id_utente(user_id), "autorizzato"):
+        return False, "Errore nel salvataggio dell'utente"
+    return True, "Utente approvato con successo"
 
 # Funzione per rifiutare un utente
 def rifiuta_utente(user_id):
-    utenti = carica_utenti()
-    
-    # Cerca l'utente nella lista di attesa
-    for i, utente in enumerate(utenti["in_attesa"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            # Rimuovi l'utente dalla lista di attesa
-            utenti["in_attesa"].pop(i)
-            salva_utenti(utenti)
-            return True, "Utente rifiutato con successo"
-        elif not isinstance(utente, dict) and utente == user_id:
-            # Compatibilità con il vecchio formato
-            utenti["in_attesa"].pop(i)
-            salva_utenti(utenti)
-            return True, "Utente rifiutato con successo"
-    
-    return False, "Utente non trovato nella lista di attesa"
+    from modules.db_manager import elimina_utente
+    
+    if not registro_utenti.is_in_attesa(user_id):
+        return False, "Utente non trovato nella lista di attesa"
+    
+    # Rimuovi l'utente dalla lista di attesa
+    if not elimina_utente(_id_utente(user_id)):
+        return False, "Errore nel salvataggio dell'utente"
+    return True, "Utente rifiutato con successo"
 
 # Funzione per rimuovere un utente autorizzato
 def rimuovi_utente_autorizzato(user_id):
-    utenti = carica_utenti()
-    
-    # Cerca l'utente nella lista degli autorizzati
-    for i, utente in enumerate(utenti["autorizzati"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            # Rimuovi l'utente dalla lista degli autorizzati
-            utenti["autorizzati"].pop(i)
-            salva_utenti(utenti)
-            return True, "Utente rimosso con successo"
-        elif not isinstance(utente, dict) and utente == user_id:
-            # Compatibilità con il vecchio formato
-            utenti["autorizzati"].pop(i)
-            salva_utenti(utenti)
-            return True, "Utente rimosso con successo"
-    
-    return False, "Utente non trovato nella lista degli autorizzati"
+    from modules.db_manager import elimina_utente
+    
+    if not registro_utenti.is_autorizzato(user_id):
+        return False, "Utente non trovato nella lista degli autorizzati"
+    
+    # Rimuovi l'utente dalla lista degli autorizzati
+    if not elimina_utente(_id_utente(user_id)):
+        return False, "Errore nel salvataggio dell'utente"
+    return True, "Utente rimosso con successo"
+    
+def _imposta_ruolo(user_id, ruolo: str) -> bool:
+    """Salva il nuovo ruolo di un utente autorizzato."""
+    from modules.db_manager import upsert_utente
+    
+    utente = registro_utenti.utente(user_id)
+    utente["ruolo"] = ruolo
+    if utente.get("nome") == "Utente" and not utente.get("data_registrazione"):
+        # Converti il vecchio formato
+        utente["nome"] = f"Utente {user_id}"
+        utente["data_registrazione"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    return upsert_utente(utente, "autorizzato")
 
 # Funzione per promuovere un utente a admin
 def promuovi_utente_admin(user_id):
-    utenti = carica_utenti()
-    
-    # Cerca l'utente nella lista degli autorizzati
-    for i, utente in enumerate(utenti["autorizzati"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            # Verifica se l'utente è già admin
-            if utente.get("ruolo") == "admin":
-                return False, "L'utente è già amministratore"
-            
-            # Promuovi l'utente a admin
-            utenti["autorizzati"][i]["ruolo"] = "admin"
-            salva_utenti(utenti)
-            return True, "Utente promosso ad amministratore con successo"
-        elif not isinstance(utente, dict) and utente == user_id:
-            # Converti il vecchio formato e promuovi a admin
-            utenti["autorizzati"][i] = {
-                "id": user_id,
-                "nome": f"Utente {user_id}",
-                "username": None,
-                "data_registrazione": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
-                "ruolo": "admin"
-            }
-            salva_utenti(utenti)
-            return True, "Utente promosso ad amministratore con successo"
+    if not registro_utenti.is_autorizzato(user_id):
+        return False, "Utente non trovato nella lista degli autorizzati"
     
-    return False, "Utente non trovato nella lista degli autorizzati"
+    # Verifica se l'utente è già admin
+    if registro_utenti.is_admin(user_id):
+        return False, "L'utente è già amministratore"
+            
+    # Promuovi l'utente a admin
+    if not _imposta_ruolo(user_id, "admin"):
+        return False, "Errore nel salvataggio dell'utente"
+    return True, "Utente promosso ad amministratore con successo"
 
 # Funzione per declassare un utente da admin
 def declassa_utente_admin(user_id):
-    utenti = carica_utenti()
-    
-    # Cerca l'utente nella lista degli autorizzati
-    for i, utente in enumerate(utenti["autorizzati"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            # Verifica se l'utente è admin
-            if utente.get("ruolo") != "admin":
-                return False, "L'utente non è un amministratore"
-            
-            # Declassa l'utente a utente normale
-            utenti["autorizzati"][i]["ruolo"] = "utente"
-            salva_utenti(utenti)
-            return True, "Privilegi di amministratore rimossi con successo"
+    if not registro_utenti.is_autorizzato(user_id):
+        return False, "Utente non trovato nella lista degli autorizzati"
     
-    return False, "Utente non trovato nella lista degli autorizzati"
\ No newline at end of file
+    # Verifica se l'utente è admin
+    if not registro_utenti.is_admin(user_id):
+        return False, "L'utente non è un amministratore"
+            
+    # Declassa l'utente a utente normale
+    if not _imposta_ruolo(user_id, "utente"):
+        return False, "Errore nel salvataggio dell'utente"
+    return True, "Privilegi di amministratore rimossi con successo"
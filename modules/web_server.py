@@ -11,6 +11,7 @@ from datetime import datetime
 
 # Importa il monitor del bot
 from modules.monitor import bot_monitor
+from modules.metriche import CONTENT_TYPE, genera_metriche
 
 # Configurazione logging
 logger = logging.getLogger(__name__)
@@ -45,6 +46,8 @@ class WebRequestHandler(BaseHTTPRequestHandler):
             self._serve_health_json()
         elif path == '/admin/api/stats' or path == '/api/stats':
             self._serve_stats_json()
+        elif path == '/metrics':
+            self._serve_metrics()
         elif path.startswith('/static/'):
             self._serve_static_file(path[8:])  # Rimuove '/static/' dal percorso
         else:
@@ -136,6 +139,7 @@ class WebRequestHandler(BaseHTTPRequestHandler):
                 <ul>
                     <li><a href="/health">Stato di salute base</a></li>
                     <li><a href="/monitor">Dashboard di monitoraggio completa</a></li>
+                    <li><a href="/metrics">Metriche in formato Prometheus</a></li>
                 </ul>
             </div>
         </body>
@@ -901,12 +905,27 @@ class WebRequestHandler(BaseHTTPRequestHandler):
             'command_counts': bot_monitor.command_counts,
             'error_count': bot_monitor.metrics['errors'],
             'active_users': len(bot_monitor.metrics['active_users']),
-            'active_users_24h': len(bot_monitor.metrics['active_users_24h'])
+            'active_users_24h': bot_monitor.get_activity()['active_users_24h'],
+            # Campioni delle risorse raccolti in background, per i grafici storici
+            'system_history': [
+                {key: sample[key] for key in ('timestamp', 'cpu_percent', 'memory_percent', 'process_rss', 'threads')}
+                for sample in bot_monitor.sampler.history()
+            ]
         }
         
         json_data = json.dumps(stats, default=str)
         self.wfile.write(json_data.encode())
     
+    def _serve_metrics(self):
+        """Serve le metriche nel formato di esposizione di Prometheus, senza campionare il sistema."""
+        body = genera_metriche(bot_monitor).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+    
     def _serve_static_file(self, path):
         """Serve un file statico."""
         # Per sicurezza, limitiamo i file che possono essere serviti
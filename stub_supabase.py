@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Server PostgREST minimale in memoria per i test offline.
+
+Implementa il sottoinsieme dell'API REST di Supabase usato dal bot
+(select, filtri, ordinamento, paginazione, insert, upsert, update e delete)
+e conta le richieste ricevute, così i test possono verificare quante
+chiamate di rete esegue ogni operazione senza un database reale.
+"""
+
+import gzip
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+def _converti(valore):
+    """Converte un valore testuale della query string nel tipo più adatto."""
+    if valore == 'null':
+        return None
+    if valore in ('true', 'false'):
+        return valore == 'true'
+    try:
+        return int(valore)
+    except ValueError:
+        pass
+    try:
+        return float(valore)
+    except ValueError:
+        return valore
+
+def _dividi_lista(valore):
+    """Divide una lista PostgREST '(a,b,"c,d")' nei suoi elementi."""
+    valore = valore.strip()
+    if valore.startswith('(') and valore.endswith(')'):
+        valore = valore[1:-1]
+    elementi = []
+    corrente = ''
+    tra_virgolette = False
+    # Le condizioni annidate (es. and(...)) vengono mantenute intatte
+    profondita = 0
+    i = 0
+    while i < len(valore):
+        c = valore[i]
+        if profondita:
+            profondita += {'(': 1, ')': -1}.get(c, 0) if not tra_virgolette else 0
+            if c == '"' and valore[i - 1] != '\\':
+                tra_virgolette = not tra_virgolette
+            corrente += c
+        elif c == '\\' and i + 1 < len(valore):
+            corrente += valore[i + 1]
+            i += 2
+            continue
+        elif c == '"':
+            tra_virgolette = not tra_virgolette
+        elif c == '(' and not tra_virgolette:
+            profondita += 1
+            corrente += c
+        elif c == ',' and not tra_virgolette:
+            elementi.append(corrente)
+            corrente = ''
+        else:
+            corrente += c
+        i += 1
+    elementi.append(corrente)
+    return [_converti(e) for e in elementi if e != '']
+
+def _confronta(a, b):
+    """Rende confrontabili valori di tipo diverso (es. int e stringa)."""
+    if isinstance(a, (int, float)) and isinstance(b, str):
+        return str(a), b
+    if isinstance(a, str) and isinstance(b, (int, float)):
+        return a, str(b)
+    return a, b
+
+def _verifica_condizione(riga, condizione):
+    """Verifica una condizione 'colonna.operatore.valore' oppure un gruppo annidato and(...) o or(...)."""
+    for logico in ('and', 'or'):
+        if condizione.startswith(logico + '('):
+            esiti = [_verifica_condizione(riga, str(c)) for c in _dividi_lista(condizione[len(logico):])]
+            return all(esiti) if logico == 'and' else any(esiti)
+    colonna, _, espressione = condizione.partition('.')
+    return _verifica_filtro(riga, colonna, espressione)
+
+def _chiave_ordinamento(valore):
+    """Chiave di ordinamento: i numeri in ordine numerico, poi i testi, i valori nulli in fondo."""
+    if valore is None:
+        return (1, 0, 0, '')
+    if isinstance(valore, (int, float)) and not isinstance(valore, bool):
+        return (0, 0, valore, '')
+    return (0, 1, 0, str(valore))
+
+def _verifica_filtro(riga, colonna, espressione):
+    """Verifica se una riga soddisfa un filtro PostgREST 'operatore.valore'."""
+    operatore, _, valore = espressione.partition('.')
+    negato = False
+    if operatore == 'not':
+        negato = True
+        operatore, _, valore = valore.partition('.')
+    
+    campo = riga.get(colonna)
+    if operatore == 'in':
+        esito = campo in _dividi_lista(valore)
+    elif operatore == 'is':
+        esito = campo is None if valore == 'null' else campo == _converti(valore)
+    elif operatore in ('like', 'ilike'):
+        modello = '^' + '.*'.join(re.escape(parte) for parte in valore.replace('*', '%').split('%')) + '$'
+        esito = campo is not None and re.match(modello, str(campo), re.IGNORECASE if operatore == 'ilike' else 0) is not None
+    else:
+        atteso = _converti(valore)
+        if operatore == 'eq':
+            esito = campo == atteso or str(campo) == str(atteso)
+        elif operatore == 'neq':
+            esito = campo != atteso and str(campo) != str(atteso)
+        elif campo is None:
+            esito = False
+        else:
+            a, b = _confronta(campo, atteso)
+            if operatore == 'gt':
+                esito = a > b
+            elif operatore == 'gte':
+                esito = a >= b
+            elif operatore == 'lt':
+                esito = a < b
+            elif operatore == 'lte':
+                esito = a <= b
+            else:
+                raise ValueError(f"Operatore non supportato: {operatore}")
+    return not esito if negato else esito
+
+class StubSupabase:
+    """
+    Database in memoria esposto tramite un server HTTP compatibile con PostgREST.
+    
+    Args:
+        chiavi_uniche: Dizionario tabella -> lista di colonne con vincolo di unicità
+        latenza: Ritardo in secondi aggiunto a ogni richiesta per simulare la rete
+        latenza_connessione: Ritardo in secondi aggiunto a ogni nuova connessione
+            per simulare l'handshake TCP e TLS
+        max_righe: Numero massimo di righe restituite da una select, come il
+            parametro max-rows di PostgREST (1000 su Supabase)
+    """
+    
+    def __init__(self, chiavi_uniche=None, latenza=0.0, latenza_connessione=0.0, max_righe=None):
+        self.tabelle = {}
+        self.chiavi_uniche = chiavi_uniche or {}
+        self.latenza = latenza
+        self.latenza_connessione = latenza_connessione
+        self.max_righe = max_righe
+        self.richieste = []
+        # (metodo, tabella) -> numero di richieste a cui rispondere con un errore
+        self.guasti = {}
+        # Stato HTTP restituito dalle richieste guaste
+        self.stato_guasti = 500
+        # Connessioni TCP accettate e byte inviati nei corpi delle risposte
+        self.connessioni = 0
+        self.byte_inviati = 0
+        self._lock = threading.Lock()
+        self._prossimo_id = {}
+        self.server = None
+        self.thread = None
+    
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def avvia(self):
+        """Avvia il server su una porta libera in un thread separato."""
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1: le connessioni restano aperte tra una richiesta e l'altra
+            protocol_version = 'HTTP/1.1'
+            # Evita i ritardi dell'algoritmo di Nagle tra intestazioni e corpo della risposta
+            disable_nagle_algorithm = True
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def setup(self):
+                super().setup()
+                if stub.latenza_connessione:
+                    time.sleep(stub.latenza_connessione)
+                with stub._lock:
+                    stub.connessioni += 1
+            
+            def _gestisci(self, metodo):
+                if stub.latenza:
+                    time.sleep(stub.latenza)
+                url = urlparse(self.path)
+                parti = url.path.strip('/').split('/')
+                tabella = parti[-1]
+                parametri = parse_qsl(url.query, keep_blank_values=True)
+                lunghezza = int(self.headers.get('Content-Length') or 0)
+                corpo = json.loads(self.rfile.read(lunghezza) or 'null') if lunghezza else None
+                with stub._lock:
+                    stub.richieste.append((metodo, tabella, url.query))
+                    stato, dati, intestazioni = stub._esegui(metodo, tabella, parametri, corpo, self.headers)
+                risposta = json.dumps(dati).encode('utf-8')
+                compressa = 'gzip' in (self.headers.get('Accept-Encoding') or '') and len(risposta) > 1024
+                if compressa:
+                    risposta = gzip.compress(risposta)
+                with stub._lock:
+                    stub.byte_inviati += len(risposta)
+                self.send_response(stato)
+                self.send_header('Content-Type', 'application/json')
+                if compressa:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(risposta)))
+                for nome, valore in intestazioni.items():
+                    self.send_header(nome, valore)
+                self.end_headers()
+                self.wfile.write(risposta)
+            
+            def do_GET(self):
+                self._gestisci('GET')
+            
+            def do_POST(self):
+                self._gestisci('POST')
+            
+            def do_PATCH(self):
+                self._gestisci('PATCH')
+            
+            def do_DELETE(self):
+                self._gestisci('DELETE')
+        
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # I client che chiudono la connessione (es. per timeout) non sono un errore
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+        
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    
+    def ferma(self):
+        """Arresta il server."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+    
+    def azzera_richieste(self):
+        """Svuota il registro delle richieste ricevute e i contatori di connessioni e byte."""
+        with self._lock:
+            self.richieste = []
+            self.connessioni = 0
+            self.byte_inviati = 0
+    
+    def conta_richieste(self, metodo=None, tabella=None):
+        """Conta le richieste ricevute, filtrando per metodo e tabella."""
+        with self._lock:
+            return sum(1 for m, t, _ in self.richieste
+                       if (metodo is None or m == metodo) and (tabella is None or t == tabella))
+    
+    def righe(self, tabella):
+        """Restituisce una copia delle righe di una tabella."""
+        with self._lock:
+            return [dict(r) for r in self.tabelle.get(tabella, [])]
+    
+    def _filtra(self, righe, parametri):
+        riservati = ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns')
+        for colonna, espressione in parametri:
+            if colonna in riservati:
+                continue
+            if colonna in ('or', 'and'):
+                righe = [r for r in righe if _verifica_condizione(r, colonna + espressione)]
+            else:
+                righe = [r for r in righe if _verifica_filtro(r, colonna, espressione)]
+        return righe
+    
+    def _assegna_id(self, tabella, riga):
+        if 'id' not in riga or riga['id'] is None:
+            esistenti = [r.get('id') for r in self.tabelle.get(tabella, []) if isinstance(r.get('id'), int)]
+            prossimo = max([self._prossimo_id.get(tabella, 0)] + esistenti) + 1
+            self._prossimo_id[tabella] = prossimo
+            riga['id'] = prossimo
+        return riga
+    
+    def _esegui(self, metodo, tabella, parametri, corpo, headers):
+        if self.guasti.get((metodo, tabella)):
+            self.guasti[(metodo, tabella)] -= 1
+            return self.stato_guasti, {'message': 'Errore simulato'}, {}
+        
+        righe = self.tabelle.setdefault(tabella, [])
+        opzioni = dict((k, v) for k, v in parametri if k in ('select', 'order', 'limit', 'offset', 'on_conflict'))
+        prefer = headers.get('Prefer', '') or ''
+        
+        if metodo == 'GET':
+            trovate = self._filtra(righe, parametri)
+            totale = len(trovate)
+            if 'order' in opzioni:
+                for criterio in reversed(opzioni['order'].split(',')):
+                    parti = criterio.split('.')
+                    decrescente = 'desc' in parti[1:]
+                    trovate = sorted(
+                        trovate,
+                        key=lambda r, c=parti[0]: _chiave_ordinamento(r.get(c)),
+                        reverse=decrescente
+                    )
+                    # Come in PostgreSQL i nulli vanno in fondo se crescente, in testa se decrescente
+                    nulli_in_testa = 'nullsfirst' in parti[1:] or (decrescente and 'nullslast' not in parti[1:])
+                    if nulli_in_testa != decrescente:
+                        nulli = [r for r in trovate if r.get(parti[0]) is None]
+                        valori = [r for r in trovate if r.get(parti[0]) is not None]
+                        trovate = nulli + valori if nulli_in_testa else valori + nulli
+            inizio = int(opzioni.get('offset', 0))
+            intestazione_range = headers.get('Range')
+            if intestazione_range:
+                da, _, a = intestazione_range.partition('-')
+                inizio = int(da)
+                trovate = trovate[inizio:int(a) + 1]
+            else:
+                trovate = trovate[inizio:]
+                if 'limit' in opzioni:
+                    trovate = trovate[:int(opzioni['limit'])]
+            if self.max_righe is not None:
+                trovate = trovate[:self.max_righe]
+            if 'select' in opzioni and opzioni['select'] != '*':
+                colonne = opzioni['select'].split(',')
+                trovate = [{c: r.get(c) for c in colonne} for r in trovate]
+            intestazioni = {}
+            if 'count=' in prefer:
+                fine = inizio + len(trovate) - 1 if trovate else inizio
+                intestazioni['Content-Range'] = f"{inizio}-{fine}/{totale}"
+            return 200, [dict(r) for r in trovate], intestazioni
+        
+        if metodo == 'POST':
+            nuove = corpo if isinstance(corpo, list) else [corpo]
+            if nuove and len({tuple(sorted(r.keys())) for r in nuove}) > 1:
+                return 400, {'message': 'All object keys must match'}, {}
+            unisci = 'merge-duplicates' in prefer
+            chiavi = (opzioni.get('on_conflict') or '').split(',') if opzioni.get('on_conflict') else ['id']
+            vincoli = [chiavi] + [k for k in self.chiavi_uniche.get(tabella, []) if k != chiavi]
+            salvate = []
+            for nuova in nuove:
+                nuova = dict(nuova)
+                esistente = None
+                for vincolo in vincoli:
+                    if all(c in nuova for c in vincolo):
+                        for r in righe:
+                            if all(str(r.get(c)) == str(nuova.get(c)) for c in vincolo):
+                                esistente = r
+                                break
+                    if esistente is not None:
+                        break
+                if esistente is not None:
+                    if not unisci:
+                        return 409, {'message': 'duplicate key value violates unique constraint'}, {}
+                    esistente.update(nuova)
+                    salvate.append(dict(esistente))
+                else:
+                    self._assegna_id(tabella, nuova)
+                    righe.append(nuova)
+                    salvate.append(dict(nuova))
+            return 201, salvate, {}
+        
+        if metodo == 'PATCH':
+            trovate = self._filtra(righe, parametri)
+            for r in trovate:
+                r.update(corpo or {})
+            return 200, [dict(r) for r in trovate], {}
+        
+        if metodo == 'DELETE':
+            trovate = self._filtra(righe, parametri)
+            identita = set(id(r) for r in trovate)
+            self.tabelle[tabella] = [r for r in righe if id(r) not in identita]
+            return 200, [dict(r) for r in trovate], {}
+        
+        return 405, {'message': 'Metodo non supportato'}, {}
+
+def collega_db_manager(stub):
+    """
+    Punta il client Supabase di modules.db_manager verso lo stub.
+    
+    Returns:
+        Il modulo db_manager configurato
+    """
+    from modules import db_manager
+    db_manager.supabase = db_manager.SupabaseClient(stub.url, 'chiave-di-test')
+    db_manager.SUPABASE_URL = stub.url
+    db_manager.SUPABASE_KEY = 'chiave-di-test'
+    # Lo stato persistito noto al modulo non vale più per il nuovo database
+    db_manager._snapshot_risultati['hash'] = {}
+    db_manager._snapshot_risultati['caricato'] = False
+    db_manager._snapshot_gironi['righe'] = None
+    db_manager._snapshot_gironi['albero'] = None
+    # Anche le cache dei manager si riferiscono al database precedente
+    from modules.cache_manager import cache
+    cache.svuota()
+    if 'modules.statistiche_manager' in sys.modules:
+        sys.modules['modules.statistiche_manager'].aggregati_arbitri.invalida()
+    if 'modules.disponibilita_manager' in sys.modules:
+        sys.modules['modules.disponibilita_manager'].indice_disponibilita.invalida()
+    if 'modules.risultati_manager' in sys.modules:
+        sys.modules['modules.risultati_manager'].indice_risultati.invalida()
+    if 'modules.user_manager' in sys.modules:
+        sys.modules['modules.user_manager'].registro_utenti.invalida()
+    return db_manager
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del bus delle invalidazioni della cache tra processi (modules/bus_invalidazioni.py).
+Un secondo processo Python simula l'interfaccia web che modifica i dati.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.bus_invalidazioni import BusInvalidazioni
+from modules.cache_manager import cache
+from modules.risultati_manager import indice_risultati
+
+CARTELLA = os.path.dirname(os.path.abspath(__file__))
+
+def scrivi_da_altro_processo(percorso, *tag):
+    """Invalida i tag indicati in un altro processo con il bus avviato sullo stesso file."""
+    codice = (
+        "import sys\n"
+        "from modules.bus_invalidazioni import BusInvalidazioni\n"
+        "from modules.cache_manager import cache\n"
+        "bus = BusInvalidazioni(sys.argv[1])\n"
+        "bus.avvia()\n"
+        "cache.invalida_tag(*sys.argv[2:])\n"
+        "bus.ferma()\n"
+    )
+    subprocess.run([sys.executable, '-c', codice, percorso, *tag], cwd=CARTELLA, check=True)
+
+def attendi(condizione, timeout=3.0):
+    """Attende che la condizione diventi vera, fino al timeout."""
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if condizione():
+            return True
+        time.sleep(0.02)
+    return condizione()
+
+def test_invalidazioni_remote():
+    """Verifica che le scritture di un altro processo invalidino solo i dati dipendenti."""
+    print("\n=== Test invalidazioni tra processi ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        percorso = os.path.join(cartella, 'invalidazioni.db')
+        bus = BusInvalidazioni(percorso, intervallo=0.05)
+        bus.avvia()
+        try:
+            utenti = cache.namespace('utenti_autorizzati', tag=('utenti',))
+            arbitri = cache.namespace('arbitri')
+            classifica = cache.namespace('classifica_campionato', tag=('classifica',))
+            for ns in (utenti, arbitri, classifica):
+                ns.imposta('tutti', 'valore')
+            indice_risultati.sostituisci([{'id': 1, 'data_partita': '01/03/2025'}])
+            
+            # Approvazione di un utente e nuova partita nell'altro processo
+            scrivi_da_altro_processo(percorso, 'utenti')
+            scrivi_da_altro_processo(percorso, 'partite', 'risultati')
+            if not attendi(lambda: not utenti.voci and not classifica.voci and not indice_risultati.costruito):
+                print("❌ Le invalidazioni dell'altro processo non sono state ricevute")
+                return False
+            if not arbitri.voci:
+                print("❌ Sono stati invalidati dati che non dipendono dalle modifiche")
+                return False
+            
+            # Le invalidazioni locali vengono pubblicate, quelle ricevute no
+            pubblicati = bus.contatori['pubblicati']
+            cache.invalida_tag('arbitri')
+            if bus.contatori['pubblicati'] != pubblicati + 1 or bus.contatori['ricevuti'] != 2:
+                print(f"❌ Contatori del bus non corretti: {bus.contatori}")
+                return False
+            
+            # Senza nuovi eventi il controllo non legge la tabella
+            bus.ricevi()
+            inizio = time.perf_counter()
+            for _ in range(1000):
+                bus.ricevi()
+            durata = (time.perf_counter() - inizio) / 1000
+            print(f"Controllo senza eventi: {durata * 1e6:.1f} µs")
+        finally:
+            bus.ferma()
+        
+        # Dopo l'arresto le invalidazioni locali non vengono più pubblicate
+        pubblicati = bus.contatori['pubblicati']
+        cache.invalida_tag('arbitri')
+        if bus.contatori['pubblicati'] != pubblicati:
+            print("❌ Il bus fermato pubblica ancora le invalidazioni")
+            return False
+    
+    print("✅ Invalidazioni tra processi corrette")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_invalidazioni_remote()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline della cache condivisa dai manager (modules/cache_manager.py).
+Usa il server PostgREST in memoria di stub_supabase.py per le invalidazioni dopo le scritture.
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules.cache_manager import ServizioCache, espandi_tag
+from modules import campionati_manager as cm
+
+def test_namespace():
+    """Verifica LRU, scadenza, dipendenze tra tag e contatori."""
+    print("\n=== Test namespace e tag ===")
+    servizio = ServizioCache()
+    lru = servizio.namespace('lru', dimensione_massima=2)
+    for chiave in ('a', 'b'):
+        lru.ottieni(chiave, lambda: chiave.upper())
+    lru.ottieni('a', lambda: 'errore')
+    lru.ottieni('c', lambda: 'C')
+    if set(lru.voci) != {'a', 'c'} or lru.statistiche()['espulsioni'] != 1:
+        print(f"❌ LRU non corretta: {list(lru.voci)}")
+        return False
+    
+    breve = servizio.namespace('breve', ttl=0.05)
+    letture = []
+    carica = lambda: letture.append(1) or len(letture)
+    breve.ottieni('x', carica)
+    breve.ottieni('x', carica)
+    time.sleep(0.06)
+    if breve.ottieni('x', carica) != 2 or breve.ottieni('x', carica, force_reload=True) != 3:
+        print("❌ Scadenza o ricaricamento forzato non corretti")
+        return False
+    # I caricamenti falliti (None) non vengono memorizzati
+    breve.ottieni('y', lambda: None)
+    if 'y' in breve.voci:
+        print("❌ Un caricamento fallito è stato memorizzato")
+        return False
+    
+    # Una partita modificata invalida classifica, statistiche e impegni, non gli arbitri
+    classifica = servizio.namespace('classifica_campionato', tag=('classifica',))
+    impegni = servizio.namespace('impegni')
+    arbitri = servizio.namespace('arbitri')
+    for ns in (classifica, impegni, arbitri):
+        ns.imposta(1, 'valore')
+    notificati = []
+    servizio.aggiungi_ascoltatore(notificati.append)
+    servizio.invalida_tag('partite')
+    if classifica.voci or impegni.voci or not arbitri.voci:
+        print("❌ Dipendenze tra tag non rispettate")
+        return False
+    if notificati != [{'partite', 'classifica', 'statistiche', 'impegni'}] or 'classifica' not in espandi_tag(['stagioni']):
+        print(f"❌ Espansione dei tag non corretta: {notificati}")
+        return False
+    
+    # Un valore caricato prima di un'invalidazione non viene memorizzato
+    def carica_superato():
+        servizio.invalida_tag('arbitri')
+        return 'superato'
+    arbitri.ottieni(2, carica_superato, force_reload=True)
+    if 2 in arbitri.voci:
+        print("❌ Un valore superato da un'invalidazione è stato memorizzato")
+        return False
+    
+    statistiche = servizio.statistiche()
+    if statistiche['lru']['hit'] != 1 or statistiche['lru']['miss'] != 3 or statistiche['breve']['hit'] != 1:
+        print(f"❌ Contatori non corretti: {statistiche}")
+        return False
+    
+    print("✅ Namespace e tag corretti")
+    return True
+
+def test_invalidazione_scritture():
+    """Verifica che le letture dei manager siano servite dalla cache e invalidate dalle scritture."""
+    print("\n=== Test invalidazione dopo le scritture ===")
+    stub = StubSupabase().avvia()
+    try:
+        collega_db_manager(stub)
+        stub.tabelle['arbitri'] = [{'id': 1, 'nome': 'Mario', 'cognome': 'Rossi'}]
+        stub.tabelle['campionato_squadre'] = [{'id': i, 'campionato_id': 1, 'squadra': s} for i, s in enumerate('AB', 1)]
+        cm.ricalcola_classifica_campionato(1)
+        
+        # Letture ripetute: una sola richiesta per tabella
+        stub.azzera_richieste()
+        for _ in range(3):
+            cm.carica_arbitri()
+            cm.carica_partite_campionato(1)
+            cm.carica_classifica_campionato(1)
+        if stub.conta_richieste('GET') != 3:
+            print(f"❌ Letture non servite dalla cache: {stub.richieste}")
+            return False
+        
+        # Le copie restituite possono essere modificate senza alterare la cache
+        cm.carica_classifica_campionato(1)[0]['punti'] = 99
+        if cm.carica_classifica_campionato(1)[0]['punti'] == 99:
+            print("❌ La modifica di una riga restituita ha alterato la cache")
+            return False
+        
+        # Una partita completata aggiorna partite e classifica, ma non gli arbitri
+        partita = cm.crea_partita(1, '2026-01-10', 'A', 'B', stato='completata')
+        cm.aggiorna_partita(partita['id'], '2026-01-10', 'A', 'B', stato='completata', punteggio_casa=20,
+                            punteggio_trasferta=10, mete_casa=4, mete_trasferta=1)
+        stub.azzera_richieste()
+        partite = cm.carica_partite_campionato(1)
+        classifica = {r['squadra']: r['punti'] for r in cm.carica_classifica_campionato(1)}
+        cm.carica_arbitri()
+        if [p['id'] for p in partite] != [partita['id']] or classifica != {'A': 5, 'B': 0}:
+            print(f"❌ Dati non aggiornati dopo la scrittura: {partite}, {classifica}")
+            return False
+        if stub.conta_richieste('GET', 'arbitri') or stub.conta_richieste('GET') != 2:
+            print(f"❌ Invalidazione non limitata ai dati dipendenti: {stub.richieste}")
+            return False
+        
+        cm.crea_arbitro('Paolo', 'Bianchi')
+        if [a['cognome'] for a in cm.carica_arbitri()] != ['Bianchi', 'Rossi']:
+            print("❌ Gli arbitri non sono stati invalidati dopo la creazione")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Invalidazione dopo le scritture corretta")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_namespace(),
+        test_invalidazione_scritture()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del calcolo della classifica dei campionati.
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import campionati_manager as cm
+
+SQUADRE = ['Rugby Padova', 'Rugby Rovigo', 'Rugby Treviso', 'Rugby Verona']
+
+def prepara_stub():
+    """Avvia lo stub con un campionato di quattro squadre e tre partite completate."""
+    stub = StubSupabase(chiavi_uniche={'classifica_campionato': [['campionato_id', 'squadra']]}).avvia()
+    collega_db_manager(stub)
+    stub.tabelle['campionato_squadre'] = [{'id': i + 1, 'campionato_id': 1, 'squadra': s} for i, s in enumerate(SQUADRE)]
+    stub.tabelle['partite_campionato'] = [
+        # Vittoria con bonus offensivo per entrambe, sconfitta con bonus difensivo
+        {'id': 1, 'campionato_id': 1, 'squadra_casa': SQUADRE[0], 'squadra_trasferta': SQUADRE[1],
+         'punteggio_casa': 31, 'punteggio_trasferta': 26, 'mete_casa': 5, 'mete_trasferta': 4, 'stato': 'completata'},
+        # Pareggio
+        {'id': 2, 'campionato_id': 1, 'squadra_casa': SQUADRE[2], 'squadra_trasferta': SQUADRE[3],
+         'punteggio_casa': 12, 'punteggio_trasferta': 12, 'mete_casa': 2, 'mete_trasferta': 2, 'stato': 'completata'},
+        # Vittoria in trasferta netta
+        {'id': 3, 'campionato_id': 1, 'squadra_casa': SQUADRE[3], 'squadra_trasferta': SQUADRE[0],
+         'punteggio_casa': 3, 'punteggio_trasferta': 40, 'mete_casa': 0, 'mete_trasferta': 6, 'stato': 'completata'},
+        {'id': 4, 'campionato_id': 1, 'squadra_casa': SQUADRE[1], 'squadra_trasferta': SQUADRE[2],
+         'punteggio_casa': None, 'punteggio_trasferta': None, 'mete_casa': None, 'mete_trasferta': None,
+         'stato': 'programmata', 'data_partita': '2025-04-06'}
+    ]
+    return stub
+
+def classifica_su_db(stub):
+    """Restituisce la classifica salvata nello stub come dizionario squadra -> riga."""
+    return {r['squadra']: {c: r.get(c) for c in cm.COLONNE_CLASSIFICA} for r in stub.righe('classifica_campionato')}
+
+def classifica_attesa(stub):
+    """Calcola da zero la classifica attesa dalle partite presenti nello stub."""
+    classifica = cm.calcola_classifica(1, SQUADRE, stub.righe('partite_campionato'))
+    return {s: {c: r[c] for c in cm.COLONNE_CLASSIFICA} for s, r in classifica.items()}
+
+def test_ricalcolo():
+    """Verifica il ricalcolo completo della classifica."""
+    print("\n=== Test ricalcolo classifica ===")
+    stub = prepara_stub()
+    try:
+        if not cm.ricalcola_classifica_campionato(1):
+            print("❌ Il ricalcolo non è riuscito")
+            return False
+        print(f"Ricalcolo eseguito con {stub.conta_richieste()} richieste")
+        
+        classifica = classifica_su_db(stub)
+        attese = {
+            SQUADRE[0]: {'punti': 10, 'vittorie': 2, 'bonus_offensivi': 2, 'mete_fatte': 11, 'punti_subiti': 29},
+            SQUADRE[1]: {'punti': 2, 'sconfitte': 1, 'bonus_offensivi': 1, 'bonus_difensivi': 1},
+            SQUADRE[2]: {'punti': 2, 'pareggi': 1},
+            SQUADRE[3]: {'punti': 2, 'pareggi': 1, 'sconfitte': 1, 'bonus_difensivi': 0}
+        }
+        for squadra, valori in attese.items():
+            for colonna, valore in valori.items():
+                if classifica[squadra][colonna] != valore:
+                    print(f"❌ {squadra}: {colonna} = {classifica[squadra][colonna]}, atteso {valore}")
+                    return False
+        
+        # Un secondo ricalcolo non duplica le righe
+        cm.ricalcola_classifica_campionato(1)
+        if len(stub.righe('classifica_campionato')) != len(SQUADRE):
+            print("❌ Il ricalcolo ha duplicato le righe della classifica")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Ricalcolo corretto")
+    return True
+
+def test_aggiornamento_incrementale():
+    """Verifica che modifiche ed eliminazioni aggiornino la classifica senza doppi conteggi."""
+    print("\n=== Test aggiornamento incrementale ===")
+    stub = prepara_stub()
+    try:
+        cm.ricalcola_classifica_campionato(1)
+        
+        # La partita programmata viene completata
+        cm.aggiorna_partita(4, '2025-04-06', SQUADRE[1], SQUADRE[2], stato='completata',
+                            punteggio_casa=20, punteggio_trasferta=15, mete_casa=3, mete_trasferta=2)
+        if classifica_su_db(stub) != classifica_attesa(stub):
+            print("❌ La classifica non è corretta dopo il completamento di una partita")
+            return False
+        
+        # Correzione del punteggio della stessa partita: il vecchio risultato viene annullato
+        stub.azzera_richieste()
+        cm.aggiorna_partita(4, '2025-04-06', SQUADRE[1], SQUADRE[2], stato='completata',
+                            punteggio_casa=20, punteggio_trasferta=25, mete_casa=3, mete_trasferta=4)
+        print(f"Correzione del punteggio eseguita con {stub.conta_richieste()} richieste")
+        if classifica_su_db(stub) != classifica_attesa(stub):
+            print("❌ La correzione del punteggio ha contato due volte la partita")
+            return False
+        
+        # Una partita completata torna rinviata
+        cm.aggiorna_partita(2, '2025-03-30', SQUADRE[2], SQUADRE[3], stato='rinviata')
+        if classifica_su_db(stub) != classifica_attesa(stub):
+            print("❌ Il contributo della partita rinviata non è stato annullato")
+            return False
+        
+        # Eliminazione di una partita completata
+        cm.elimina_partita(1)
+        if classifica_su_db(stub) != classifica_attesa(stub):
+            print("❌ Il contributo della partita eliminata non è stato annullato")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Aggiornamento incrementale corretto")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_ricalcolo(),
+        test_aggiornamento_incrementale()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
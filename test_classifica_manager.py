@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test del motore condiviso delle classifiche (modules/classifica_manager.py).
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules import classifica_manager as km
+
+PARTITE = [
+    # gruppo, squadra1, squadra2, punteggio1, punteggio2, mete1, mete2
+    ('A', 'Padova', 'Rovigo', 24, 19, 4, 3),
+    ('A', 'Rovigo', 'Treviso', 10, 30, 1, 5),
+    ('A', 'Treviso', 'Padova', 15, 15, 2, 2),
+    ('B', 'Verona', 'Vicenza', 5, 32, 1, 4),
+    ('B', 'Vicenza', 'Mirano', None, None, None, None)
+]
+
+def test_regole_e_gruppi():
+    """Verifica punteggi, bonus e calcolo di più gruppi in un solo passaggio."""
+    print("\n=== Test regole e gruppi ===")
+    classifiche = km.calcola_classifiche(PARTITE, km.REGOLAMENTO_CAMPIONATI, {'B': ['Verona', 'Vicenza', 'Mirano']})
+    
+    girone_a = {r['squadra']: r for r in classifiche['A']}
+    # Padova: vittoria con bonus offensivo (5) + pareggio (2)
+    # Rovigo: sconfitta con bonus difensivo (1) + sconfitta netta (0)
+    # Treviso: vittoria con bonus offensivo (5) + pareggio (2), miglior differenza punti
+    attesi = {'Padova': 7, 'Rovigo': 1, 'Treviso': 7}
+    if {s: r['punti'] for s, r in girone_a.items()} != attesi:
+        print(f"❌ Punti del gruppo A non corretti: {girone_a}")
+        return False
+    if [r['squadra'] for r in classifiche['A']] != ['Treviso', 'Padova', 'Rovigo']:
+        print("❌ Ordinamento per punti e differenza punti non corretto")
+        return False
+    
+    girone_b = {r['squadra']: r for r in classifiche['B']}
+    if girone_b['Mirano']['partite_giocate'] != 0 or girone_b['Vicenza']['punti'] != 5:
+        print("❌ Le partite senza punteggio non sono state ignorate")
+        return False
+    
+    # Con il regolamento dei gironi il bonus offensivo non spetta a chi perde
+    regolamento = km.Regolamento('test', bonus=[km.bonus_offensivo(4, anche_in_sconfitta=False)])
+    contributo = regolamento.contributo(20, 25, 4, 3)
+    if contributo['bonus_offensivi'] != 0 or contributo['punti'] != 0:
+        print("❌ Il bonus offensivo è stato assegnato alla squadra sconfitta")
+        return False
+    
+    print("✅ Regole e gruppi corretti")
+    return True
+
+def test_cache():
+    """Verifica che la stessa serie di partite venga servita dalla cache."""
+    print("\n=== Test cache delle classifiche ===")
+    chiamate = []
+    regolamento = km.Regolamento('conteggio', bonus=[lambda *args: chiamate.append(args)])
+    
+    prima = km.calcola_classifica([p[1:] for p in PARTITE], regolamento)
+    numero_chiamate = len(chiamate)
+    seconda = km.calcola_classifica([p[1:] for p in PARTITE], regolamento)
+    
+    if len(chiamate) != numero_chiamate or prima != seconda:
+        print("❌ La classifica è stata ricalcolata invece di essere letta dalla cache")
+        return False
+    
+    # Le righe restituite sono copie: modificarle non altera la cache
+    seconda[0]['punti'] = -100
+    if km.calcola_classifica([p[1:] for p in PARTITE], regolamento) != prima:
+        print("❌ La modifica del risultato ha alterato la cache")
+        return False
+    
+    print("✅ Cache corretta")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_regole_e_gruppi(),
+        test_cache()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
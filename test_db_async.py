@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del livello di accesso asincrono a Supabase (modules/db_async.py).
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import db_async
+
+UTENTI = {
+    "autorizzati": [
+        {"id": 1, "nome": "Mario Rossi", "username": "mario", "ruolo": "admin", "data_registrazione": "01/03/2025 10:00"},
+        {"id": "2", "nome": "Paolo Bianchi", "username": None, "ruolo": "utente"},
+        3
+    ],
+    "in_attesa": [
+        {"id": 4, "nome": "Anna Verdi", "username": "anna", "ruolo": "utente"}
+    ]
+}
+
+def prepara_ambiente(cartella, latenza=0.0):
+    """Avvia lo stub e reindirizza i file locali in una cartella temporanea."""
+    stub = StubSupabase(latenza=latenza).avvia()
+    db = collega_db_manager(stub)
+    db.UTENTI_FILE = os.path.join(cartella, 'utenti.json')
+    db.RISULTATI_FILE = os.path.join(cartella, 'risultati.json')
+    db.SQUADRE_FILE = os.path.join(cartella, 'squadre.json')
+    return stub, db
+
+def test_utenti_e_squadre():
+    """Verifica che le funzioni asincrone leggano e scrivano come quelle sincrone."""
+    print("\n=== Test utenti e squadre asincroni ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub, db = prepara_ambiente(cartella)
+        try:
+            async def scenario():
+                try:
+                    stub.azzera_richieste()
+                    if not await db_async.salva_utenti(UTENTI):
+                        print("❌ Salvataggio degli utenti non riuscito")
+                        return False
+                    # Un upsert multiplo per ogni insieme di campi e un'eliminazione degli utenti rimossi
+                    if stub.conta_richieste('POST') != 2 or stub.conta_richieste('DELETE') != 1:
+                        print(f"❌ Richieste non attese: {stub.richieste}")
+                        return False
+                    
+                    utenti = await db_async.carica_utenti()
+                    if utenti != db.carica_utenti():
+                        print("❌ Gli utenti letti in modo asincrono differiscono da quelli sincroni")
+                        return False
+                    if sorted(u['id'] for u in utenti['autorizzati']) != [1, 2, 3] or [u['id'] for u in utenti['in_attesa']] != [4]:
+                        print(f"❌ Utenti non corretti: {utenti}")
+                        return False
+                    
+                    await db_async.salva_squadre(['Rovigo', 'Padova', '', 'Treviso'])
+                    if await db_async.carica_squadre() != ['Padova', 'Rovigo', 'Treviso']:
+                        print("❌ Squadre non corrette")
+                        return False
+                    return True
+                finally:
+                    await db_async.chiudi_client()
+            
+            esito = asyncio.run(scenario())
+        finally:
+            stub.ferma()
+    
+    if esito:
+        print("✅ Utenti e squadre corretti")
+    return esito
+
+def test_operazioni_utente():
+    """Verifica che le operazioni asincrone su un singolo utente non tocchino gli altri."""
+    print("\n=== Test operazioni asincrone su un singolo utente ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub, db = prepara_ambiente(cartella)
+        try:
+            async def scenario():
+                try:
+                    await db_async.salva_utenti(UTENTI)
+                    await db_async.carica_utenti()
+                    # Utente aggiunto dall'interfaccia web dopo la lettura del bot
+                    db.upsert_utente({'id': 5, 'nome': 'Luca Neri'}, 'in_attesa')
+                    
+                    stub.azzera_richieste()
+                    esiti = [
+                        await db_async.upsert_utente({'id': 6, 'nome': 'Nuovo Utente', 'username': 'nuovo'}, 'in_attesa'),
+                        await db_async.set_stato_utente(4, 'autorizzato'),
+                        await db_async.elimina_utente(3),
+                        not await db_async.set_stato_utente(99, 'autorizzato')
+                    ]
+                    if not all(esiti):
+                        print(f"❌ Esiti non corretti: {esiti}")
+                        return False
+                    # Una sola richiesta per operazione, limitata alla riga dell'utente
+                    if len(stub.richieste) != 4 or any('id=eq.' not in query for metodo, _, query in stub.richieste
+                                                       if metodo in ('PATCH', 'DELETE')):
+                        print(f"❌ Richieste non attese: {stub.richieste}")
+                        return False
+                    
+                    stati = {r['id']: r['stato'] for r in stub.righe('utenti')}
+                    attesi = {1: 'autorizzato', 2: 'autorizzato', 4: 'autorizzato', 5: 'in_attesa', 6: 'in_attesa'}
+                    if stati != attesi:
+                        print(f"❌ Utenti salvati non corretti: {stati}")
+                        return False
+                    with open(db.UTENTI_FILE, 'r', encoding='utf-8') as f:
+                        su_file = json.load(f)
+                    if (sorted(u['id'] for u in su_file['autorizzati']) != [1, 2, 4]
+                            or sorted(u['id'] for u in su_file['in_attesa']) != [5, 6]):
+                        print(f"❌ Il file locale non riflette le operazioni: {su_file}")
+                        return False
+                    return True
+                finally:
+                    await db_async.chiudi_client()
+            
+            esito = asyncio.run(scenario())
+        finally:
+            stub.ferma()
+    
+    if esito:
+        print("✅ Operazioni su un singolo utente corrette")
+    return esito
+
+def test_risultati():
+    """Verifica il salvataggio asincrono dei risultati e la condivisione dello snapshot."""
+    print("\n=== Test risultati asincroni ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub, db = prepara_ambiente(cartella)
+        dimensione_pagina = db.DIMENSIONE_PAGINA_LETTURA
+        try:
+            async def scenario():
+                try:
+                    risultati = [{'id': i, 'categoria': 'U14', 'squadra1': f"Squadra {i}", 'squadra2': f"Squadra {i + 1}",
+                                  'punteggio1': i, 'punteggio2': 10 - i, 'data_partita': '01/03/2025'} for i in range(1, 11)]
+                    await db_async.salva_risultati(risultati)
+                    
+                    # Lo snapshot è condiviso con db_manager: un salvataggio identico non genera richieste
+                    stub.azzera_richieste()
+                    db.salva_risultati(risultati)
+                    await db_async.salva_risultato(dict(risultati[0]))
+                    if stub.conta_richieste():
+                        print(f"❌ Il salvataggio di righe invariate ha generato {stub.conta_richieste()} richieste")
+                        return False
+                    
+                    risultati[0]['punteggio1'] = 40
+                    await db_async.salva_risultato(risultati[0])
+                    await db_async.salva_risultati(risultati[1:])
+                    if stub.conta_richieste('POST') != 1 or stub.conta_richieste('DELETE') != 1:
+                        print(f"❌ Richieste non attese: {stub.richieste}")
+                        return False
+                    
+                    righe = {r['id']: r for r in await db_async.carica_risultati()}
+                    if sorted(righe) != list(range(2, 11)) or db.carica_risultati() != list(righe.values()):
+                        print("❌ Risultati su Supabase non corretti")
+                        return False
+                    
+                    # Il journal locale contiene le stesse righe
+                    if [r['id'] for r in await asyncio.to_thread(db._carica_risultati_da_file)] != list(range(2, 11)):
+                        print("❌ Il file locale non è stato aggiornato")
+                        return False
+                    
+                    # Nuovi risultati salvati insieme ricevono ID distinti
+                    nuovi = [{'categoria': 'U16', 'squadra1': 'Rovigo', 'squadra2': f"Squadra {i}",
+                              'data_partita': '08/03/2025'} for i in range(3)]
+                    await asyncio.gather(*(db_async.salva_risultato(nuovo) for nuovo in nuovi))
+                    if len({nuovo['id'] for nuovo in nuovi} | set(righe)) != 12 or len(stub.righe('risultati')) != 12:
+                        print(f"❌ ID non univoci per i nuovi risultati: {[nuovo['id'] for nuovo in nuovi]}")
+                        return False
+                    
+                    # Oltre il limite max-rows del server i risultati vengono letti a pagine
+                    stub.max_righe = db.DIMENSIONE_PAGINA_LETTURA = 5
+                    db._snapshot_risultati['caricato'] = False
+                    if len(await db_async.carica_risultati()) != 12 or len(db._copia_snapshot_risultati()) != 12:
+                        print("❌ Lettura asincrona dei risultati troncata dal limite max-rows")
+                        return False
+                    
+                    # Una lettura fallita non diventa lo snapshot condiviso
+                    db._snapshot_risultati['caricato'] = False
+                    stub.guasti[('GET', 'risultati')] = 1
+                    await db_async.salva_risultati(risultati[2:])
+                    if db._snapshot_risultati['caricato'] or len(stub.righe('risultati')) != 12:
+                        print("❌ Una lettura asincrona fallita è stata registrata come snapshot")
+                        return False
+                    return True
+                finally:
+                    await db_async.chiudi_client()
+            
+            esito = asyncio.run(scenario())
+        finally:
+            db.DIMENSIONE_PAGINA_LETTURA = dimensione_pagina
+            stub.ferma()
+    
+    if esito:
+        print("✅ Risultati corretti")
+    return esito
+
+def test_concorrenza():
+    """Verifica che le richieste non blocchino l'event loop e riusino lo stesso client."""
+    print("\n=== Test concorrenza ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub, db = prepara_ambiente(cartella, latenza=0.1)
+        try:
+            async def scenario():
+                try:
+                    battiti = []
+                    
+                    async def battito():
+                        while True:
+                            battiti.append(time.time())
+                            await asyncio.sleep(0.01)
+                    
+                    ticker = asyncio.create_task(battito())
+                    inizio = time.time()
+                    await asyncio.gather(*(db_async.carica_risultati() for _ in range(10)))
+                    durata = time.time() - inizio
+                    ticker.cancel()
+                    
+                    print(f"10 letture da 0.1s completate in {durata:.2f}s, {len(battiti)} battiti dell'event loop")
+                    if durata > 0.6:
+                        print("❌ Le letture non sono state eseguite in parallelo")
+                        return False
+                    if len(battiti) < 5:
+                        print("❌ L'event loop è rimasto bloccato durante le richieste")
+                        return False
+                    if db_async._get_client() is not db_async._get_client():
+                        print("❌ Il client HTTP non è condiviso")
+                        return False
+                    return True
+                finally:
+                    await db_async.chiudi_client()
+            
+            esito = asyncio.run(scenario())
+        finally:
+            stub.ferma()
+    
+    if esito:
+        print("✅ Concorrenza corretta")
+    return esito
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_utenti_e_squadre(),
+        test_operazioni_utente(),
+        test_risultati(),
+        test_concorrenza()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline dell'indice delle disponibilità di arbitri e tutor.
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import campionati_manager as cm
+from modules import tutor_manager as tm
+from modules import disponibilita_manager as dm
+
+DATE = ['2025-03-01', '2025-03-08', '2025-03-15']
+
+def prepara_stub(max_righe=None):
+    """Avvia lo stub con nove partite in tre date, designate a sei arbitri e seguite da due tutor."""
+    stub = StubSupabase(max_righe=max_righe).avvia()
+    collega_db_manager(stub)
+    partite, designazioni, tutor_partite = [], [], []
+    for i in range(9):
+        partite.append({'id': i + 1, 'campionato_id': 1, 'data_partita': DATE[i % 3], 'ora': '15:00',
+                        'luogo': f"Campo {i + 1}", 'squadra_casa': f"Squadra {i}", 'squadra_trasferta': f"Squadra {i + 9}"})
+        designazioni.append({'id': len(designazioni) + 1, 'partita_id': i + 1, 'arbitro_id': i % 6 + 1, 'ruolo': 'primo'})
+        designazioni.append({'id': len(designazioni) + 1, 'partita_id': i + 1, 'arbitro_id': (i + 1) % 6 + 1, 'ruolo': 'secondo'})
+        tutor_partite.append({'id': i + 1, 'partita_id': i + 1, 'tutor_id': i % 2 + 1, 'note': ''})
+    stub.tabelle.update({'partite_campionato': partite, 'designazioni_arbitrali': designazioni,
+                         'tutor_partite': tutor_partite})
+    return stub
+
+def impegni_attesi(stub, arbitro_id, data_partita, partita_id=None):
+    """Calcola direttamente dalle tabelle dello stub le partite in cui l'arbitro è impegnato."""
+    partite = {p['id']: p for p in stub.righe('partite_campionato')}
+    return sorted(d['partita_id'] for d in stub.righe('designazioni_arbitrali')
+                  if d['arbitro_id'] == arbitro_id and d['partita_id'] != partita_id
+                  and partite.get(d['partita_id'], {}).get('data_partita') == data_partita)
+
+def verifica_indice(stub, richieste):
+    """Confronta gli impegni restituiti dall'indice con quelli calcolati dalle tabelle."""
+    impegni = dm.verifica_impegni_bulk(richieste)
+    for (arbitro_id, data_partita), elenco in impegni.items():
+        if sorted(i['partita_id'] for i in elenco) != impegni_attesi(stub, arbitro_id, data_partita):
+            print(f"❌ Impegni dell'arbitro {arbitro_id} il {data_partita} non corretti: {elenco}")
+            return False
+    return True
+
+def test_verifica_in_blocco():
+    """Verifica le letture singole e in blocco e il numero di richieste."""
+    print("\n=== Test verifica degli impegni in blocco ===")
+    stub = prepara_stub()
+    try:
+        richieste = [(arbitro_id, data) for arbitro_id in range(1, 8) for data in DATE + ['2025-04-01']]
+        
+        stub.azzera_richieste()
+        if not verifica_indice(stub, richieste):
+            return False
+        print(f"{len(richieste)} verifiche eseguite con {stub.conta_richieste()} richieste")
+        if stub.conta_richieste() != 3:
+            print("❌ La costruzione dell'indice non ha usato tre query in blocco")
+            return False
+        
+        # Le verifiche successive sono letture in memoria
+        stub.azzera_richieste()
+        impegni = dm.verifica_impegni_arbitro(1, DATE[0])
+        if stub.conta_richieste():
+            print("❌ Una verifica successiva ha generato richieste")
+            return False
+        if [(i['partita_id'], i['ruolo'], i['luogo']) for i in impegni] != [(1, 'primo', 'Campo 1'), (7, 'primo', 'Campo 7')]:
+            print(f"❌ Dettagli dell'impegno non corretti: {impegni}")
+            return False
+        
+        # La partita corrente è esclusa dalla verifica
+        if [i['partita_id'] for i in dm.verifica_impegni_arbitro(1, DATE[0], partita_id=1)] != [7]:
+            print("❌ La partita corrente non è stata esclusa")
+            return False
+        
+        tutor = dm.verifica_impegni_tutor(1, DATE[0])
+        if sorted(i['partita_id'] for i in tutor) != [1, 7] or 'ruolo' in tutor[0]:
+            print(f"❌ Impegni del tutor non corretti: {tutor}")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Verifica in blocco corretta")
+    return True
+
+def test_aggiornamento_indice():
+    """Verifica che l'indice segua designazioni, tutor e cambi di data senza essere ricostruito."""
+    print("\n=== Test aggiornamento dell'indice ===")
+    stub = prepara_stub()
+    try:
+        richieste = [(arbitro_id, data) for arbitro_id in range(1, 8) for data in DATE + ['2025-04-01']]
+        dm.verifica_impegni_bulk(richieste)
+        
+        cm.aggiungi_designazione(2, 7, 'TMO')
+        cm.rimuovi_designazione(1)
+        cm.aggiorna_partita(3, '2025-04-01', 'Squadra 2', 'Squadra 11')
+        cm.elimina_partita(5)
+        stub.tabelle['designazioni_arbitrali'] = [d for d in stub.righe('designazioni_arbitrali') if d['partita_id'] != 5]
+        nuova = cm.crea_partita(1, DATE[0], 'Squadra 20', 'Squadra 21')
+        cm.aggiungi_designazione(nuova['id'], 4, 'primo')
+        
+        # Nessuna ricostruzione: le letture non generano richieste
+        stub.azzera_richieste()
+        if not verifica_indice(stub, richieste) or stub.conta_richieste():
+            print("❌ L'indice non è stato aggiornato in modo incrementale")
+            return False
+        
+        tm.assegna_tutor_partita(nuova['id'], 2, '')
+        if nuova['id'] not in [i['partita_id'] for i in dm.verifica_impegni_tutor(2, DATE[0])]:
+            print("❌ L'assegnazione del tutor non è stata registrata")
+            return False
+        tm.rimuovi_tutor_partita(2)
+        if 2 in [i['partita_id'] for i in dm.verifica_impegni_tutor(2, DATE[1])]:
+            print("❌ La rimozione del tutor non è stata registrata")
+            return False
+        
+        # L'indice aggiornato coincide con una ricostruzione completa
+        aggiornato = dm.verifica_impegni_bulk(richieste)
+        dm.indice_disponibilita.invalida()
+        if dm.verifica_impegni_bulk(richieste) != aggiornato:
+            print("❌ L'indice aggiornato non coincide con la ricostruzione")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Aggiornamento dell'indice corretto")
+    return True
+
+def test_tabelle_oltre_max_righe():
+    """Verifica che l'indice comprenda tutte le righe anche oltre il limite max-rows del server."""
+    print("\n=== Test indice oltre max-rows ===")
+    from modules import db_manager
+    stub = prepara_stub(max_righe=4)
+    dimensione_pagina = db_manager.DIMENSIONE_PAGINA_LETTURA
+    db_manager.DIMENSIONE_PAGINA_LETTURA = 4
+    try:
+        richieste = [(arbitro_id, data) for arbitro_id in range(1, 7) for data in DATE]
+        if not verifica_indice(stub, richieste):
+            return False
+        if sorted(i['partita_id'] for i in dm.verifica_impegni_tutor(2, DATE[1])) != [2, 8]:
+            print("❌ Impegni dei tutor troncati")
+            return False
+    finally:
+        db_manager.DIMENSIONE_PAGINA_LETTURA = dimensione_pagina
+        stub.ferma()
+    
+    print("✅ Indice oltre max-rows corretto")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_verifica_in_blocco(),
+        test_aggiornamento_indice(),
+        test_tabelle_oltre_max_righe()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
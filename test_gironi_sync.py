@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del salvataggio incrementale dei gironi su Supabase.
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import sys
+import copy
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+
+def prepara_stub(max_righe=None):
+    """Avvia lo stub con due tornei, ciascuno con due gironi di quattro squadre."""
+    stub = StubSupabase(max_righe=max_righe).avvia()
+    tornei, gironi, girone_squadre, partite = [], [], [], []
+    for t in (1, 2):
+        tornei.append({'id': t, 'nome': f"Torneo {t}", 'categoria': 'U16', 'genere': 'Femminile',
+                       'data_inizio': '01/03/2025', 'data_fine': '31/05/2025', 'descrizione': ''})
+        for g in (1, 2):
+            girone_id = t * 10 + g
+            gironi.append({'id': girone_id, 'torneo_id': t, 'nome': f"Girone {g}", 'descrizione': ''})
+            squadre = [f"Squadra {girone_id}-{s}" for s in range(4)]
+            girone_squadre.extend({'girone_id': girone_id, 'squadra': s} for s in squadre)
+            partite.append({'id': girone_id * 100 + 1, 'girone_id': girone_id, 'data_partita': '15/03/2025',
+                            'squadra1': squadre[0], 'squadra2': squadre[1], 'punteggio1': None,
+                            'punteggio2': None, 'mete1': None, 'mete2': None, 'luogo': '', 'ora': ''})
+    stub.tabelle.update({'tornei': tornei, 'gironi': gironi,
+                         'girone_squadre': girone_squadre, 'partite_girone': partite})
+    return stub
+
+def test_salvataggio_minimo():
+    """Verifica che la modifica di un punteggio generi una sola richiesta."""
+    print("\n=== Test salvataggio minimo dei gironi ===")
+    stub = prepara_stub()
+    try:
+        db = collega_db_manager(stub)
+        gironi = db.carica_gironi_da_db()
+        
+        partita = gironi['tornei'][0]['gironi'][1]['partite'][0]
+        partita.update({'punteggio1': 24, 'punteggio2': 10, 'mete1': 4, 'mete2': 1})
+        
+        stub.azzera_richieste()
+        if not db.salva_gironi_su_db(gironi) or stub.conta_richieste() != 1:
+            print(f"❌ La modifica di un punteggio ha richiesto {stub.conta_richieste()} richieste")
+            return False
+        
+        salvata = [p for p in stub.righe('partite_girone') if p['id'] == partita['id']][0]
+        if salvata['punteggio1'] != 24 or salvata['mete2'] != 1:
+            print("❌ Il punteggio non è stato salvato")
+            return False
+        
+        # Un secondo salvataggio senza modifiche non invia nulla
+        stub.azzera_richieste()
+        db.salva_gironi_su_db(gironi)
+        if stub.conta_richieste():
+            print("❌ Un salvataggio senza modifiche ha generato richieste")
+            return False
+        
+        # Rimozione di una squadra e di un intero girone, aggiunta di una partita
+        girone = gironi['tornei'][1]['gironi'][0]
+        girone['squadre'].remove('Squadra 21-3')
+        girone['partite'].append({'id': 9999, 'data_partita': '22/03/2025', 'squadra1': 'Squadra 21-0',
+                                  'squadra2': 'Squadra 21-2', 'luogo': 'Padova', 'ora': '15:00'})
+        rimosso = gironi['tornei'][1]['gironi'].pop(1)
+        
+        stub.azzera_richieste()
+        if not db.salva_gironi_su_db(gironi):
+            print("❌ Il salvataggio delle modifiche strutturali non è riuscito")
+            return False
+        print(f"Modifiche strutturali salvate con {stub.conta_richieste()} richieste")
+        
+        squadre = {(r['girone_id'], r['squadra']) for r in stub.righe('girone_squadre')}
+        if (21, 'Squadra 21-3') in squadre or any(g == rimosso['id'] for g, _ in squadre):
+            print("❌ Le squadre rimosse sono ancora presenti")
+            return False
+        if rimosso['id'] in {g['id'] for g in stub.righe('gironi')}:
+            print("❌ Il girone rimosso è ancora presente")
+            return False
+        if 9999 not in {p['id'] for p in stub.righe('partite_girone')}:
+            print("❌ La nuova partita non è stata inserita")
+            return False
+        if db.carica_gironi_da_db() != _senza_colonne_db(gironi):
+            print("❌ Il database non corrisponde ai gironi salvati")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Salvataggio minimo corretto")
+    return True
+
+def _senza_colonne_db(gironi):
+    """Restituisce i gironi con le partite nel formato letto dal database."""
+    gironi = copy.deepcopy(gironi)
+    for torneo in gironi['tornei']:
+        for girone in torneo['gironi']:
+            for partita in girone['partite']:
+                partita.setdefault('girone_id', girone['id'])
+                for campo in ('punteggio1', 'punteggio2', 'mete1', 'mete2'):
+                    partita.setdefault(campo, None)
+    return gironi
+
+def test_rollback():
+    """Verifica che un errore a metà salvataggio annulli le operazioni già eseguite."""
+    print("\n=== Test rollback dei gironi ===")
+    stub = prepara_stub()
+    try:
+        db = collega_db_manager(stub)
+        gironi = db.carica_gironi_da_db()
+        prima = {tabella: stub.righe(tabella) for tabella in ('tornei', 'gironi', 'girone_squadre', 'partite_girone')}
+        
+        gironi['tornei'][0]['nome'] = 'Torneo rinominato'
+        gironi['tornei'][0]['gironi'][0]['squadre'].append('Squadra nuova')
+        gironi['tornei'][1]['gironi'].pop(0)
+        
+        # L'eliminazione dei gironi fallisce dopo upsert ed eliminazioni precedenti
+        stub.guasti[('DELETE', 'gironi')] = 1
+        if db.salva_gironi_su_db(gironi):
+            print("❌ Il salvataggio non ha segnalato l'errore")
+            return False
+        
+        for tabella, righe in prima.items():
+            # Le squadre ripristinate ricevono un nuovo ID seriale
+            normalizza = lambda rr: sorted(json.dumps({k: v for k, v in r.items() if tabella != 'girone_squadre' or k != 'id'},
+                                                      sort_keys=True) for r in rr)
+            if normalizza(stub.righe(tabella)) != normalizza(righe):
+                print(f"❌ La tabella {tabella} non è stata ripristinata")
+                return False
+        
+        # Al tentativo successivo il salvataggio riesce, eliminazioni comprese
+        if not db.salva_gironi_su_db(gironi) or stub.righe('tornei')[0]['nome'] != 'Torneo rinominato':
+            print("❌ Il nuovo tentativo di salvataggio non è riuscito")
+            return False
+        if 21 in {g['id'] for g in stub.righe('gironi')}:
+            print("❌ Il girone rimosso non è stato eliminato al nuovo tentativo")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Rollback corretto")
+    return True
+
+def test_albero_non_derivato():
+    """Verifica che un albero non letto dal database non elimini i dati presenti solo sul database."""
+    print("\n=== Test gironi non letti dal database ===")
+    stub = prepara_stub()
+    try:
+        db = collega_db_manager(stub)
+        gironi = db.carica_gironi_da_db()
+        
+        # Copia locale incompleta (es. gironi.json dopo un errore di lettura) con un solo torneo
+        locale = json.loads(json.dumps(gironi))
+        locale['tornei'].pop(1)
+        locale['tornei'][0]['gironi'][0]['partite'][0]['punteggio1'] = 31
+        
+        if not db.salva_gironi_su_db(locale):
+            print("❌ Il salvataggio della copia locale non è riuscito")
+            return False
+        if sorted(t['id'] for t in stub.righe('tornei')) != [1, 2] or len(stub.righe('partite_girone')) != 4:
+            print(f"❌ Dati presenti solo sul database eliminati: tornei {[t['id'] for t in stub.righe('tornei')]}")
+            return False
+        if not any(p['punteggio1'] == 31 for p in stub.righe('partite_girone')):
+            print("❌ La modifica della copia locale non è stata salvata")
+            return False
+        
+        # Un nuovo salvataggio della copia locale non genera richieste
+        stub.azzera_richieste()
+        db.salva_gironi_su_db(locale)
+        if stub.conta_richieste():
+            print("❌ Lo stato persistito non include le righe non eliminate")
+            return False
+        
+        # Partendo dai dati letti dal database l'eliminazione è consentita
+        gironi = db.carica_gironi_da_db()
+        gironi['tornei'].pop(1)
+        if not db.salva_gironi_su_db(gironi) or [t['id'] for t in stub.righe('tornei')] != [1]:
+            print("❌ L'eliminazione del torneo dai dati del database non è riuscita")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Gironi non letti dal database gestiti correttamente")
+    return True
+
+def test_lettura_oltre_max_righe():
+    """Verifica la lettura dei gironi oltre il limite max-rows del server e dopo una lettura fallita."""
+    print("\n=== Test lettura dei gironi oltre max-rows ===")
+    stub = prepara_stub(max_righe=3)
+    db = collega_db_manager(stub)
+    dimensione_pagina = db.DIMENSIONE_PAGINA_LETTURA
+    db.DIMENSIONE_PAGINA_LETTURA = 3
+    try:
+        gironi = db.carica_gironi_da_db()
+        elenco = [g for t in gironi['tornei'] for g in t['gironi']]
+        if (len(elenco) != 4 or sum(len(g['squadre']) for g in elenco) != 16
+                or sum(len(g['partite']) for g in elenco) != 4):
+            print("❌ Gironi troncati dal limite max-rows")
+            return False
+        
+        # Una lettura fallita non sostituisce lo stato persistito
+        stub.guasti[('GET', 'partite_girone')] = 1
+        if db.carica_gironi_da_db() is not None or db._snapshot_gironi['albero'] is not gironi:
+            print("❌ Una lettura fallita ha prodotto un albero dei gironi")
+            return False
+    finally:
+        db.DIMENSIONE_PAGINA_LETTURA = dimensione_pagina
+        stub.ferma()
+    
+    print("✅ Lettura dei gironi oltre max-rows corretta")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_salvataggio_minimo(),
+        test_rollback(),
+        test_albero_non_derivato(),
+        test_lettura_oltre_max_righe()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
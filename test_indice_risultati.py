@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline dell'indice per data dei risultati (modules/risultati_manager.py).
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import data_manager
+from modules.risultati_manager import indice_risultati, date_weekend, data_ordinale
+
+def crea_risultati(num_risultati, giorni=1500):
+    """Crea risultati distribuiti sugli ultimi giorni, con alcune date mancanti o non valide."""
+    casuale = random.Random(42)
+    oggi = datetime.now().date()
+    risultati = []
+    for i in range(num_risultati):
+        data = (oggi - timedelta(days=casuale.randrange(giorni))).strftime('%d/%m/%Y')
+        if i % 50 == 7:
+            data = ''
+        elif i % 50 == 8:
+            data = '31/02/2025'
+        risultati.append({'id': i + 1, 'categoria': ['U14', 'U16', 'Serie B'][i % 3], 'genere': 'Maschile',
+                          'data_partita': data, 'squadra1': f"Squadra {i}", 'squadra2': f"Squadra {i + 1}",
+                          'punteggio1': i % 40, 'punteggio2': (i * 7) % 40, 'mete1': i % 6, 'mete2': (i * 3) % 6})
+    return risultati
+
+def scansione_lineare(risultati, inizio, fine):
+    """Riferimento: filtro con strptime su tutti i risultati, come prima dell'indice."""
+    trovati = []
+    for r in risultati:
+        try:
+            giorno = datetime.strptime(r['data_partita'], '%d/%m/%Y').date()
+        except ValueError:
+            continue
+        if inizio <= giorno <= fine:
+            trovati.append(r)
+    return sorted(trovati, key=lambda r: (datetime.strptime(r['data_partita'], '%d/%m/%Y'), r['id']))
+
+def test_intervalli():
+    """Verifica le ricerche per intervallo e il loro costo rispetto a una scansione completa."""
+    print("\n=== Test intervalli di date ===")
+    risultati = crea_risultati(20000)
+    indice_risultati.sostituisci(risultati)
+    oggi = datetime.now().date()
+    
+    for inizio, fine in ((oggi - timedelta(days=30), oggi), (oggi - timedelta(days=400), oggi - timedelta(days=365)),
+                         date_weekend(), (oggi + timedelta(days=1), oggi + timedelta(days=5))):
+        if indice_risultati.intervallo(inizio, fine) != scansione_lineare(risultati, inizio, fine):
+            print(f"❌ Intervallo {inizio} - {fine} non corretto")
+            return False
+    
+    if indice_risultati.ultimi_giorni(7) != scansione_lineare(risultati, oggi - timedelta(days=7), oggi):
+        print("❌ Ultimi 7 giorni non corretti")
+        return False
+    stagione = {'data_inizio': (oggi - timedelta(days=300)).isoformat(), 'data_fine': oggi.isoformat()}
+    if indice_risultati.stagione(stagione) != scansione_lineare(risultati, oggi - timedelta(days=300), oggi):
+        print("❌ Risultati della stagione non corretti")
+        return False
+    if indice_risultati.conta() != 20000 or data_ordinale('31/02/2025') is not None:
+        print("❌ Conteggio o date non valide non gestiti")
+        return False
+    
+    # Il weekend è una ricerca O(log n + k), non una scansione di tutto lo storico
+    inizio = time.perf_counter()
+    for _ in range(200):
+        indice_risultati.weekend()
+    tempo_indice = (time.perf_counter() - inizio) / 200
+    inizio = time.perf_counter()
+    scansione_lineare(risultati, *date_weekend())
+    tempo_scansione = time.perf_counter() - inizio
+    print(f"Weekend su 20000 risultati: indice {tempo_indice * 1000:.3f} ms, scansione {tempo_scansione * 1000:.1f} ms")
+    if tempo_indice * 20 > tempo_scansione:
+        print("❌ La ricerca con l'indice non è più veloce della scansione")
+        return False
+    
+    print("✅ Intervalli di date corretti")
+    return True
+
+def test_aggiornamenti():
+    """Verifica che i salvataggi aggiornino l'indice senza ricaricare i risultati."""
+    print("\n=== Test aggiornamenti dell'indice ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub = StubSupabase().avvia()
+        try:
+            db = collega_db_manager(stub)
+            db.RISULTATI_FILE = os.path.join(cartella, 'risultati.json')
+            risultati = crea_risultati(300, giorni=60)
+            db.salva_risultati(risultati)
+            
+            venerdi, domenica = date_weekend(date(2025, 3, 12))
+            if (venerdi, domenica) != (date(2025, 3, 7), date(2025, 3, 9)) or date_weekend(date(2025, 3, 8))[0] != venerdi:
+                print("❌ Date del weekend non corrette")
+                return False
+            
+            # Nuovo risultato e spostamento di data: nessuna lettura da Supabase
+            fine_weekend = date_weekend()[1]
+            stub.azzera_richieste()
+            db.salva_risultato({'id': 1000, 'categoria': 'U14', 'data_partita': fine_weekend.strftime('%d/%m/%Y'),
+                                'squadra1': 'A', 'squadra2': 'B', 'punteggio1': 10, 'punteggio2': 5})
+            spostato = dict(risultati[0], data_partita='01/01/2000')
+            db.salva_risultato(spostato)
+            weekend = data_manager.ottieni_risultati_weekend()
+            if stub.conta_richieste('GET'):
+                print(f"❌ L'indice è stato ricaricato dopo un salvataggio: {stub.richieste}")
+                return False
+            if weekend[-1]['id'] != 1000 or any(r['id'] == 1 for r in weekend):
+                print("❌ Il risultato salvato non è stato registrato nell'indice")
+                return False
+            if [r['id'] for r in indice_risultati.intervallo('01/01/2000', '01/01/2000')] != [1]:
+                print("❌ Lo spostamento di data non è stato registrato nell'indice")
+                return False
+            
+            # Dopo l'invalidazione l'indice viene ricostruito con gli stessi risultati
+            attesi = [r['id'] for r in indice_risultati.ultimi_giorni(30)]
+            indice_risultati.invalida()
+            if [r['id'] for r in indice_risultati.ultimi_giorni(30)] != attesi or stub.conta_richieste('GET') != 1:
+                print("❌ Ricostruzione dell'indice non corretta")
+                return False
+        finally:
+            stub.ferma()
+    
+    print("✅ Aggiornamenti dell'indice corretti")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_intervalli(),
+        test_aggiornamenti()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del gestore di job (modules/job_manager.py).
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, time as dt_time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.cron import EspressioneCron
+from modules.job_manager import ArchivioJob, JobManager
+
+def test_ordine_esecuzione():
+    """Verifica ordine delle esecuzioni, rimozione dei job e assenza di thread per job."""
+    print("\n=== Test ordine di esecuzione ===")
+    manager = JobManager()
+    manager.start()
+    try:
+        eseguiti = []
+        thread = []
+        
+        async def callback(data):
+            eseguiti.append(data)
+            thread.append(threading.current_thread().name)
+        
+        thread_iniziali = threading.active_count()
+        for i in reversed(range(50)):
+            manager.run_once(callback, 0.1 + i * 0.004, data=i, name=f"job_{i}")
+        rimosso = manager.get_jobs_by_name("job_7")[0]
+        if not manager.remove_job(rimosso) or manager.remove_job(rimosso):
+            print("❌ Rimozione del job non corretta")
+            return False
+        risvegli = manager.statistiche()['risvegli']
+        time.sleep(0.5)
+        
+        if eseguiti != [i for i in range(50) if i != 7]:
+            print(f"❌ Ordine di esecuzione non corretto: {eseguiti}")
+            return False
+        if set(thread) != {'job_manager_loop'} or threading.active_count() != thread_iniziali:
+            print(f"❌ Sono stati creati thread per l'esecuzione dei job: {set(thread)}")
+            return False
+        statistiche = manager.statistiche()
+        risvegli = statistiche['risvegli'] - risvegli
+        print(f"Risvegli del dispatcher per 49 job: {risvegli}")
+        if statistiche['job'] or statistiche['in_coda'] or statistiche['esecuzioni'] != 49:
+            print(f"❌ Statistiche non corrette: {statistiche}")
+            return False
+        # Il dispatcher si risveglia solo alle scadenze, non a intervalli fissi
+        if risvegli > 60:
+            print("❌ Il dispatcher si è risvegliato troppe volte")
+            return False
+        
+        # Senza job il dispatcher resta fermo
+        risvegli = manager.statistiche()['risvegli']
+        time.sleep(0.3)
+        if manager.statistiche()['risvegli'] != risvegli:
+            print("❌ Il dispatcher si risveglia anche senza job")
+            return False
+    finally:
+        manager.stop()
+    
+    print("✅ Ordine di esecuzione corretto")
+    return True
+
+def test_esecuzioni_mancate():
+    """Verifica accorpamento e tolleranza per le esecuzioni mancate."""
+    print("\n=== Test esecuzioni mancate ===")
+    manager = JobManager()
+    try:
+        eseguiti = []
+        
+        async def callback(data):
+            eseguiti.append(data)
+        
+        # Il gestore non è ancora avviato: tutti i job accumulano ritardo
+        ripetuto = manager.run_repeating(callback, 0.04, data='ripetuto', name='ripetuto')
+        manager.run_once(callback, 0, data='tardivo', tolleranza=0.01)
+        manager.run_once(callback, 0, data='senza_limite')
+        time.sleep(0.2)
+        manager.start()
+        time.sleep(0.01)
+        
+        # Le cinque occorrenze mancate del job ripetuto producono una sola esecuzione
+        if sorted(set(eseguiti)) != ['ripetuto', 'senza_limite'] or eseguiti.count('ripetuto') > 2:
+            print(f"❌ Esecuzioni non corrette: {eseguiti}")
+            return False
+        metriche = ripetuto['metriche']
+        if metriche['accorpate'] < 3 or ripetuto['next_run'].timestamp() <= time.time() - 0.04:
+            print(f"❌ Esecuzioni mancate non accorpate: {metriche}")
+            return False
+        if manager.statistiche()['saltate'] != 1:
+            print("❌ L'esecuzione oltre la tolleranza non è stata saltata")
+            return False
+    finally:
+        manager.stop()
+    
+    print("✅ Esecuzioni mancate corrette")
+    return True
+
+def test_metriche():
+    """Verifica metriche di durata, errori, sovrapposizioni e callback sincrone."""
+    print("\n=== Test metriche dei job ===")
+    manager = JobManager()
+    manager.start()
+    try:
+        async def lento(data):
+            await asyncio.sleep(0.07)
+        
+        def sincrono(data):
+            if data == 'errore':
+                raise ValueError(data)
+        
+        job = manager.run_repeating(lento, 0.03, name='lento', jitter=0.005)
+        manager.run_once(sincrono, 0, data='ok')
+        manager.run_once(sincrono, 0, data='errore')
+        time.sleep(0.33)
+        manager.remove_job(job)
+        time.sleep(0.1)
+        
+        metriche = job['metriche']
+        print(f"Metriche: {metriche}")
+        # Le esecuzioni che si sovrappongono alla precedente vengono accorpate
+        if not 3 <= metriche['esecuzioni'] <= 5 or metriche['accorpate'] < 3:
+            print("❌ Esecuzioni sovrapposte non accorpate")
+            return False
+        if not 0.07 <= metriche['durata_max'] < 0.2 or metriche['durata_ultima'] < 0.07 or metriche['errori']:
+            print("❌ Durate non registrate")
+            return False
+        statistiche = manager.statistiche()
+        if statistiche['errori'] != 1 or statistiche['esecuzioni'] < 5:
+            print(f"❌ Errori non registrati: {statistiche}")
+            return False
+    finally:
+        manager.stop()
+    
+    print("✅ Metriche dei job corrette")
+    return True
+
+def prossima_per_passi(cron, dopo):
+    """Calcola la prossima esecuzione avanzando di un minuto alla volta (riferimento per il test)."""
+    istante = dopo.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    while True:
+        settimana = (istante.weekday() + 1) % 7
+        nel_mese = istante.day in cron.giorni_mese
+        in_settimana = settimana in cron.giorni_settimana
+        giorno = (nel_mese or in_settimana) if cron.limita_mese and cron.limita_settimana else (nel_mese and in_settimana)
+        if (giorno and istante.month in cron.mesi and istante.hour in cron.ore and istante.minute in cron.minuti):
+            return istante
+        istante += timedelta(minutes=1)
+
+def test_espressioni_cron():
+    """Verifica il calcolo della prossima esecuzione delle espressioni cron."""
+    print("\n=== Test espressioni cron ===")
+    espressioni = ['0 18 * * sun', '*/15 9-17 * * mon-fri', '30 2 1,15 * *', '0 0 13 * fri',
+                   '5 4 * feb,aug *', '@hourly', '0 12 31 * *', '0 6 * * 7']
+    inizio = datetime(2025, 1, 30, 17, 59, 30)
+    for espressione in espressioni:
+        cron = EspressioneCron(espressione)
+        istante = inizio
+        for _ in range(8):
+            attesa = prossima_per_passi(cron, istante)
+            calcolata = cron.prossima(istante)
+            if calcolata != attesa:
+                print(f"❌ '{espressione}' dopo {istante}: {calcolata} invece di {attesa}")
+                return False
+            istante = calcolata
+    
+    # Secondi, anni bisestili e calcolo diretto anche per scadenze lontane
+    casi = [
+        ('*/20 * * * * *', datetime(2025, 1, 1, 0, 0, 59), datetime(2025, 1, 1, 0, 1, 0)),
+        ('0 0 29 2 *', datetime(2025, 3, 1), datetime(2028, 2, 29)),
+        ('0 18 * * 0', datetime(2025, 5, 4, 18, 0), datetime(2025, 5, 11, 18, 0))
+    ]
+    for espressione, dopo, attesa in casi:
+        if EspressioneCron(espressione).prossima(dopo) != attesa:
+            print(f"❌ '{espressione}' dopo {dopo}: {EspressioneCron(espressione).prossima(dopo)}")
+            return False
+    cron = EspressioneCron('0 0 29 2 *')
+    durata = time.perf_counter()
+    for _ in range(1000):
+        cron.prossima(datetime(2025, 3, 1))
+    durata = (time.perf_counter() - durata) / 1000
+    print(f"Prossimo 29 febbraio: {durata * 1e6:.1f} µs")
+    
+    for errata in ['* * * *', '60 * * * *', '*/0 * * * *', '5-1 * * * *', '0 0 * * lun', '0 0 30 2 *']:
+        try:
+            EspressioneCron(errata).prossima(datetime(2025, 1, 1))
+            print(f"❌ Espressione non valida accettata: '{errata}'")
+            return False
+        except ValueError:
+            pass
+    
+    # run_daily usa l'espressione equivalente
+    manager = JobManager()
+    async def callback(data):
+        pass
+    job = manager.run_daily(callback, dt_time(18, 0), days=[6])
+    if job["cron"] != EspressioneCron('0 0 18 * * 0') or job["next_run"].weekday() != 6 or job["next_run"].hour != 18:
+        print(f"❌ Job giornaliero non corretto: {job['cron']} {job['next_run']}")
+        return False
+    
+    print("✅ Espressioni cron corrette")
+    return True
+
+def test_job_persistenti():
+    """Verifica recupero delle esecuzioni perse e idempotenza dei job persistenti dopo un riavvio."""
+    print("\n=== Test job persistenti ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        percorso = os.path.join(cartella, 'job.db')
+        inviati = []
+        
+        async def riepilogo(data):
+            inviati.append(data)
+        
+        def riavvia(prossima=None, prenotata=False, **opzioni):
+            """Simula un riavvio del bot dopo che l'esecuzione 'prossima' non è avvenuta."""
+            archivio = ArchivioJob(percorso)
+            if prossima:
+                archivio.salva_prossima('riepilogo', '0 18 * * 0', prossima)
+                if prenotata:
+                    archivio.prenota(f"riepilogo@{prossima.isoformat()}", 'riepilogo', '0 18 * * 0', prossima)
+            manager = JobManager(archivio=archivio)
+            manager.start()
+            job = manager.run_cron(riepilogo, '0 18 * * 0', data='riepilogo', name='riepilogo', persistente=True, **opzioni)
+            time.sleep(0.1)
+            manager.stop()
+            return archivio, job
+        
+        # Primo avvio: nessuna esecuzione da recuperare
+        archivio, job = riavvia()
+        prossima = EspressioneCron('0 18 * * 0').prossima(datetime.now())
+        if inviati or archivio.prossima('riepilogo', '0 18 * * 0') != prossima:
+            print("❌ Primo avvio non corretto")
+            return False
+        
+        # Il bot era fermo all'ora prevista: il riepilogo viene recuperato una sola volta
+        persa = prossima - timedelta(days=14)
+        archivio, job = riavvia(persa)
+        chiave = f"riepilogo@{persa.isoformat()}"
+        if inviati != ['riepilogo'] or archivio.stato_esecuzione(chiave) != 'completata':
+            print(f"❌ Esecuzione persa non recuperata: {inviati}")
+            return False
+        if job['metriche']['accorpate'] != 1 or archivio.prossima('riepilogo', '0 18 * * 0') != prossima:
+            print(f"❌ Esecuzioni perse non accorpate: {job['metriche']}")
+            return False
+        
+        # Un riavvio non ripete l'esecuzione già completata...
+        archivio, job = riavvia(persa)
+        # ...né quella interrotta da un arresto anomalo durante l'invio
+        interrotta = prossima - timedelta(days=7)
+        archivio, job = riavvia(interrotta, prenotata=True)
+        if inviati != ['riepilogo'] or job['metriche']['duplicate'] != 1:
+            print(f"❌ Esecuzione ripetuta dopo il riavvio: {inviati}")
+            return False
+        
+        # Oltre la tolleranza l'esecuzione persa viene saltata
+        archivio, job = riavvia(prossima - timedelta(days=2), tolleranza=3600)
+        if inviati != ['riepilogo'] or job['metriche']['saltate'] != 1 or archivio.prossima('riepilogo', '0 18 * * 0') != prossima:
+            print("❌ Esecuzione oltre la tolleranza non saltata")
+            return False
+        
+        # Se la pianificazione cambia, quella salvata viene ignorata
+        if archivio.prossima('riepilogo', '0 9 * * 1') is not None:
+            print("❌ Pianificazione salvata usata per un'altra espressione")
+            return False
+        try:
+            JobManager(archivio=archivio).run_cron(riepilogo, '@daily', persistente=True)
+            print("❌ Job persistente senza nome accettato")
+            return False
+        except ValueError:
+            pass
+    
+    print("✅ Job persistenti corretti")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_ordine_esecuzione(),
+        test_esecuzioni_mancate(),
+        test_metriche(),
+        test_espressioni_cron(),
+        test_job_persistenti()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
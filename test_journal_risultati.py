@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test dell'archivio locale dei risultati basato su snapshot e journal.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.journal_manager import JournalStore
+
+def crea_risultati(n):
+    """Genera n risultati di esempio."""
+    return [{
+        'id': i + 1,
+        'categoria': 'U16',
+        'squadra1': f"Squadra {i}",
+        'squadra2': f"Squadra {i + 1}",
+        'punteggio1': i % 30,
+        'punteggio2': (i * 3) % 30,
+        'data_partita': '15/03/2025'
+    } for i in range(n)]
+
+def test_journal_e_ripristino():
+    """Verifica che le modifiche finiscano nel journal e vengano riapplicate al caricamento."""
+    print("\n=== Test journal e ripristino ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        percorso = os.path.join(cartella, 'risultati.json')
+        
+        # Snapshot iniziale nel vecchio formato indentato
+        risultati = crea_risultati(50)
+        with open(percorso, 'w', encoding='utf-8') as file:
+            json.dump(risultati, file, indent=2, ensure_ascii=False)
+        dimensione_snapshot = os.path.getsize(percorso)
+        
+        store = JournalStore(percorso)
+        if store.carica() != risultati:
+            print("❌ Lo snapshot iniziale non è stato caricato correttamente")
+            return False
+        
+        # Una modifica, un'eliminazione e un inserimento
+        risultati[5]['punteggio1'] = 77
+        risultati.pop(8)
+        risultati.append({'id': 999, 'squadra1': 'Nuova A', 'squadra2': 'Nuova B'})
+        store.salva_tutti(risultati)
+        
+        if os.path.getsize(percorso) != dimensione_snapshot:
+            print("❌ Lo snapshot è stato riscritto per una modifica incrementale")
+            return False
+        with open(percorso + '.journal', 'r', encoding='utf-8') as file:
+            righe = file.readlines()
+        if len(righe) != 3:
+            print(f"❌ Il journal contiene {len(righe)} righe invece di 3")
+            return False
+        
+        # Simula una scrittura interrotta: una riga incompleta in coda viene ignorata
+        with open(percorso + '.journal', 'a', encoding='utf-8') as file:
+            file.write('{"op":"upsert","id":1000,"rec')
+        
+        # Un nuovo archivio (come dopo un riavvio) deve vedere lo stesso stato
+        if JournalStore(percorso).carica() != risultati:
+            print("❌ Il ripristino da snapshot e journal non ha prodotto lo stato atteso")
+            return False
+    
+    print("✅ Journal e ripristino corretti")
+    return True
+
+def test_compattazione():
+    """Verifica la compattazione del journal in un nuovo snapshot."""
+    print("\n=== Test compattazione ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        percorso = os.path.join(cartella, 'risultati.json')
+        store = JournalStore(percorso, soglia_compattazione=2048)
+        
+        risultati = crea_risultati(10)
+        store.salva_tutti(risultati)
+        for i in range(100):
+            risultati[i % 10]['punteggio1'] = i
+            store.salva(risultati[i % 10])
+        store.attendi_compattazione(timeout=5)
+        
+        if os.path.getsize(percorso + '.journal') > 2048 + 1024:
+            print("❌ Il journal non è stato compattato")
+            return False
+        
+        with open(percorso, 'r', encoding='utf-8') as file:
+            snapshot = json.load(file)
+        if len(snapshot) != 10:
+            print("❌ Lo snapshot compattato non contiene tutti i risultati")
+            return False
+        
+        store.compatta()
+        if JournalStore(percorso).carica() != risultati or os.path.getsize(percorso + '.journal') != 0:
+            print("❌ Lo stato dopo la compattazione non è corretto")
+            return False
+        
+        # Una lista riordinata non è esprimibile nel journal: viene scritto un nuovo snapshot
+        risultati.reverse()
+        store.salva_tutti(risultati)
+        if JournalStore(percorso).carica() != risultati:
+            print("❌ L'ordine dei risultati non è stato mantenuto")
+            return False
+    
+    print("✅ Compattazione corretta")
+    return True
+
+def test_compattazione_concorrente():
+    """Verifica che una riga aggiunta da un altro archivio durante la compattazione non vada persa."""
+    print("\n=== Test compattazione concorrente ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        percorso = os.path.join(cartella, 'risultati.json')
+        store_a = JournalStore(percorso)
+        store_b = JournalStore(percorso)
+        store_a.salva_tutti(crea_risultati(5))
+        store_a.salva({'id': 3, 'squadra1': 'Modificata'})
+        
+        # Il secondo archivio scrive subito dopo che il primo ha letto lo stato da compattare
+        scrittori = []
+        nuovi = [{'id': 6, 'squadra1': 'Nuova'}, {'id': 7, 'squadra1': 'Altra'}]
+        sincronizza = store_a._sincronizza
+        
+        def sincronizza_e_scrivi():
+            sincronizza()
+            if not scrittori:
+                scrittori.append(threading.Thread(target=store_b.salva, args=(nuovi.pop(0),)))
+                scrittori[0].start()
+                time.sleep(0.2)
+        store_a._sincronizza = sincronizza_e_scrivi
+        
+        store_a.compatta()
+        scrittori[0].join(5)
+        
+        ids = [r['id'] for r in JournalStore(percorso).carica()]
+        if ids != [1, 2, 3, 4, 5, 6]:
+            print(f"❌ Riga concorrente persa durante la compattazione: {ids}")
+            return False
+        
+        # Lo stesso vale per il nuovo snapshot scritto da salva_tutti
+        scrittori.clear()
+        store_a.salva_tutti(list(reversed(crea_risultati(5))))
+        scrittori[0].join(5)
+        ids = [r['id'] for r in JournalStore(percorso).carica()]
+        if ids != [5, 4, 3, 2, 1, 7]:
+            print(f"❌ Riga concorrente persa durante la scrittura dello snapshot: {ids}")
+            return False
+    
+    print("✅ Compattazione concorrente corretta")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_journal_e_ripristino(),
+        test_compattazione(),
+        test_compattazione_concorrente()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline dell'esposizione delle metriche in formato Prometheus (modules/metriche.py).
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+import urllib.request
+from http.server import HTTPServer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.cache_manager import cache
+from modules.job_manager import job_manager
+from modules.metriche import CONTENT_TYPE, genera_metriche
+from modules.monitor import BotMonitor
+
+# Riga valida del formato di esposizione: commento HELP/TYPE o campione con etichette opzionali
+RIGA = re.compile(r'^(# (HELP|TYPE) [a-zA-Z_:][a-zA-Z0-9_:]* .+'
+                  r'|[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? '
+                  r'(-?[0-9.e+-]+|\+Inf|-Inf|NaN))$')
+
+def _monitor_di_prova():
+    """Crea un monitor con qualche comando tracciato, che segnala ogni campionamento del sistema."""
+    monitor = BotMonitor()
+    monitor.campionamenti = 0
+    
+    def campiona(*args, **kwargs):
+        monitor.campionamenti += 1
+    monitor._update_system_metrics = campiona
+    
+    for i in range(50):
+        comando = '/risultati' if i % 2 else '/start'
+        start = monitor.track_command(i % 7, f"Utente {i % 7}", comando)
+        monitor.track_command_completion(start - i / 1000, comando)
+    monitor.track_error("Errore", "test \"virgolette\"")
+    return monitor
+
+def test_formato_esposizione():
+    """Verifica la sintassi del testo, il raggruppamento delle famiglie e gli istogrammi."""
+    print("\n=== Test formato di esposizione ===")
+    monitor = _monitor_di_prova()
+    testo = genera_metriche(monitor)
+    righe = testo.rstrip('\n').split('\n')
+    
+    errate = [riga for riga in righe if not RIGA.match(riga)]
+    if errate:
+        print(f"❌ Righe non valide: {errate[:3]}")
+        return False
+    if monitor.campionamenti:
+        print("❌ La generazione delle metriche ha campionato il sistema")
+        return False
+    
+    # Ogni famiglia ha un solo TYPE e i suoi campioni sono contigui
+    tipi = [riga.split()[2] for riga in righe if riga.startswith('# TYPE')]
+    if len(tipi) != len(set(tipi)):
+        print("❌ Famiglie dichiarate più volte")
+        return False
+    famiglie = []
+    for riga in righe:
+        if riga.startswith('#'):
+            continue
+        nome = re.split(r'[{ ]', riga, 1)[0]
+        famiglia = next((tipo for tipo in tipi if nome == tipo or nome.startswith(tipo + '_')), None)
+        if famiglia is None:
+            print(f"❌ Campione senza famiglia: {riga}")
+            return False
+        if not famiglie or famiglie[-1] != famiglia:
+            famiglie.append(famiglia)
+    if len(famiglie) != len(set(famiglie)):
+        print("❌ Campioni di una famiglia non contigui")
+        return False
+    
+    # Istogramma per comando: bucket cumulativi fino a +Inf uguale al conteggio
+    bucket = [float(riga.rsplit(' ', 1)[1]) for riga in righe
+              if riga.startswith('crv_bot_command_duration_seconds_bucket{command="/start"')]
+    conteggio = [riga for riga in righe if riga.startswith('crv_bot_command_duration_seconds_count{command="/start"}')]
+    if not bucket or bucket != sorted(bucket) or not conteggio or float(conteggio[0].rsplit(' ', 1)[1]) != 25:
+        print(f"❌ Istogramma per comando non corretto: {bucket}, {conteggio}")
+        return False
+    if 'crv_bot_commands_total 50' not in righe or 'crv_bot_errors_total 1' not in righe:
+        print("❌ Contatori dei comandi o degli errori non corretti")
+        return False
+    
+    print("✅ Formato di esposizione corretto")
+    return True
+
+def test_sorgenti_moduli():
+    """Verifica che cache e job pianificati compaiano tra le metriche."""
+    print("\n=== Test metriche dei moduli ===")
+    namespace = cache.namespace('test_metriche')
+    namespace.ottieni('chiave', lambda: 1)
+    namespace.ottieni('chiave', lambda: 1)
+    
+    eseguito = threading.Event()
+    job_manager.run_once(lambda context: eseguito.set(), 0, name='test_metriche')
+    eseguito.wait(2)
+    time.sleep(0.1)
+    
+    testo = genera_metriche(_monitor_di_prova())
+    attese = ['crv_cache_hits_total{namespace="test_metriche"} 1',
+              'crv_cache_misses_total{namespace="test_metriche"} 1',
+              'crv_cache_hit_ratio{namespace="test_metriche"} 0.5',
+              '# TYPE crv_jobs_runs_total counter']
+    mancanti = [riga for riga in attese if riga not in testo.split('\n')]
+    if mancanti:
+        print(f"❌ Metriche mancanti: {mancanti}")
+        return False
+    
+    print("✅ Metriche dei moduli presenti")
+    return True
+
+def test_endpoint():
+    """Verifica l'endpoint /metrics del server web del bot."""
+    print("\n=== Test endpoint /metrics ===")
+    from modules.web_server import WebRequestHandler
+    WebRequestHandler.log_message = lambda *args: None
+    server = HTTPServer(('127.0.0.1', 0), WebRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5) as risposta:
+            stato = risposta.status
+            tipo = risposta.headers.get('Content-type')
+            testo = risposta.read().decode('utf-8')
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    if stato != 200 or tipo != CONTENT_TYPE or '# TYPE crv_bot_commands_total counter' not in testo:
+        print(f"❌ Risposta non corretta: {stato}, {tipo}")
+        return False
+    
+    print("✅ Endpoint /metrics corretto")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_formato_esposizione(),
+        test_sorgenti_moduli(),
+        test_endpoint()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
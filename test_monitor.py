@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline delle metriche a finestre mobili del monitor del bot (modules/monitor.py).
+"""
+
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules import monitor as modulo_monitor
+from modules.monitor import BotMonitor, LatencyHistogram, SystemSampler, TimeBuckets
+
+class Orologio:
+    """Orologio simulato per far scorrere il tempo nei test."""
+    def __init__(self, ora=1699999200.0):
+        self.ora = ora
+    
+    def __call__(self):
+        return self.ora
+
+def test_finestre_mobili():
+    """Verifica i contatori a finestre mobili e la scadenza degli utenti attivi."""
+    print("\n=== Test finestre mobili ===")
+    orologio = Orologio()
+    monitor = BotMonitor(clock=orologio)
+    
+    # Un comando al secondo per due ore, da 100 utenti diversi
+    for i in range(7200):
+        orologio.ora += 1 if i else 0
+        monitor.track_command(i % 100, f"Utente {i % 100}", "/risultati")
+    monitor.track_error("Errore", "test")
+    attivita = monitor.get_activity()
+    comandi = attivita['commands']
+    if (comandi['minute'], comandi['hour'], comandi['day'], comandi['total']) != (60, 3600, 7200, 7200):
+        print(f"❌ Contatori non corretti: {comandi}")
+        return False
+    if attivita['errors']['hour'] != 1 or attivita['active_users_24h'] != 100 or len(attivita['commands_per_minute']) != 60:
+        print(f"❌ Attività non corretta: {attivita['errors']}, {attivita['active_users_24h']}")
+        return False
+    
+    # Dopo 23 ore solo gli utenti tornati restano attivi
+    orologio.ora += 23 * 3600
+    for user_id in range(10):
+        monitor.track_command(user_id, f"Utente {user_id}", "/start")
+    orologio.ora += 3600
+    attivita = monitor.get_activity()
+    if attivita['active_users_24h'] != 10 or len(monitor.metrics['active_users_24h']) != 10:
+        print(f"❌ Utenti attivi non scaduti: {attivita['active_users_24h']}")
+        return False
+    if attivita['commands']['hour'] != 0 or attivita['commands']['day'] != 10 or attivita['errors']['hour'] != 0:
+        print(f"❌ Finestre non scadute: {attivita['commands']}")
+        return False
+    
+    # Il buffer circolare riusa gli intervalli scaduti
+    finestra = TimeBuckets(60, 60)
+    finestra.add(0, 5)
+    finestra.add(3600, 2)
+    if finestra.total(3600) != 2 or finestra.series(3600)[-1] != (3600, 2):
+        print("❌ Intervallo scaduto non azzerato")
+        return False
+    
+    print("✅ Finestre mobili corrette")
+    return True
+
+def test_istogrammi_latenze():
+    """Verifica i percentili degli istogrammi e il costo di registrazione."""
+    print("\n=== Test istogrammi delle latenze ===")
+    generatore = random.Random(42)
+    latenze = [generatore.lognormvariate(-4, 1.2) for _ in range(20000)]
+    istogramma = LatencyHistogram()
+    for latenza in latenze:
+        istogramma.record(latenza)
+    
+    ordinate = sorted(latenze)
+    percentili = istogramma.percentiles((50, 95, 99, 100))
+    for percentile in (50, 95, 99):
+        atteso = ordinate[int(len(ordinate) * percentile / 100) - 1]
+        errore = abs(percentili[percentile] - atteso) / atteso
+        print(f"p{percentile}: {percentili[percentile] * 1e3:.2f} ms (esatto {atteso * 1e3:.2f} ms)")
+        if errore > 0.04:
+            print(f"❌ Percentile p{percentile} con errore del {errore:.1%}")
+            return False
+    if percentili[100] != max(latenze) or len(istogramma.counts) > 1000:
+        print("❌ Massimo o dimensione dell'istogramma non corretti")
+        return False
+    cumulativi = istogramma.cumulative_counts([0.001, 0.01, 0.1, 1, 3600])
+    if cumulativi != sorted(cumulativi) or cumulativi[-1] != len(latenze):
+        print(f"❌ Conteggi cumulativi non corretti: {cumulativi}")
+        return False
+    esatti = sum(1 for latenza in latenze if latenza <= 0.1)
+    if abs(cumulativi[2] - esatti) > len(latenze) * 0.01:
+        print(f"❌ Conteggio fino a 100 ms non corretto: {cumulativi[2]} invece di {esatti}")
+        return False
+    
+    # Il costo per comando non dipende dal numero di comandi tracciati
+    monitor = BotMonitor()
+    durate = []
+    for blocco in range(3):
+        inizio = time.perf_counter()
+        for i in range(20000):
+            start = monitor.track_command(i, "Utente", f"/comando{i % 5}")
+            monitor.track_command_completion(start, f"/comando{i % 5}")
+        durate.append((time.perf_counter() - inizio) / 20000)
+    print(f"Tempo per comando tracciato: {[f'{d * 1e6:.1f} µs' for d in durate]}")
+    if durate[-1] > durate[0] * 3 or len(monitor.command_latency) != 5:
+        print("❌ Il costo di tracciamento cresce con i comandi tracciati")
+        return False
+    
+    salute = monitor.get_health_status()
+    if salute['command_latency']['/comando0']['count'] != 12000 or 'response_time_p99' not in salute:
+        print("❌ Latenze per comando non riportate nello stato di salute")
+        return False
+    if "p50/p95/p99" not in monitor.format_health_message():
+        print("❌ Percentili non riportati nel messaggio di stato")
+        return False
+    
+    print("✅ Istogrammi delle latenze corretti")
+    return True
+
+def test_campionatore_sistema():
+    """Verifica il campionamento in background e che lo stato di salute non attenda misure."""
+    print("\n=== Test campionatore di sistema ===")
+    campionatore = SystemSampler(interval=0.05, history=10)
+    loop = asyncio.new_event_loop()
+    thread_loop = threading.Thread(target=loop.run_forever, daemon=True)
+    thread_loop.start()
+    campionatore.watch_loop(loop, 'test')
+    campionatore.start()
+    try:
+        time.sleep(1.3)
+        # Un loop bloccato fa crescere il ritardo misurato, senza bloccare il campionatore
+        loop.call_soon_threadsafe(time.sleep, 0.3)
+        time.sleep(0.6)
+        campioni = campionatore.history()
+        ritardi = [campione['loop_lag'].get('test') or 0 for campione in campioni]
+        if len(campioni) != 10 or max(ritardi) < 0.2:
+            print(f"❌ Campioni o ritardo del loop non corretti: {len(campioni)}, {max(ritardi):.3f}s")
+            return False
+        if campioni[-1]['threads'] < 3 or modulo_monitor.PSUTIL_AVAILABLE and not campioni[-1]['process_rss']:
+            print(f"❌ Metriche del processo mancanti: {campioni[-1]}")
+            return False
+        
+        monitor = BotMonitor(sampler=campionatore)
+        inizio = time.perf_counter()
+        for _ in range(20):
+            salute = monitor.get_health_status()
+        durata = (time.perf_counter() - inizio) / 20
+        print(f"Tempo per lo stato di salute: {durata * 1e3:.2f} ms")
+        if durata > 0.02 or salute['system']['process_rss'] == "N/A" and modulo_monitor.PSUTIL_AVAILABLE:
+            print("❌ Lo stato di salute attende le misure di sistema")
+            return False
+    finally:
+        campionatore.stop()
+        loop.call_soon_threadsafe(loop.stop)
+        thread_loop.join(1)
+        loop.close()
+    
+    # Senza psutil restano disponibili thread e ritardo dei loop
+    disponibile = modulo_monitor.PSUTIL_AVAILABLE
+    modulo_monitor.PSUTIL_AVAILABLE = False
+    try:
+        campione = SystemSampler().sample()
+    finally:
+        modulo_monitor.PSUTIL_AVAILABLE = disponibile
+    if campione['cpu_percent'] != 0 or campione['process_rss'] is not None or campione['threads'] < 1:
+        print(f"❌ Campione senza psutil non corretto: {campione}")
+        return False
+    
+    print("✅ Campionatore di sistema corretto")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_finestre_mobili(),
+        test_istogrammi_latenze(),
+        test_campionatore_sistema()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
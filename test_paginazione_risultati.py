@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline della paginazione keyset dei risultati (db_manager.list_risultati).
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import db_async
+
+def crea_risultati(num_risultati=60):
+    """Crea risultati con date ripetute (stesso giorno per più partite) e alcune date mancanti."""
+    risultati = []
+    for i in range(num_risultati):
+        data = '' if i % 7 == 3 else f"{i % 20 + 1:02d}/03/2025"
+        risultati.append({
+            'id': i + 1, 'categoria': 'U14' if i % 3 else 'U16', 'genere': 'Maschile',
+            'data_partita': data, 'squadra1': f"Squadra {i}", 'squadra2': f"Squadra {i + 1}",
+            'punteggio1': i % 40, 'punteggio2': (i * 7) % 40, 'mete1': i % 6, 'mete2': (i * 3) % 6
+        })
+    return risultati
+
+def ordine_atteso(risultati, **filtri):
+    """Ordine di riferimento: data decrescente, ID decrescente, date mancanti in fondo."""
+    righe = [r for r in risultati if all(r.get(c) == v for c, v in filtri.items())]
+    iso = lambda r: '2025-03-%s' % r['data_partita'][:2] if r['data_partita'] else None
+    valorizzate = sorted((r for r in righe if iso(r)), key=lambda r: (iso(r), r['id']), reverse=True)
+    nulle = sorted((r for r in righe if not iso(r)), key=lambda r: r['id'], reverse=True)
+    return [r['id'] for r in valorizzate + nulle]
+
+def scorri_pagine(funzione, **parametri):
+    """Legge tutte le pagine seguendo i cursori e restituisce gli ID e il numero di pagine."""
+    ids, pagine, cursore = [], 0, None
+    while True:
+        pagina = funzione(after=cursore, **parametri)
+        ids.extend(r['id'] for r in pagina['risultati'])
+        pagine += 1
+        cursore = pagina['cursore']
+        if not cursore or pagine > 100:
+            return ids, pagine
+
+def test_paginazione():
+    """Verifica che le pagine, concatenate, restituiscano tutti i risultati nell'ordine corretto."""
+    print("\n=== Test paginazione keyset ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub = StubSupabase().avvia()
+        try:
+            db = collega_db_manager(stub)
+            db.RISULTATI_FILE = os.path.join(cartella, 'risultati.json')
+            risultati = crea_risultati()
+            db.salva_risultati(risultati)
+            
+            # Pagine lato server: una richiesta per pagina, nessuna riga mancante o ripetuta
+            stub.azzera_richieste()
+            ids, pagine = scorri_pagine(db.list_risultati, limit=7)
+            if ids != ordine_atteso(risultati):
+                print(f"❌ Ordine delle pagine non corretto: {ids}")
+                return False
+            if pagine != 9 or stub.conta_richieste('GET', 'risultati') != pagine:
+                print(f"❌ {pagine} pagine con {stub.conta_richieste('GET', 'risultati')} richieste")
+                return False
+            
+            # Filtri di uguaglianza e intervallo di date
+            ids, _ = scorri_pagine(db.list_risultati, limit=5, categoria='U16')
+            if ids != ordine_atteso(risultati, categoria='U16'):
+                print("❌ Filtro per categoria non corretto")
+                return False
+            pagina = db.list_risultati(limit=50, data_da='2025-03-05', data_a='2025-03-06')
+            attese = [i for i in ordine_atteso(risultati) if risultati[i - 1]['data_partita'] in ('05/03/2025', '06/03/2025')]
+            if [r['id'] for r in pagina['risultati']] != attese:
+                print(f"❌ Filtro per date non corretto: {[r['data_partita'] for r in pagina['risultati']]}")
+                return False
+            
+            # Un nuovo risultato più recente non sposta le pagine successive già richieste
+            prima = db.list_risultati(limit=10)
+            db.salva_risultato(dict(risultati[0], id=100, data_partita='31/03/2025'))
+            seconda = db.list_risultati(after=prima['cursore'], limit=10)
+            if [r['id'] for r in prima['risultati'] + seconda['risultati']] != ordine_atteso(risultati)[:20]:
+                print("❌ Le pagine successive sono cambiate dopo un inserimento")
+                return False
+            
+            # Senza Supabase la pagina viene calcolata dal file locale con la stessa semantica
+            client, db.supabase = db.supabase, None
+            try:
+                ids_file, _ = scorri_pagine(db.list_risultati, limit=7)
+            finally:
+                db.supabase = client
+            ids_db, _ = scorri_pagine(db.list_risultati, limit=7)
+            if ids_file != ids_db:
+                print("❌ La paginazione dal file locale differisce da quella di Supabase")
+                return False
+            
+            # Versione asincrona
+            async def scenario():
+                try:
+                    return await db_async.list_risultati(limit=7, after=db.list_risultati(limit=7)['cursore'])
+                finally:
+                    await db_async.chiudi_client()
+            if [r['id'] for r in asyncio.run(scenario())['risultati']] != ids_db[7:14]:
+                print("❌ La paginazione asincrona differisce da quella sincrona")
+                return False
+        finally:
+            stub.ferma()
+    
+    print("✅ Paginazione keyset corretta")
+    return True
+
+def test_parametri_non_validi():
+    """Verifica che cursori, ordinamenti e filtri non validi vengano rifiutati."""
+    print("\n=== Test parametri non validi ===")
+    stub = StubSupabase().avvia()
+    try:
+        db = collega_db_manager(stub)
+        for parametri in ({'after': 'non-un-cursore'}, {'order': 'colonna_inesistente desc'},
+                          {'order': 'data_partita_iso alto'}, {'squadra': 'Rovigo'}):
+            try:
+                db.list_risultati(**parametri)
+                print(f"❌ Parametri non validi accettati: {parametri}")
+                return False
+            except ValueError:
+                pass
+    finally:
+        stub.ferma()
+    
+    print("✅ Parametri non validi rifiutati")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_paginazione(),
+        test_parametri_non_validi()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
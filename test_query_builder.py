@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del costruttore di query PostgREST (db_manager.SupabaseTable).
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import campionati_manager as cm
+
+SQUADRE = ["RUGBY ROVIGO DELTA SRL SSD", "ASD C'E' L'ESTE RUGBY", "VERONA RUGBY ASD", "RUGBY PAESE ASD"]
+
+def prepara_stub():
+    """Avvia lo stub con 200 partite distribuite su 100 giorni attorno a oggi."""
+    stub = StubSupabase().avvia()
+    db = collega_db_manager(stub)
+    oggi = datetime.now().date()
+    stub.tabelle['partite_campionato'] = [{
+        'id': i + 1, 'campionato_id': i % 2 + 1, 'data_partita': (oggi + timedelta(days=i // 2 - 50)).strftime('%Y-%m-%d'),
+        'squadra_casa': SQUADRE[i % 4], 'squadra_trasferta': SQUADRE[(i + 1) % 4],
+        'stato': 'completata' if i < 100 else 'programmata', 'note': 'x' * 200
+    } for i in range(200)]
+    stub.tabelle['campionati'] = [{'id': 1, 'nome': 'Serie A', 'stagione_id': 1}, {'id': 2, 'nome': 'Serie B', 'stagione_id': 2}]
+    stub.tabelle['arbitri'] = [{'id': 1, 'nome': 'Mario', 'cognome': 'Rossi'}, {'id': 2, 'nome': 'Paolo', 'cognome': 'Bianchi'},
+                               {'id': 3, 'nome': 'Anna', 'cognome': 'Verdi'}]
+    return stub, db
+
+def test_query():
+    """Verifica filtri, ordinamento, paginazione, proiezione e conteggio lato server."""
+    print("\n=== Test costruttore di query ===")
+    stub, db = prepara_stub()
+    try:
+        partite = stub.righe('partite_campionato')
+        tabella = lambda: db.supabase.table('partite_campionato')
+        
+        # Filtri di intervallo e ordinamento decrescente con criterio secondario
+        data_inizio, data_fine = partite[40]['data_partita'], partite[59]['data_partita']
+        righe = tabella().select('id,data_partita').gte('data_partita', data_inizio).lte('data_partita', data_fine) \
+            .order('data_partita', desc=True).order('id').execute().data
+        attese = sorted((p for p in partite if data_inizio <= p['data_partita'] <= data_fine),
+                        key=lambda p: (p['data_partita'], -p['id']), reverse=True)
+        if [r['id'] for r in righe] != [p['id'] for p in attese] or set(righe[0]) != {'id', 'data_partita'}:
+            print(f"❌ Filtri, ordinamento o proiezione non corretti: {righe[:3]}")
+            return False
+        
+        # Paginazione con conteggio totale
+        pagina = tabella().select('id', count='exact').eq('stato', 'completata').order('id').range(20, 29).execute()
+        if [r['id'] for r in pagina.data] != list(range(21, 31)) or pagina.count != 100:
+            print(f"❌ Paginazione o conteggio non corretti: {pagina.data}, {pagina.count}")
+            return False
+        if [r['id'] for r in tabella().select('id').in_('id', [5, 3, 150]).order('id').limit(2).execute().data] != [3, 5]:
+            print("❌ Filtro in_ o limit non corretti")
+            return False
+        
+        # Disgiunzione con valori che contengono caratteri riservati
+        squadra = db.SupabaseTable.valore_in_lista(SQUADRE[1])
+        righe = tabella().select('id').or_(f"squadra_casa.eq.{squadra},squadra_trasferta.eq.{squadra}").execute().data
+        if len(righe) != 100:
+            print(f"❌ Filtro or_ non corretto: {len(righe)} righe")
+            return False
+        
+        # Upsert multiplo: una sola richiesta per inserimenti e aggiornamenti
+        stub.azzera_richieste()
+        salvate = db.supabase.table('arbitri').upsert([{'id': 1, 'nome': 'Mario', 'cognome': 'Rossini'},
+                                                       {'id': 4, 'nome': 'Luca', 'cognome': 'Neri'}], on_conflict='id').execute()
+        if stub.conta_richieste() != 1 or len(salvate.data) != 2 or len(stub.righe('arbitri')) != 4:
+            print("❌ Upsert multiplo non corretto")
+            return False
+        
+        # I dati restituiti dipendono dal risultato, non dalla dimensione della tabella
+        completa = len(json.dumps(tabella().select('*').execute().data))
+        pagina = len(json.dumps(tabella().select('id,data_partita').eq('campionato_id', 1).range(0, 9).execute().data))
+        print(f"Tabella completa: {completa} byte, pagina filtrata: {pagina} byte")
+        if pagina * 50 > completa:
+            print("❌ La query filtrata restituisce troppi dati")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Costruttore di query corretto")
+    return True
+
+def test_funzioni_manager():
+    """Verifica le funzioni dei manager che usano ordinamento e filtri lato server."""
+    print("\n=== Test funzioni dei manager ===")
+    stub, db = prepara_stub()
+    try:
+        if [a['cognome'] for a in cm.carica_arbitri(force_reload=True)] != ['Bianchi', 'Rossi', 'Verdi']:
+            print("❌ Gli arbitri non sono ordinati per cognome")
+            return False
+        
+        oggi = datetime.now().strftime('%Y-%m-%d')
+        prossime = cm.get_prossime_partite(7)
+        date = [p['data_partita'] for p in prossime]
+        if len(prossime) != 16 or date != sorted(date) or date[0] != oggi:
+            print(f"❌ Prossime partite non corrette: {date}")
+            return False
+        ultime = cm.get_ultime_partite(7)
+        if len(ultime) != 14 or any(p['stato'] != 'completata' for p in ultime):
+            print(f"❌ Ultime partite non corrette: {[(p['data_partita'], p['stato']) for p in ultime]}")
+            return False
+        
+        partite = cm.get_partite_squadra(SQUADRE[1])
+        date = [p['data_partita'] for p in partite]
+        if len(partite) != 100 or date != sorted(date):
+            print("❌ Partite della squadra non corrette")
+            return False
+        
+        # Un caricamento filtrato non sostituisce l'elenco completo in cache
+        if [c['id'] for c in cm.carica_campionati(stagione_id=2, force_reload=True)] != [2]:
+            print("❌ Filtro per stagione non corretto")
+            return False
+        if len(cm.carica_campionati()) != 2:
+            print("❌ La cache contiene solo i campionati della stagione filtrata")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Funzioni dei manager corrette")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_query(),
+        test_funzioni_manager()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
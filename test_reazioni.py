@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline dell'archivio delle reazioni ai messaggi del canale (modules/reazioni_manager.py).
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.reazioni_manager import ArchivioReazioni, PianificatorePulsanti
+
+REAZIONI_JSON = {
+    "27": {
+        "like": [{"id": 1, "name": "Mario Rossi", "timestamp": "2025-04-24 15:40:45"}],
+        "love": [],
+        "fire": [{"id": 2, "name": "Luca Bianchi", "timestamp": "2025-04-24 15:41:00"}],
+        "clap": [],
+        "rugby": []
+    }
+}
+
+def crea_archivio(cartella):
+    """Crea un archivio nella cartella indicata, importando il vecchio file JSON."""
+    file_json = os.path.join(cartella, 'reazioni.json')
+    with open(file_json, 'w', encoding='utf-8') as file:
+        json.dump(REAZIONI_JSON, file)
+    return ArchivioReazioni(os.path.join(cartella, 'reazioni.db'), file_json)
+
+def test_reazioni():
+    """Verifica importazione, sostituzione e rimozione delle reazioni e persistenza."""
+    print("\n=== Test reazioni ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        archivio = crea_archivio(cartella)
+        if archivio.reazioni_messaggio(27) != REAZIONI_JSON["27"] or archivio.esporta() != REAZIONI_JSON:
+            print(f"❌ Importazione del file JSON non corretta: {archivio.esporta()}")
+            return False
+        
+        # Una reazione diversa sostituisce la precedente, la stessa la rimuove
+        passaggi = [
+            (archivio.registra_reazione(27, 1, "Mario Rossi", "fire"), (True, 0, 2)),
+            (archivio.registra_reazione(27, 1, "Mario Rossi", "fire"), (False, 0, 1)),
+            (archivio.registra_reazione(27, 3, "Anna Verdi", "like"), (True, 1, 1))
+        ]
+        for i, ((attiva, conteggi), (attesa, like, fire)) in enumerate(passaggi):
+            if (attiva, conteggi['like'], conteggi['fire']) != (attesa, like, fire):
+                print(f"❌ Passaggio {i} non corretto: {attiva}, {conteggi}")
+                return False
+        try:
+            archivio.registra_reazione(27, 1, "Mario Rossi", "sconosciuta")
+            print("❌ Un tipo di reazione non valido è stato accettato")
+            return False
+        except ValueError:
+            pass
+        
+        # Un nuovo processo ritrova le stesse reazioni, senza reimportare il file JSON
+        riaperto = ArchivioReazioni(archivio.percorso, archivio.file_json)
+        if riaperto.conteggi_messaggio(27) != archivio.conteggi_messaggio(27) or riaperto.conteggi_messaggio(99)['like']:
+            print("❌ Reazioni non persistite")
+            return False
+        if [u['id'] for u in riaperto.reazioni_messaggio(27)['like']] != [3]:
+            print(f"❌ Reazioni del messaggio non corrette: {riaperto.reazioni_messaggio(27)}")
+            return False
+        
+        # Sostituzione completa (data_manager.salva_reazioni)
+        riaperto.sostituisci(REAZIONI_JSON)
+        if riaperto.esporta() != REAZIONI_JSON or riaperto.conteggi_messaggio(27)['fire'] != 1:
+            print("❌ Sostituzione delle reazioni non corretta")
+            return False
+    
+    print("✅ Reazioni corrette")
+    return True
+
+def test_tocchi_concorrenti():
+    """Verifica che molti tocchi concorrenti sullo stesso messaggio non perdano reazioni."""
+    print("\n=== Test tocchi concorrenti ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        archivio = crea_archivio(cartella)
+        archivio.carica()
+        
+        async def scenario():
+            # 300 utenti reagiscono a due messaggi, i primi 100 cambiano poi reazione
+            tocchi = [archivio.registra_reazione_async(m, u, f"Utente {u}", "like")
+                      for u in range(100, 400) for m in (27, 28)]
+            await asyncio.gather(*tocchi)
+            await asyncio.gather(*[archivio.registra_reazione_async(27, u, f"Utente {u}", "clap") for u in range(100, 200)])
+            return len(archivio.lock_messaggi)
+        
+        inizio = time.perf_counter()
+        lock_residui = asyncio.run(scenario())
+        durata = (time.perf_counter() - inizio) / 700
+        print(f"Tempo medio per tocco: {durata * 1e3:.2f} ms")
+        
+        attesi = {'like': 201, 'love': 0, 'fire': 1, 'clap': 100, 'rugby': 0}
+        if archivio.conteggi_messaggio(27) != attesi or archivio.conteggi_messaggio(28)['like'] != 300:
+            print(f"❌ Conteggi non corretti: {archivio.conteggi_messaggio(27)}, {archivio.conteggi_messaggio(28)}")
+            return False
+        riaperto = ArchivioReazioni(archivio.percorso, archivio.file_json)
+        if riaperto.conteggi_messaggio(27) != attesi:
+            print("❌ Le reazioni salvate differiscono dai conteggi in memoria")
+            return False
+        if lock_residui:
+            print(f"❌ Restano {lock_residui} lock di messaggi non più usati")
+            return False
+    
+    print("✅ Tocchi concorrenti corretti")
+    return True
+
+class LimiteSuperato(Exception):
+    """Simula telegram.error.RetryAfter."""
+    retry_after = 0.05
+
+def test_aggiornamento_pulsanti():
+    """Verifica che le reazioni ravvicinate producano una sola modifica dei pulsanti."""
+    print("\n=== Test aggiornamento dei pulsanti ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        archivio = crea_archivio(cartella)
+        pianificatore = PianificatorePulsanti(archivio, ritardo=0.05)
+        modifiche = []
+        guasti = []
+        
+        async def aggiorna(conteggi):
+            if guasti:
+                raise guasti.pop()
+            modifiche.append(conteggi)
+        
+        async def tocco(message_id, user_id, tipo):
+            await archivio.registra_reazione_async(message_id, user_id, f"Utente {user_id}", tipo)
+            pianificatore.pianifica(message_id, aggiorna)
+        
+        async def scenario():
+            # Raffica di 50 reazioni sullo stesso messaggio
+            await asyncio.gather(*[tocco(27, u, 'rugby') for u in range(100, 150)])
+            await asyncio.sleep(0.1)
+            if len(modifiche) != 1 or modifiche[0]['rugby'] != 50:
+                print(f"❌ Modifiche non accorpate: {modifiche}")
+                return False
+            
+            # Una reazione aggiunta e tolta nella stessa finestra non modifica il messaggio
+            await tocco(27, 200, 'clap')
+            await tocco(27, 200, 'clap')
+            await asyncio.sleep(0.1)
+            if len(modifiche) != 1:
+                print("❌ Il messaggio è stato modificato con conteggi invariati")
+                return False
+            
+            # Limite di Telegram: la modifica viene ripetuta dopo l'attesa indicata
+            guasti.append(LimiteSuperato())
+            await tocco(27, 201, 'love')
+            await asyncio.sleep(0.2)
+            if len(modifiche) != 2 or modifiche[1]['love'] != 1:
+                print(f"❌ Modifica non ripetuta dopo il limite: {modifiche}")
+                return False
+            return True
+        
+        if not asyncio.run(scenario()):
+            return False
+        statistiche = pianificatore.statistiche()
+        print(f"Statistiche: {statistiche}")
+        if statistiche['modifiche'] != 2 or statistiche['risparmiate'] != 51 or statistiche['in_attesa']:
+            print("❌ Statistiche non corrette")
+            return False
+    
+    print("✅ Aggiornamento dei pulsanti corretto")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_reazioni(),
+        test_tocchi_concorrenti(),
+        test_aggiornamento_pulsanti()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del registro in memoria degli utenti (modules/user_manager.py).
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import user_manager as um
+from modules.user_manager import registro_utenti
+
+UTENTI = [
+    {'id': 101, 'nome': 'Mario Rossi', 'username': 'mrossi', 'stato': 'autorizzato', 'ruolo': 'admin'},
+    {'id': 102, 'nome': 'Luca Bianchi', 'username': None, 'stato': 'autorizzato', 'ruolo': 'utente'},
+    {'id': 201, 'nome': 'Paolo Verdi', 'username': 'pverdi', 'stato': 'in_attesa'}
+]
+
+def test_verifiche_permessi():
+    """Verifica che le verifiche dei permessi non leggano il database dopo il primo caricamento."""
+    print("\n=== Test verifiche dei permessi ===")
+    stub = StubSupabase().avvia()
+    try:
+        collega_db_manager(stub)
+        stub.tabelle['utenti'] = [dict(u) for u in UTENTI]
+        
+        stub.azzera_richieste()
+        inizio = time.perf_counter()
+        for _ in range(1000):
+            esiti = (um.is_utente_autorizzato(102), um.is_admin(101), um.is_admin(102),
+                     um.is_utente_autorizzato(201), um.is_utente_autorizzato('102'))
+        durata = (time.perf_counter() - inizio) / 1000
+        print(f"Cinque verifiche: {durata * 1e6:.1f} µs")
+        if esiti != (True, True, False, False, True):
+            print(f"❌ Verifiche non corrette: {esiti}")
+            return False
+        if stub.conta_richieste('GET') != 2:
+            print(f"❌ Le verifiche hanno letto il database più di una volta: {stub.richieste}")
+            return False
+        
+        # Gli amministratori predefiniti non richiedono il registro
+        registro_utenti.invalida()
+        stub.azzera_richieste()
+        if not um.is_admin(um.ADMIN_IDS[0]) or stub.richieste:
+            print("❌ Un amministratore predefinito ha richiesto la lettura degli utenti")
+            return False
+        
+        # Vecchio formato: gli utenti sono solo ID
+        registro_utenti.sostituisci({'autorizzati': [103, '104'], 'in_attesa': [202]})
+        if not (um.is_utente_autorizzato(103) and um.is_utente_autorizzato(104)) or um.is_admin(103):
+            print("❌ Utenti nel vecchio formato non gestiti")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Verifiche dei permessi corrette")
+    return True
+
+def test_aggiornamenti():
+    """Verifica che le operazioni sugli utenti aggiornino il registro senza ricaricarlo."""
+    print("\n=== Test aggiornamenti del registro ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub = StubSupabase().avvia()
+        try:
+            db = collega_db_manager(stub)
+            db.UTENTI_FILE = os.path.join(cartella, 'utenti.json')
+            stub.tabelle['utenti'] = [dict(u) for u in UTENTI]
+            um.is_utente_autorizzato(102)
+            
+            stub.azzera_richieste()
+            passaggi = [
+                (um.aggiungi_utente_in_attesa(202, 'Anna Neri', 'aneri'), True),
+                (um.aggiungi_utente_in_attesa(101, 'Mario Rossi'), False),
+                (um.approva_utente(201), True),
+                (um.approva_utente(201), False),
+                (um.rifiuta_utente(202), True),
+                (um.promuovi_utente_admin(102), True),
+                (um.promuovi_utente_admin(102), False),
+                (um.declassa_utente_admin(101), True),
+                (um.rimuovi_utente_autorizzato(101), True)
+            ]
+            for i, ((esito, messaggio), atteso) in enumerate(passaggi):
+                if esito != atteso:
+                    print(f"❌ Passaggio {i} non corretto: {messaggio}")
+                    return False
+            if stub.conta_richieste('GET'):
+                print(f"❌ Il registro è stato ricaricato dopo un salvataggio: {stub.richieste}")
+                return False
+            # Una sola richiesta per ogni operazione riuscita, limitata alla riga dell'utente
+            if len(stub.richieste) != 6 or any('id=eq.' not in query for metodo, _, query in stub.richieste
+                                               if metodo in ('PATCH', 'DELETE')):
+                print(f"❌ Richieste non attese: {stub.richieste}")
+                return False
+            if (not um.is_utente_autorizzato(201) or um.is_utente_autorizzato(101) or not um.is_admin(102)
+                    or registro_utenti.is_in_attesa(202)):
+                print("❌ Il registro non riflette le operazioni")
+                return False
+            
+            # Il database contiene gli stessi utenti del registro
+            stati = {r['id']: (r['stato'], r.get('ruolo')) for r in stub.righe('utenti')}
+            if stati != {102: ('autorizzato', 'admin'), 201: ('autorizzato', None)}:
+                print(f"❌ Utenti salvati non corretti: {stati}")
+                return False
+            
+            # Un salvataggio completo (interfaccia web) sostituisce il registro
+            db.salva_utenti({'autorizzati': [], 'in_attesa': [{'id': 301, 'nome': 'Nuovo'}]})
+            if um.is_utente_autorizzato(102) or not registro_utenti.is_in_attesa(301) or stub.conta_richieste('GET'):
+                print("❌ Il salvataggio completo non ha aggiornato il registro")
+                return False
+        finally:
+            stub.ferma()
+    
+    print("✅ Aggiornamenti del registro corretti")
+    return True
+
+def test_salvataggio_completo():
+    """Verifica che il salvataggio di tutti gli utenti non svuoti mai la tabella."""
+    print("\n=== Test salvataggio completo ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub = StubSupabase().avvia()
+        try:
+            db = collega_db_manager(stub)
+            db.UTENTI_FILE = os.path.join(cartella, 'utenti.json')
+            stub.tabelle['utenti'] = [dict(u) for u in UTENTI]
+            
+            utenti = {
+                'autorizzati': [{'id': 1000 + i, 'nome': f"Utente {i}", 'ruolo': 'utente'} for i in range(1200)] + [102],
+                'in_attesa': [{'id': 201, 'nome': 'Paolo Verdi', 'username': 'pverdi'}]
+            }
+            stub.azzera_richieste()
+            if not db.salva_utenti(utenti):
+                print("❌ Salvataggio degli utenti non riuscito")
+                return False
+            # Tre lotti per gli utenti nuovi, uno per il vecchio formato e uno per l'utente in attesa,
+            # poi un'unica eliminazione degli utenti rimossi
+            eliminazioni = [query for metodo, _, query in stub.richieste if metodo == 'DELETE']
+            if stub.conta_richieste('POST') != 5 or len(eliminazioni) != 1 or 'not.in' not in eliminazioni[0]:
+                print(f"❌ Richieste non attese: {[(m, t) for m, t, _ in stub.richieste]}")
+                return False
+            
+            stati = {r['id']: r['stato'] for r in stub.righe('utenti')}
+            if len(stati) != 1202 or 101 in stati or stati[201] != 'in_attesa' or stati[102] != 'autorizzato':
+                print("❌ Utenti salvati non corretti")
+                return False
+            
+            # La migrazione inserisce gli utenti senza eliminare gli altri
+            if not db.upsert_utenti({'autorizzati': [101], 'in_attesa': []}) or len(stub.righe('utenti')) != 1203:
+                print("❌ Migrazione degli utenti non corretta")
+                return False
+        finally:
+            stub.ferma()
+    
+    print("✅ Salvataggio completo corretto")
+    return True
+
+def test_lettura_fallita():
+    """Verifica che una lettura fallita degli utenti non svuoti il registro né il file locale."""
+    print("\n=== Test lettura fallita degli utenti ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub = StubSupabase().avvia()
+        try:
+            db = collega_db_manager(stub)
+            db.UTENTI_FILE = os.path.join(cartella, 'utenti.json')
+            stub.tabelle['utenti'] = [dict(u) for u in UTENTI]
+            with open(db.UTENTI_FILE, 'w', encoding='utf-8') as file:
+                json.dump({'autorizzati': UTENTI[:2], 'in_attesa': UTENTI[2:]}, file)
+            um.is_utente_autorizzato(102)
+            
+            # Registro scaduto e database non raggiungibile: resta in uso quello precedente
+            registro_utenti.ultima_costruzione = 0
+            stub.guasti[('GET', 'utenti')] = 1
+            if not um.is_utente_autorizzato(102) or not um.is_admin(101) or registro_utenti.ultima_costruzione:
+                print("❌ Una lettura fallita ha sostituito il registro")
+                return False
+            stub.azzera_richieste()
+            um.is_utente_autorizzato(102)
+            if stub.richieste:
+                print("❌ La lettura è stata ritentata subito dopo un errore")
+                return False
+            registro_utenti.ultimo_errore = 0
+            if not um.is_utente_autorizzato(102) or not registro_utenti.ultima_costruzione:
+                print("❌ La lettura non è stata ritentata")
+                return False
+            
+            # Registro mai costruito: vengono usati gli utenti del file, senza riscriverlo
+            registro_utenti.invalida()
+            stub.guasti[('GET', 'utenti')] = 1
+            if not um.is_utente_autorizzato(102) or registro_utenti.costruito:
+                print("❌ Gli utenti del file locale non sono stati usati dopo l'errore")
+                return False
+            if not db.upsert_utente({'id': 301, 'nome': 'Nuovo Utente'}, 'in_attesa'):
+                print("❌ Inserimento dell'utente non riuscito")
+                return False
+            with open(db.UTENTI_FILE, 'r', encoding='utf-8') as file:
+                su_file = json.load(file)
+            if [u['id'] for u in su_file['autorizzati']] != [101, 102]:
+                print(f"❌ File locale riscritto da un registro incompleto: {su_file}")
+                return False
+            registro_utenti.ultimo_errore = 0
+            if not registro_utenti.is_in_attesa(301) or not registro_utenti.costruito:
+                print("❌ Il registro non è stato ricostruito dopo l'errore")
+                return False
+        finally:
+            stub.ferma()
+    
+    print("✅ Lettura fallita gestita correttamente")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_verifiche_permessi(),
+        test_aggiornamenti(),
+        test_salvataggio_completo(),
+        test_lettura_fallita()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline della sincronizzazione incrementale dei risultati con Supabase.
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+
+def crea_risultati(n):
+    """Genera n risultati di esempio."""
+    return [{
+        'id': i + 1,
+        'categoria': 'U14',
+        'genere': 'Maschile',
+        'tipo_partita': 'normale',
+        'data_partita': f"{(i % 28) + 1:02d}/03/2025",
+        'squadra1': f"Squadra {i}",
+        'squadra2': f"Squadra {i + 1}",
+        'punteggio1': i % 40,
+        'punteggio2': (i * 7) % 40,
+        'mete1': i % 6,
+        'mete2': (i * 3) % 6,
+        'arbitro': 'Mario Rossi',
+        'inserito_da': 'Test',
+        'timestamp': '2025-03-01T10:00:00'
+    } for i in range(n)]
+
+def prepara_ambiente(cartella, max_righe=None):
+    """Avvia lo stub e reindirizza il file dei risultati in una cartella temporanea."""
+    stub = StubSupabase(max_righe=max_righe).avvia()
+    db = collega_db_manager(stub)
+    db.RISULTATI_FILE = os.path.join(cartella, 'risultati.json')
+    return stub, db
+
+def test_salvataggio_incrementale():
+    """Verifica che vengano inviate solo le righe modificate o eliminate."""
+    print("\n=== Test salvataggio incrementale ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub, db = prepara_ambiente(cartella)
+        try:
+            return _verifica_salvataggio_incrementale(stub, db)
+        finally:
+            stub.ferma()
+
+def _verifica_salvataggio_incrementale(stub, db):
+    risultati = crea_risultati(200)
+    
+    # Primo salvataggio: tutte le righe sono nuove, un solo upsert raggruppato
+    stub.azzera_richieste()
+    db.salva_risultati(risultati)
+    print(f"Primo salvataggio: {stub.conta_richieste()} richieste")
+    if len(stub.righe('risultati')) != 200 or stub.conta_richieste('POST') != 1:
+        print("❌ Il primo salvataggio non ha inviato le righe in un unico upsert")
+        return False
+    
+    # Nessuna modifica: nessuna scrittura
+    stub.azzera_richieste()
+    db.salva_risultati(risultati)
+    if stub.conta_richieste('POST') or stub.conta_richieste('DELETE'):
+        print("❌ Un salvataggio senza modifiche ha generato scritture")
+        return False
+    
+    # Modifica di una riga ed eliminazione di un'altra
+    risultati[10]['punteggio1'] = 99
+    eliminato = risultati.pop(20)
+    stub.azzera_richieste()
+    db.salva_risultati(risultati)
+    print(f"Salvataggio con una modifica e una eliminazione: {stub.conta_richieste()} richieste")
+    if stub.conta_richieste('POST') != 1 or stub.conta_richieste('DELETE') != 1:
+        print("❌ Il salvataggio incrementale non ha inviato solo le differenze")
+        return False
+    
+    righe = {r['id']: r for r in stub.righe('risultati')}
+    if righe[11]['punteggio1'] != 99 or eliminato['id'] in righe:
+        print("❌ Il contenuto del database non corrisponde ai risultati salvati")
+        return False
+    
+    print("✅ Salvataggio incrementale corretto")
+    return True
+
+def test_salva_risultato():
+    """Verifica il salvataggio di un singolo risultato."""
+    print("\n=== Test salva_risultato ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub, db = prepara_ambiente(cartella)
+        try:
+            return _verifica_salva_risultato(stub, db)
+        finally:
+            stub.ferma()
+
+def _verifica_salva_risultato(stub, db):
+    nuovo = crea_risultati(1)[0]
+    del nuovo['id']
+    
+    # Un nuovo risultato richiede solo la lettura dell'ultimo ID e un upsert
+    stub.azzera_richieste()
+    db.salva_risultato(nuovo)
+    if 'id' not in nuovo or stub.conta_richieste('POST') != 1 or stub.conta_richieste('GET') != 1:
+        print("❌ Il nuovo risultato non è stato salvato con un'unica scrittura")
+        return False
+    
+    # Un secondo salvataggio identico non deve generare richieste
+    stub.azzera_richieste()
+    db.salva_risultato(nuovo)
+    if stub.conta_richieste():
+        print("❌ Un risultato invariato è stato inviato di nuovo")
+        return False
+    
+    # L'aggiornamento del message_id invia solo la riga modificata
+    nuovo['message_id'] = 1234
+    db.salva_risultato(nuovo)
+    righe = {r['id']: r for r in stub.righe('risultati')}
+    if righe[nuovo['id']].get('message_id') != 1234:
+        print("❌ Il message_id non è stato aggiornato")
+        return False
+    
+    locali = db._carica_risultati_da_file()
+    if sum(1 for r in locali if r.get('id') == nuovo['id']) != 1:
+        print("❌ Il file locale non contiene il risultato una sola volta")
+        return False
+    
+    # Risultati confermati nello stesso secondo ricevono ID distinti e nessuno viene sovrascritto
+    altri = crea_risultati(3)
+    for risultato in altri:
+        del risultato['id']
+        db.salva_risultato(risultato)
+    ids = {nuovo['id']} | {risultato['id'] for risultato in altri}
+    if len(ids) != 4 or len(stub.righe('risultati')) != 4 or len(db._carica_risultati_da_file()) != 4:
+        print(f"❌ ID non univoci per i nuovi risultati: {sorted(ids)}")
+        return False
+    
+    print("✅ salva_risultato corretto")
+    return True
+
+def test_snapshot_oltre_max_righe():
+    """Verifica lo snapshot con più righe del limite max-rows del server e dopo una lettura fallita."""
+    print("\n=== Test snapshot oltre max-rows ===")
+    with tempfile.TemporaryDirectory() as cartella:
+        stub, db = prepara_ambiente(cartella, max_righe=50)
+        dimensione_pagina = db.DIMENSIONE_PAGINA_LETTURA
+        db.DIMENSIONE_PAGINA_LETTURA = 50
+        try:
+            return _verifica_snapshot_oltre_max_righe(stub, db, cartella)
+        finally:
+            db.DIMENSIONE_PAGINA_LETTURA = dimensione_pagina
+            stub.ferma()
+
+def _verifica_snapshot_oltre_max_righe(stub, db, cartella):
+    risultati = crea_risultati(120)
+    db.salva_risultati(risultati)
+    
+    # Dopo un riavvio lo snapshot viene letto a pagine e comprende tutte le righe
+    db._snapshot_risultati['caricato'] = False
+    if len(db.carica_risultati()) != 120 or len(db._copia_snapshot_risultati()) != 120:
+        print("❌ Lettura dei risultati troncata dal limite max-rows")
+        return False
+    
+    # Una lettura fallita non diventa uno snapshot vuoto: l'eliminazione viene comunque inviata
+    db._snapshot_risultati['caricato'] = False
+    stub.guasti[('GET', 'risultati')] = 1
+    risultati.pop()
+    db.salva_risultati(risultati)
+    if db._snapshot_risultati['caricato'] or len(stub.righe('risultati')) != 120:
+        print("❌ Una lettura fallita è stata registrata come snapshot")
+        return False
+    db.salva_risultati(risultati)
+    if 120 in {r['id'] for r in stub.righe('risultati')}:
+        print("❌ Il risultato eliminato non è stato rimosso da Supabase")
+        return False
+    
+    # Con un file locale vuoto il nuovo ID segue quelli già su Supabase
+    db.RISULTATI_FILE = os.path.join(cartella, 'vuoto.json')
+    db._snapshot_risultati['hash'] = {}
+    nuovo = crea_risultati(1)[0]
+    del nuovo['id']
+    db.salva_risultato(nuovo)
+    if nuovo['id'] != 120 or len(stub.righe('risultati')) != 120:
+        print(f"❌ Il nuovo risultato ha ricevuto un ID già usato: {nuovo['id']}")
+        return False
+    
+    # Se l'ultimo ID non è leggibile il risultato non viene salvato con un ID stimato
+    stub.guasti[('GET', 'risultati')] = 1
+    altro = crea_risultati(1)[0]
+    del altro['id']
+    if db.salva_risultato(altro) or 'id' in altro:
+        print("❌ Un risultato è stato salvato senza conoscere l'ultimo ID")
+        return False
+    
+    print("✅ Snapshot oltre max-rows corretto")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_salvataggio_incrementale(),
+        test_salva_risultato(),
+        test_snapshot_oltre_max_righe()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline delle statistiche degli arbitri.
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+from modules import campionati_manager as cm
+from modules import statistiche_manager as sm
+from modules import tutor_manager as tm
+
+ARBITRI = [
+    {'id': 2, 'nome': 'Paolo', 'cognome': 'Bianchi', 'qualifica': 'regionale', 'attivo': True},
+    {'id': 1, 'nome': 'Mario', 'cognome': 'Rossi', 'qualifica': 'nazionale', 'attivo': True},
+    {'id': 3, 'nome': 'Anna', 'cognome': 'Verdi', 'qualifica': 'regionale', 'attivo': False}
+]
+
+def prepara_stub(num_partite, max_righe=None):
+    """Avvia lo stub con tre campionati, tre arbitri, due tutor e 'num_partite' partite designate."""
+    stub = StubSupabase(max_righe=max_righe).avvia()
+    collega_db_manager(stub)
+    
+    # Gli arbitri sono già in cache, ordinati per cognome come li restituisce carica_arbitri
+    cm._cache_arbitri.imposta('tutti', ARBITRI)
+    
+    stub.tabelle['campionati'] = [
+        {'id': 1, 'nome': 'Serie A', 'stagione_id': 1, 'categoria': 'Seniores'},
+        {'id': 2, 'nome': 'Under 18 Elite', 'stagione_id': 1, 'categoria': 'Under 18'},
+        {'id': 3, 'nome': 'Serie A', 'stagione_id': 2, 'categoria': 'Seniores'}
+    ]
+    stub.tabelle['tutor_arbitrali'] = [
+        {'id': 1, 'nome': 'Giuseppe', 'cognome': 'Neri', 'qualifica': 'nazionale', 'attivo': True},
+        {'id': 2, 'nome': 'Luigi', 'cognome': 'Gialli', 'qualifica': 'regionale', 'attivo': True}
+    ]
+    partite, designazioni, tutor_partite = [], [], []
+    for i in range(1, num_partite + 1):
+        partite.append({'id': i, 'campionato_id': i % 3 + 1, 'data_partita': f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                        'squadra_casa': f"Squadra {i}", 'squadra_trasferta': f"Squadra {i + 1}", 'stato': 'completata'})
+        primo, secondo = (1, 2) if i % 2 else (2, 1)
+        designazioni.append({'id': len(designazioni) + 1, 'partita_id': i, 'arbitro_id': primo, 'ruolo': 'primo'})
+        designazioni.append({'id': len(designazioni) + 1, 'partita_id': i, 'arbitro_id': secondo, 'ruolo': 'secondo'})
+        if i % 4 == 0:
+            designazioni.append({'id': len(designazioni) + 1, 'partita_id': i, 'arbitro_id': 3, 'ruolo': 'TMO'})
+        if i % 5 == 0:
+            tutor_partite.append({'id': len(tutor_partite) + 1, 'partita_id': i,
+                                  'tutor_id': 1 if i % 10 == 0 else 2, 'note': f"Osservazione {i}"})
+    stub.tabelle.update({'partite_campionato': partite, 'designazioni_arbitrali': designazioni,
+                         'tutor_partite': tutor_partite})
+    return stub
+
+def statistiche_attese(stub, campionati_ids):
+    """Calcola direttamente dalle tabelle dello stub i contatori attesi per arbitro."""
+    partite = {p['id']: p for p in stub.righe('partite_campionato') if p['campionato_id'] in campionati_ids}
+    tutor = {t['partita_id']: t['tutor_id'] for t in stub.righe('tutor_partite')}
+    attese = {}
+    for arbitro in ARBITRI:
+        designazioni = [d for d in stub.righe('designazioni_arbitrali')
+                        if d['arbitro_id'] == arbitro['id'] and d['partita_id'] in partite]
+        attese[arbitro['id']] = {
+            'partite_totali': len(designazioni),
+            'partite_primo': len([d for d in designazioni if d['ruolo'] == 'primo']),
+            'partite_secondo': len([d for d in designazioni if d['ruolo'] == 'secondo']),
+            'partite_con_tutor': len([d for d in designazioni if d['partita_id'] in tutor])
+        }
+    return attese
+
+def test_statistiche_arbitri():
+    """Verifica i contatori delle statistiche e che le richieste non dipendano dal numero di partite."""
+    print("\n=== Test statistiche degli arbitri ===")
+    richieste = []
+    for num_partite in (20, 120):
+        stub = prepara_stub(num_partite)
+        try:
+            stub.azzera_richieste()
+            statistiche = sm.carica_statistiche_arbitri(stagione_id=1, force_reload=True)
+            richieste.append(stub.conta_richieste())
+            
+            attese = statistiche_attese(stub, {1, 2})
+            righe = {r['id']: r for r in statistiche['statistiche_arbitri']}
+            if [r['id'] for r in statistiche['statistiche_arbitri']] != [2, 1]:
+                print("❌ Gli arbitri non attivi sono inclusi o l'ordine non è stato mantenuto")
+                return False
+            for arbitro_id, valori in righe.items():
+                for colonna, valore in attese[arbitro_id].items():
+                    if valori[colonna] != valore:
+                        print(f"❌ Arbitro {arbitro_id}: {colonna} = {valori[colonna]}, atteso {valore}")
+                        return False
+            
+            tutor = {t['id']: t for t in righe[1]['tutor_assegnati']}
+            if sum(t['partite'] for t in tutor.values()) != righe[1]['partite_con_tutor'] or tutor[1]['cognome'] != 'Neri':
+                print(f"❌ Tutor assegnati non corretti: {tutor}")
+                return False
+            
+            generali = statistiche['statistiche_generali']
+            partite_stagione = [p for p in stub.righe('partite_campionato') if p['campionato_id'] in (1, 2)]
+            if generali['totale_partite'] != len(partite_stagione) or generali['totale_arbitri'] != 2:
+                print(f"❌ Statistiche generali non corrette: {generali}")
+                return False
+            if set(statistiche['categorie_labels']) != {'Seniores', 'Under 18'} or 'TMO' not in statistiche['ruoli_labels']:
+                print("❌ Distribuzioni per categoria o per ruolo non corrette")
+                return False
+            
+            # Il filtro per categoria esclude il campionato Under 18
+            seniores = sm.carica_statistiche_arbitri(stagione_id=1, categoria='Seniores', force_reload=True)
+            if seniores['categorie_labels'] != ['Seniores']:
+                print("❌ Il filtro per categoria non è stato applicato")
+                return False
+        finally:
+            stub.ferma()
+    
+    print(f"Statistiche calcolate con {richieste[0]} e {richieste[1]} richieste")
+    if richieste[0] != richieste[1]:
+        print("❌ Il numero di richieste cresce con il numero di partite")
+        return False
+    
+    print("✅ Statistiche degli arbitri corrette")
+    return True
+
+def test_statistiche_arbitro():
+    """Verifica il dettaglio di un singolo arbitro."""
+    print("\n=== Test statistiche di un arbitro ===")
+    stub = prepara_stub(40)
+    try:
+        stub.azzera_richieste()
+        statistiche = sm.carica_statistiche_arbitro(1)
+        print(f"Dettaglio calcolato con {stub.conta_richieste()} richieste")
+        
+        attese = statistiche_attese(stub, {1, 2, 3})[1]
+        for colonna, valore in attese.items():
+            if statistiche['statistiche'][colonna] != valore:
+                print(f"❌ {colonna} = {statistiche['statistiche'][colonna]}, atteso {valore}")
+                return False
+        
+        partite = statistiche['statistiche']['partite']
+        if len(partite) != attese['partite_totali'] or sum(statistiche['mesi_data']) != len(partite):
+            print("❌ Elenco delle partite o distribuzione per mese non corretti")
+            return False
+        if len([p for p in partite if 'tutor' in p]) != attese['partite_con_tutor']:
+            print("❌ I tutor delle partite non sono stati associati")
+            return False
+        
+        tutor = {t['id']: t for t in statistiche['statistiche']['tutor_assegnati']}
+        if tutor[2]['cognome'] != 'Gialli' or not tutor[2]['note'].startswith('Osservazione'):
+            print("❌ Dati dei tutor non corretti")
+            return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Statistiche dell'arbitro corrette")
+    return True
+
+def _normalizza(statistiche):
+    """Rende confrontabili statistiche il cui ordine dei grafici può differire."""
+    statistiche = dict(statistiche)
+    for grafico in ('categorie', 'ruoli', 'mesi'):
+        if f"{grafico}_labels" in statistiche:
+            statistiche[grafico] = dict(zip(statistiche.pop(f"{grafico}_labels"), statistiche.pop(f"{grafico}_data")))
+    return statistiche
+
+def test_aggregati_incrementali():
+    """Verifica che gli aggregati aggiornati a ogni modifica coincidano con una ricostruzione completa."""
+    print("\n=== Test aggregati incrementali ===")
+    stub = prepara_stub(30)
+    try:
+        sm.carica_statistiche_arbitri(force_reload=True)
+        
+        # Modifiche tramite le funzioni dei manager
+        cm.aggiungi_designazione(7, 3, 'TMO')
+        cm.aggiungi_designazione(7, 1, 'giudice_di_linea')
+        tm.assegna_tutor_partita(7, 1, 'Prima osservazione')
+        cm.rimuovi_designazione(1)
+        assegnazione = [t for t in stub.righe('tutor_partite') if t['partita_id'] == 5][0]
+        tm.rimuovi_tutor_partita(assegnazione['id'])
+        cm.aggiorna_partita(10, '2026-01-15', 'Squadra 10', 'Squadra 11', stato='rinviata')
+        cm.elimina_partita(12)
+        stub.tabelle['designazioni_arbitrali'] = [d for d in stub.righe('designazioni_arbitrali') if d['partita_id'] != 12]
+        nuova = cm.crea_partita(1, '2026-02-01', 'Squadra 50', 'Squadra 51')
+        cm.aggiungi_designazione(nuova['id'], 2, 'primo')
+        
+        # Le letture sono servite dagli aggregati, senza richieste
+        cm._cache_arbitri.imposta('tutti', ARBITRI)
+        stub.azzera_richieste()
+        incrementali = [sm.carica_statistiche_arbitri(), sm.carica_statistiche_arbitri(stagione_id=1),
+                        sm.carica_statistiche_arbitri(stagione_id=1, categoria='Seniores')]
+        dettaglio = sm.carica_statistiche_arbitro(1)
+        if stub.conta_richieste():
+            print(f"❌ Le letture hanno generato {stub.conta_richieste()} richieste")
+            return False
+        
+        ricostruite = [sm.carica_statistiche_arbitri(force_reload=True),
+                       sm.carica_statistiche_arbitri(stagione_id=1, force_reload=True),
+                       sm.carica_statistiche_arbitri(stagione_id=1, categoria='Seniores', force_reload=True)]
+        for incrementale, ricostruita in zip(incrementali, ricostruite):
+            if _normalizza(incrementale) != _normalizza(ricostruita):
+                print("❌ Gli aggregati incrementali non coincidono con la ricostruzione")
+                return False
+        if _normalizza(dettaglio) != _normalizza(sm.carica_statistiche_arbitro(1)):
+            print("❌ Il dettaglio dell'arbitro non coincide con la ricostruzione")
+            return False
+        
+        attese = statistiche_attese(stub, {1, 2, 3})
+        righe = {r['id']: r for r in ricostruite[0]['statistiche_arbitri']}
+        for arbitro_id, valori in righe.items():
+            for colonna, valore in attese[arbitro_id].items():
+                if valori[colonna] != valore:
+                    print(f"❌ Arbitro {arbitro_id}: {colonna} = {valori[colonna]}, atteso {valore}")
+                    return False
+    finally:
+        stub.ferma()
+    
+    print("✅ Aggregati incrementali corretti")
+    return True
+
+def test_tabelle_oltre_max_righe():
+    """Verifica che le tabelle più grandi del limite max-rows del server vengano lette per intero."""
+    print("\n=== Test tabelle oltre max-rows ===")
+    from modules import db_manager
+    stub = prepara_stub(120, max_righe=50)
+    dimensione_pagina = db_manager.DIMENSIONE_PAGINA_LETTURA
+    db_manager.DIMENSIONE_PAGINA_LETTURA = 50
+    try:
+        statistiche = sm.carica_statistiche_arbitri(force_reload=True)
+        attese = statistiche_attese(stub, {1, 2, 3})
+        righe = {r['id']: r for r in statistiche['statistiche_arbitri']}
+        for arbitro_id, valori in righe.items():
+            for colonna, valore in attese[arbitro_id].items():
+                if valori[colonna] != valore:
+                    print(f"❌ Arbitro {arbitro_id}: {colonna} = {valori[colonna]}, atteso {valore}")
+                    return False
+        if statistiche['statistiche_generali']['totale_partite'] != 120:
+            print(f"❌ Partite troncate: {statistiche['statistiche_generali']}")
+            return False
+    finally:
+        db_manager.DIMENSIONE_PAGINA_LETTURA = dimensione_pagina
+        stub.ferma()
+    
+    print("✅ Tabelle oltre max-rows lette per intero")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_statistiche_arbitri(),
+        test_statistiche_arbitro(),
+        test_aggregati_incrementali(),
+        test_tabelle_oltre_max_righe()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
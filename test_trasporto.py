@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test offline del trasporto HTTP del client Supabase (db_manager.TrasportoHTTP).
+Usa il server PostgREST in memoria di stub_supabase.py.
+"""
+
+import os
+import sys
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stub_supabase import StubSupabase, collega_db_manager
+
+def prepara_stub(**opzioni):
+    """Avvia lo stub con 200 squadre e un client con un trasporto dedicato."""
+    stub = StubSupabase(latenza=opzioni.pop('latenza', 0.0)).avvia()
+    db = collega_db_manager(stub)
+    stub.tabelle['squadre'] = [{'id': i + 1, 'nome': f"Squadra {i + 1}"} for i in range(200)]
+    trasporto = db.TrasportoHTTP(**opzioni)
+    client = db.SupabaseClient(stub.url, db.SUPABASE_KEY, trasporto=trasporto)
+    return stub, client, trasporto
+
+def test_connessioni_persistenti():
+    """Verifica che le richieste riusino la stessa connessione e ricevano risposte compresse."""
+    print("\n=== Test connessioni persistenti ===")
+    stub, client, trasporto = prepara_stub()
+    try:
+        stub.azzera_richieste()
+        for _ in range(20):
+            squadre = client.table('squadre').select('*').execute().data
+        client.table('squadre').insert({'nome': 'Nuova'}).execute()
+        client.table('squadre').delete().eq('nome', 'Nuova').execute()
+        print(f"{stub.conta_richieste()} richieste su {stub.connessioni} connessioni")
+        
+        if len(squadre) != 200 or stub.conta_richieste() != 22:
+            print("❌ Risposte non corrette")
+            return False
+        if stub.connessioni != 1:
+            print("❌ Le connessioni non sono state riusate")
+            return False
+        if stub.byte_inviati >= 20 * len(str(squadre)) / 2:
+            print("❌ Le risposte non sono state compresse")
+            return False
+        
+        contatori = trasporto.statistiche()['squadre']
+        if contatori['richieste'] != 22 or contatori['errori'] or contatori['tempo_medio'] > contatori['tempo_massimo']:
+            print(f"❌ Contatori della tabella non corretti: {contatori}")
+            return False
+    finally:
+        trasporto.chiudi()
+        stub.ferma()
+    
+    print("✅ Connessioni persistenti corrette")
+    return True
+
+def test_ripetizioni():
+    """Verifica che solo le richieste idempotenti vengano ripetute dopo un errore transitorio."""
+    print("\n=== Test ripetizioni ===")
+    stub, client, trasporto = prepara_stub(tentativi=3, backoff=0.01)
+    try:
+        stub.stato_guasti = 503
+        stub.guasti[('GET', 'squadre')] = 2
+        if len(client.table('squadre').select('*').execute().data) != 200:
+            print("❌ La lettura non è stata ripetuta dopo gli errori transitori")
+            return False
+        
+        # I tentativi sono limitati
+        stub.guasti[('GET', 'squadre')] = 3
+        if client.table('squadre').select('*').execute().data != []:
+            print("❌ La lettura è stata ripetuta oltre il numero massimo di tentativi")
+            return False
+        
+        # Un inserimento non è idempotente: non viene ripetuto
+        stub.guasti[('POST', 'squadre')] = 1
+        if client.table('squadre').insert({'nome': 'Nuova'}).execute().data is not None:
+            print("❌ L'inserimento fallito è stato ripetuto")
+            return False
+        
+        # Un errore del database non è transitorio: non viene ripetuto
+        stub.stato_guasti = 500
+        stub.guasti[('GET', 'squadre')] = 1
+        client.table('squadre').select('*').execute()
+        if stub.guasti[('GET', 'squadre')] != 0 or len(stub.righe('squadre')) != 200:
+            print("❌ Stato dei guasti non atteso")
+            return False
+        
+        contatori = trasporto.statistiche()['squadre']
+        print(f"Contatori: {contatori['richieste']} richieste, {contatori['ripetizioni']} ripetizioni, "
+              f"{contatori['errori']} errori")
+        if (contatori['richieste'], contatori['ripetizioni'], contatori['errori']) != (4, 4, 3):
+            print("❌ Contatori delle ripetizioni non corretti")
+            return False
+    finally:
+        trasporto.chiudi()
+        stub.ferma()
+    
+    print("✅ Ripetizioni corrette")
+    return True
+
+def test_timeout():
+    """Verifica che una risposta troppo lenta interrompa la richiesta."""
+    print("\n=== Test timeout ===")
+    stub, client, trasporto = prepara_stub(latenza=0.5, timeout=(1, 0.1), tentativi=2, backoff=0.01)
+    try:
+        try:
+            client.table('squadre').select('*').execute()
+            print("❌ La richiesta lenta non è stata interrotta")
+            return False
+        except requests.Timeout:
+            pass
+        
+        contatori = trasporto.statistiche()['squadre']
+        if contatori['ripetizioni'] != 1 or contatori['errori'] != 1:
+            print(f"❌ Contatori non corretti: {contatori}")
+            return False
+    finally:
+        trasporto.chiudi()
+        stub.ferma()
+    
+    print("✅ Timeout corretto")
+    return True
+
+def main():
+    """Funzione principale."""
+    esiti = [
+        test_connessioni_persistenti(),
+        test_ripetizioni(),
+        test_timeout()
+    ]
+    
+    if all(esiti):
+        print("\n✅ Tutti i test sono stati completati con successo!")
+        return True
+    print("\n❌ Alcuni test sono falliti.")
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -47,7 +47,7 @@ except ImportError:
     CHANNEL_ID_WEB = CHANNEL_ID
 
 from modules.export_manager import genera_excel_riepilogo_weekend, genera_pdf_riepilogo_weekend
-from modules.db_manager import carica_utenti, salva_utenti, carica_risultati, salva_risultati, carica_squadre, salva_squadre, carica_admin_users, salva_admin_users, is_supabase_configured, migra_dati_a_supabase
+from modules.db_manager import carica_utenti, salva_utenti, carica_risultati, salva_risultati, list_risultati, carica_squadre, salva_squadre, carica_admin_users, salva_admin_users, is_supabase_configured, migra_dati_a_supabase
 from modules.config import CATEGORIE
 from modules.gironi_manager import (
     carica_gironi, salva_gironi, crea_torneo, elimina_torneo, modifica_torneo,
@@ -57,6 +57,14 @@ from modules.gironi_manager import (
     ottieni_prossime_partite, ottieni_ultimi_risultati
 )
 from modules.data_manager import ottieni_risultati_weekend
+from modules.risultati_manager import indice_risultati, date_weekend
+from modules.bus_invalidazioni import bus_invalidazioni
+from modules.reazioni_manager import archivio_reazioni, TIPI_REAZIONE
+from modules.user_manager import (
+    registro_utenti, approva_utente, rifiuta_utente, rimuovi_utente_autorizzato,
+    promuovi_utente_admin, declassa_utente_admin
+)
+from modules.classifica_manager import calcola_classifica, REGOLAMENTO_STATISTICHE
 # Funzioni stub per sostituire le funzionalità quiz rimosse
 def carica_quiz():
     """Funzione stub che restituisce una struttura vuota per i quiz."""
@@ -184,6 +192,12 @@ def set_csrf_cookie(response):
     # Non facciamo nulla se CSRF è disabilitato
     return response
 
+# Avvia il bus delle invalidazioni della cache nel worker che gestisce la richiesta:
+# gunicorn crea i worker con un fork, quindi l'avvio all'importazione non basta
+@app.before_request
+def avvia_bus_invalidazioni():
+    bus_invalidazioni.avvia()
+
 # Proteggi solo i form HTML, non le richieste AJAX (disabilitato)
 @app.before_request
 def csrf_protect():
@@ -580,10 +594,13 @@ def dashboard():
     try:
         # Carica i dati per la dashboard
         try:
-            risultati = carica_risultati()
+            num_partite = indice_risultati.conta()
+            # Partite recenti (ultimi 7 giorni, più recenti prima), dall'indice per data
+            partite_recenti = indice_risultati.ultimi_giorni(7)[::-1][:5]
         except Exception as e:
             app.logger.error(f"Errore nel caricamento dei risultati: {e}")
-            risultati = []
+            num_partite = 0
+            partite_recenti = []
         
         try:
             utenti_data = carica_utenti()
@@ -592,7 +609,6 @@ def dashboard():
             utenti_data = {"autorizzati": [], "in_attesa": []}
         
         # Calcola alcune statistiche
-        num_partite = len(risultati)
         num_utenti_autorizzati = len(utenti_data.get("autorizzati", []))
         num_utenti_in_attesa = len(utenti_data.get("in_attesa", []))
         
@@ -604,29 +620,6 @@ def dashboard():
         correct_responses = 0
         correct_percentage = 0
         
-        # Calcola le partite recenti (ultimi 7 giorni)
-        oggi = datetime.now()
-        sette_giorni_fa = oggi - timedelta(days=7)
-        partite_recenti = []
-        
-        for risultato in risultati:
-            try:
-                data_partita = datetime.strptime(risultato.get('data_partita', '01/01/2000'), '%d/%m/%Y')
-                if data_partita >= sette_giorni_fa:
-                    partite_recenti.append(risultato)
-            except (ValueError, TypeError) as e:
-                app.logger.warning(f"Errore nella conversione della data: {e}")
-                continue
-        
-        # Ordina le partite recenti per data (più recenti prima)
-        try:
-            partite_recenti.sort(key=lambda x: datetime.strptime(x.get('data_partita', '01/01/2000'), '%d/%m/%Y'), reverse=True)
-        except Exception as e:
-            app.logger.error(f"Errore nell'ordinamento delle partite: {e}")
-        
-        # Limita a 5 partite
-        partite_recenti = partite_recenti[:5]
-        
         return render_template('dashboard.html', 
                               num_partite=num_partite,
                               num_utenti_autorizzati=num_utenti_autorizzati,
@@ -692,87 +685,36 @@ def users():
                           utenti_autorizzati=utenti_autorizzati,
                           utenti_in_attesa=utenti_in_attesa)
 
+def _risposta_operazione_utente(esito, messaggio):
+    """Converte l'esito di un'operazione di modules.user_manager in una risposta JSON."""
+    return jsonify({"success": esito, "message": messaggio}), 200 if esito else 500
+
 # API per approvare un utente
 @app.route('/api/approve_user/<int:user_id>', methods=['POST'])
 @login_required
 def approve_user(user_id):
-    utenti_data = carica_utenti()
-    
-    # Trova l'utente in attesa
-    utente_da_approvare = None
-    indice_da_rimuovere = None
-    
-    for i, utente in enumerate(utenti_data["in_attesa"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            utente_da_approvare = utente
-            indice_da_rimuovere = i
-            break
-        elif not isinstance(utente, dict) and utente == user_id:
-            # Vecchio formato (solo ID)
-            utente_da_approvare = {
-                "id": user_id,
-                "nome": f"Utente {user_id}",
-                "username": None,
-                "data_registrazione": datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            }
-            indice_da_rimuovere = i
-            break
-    
-    if utente_da_approvare is not None and indice_da_rimuovere is not None:
-        # Rimuovi l'utente dalla lista in attesa
-        utenti_data["in_attesa"].pop(indice_da_rimuovere)
-        
-        # Aggiungi l'utente alla lista degli autorizzati
-        utenti_data["autorizzati"].append(utente_da_approvare)
-        
-        # Salva le modifiche
-        salva_utenti(utenti_data)
-        
-        return jsonify({"success": True, "message": "Utente approvato con successo"})
-    
-    return jsonify({"success": False, "message": "Utente non trovato"}), 404
+    # Verifica nel registro degli utenti e aggiorna solo la riga dell'utente
+    if not registro_utenti.is_in_attesa(user_id):
+        return jsonify({"success": False, "message": "Utente non trovato"}), 404
+    return _risposta_operazione_utente(*approva_utente(user_id))
 
 # API per rifiutare un utente
 @app.route('/api/reject_user/<int:user_id>', methods=['POST'])
 @login_required
 def reject_user(user_id):
-    utenti_data = carica_utenti()
-    
-    # Cerca l'utente nella lista in attesa
-    trovato = False
-    for i, utente in enumerate(utenti_data["in_attesa"]):
-        if (isinstance(utente, dict) and utente.get("id") == user_id) or (not isinstance(utente, dict) and utente == user_id):
-            utenti_data["in_attesa"].pop(i)
-            trovato = True
-            break
-    
-    if trovato:
-        # Salva le modifiche
-        salva_utenti(utenti_data)
-        return jsonify({"success": True, "message": "Utente rifiutato con successo"})
-    else:
+    if not registro_utenti.is_in_attesa(user_id):
         return jsonify({"success": False, "message": "Utente non trovato"}), 404
+    return _risposta_operazione_utente(*rifiuta_utente(user_id))
 
 # API per revocare l'autorizzazione a un utente
 @app.route('/api/revoke_user/<int:user_id>', methods=['POST'])
 @login_required
 def revoke_user(user_id):
-    utenti_data = carica_utenti()
-    
-    # Cerca l'utente nella lista degli autorizzati
-    trovato = False
-    for i, utente in enumerate(utenti_data["autorizzati"]):
-        if (isinstance(utente, dict) and utente.get("id") == user_id) or (not isinstance(utente, dict) and utente == user_id):
-            utenti_data["autorizzati"].pop(i)
-            trovato = True
-            break
-    
-    if trovato:
-        # Salva le modifiche
-        salva_utenti(utenti_data)
-        return jsonify({"success": True, "message": "Autorizzazione revocata con successo"})
-    else:
+    if not registro_utenti.is_autorizzato(user_id):
         return jsonify({"success": False, "message": "Utente non trovato"}), 404
+    
+    esito, messaggio = rimuovi_utente_autorizzato(user_id)
+    return _risposta_operazione_utente(esito, "Autorizzazione revocata con successo" if esito else messaggio)
 
 # API per promuovere un utente a admin
 @app.route('/api/promote_user/<int:user_id>', methods=['POST'])
@@ -782,34 +724,11 @@ def promote_user(user_id):
     if not current_user.is_admin:
         return jsonify({"success": False, "message": "Non hai i permessi per eseguire questa operazione"}), 403
     
-    utenti_data = carica_utenti()
-    
-    # Cerca l'utente nella lista degli autorizzati
-    trovato = False
-    for i, utente in enumerate(utenti_data["autorizzati"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            # Promuovi l'utente a admin
-            utenti_data["autorizzati"][i]["ruolo"] = "admin"
-            trovato = True
-            break
-        elif not isinstance(utente, dict) and utente == user_id:
-            # Converti il vecchio formato e promuovi a admin
-            utenti_data["autorizzati"][i] = {
-                "id": user_id,
-                "nome": f"Utente {user_id}",
-                "username": None,
-                "data_registrazione": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
-                "ruolo": "admin"
-            }
-            trovato = True
-            break
-    
-    if trovato:
-        # Salva le modifiche
-        salva_utenti(utenti_data)
-        return jsonify({"success": True, "message": "Utente promosso ad amministratore con successo"})
-    else:
+    if not registro_utenti.is_autorizzato(user_id):
         return jsonify({"success": False, "message": "Utente non trovato"}), 404
+    if registro_utenti.is_admin(user_id):
+        return jsonify({"success": True, "message": "Utente promosso ad amministratore con successo"})
+    return _risposta_operazione_utente(*promuovi_utente_admin(user_id))
 
 # API per declassare un utente da admin
 @app.route('/api/demote_user/<int:user_id>', methods=['POST'])
@@ -819,53 +738,66 @@ def demote_user(user_id):
     if not current_user.is_admin:
         return jsonify({"success": False, "message": "Non hai i permessi per eseguire questa operazione"}), 403
     
-    utenti_data = carica_utenti()
-    
-    # Cerca l'utente nella lista degli autorizzati
-    trovato = False
-    for i, utente in enumerate(utenti_data["autorizzati"]):
-        if isinstance(utente, dict) and utente.get("id") == user_id:
-            # Declassa l'utente a utente normale
-            utenti_data["autorizzati"][i]["ruolo"] = "utente"
-            trovato = True
-            break
-    
-    if trovato:
-        # Salva le modifiche
-        salva_utenti(utenti_data)
-        return jsonify({"success": True, "message": "Privilegi di amministratore rimossi con successo"})
-    else:
+    if not registro_utenti.is_autorizzato(user_id):
         return jsonify({"success": False, "message": "Utente non trovato"}), 404
+    if not registro_utenti.is_admin(user_id):
+        return jsonify({"success": True, "message": "Privilegi di amministratore rimossi con successo"})
+    return _risposta_operazione_utente(*declassa_utente_admin(user_id))
 
 # Rotta per la gestione delle partite
+# Numero di partite caricate per ogni pagina della gestione partite
+PARTITE_PER_PAGINA = 50
+
+def _filtri_partite():
+    """Legge dalla query string i filtri della pagina partite applicati dal database."""
+    return {campo: request.args[campo] for campo in ('categoria', 'genere', 'data_da', 'data_a')
+            if request.args.get(campo)}
+
+def _indice_partita(risultati, match_id):
+    """
+    Restituisce la posizione nella lista della partita con l'ID indicato, o None se non esiste.
+    
+    Le partite senza ID usano la posizione + 1, come in db_manager._prepara_risultato_db.
+    """
+    for i, risultato in enumerate(risultati):
+        if str(risultato.get('id', i + 1)) == str(match_id):
+            return i
+    return None
+
 @app.route('/matches')
 @login_required
 def matches():
+    filtri = _filtri_partite()
     try:
-        risultati = carica_risultati()
-        
-        # Funzione sicura per convertire la data
-        def safe_date_convert(match):
-            try:
-                data = match.get('data_partita')
-                if data is None or data == '':
-                    return datetime.strptime('01/01/2000', '%d/%m/%Y')
-                return datetime.strptime(data, '%d/%m/%Y')
-            except (ValueError, TypeError) as e:
-                app.logger.warning(f"Errore nella conversione della data: {e}, match: {match}")
-                return datetime.strptime('01/01/2000', '%d/%m/%Y')
-        
-        # Ordina i risultati per data (più recenti prima)
+        # Solo la prima pagina (più recenti prima): le successive arrivano da /api/matches
         try:
-            risultati.sort(key=safe_date_convert, reverse=True)
-        except Exception as e:
-            app.logger.error(f"Errore nell'ordinamento delle partite: {e}")
+            pagina = list_risultati(after=request.args.get('after'), limit=PARTITE_PER_PAGINA, **filtri)
+        except ValueError as e:
+            app.logger.warning(f"Parametri della pagina partite non validi: {e}")
+            flash("Filtri non validi: vengono mostrate tutte le partite.", "warning")
+            filtri = {}
+            pagina = list_risultati(limit=PARTITE_PER_PAGINA)
         
-        return render_template('matches.html', risultati=risultati)
+        return render_template('matches.html', risultati=pagina['risultati'], cursore=pagina['cursore'], filtri=filtri)
     except Exception as e:
         app.logger.error(f"Errore nella pagina matches: {e}")
         flash(f"Si è verificato un errore nel caricamento delle partite: {str(e)}", "danger")
-        return render_template('matches.html', risultati=[])
+        return render_template('matches.html', risultati=[], cursore=None, filtri=filtri)
+
+@app.route('/api/matches')
+@login_required
+def api_matches():
+    """Restituisce le righe HTML della pagina successiva di partite e il relativo cursore."""
+    try:
+        pagina = list_risultati(after=request.args.get('after'), limit=PARTITE_PER_PAGINA, **_filtri_partite())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'html': render_template('matches_rows.html', risultati=pagina['risultati']),
+        'cursore': pagina['cursore']
+    })
 
 # Rotta per aggiungere una nuova partita
 @app.route('/match/add', methods=['GET', 'POST'])
@@ -993,43 +925,23 @@ def add_match():
     
     return render_template('add_match.html', squadre=squadre, categorie=categorie)
 
-# Funzione per caricare le reazioni dal bot
-def carica_reazioni():
-    REAZIONI_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'reazioni.json')
-    if os.path.exists(REAZIONI_FILE):
-        with open(REAZIONI_FILE, 'r', encoding='utf-8') as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError:
-                return {}
-    return {}
-
 # Rotta per visualizzare i dettagli di una partita
 @app.route('/match/<int:match_id>')
 @login_required
 def match_details(match_id):
     risultati = carica_risultati()
+    indice = _indice_partita(risultati, match_id)
     
-    if 0 <= match_id < len(risultati):
-        partita = risultati[match_id]
-        
-        # Carica le reazioni se esistono
-        reazioni = carica_reazioni()
+    if indice is not None:
+        partita = risultati[indice]
         
         # Cerca le reazioni per questa partita
         # Nota: nel bot, le reazioni sono associate all'ID del messaggio Telegram
-        # Qui dobbiamo fare una ricerca basata su altri criteri
-        partita_reazioni = {
-            "like": [],
-            "love": [],
-            "fire": [],
-            "clap": [],
-            "rugby": []
-        }
+        partita_reazioni = {tipo: [] for tipo in TIPI_REAZIONE}
         
         # Se la partita ha un campo message_id, possiamo usarlo per cercare le reazioni
-        if 'message_id' in partita and str(partita['message_id']) in reazioni:
-            partita_reazioni = reazioni[str(partita['message_id'])]
+        if partita.get('message_id'):
+            partita_reazioni = archivio_reazioni.reazioni_messaggio(partita['message_id'])
         
         return render_template('match_details.html', 
                               partita=partita, 
@@ -1044,23 +956,24 @@ def match_details(match_id):
 @login_required
 def edit_match(match_id):
     risultati = carica_risultati()
+    indice = _indice_partita(risultati, match_id)
     
-    if 0 <= match_id < len(risultati):
+    if indice is not None:
         if request.method == 'POST':
             # Aggiorna i dati della partita
-            risultati[match_id]['categoria'] = request.form.get('categoria')
-            risultati[match_id]['genere'] = request.form.get('genere')
-            risultati[match_id]['data_partita'] = request.form.get('data_partita')
-            risultati[match_id]['squadra1'] = request.form.get('squadra1')
-            risultati[match_id]['squadra2'] = request.form.get('squadra2')
-            risultati[match_id]['punteggio1'] = int(request.form.get('punteggio1'))
-            risultati[match_id]['punteggio2'] = int(request.form.get('punteggio2'))
-            risultati[match_id]['mete1'] = int(request.form.get('mete1'))
-            risultati[match_id]['mete2'] = int(request.form.get('mete2'))
-            risultati[match_id]['arbitro'] = request.form.get('arbitro')
-            risultati[match_id]['sezione_arbitrale'] = request.form.get('sezione_arbitrale')
-            risultati[match_id]['modificato_da'] = current_user.username
-            risultati[match_id]['timestamp_modifica'] = datetime.now().isoformat()
+            risultati[indice]['categoria'] = request.form.get('categoria')
+            risultati[indice]['genere'] = request.form.get('genere')
+            risultati[indice]['data_partita'] = request.form.get('data_partita')
+            risultati[indice]['squadra1'] = request.form.get('squadra1')
+            risultati[indice]['squadra2'] = request.form.get('squadra2')
+            risultati[indice]['punteggio1'] = int(request.form.get('punteggio1'))
+            risultati[indice]['punteggio2'] = int(request.form.get('punteggio2'))
+            risultati[indice]['mete1'] = int(request.form.get('mete1'))
+            risultati[indice]['mete2'] = int(request.form.get('mete2'))
+            risultati[indice]['arbitro'] = request.form.get('arbitro')
+            risultati[indice]['sezione_arbitrale'] = request.form.get('sezione_arbitrale')
+            risultati[indice]['modificato_da'] = current_user.username
+            risultati[indice]['timestamp_modifica'] = datetime.now().isoformat()
             
             # Salva le modifiche
             salva_risultati(risultati)
@@ -1080,7 +993,7 @@ def edit_match(match_id):
             squadre = {"Tutte le squadre": sorted(squadre_raw)}
         
         return render_template('edit_match.html', 
-                              partita=risultati[match_id], 
+                              partita=risultati[indice], 
                               match_id=match_id,
                               squadre=squadre,
                               categorie=categorie)
@@ -1093,10 +1006,11 @@ def edit_match(match_id):
 @login_required
 def delete_match(match_id):
     risultati = carica_risultati()
+    indice = _indice_partita(risultati, match_id)
     
-    if 0 <= match_id < len(risultati):
+    if indice is not None:
         # Rimuovi la partita
-        del risultati[match_id]
+        del risultati[indice]
         
         # Salva le modifiche
         salva_risultati(risultati)
@@ -1300,41 +1214,22 @@ def stats():
             stats_categoria[categoria] = 0
         stats_categoria[categoria] += 1
     
-    # Statistiche per squadra
-    stats_squadre = {}
-    for risultato in risultati:
-        squadra1 = risultato.get('squadra1')
-        squadra2 = risultato.get('squadra2')
-        
-        if squadra1 not in stats_squadre:
-            stats_squadre[squadra1] = {'partite': 0, 'vittorie': 0, 'pareggi': 0, 'sconfitte': 0, 'punti_fatti': 0, 'punti_subiti': 0}
-        if squadra2 not in stats_squadre:
-            stats_squadre[squadra2] = {'partite': 0, 'vittorie': 0, 'pareggi': 0, 'sconfitte': 0, 'punti_fatti': 0, 'punti_subiti': 0}
-        
-        # Aggiorna le statistiche
-        stats_squadre[squadra1]['partite'] += 1
-        stats_squadre[squadra2]['partite'] += 1
-        
-        punteggio1 = risultato.get('punteggio1', 0)
-        punteggio2 = risultato.get('punteggio2', 0)
-        
-        stats_squadre[squadra1]['punti_fatti'] += punteggio1
-        stats_squadre[squadra1]['punti_subiti'] += punteggio2
-        stats_squadre[squadra2]['punti_fatti'] += punteggio2
-        stats_squadre[squadra2]['punti_subiti'] += punteggio1
-        
-        if punteggio1 > punteggio2:
-            stats_squadre[squadra1]['vittorie'] += 1
-            stats_squadre[squadra2]['sconfitte'] += 1
-        elif punteggio1 < punteggio2:
-            stats_squadre[squadra1]['sconfitte'] += 1
-            stats_squadre[squadra2]['vittorie'] += 1
-        else:
-            stats_squadre[squadra1]['pareggi'] += 1
-            stats_squadre[squadra2]['pareggi'] += 1
-    
-    # Ordina le squadre per numero di vittorie
-    stats_squadre = {k: v for k, v in sorted(stats_squadre.items(), key=lambda item: item[1]['vittorie'], reverse=True)}
+    # Statistiche per squadra, calcolate con il motore delle classifiche e ordinate per vittorie
+    classifica = calcola_classifica(
+        [(r.get('squadra1'), r.get('squadra2'), r.get('punteggio1', 0), r.get('punteggio2', 0), 0, 0) for r in risultati],
+        REGOLAMENTO_STATISTICHE
+    )
+    stats_squadre = {
+        riga['squadra']: {
+            'partite': riga['partite_giocate'],
+            'vittorie': riga['vittorie'],
+            'pareggi': riga['pareggi'],
+            'sconfitte': riga['sconfitte'],
+            'punti_fatti': riga['punti_fatti'],
+            'punti_subiti': riga['punti_subiti']
+        }
+        for riga in classifica
+    }
     
     return render_template('stats.html', 
                           stats_categoria=stats_categoria,
@@ -1352,9 +1247,9 @@ def monitor():
         
         # Ottieni informazioni sul sistema
         import platform
-        import psutil
         import time
         from datetime import datetime, timedelta
+        from modules.monitor import PSUTIL_AVAILABLE, system_sampler
         
         # Informazioni sul sistema
         system_info = {
@@ -1363,23 +1258,42 @@ def monitor():
             'architettura': platform.machine(),
             'processore': platform.processor(),
             'python_version': platform.python_version(),
-            'uptime': str(timedelta(seconds=int(time.time() - psutil.boot_time())))
+            'uptime': "N/A"
         }
+        if PSUTIL_AVAILABLE:
+            import psutil
+            system_info['uptime'] = str(timedelta(seconds=int(time.time() - psutil.boot_time())))
         
-        # Informazioni sulle risorse
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        # Informazioni sulle risorse dal campionatore in background, senza attendere una misura
+        system_sampler.start()
+        campione = system_sampler.latest() or system_sampler.sample()
+        
+        def gigabyte(valore):
+            return f"{valore / (1024 * 1024 * 1024):.2f} GB" if valore is not None else "N/A"
         
         resources_info = {
-            'cpu_percent': cpu_percent,
-            'memory_percent': memory.percent,
-            'memory_used': f"{memory.used / (1024 * 1024 * 1024):.2f} GB",
-            'memory_total': f"{memory.total / (1024 * 1024 * 1024):.2f} GB",
-            'disk_percent': disk.percent,
-            'disk_used': f"{disk.used / (1024 * 1024 * 1024):.2f} GB",
-            'disk_total': f"{disk.total / (1024 * 1024 * 1024):.2f} GB"
+            'cpu_percent': campione['cpu_percent'],
+            'memory_percent': campione['memory_percent'],
+            'memory_used': gigabyte(campione['memory_used']),
+            'memory_total': gigabyte(campione['memory_total']),
+            'disk_percent': campione['disk_percent'],
+            'disk_used': gigabyte(campione['disk_used']),
+            'disk_total': gigabyte(campione['disk_total']),
+            'process_rss': f"{campione['process_rss'] / (1024 * 1024):.1f} MB" if campione['process_rss'] else "N/A",
+            'threads': campione['threads'],
+            'open_fds': campione['open_fds'] if campione['open_fds'] is not None else "N/A"
+        }
+        
+        # Andamento dell'ultima ora per il grafico delle risorse
+        resources_history = {
+            'labels': [],
+            'cpu_percent': [],
+            'memory_percent': []
         }
+        for voce in system_sampler.history(3600):
+            resources_history['labels'].append(datetime.fromtimestamp(voce['timestamp']).strftime('%H:%M:%S'))
+            resources_history['cpu_percent'].append(voce['cpu_percent'])
+            resources_history['memory_percent'].append(voce['memory_percent'])
         
         # Informazioni sul bot
         bot_info = {
@@ -1440,6 +1354,7 @@ def monitor():
         return render_template('monitor.html',
                               system_info=system_info,
                               resources_info=resources_info,
+                              resources_history=resources_history,
                               bot_info=bot_info,
                               usage_stats=usage_stats,
                               recent_logs=recent_logs)
@@ -1621,6 +1536,10 @@ def backup_data():
         
         backup_file = os.path.join(backup_dir, f"backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.zip")
         
+        # Compatta il journal dei risultati, così il backup contiene uno snapshot aggiornato
+        from modules.journal_manager import get_store
+        get_store(os.path.join(root_dir, 'risultati.json')).compatta()
+        
         # Crea un file zip con i dati
         with zipfile.ZipFile(backup_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
             # Aggiungi i file JSON
@@ -1756,12 +1675,8 @@ def genera_riepilogo_weekend():
         # Ottieni i risultati del weekend
         risultati_weekend = ottieni_risultati_weekend()
         
-        # Calcola le date del weekend corrente
-        oggi = datetime.now()
-        # Trova il venerdì precedente
-        inizio_weekend = oggi - timedelta(days=(oggi.weekday() + 3) % 7)
-        # Trova la domenica successiva
-        fine_weekend = inizio_weekend + timedelta(days=2)
+        # Calcola le date del weekend corrente (dal venerdì precedente alla domenica successiva)
+        inizio_weekend, fine_weekend = date_weekend()
         
         inizio_weekend_str = inizio_weekend.strftime("%d/%m/%Y")
         fine_weekend_str = fine_weekend.strftime("%d/%m/%Y")
@@ -1799,9 +1714,7 @@ def genera_riepilogo_weekend():
         app.logger.error(f"Errore nella generazione del riepilogo weekend: {e}")
         
         # Calcola le date del weekend corrente come fallback
-        oggi = datetime.now()
-        inizio_weekend = oggi - timedelta(days=(oggi.weekday() + 3) % 7)
-        fine_weekend = inizio_weekend + timedelta(days=2)
+        inizio_weekend, fine_weekend = date_weekend()
         
         inizio_weekend_str = inizio_weekend.strftime("%d/%m/%Y")
         fine_weekend_str = fine_weekend.strftime("%d/%m/%Y")
@@ -2152,9 +2065,10 @@ def republish_match(match_id):
     try:
         # Carica i risultati
         risultati = carica_risultati()
+        indice = _indice_partita(risultati, match_id)
         
-        if 0 <= match_id < len(risultati):
-            partita = risultati[match_id]
+        if indice is not None:
+            partita = risultati[indice]
             
             # Importa le funzioni necessarie
             from telegram import Bot
@@ -2229,21 +2143,6 @@ def republish_match(match_id):
                 partita['message_id'] = message.message_id
                 salva_risultati(risultati)
                 
-                # Assicurati che le reazioni siano inizializzate per questo messaggio
-                from modules.data_manager import carica_reazioni, salva_reazioni
-                
-                reazioni = carica_reazioni()
-                message_id_str = str(message.message_id)
-                if message_id_str not in reazioni:
-                    reazioni[message_id_str] = {
-                        "like": [],
-                        "love": [],
-                        "fire": [],
-                        "clap": [],
-                        "rugby": []
-                    }
-                    salva_reazioni(reazioni)
-                
                 return jsonify({"success": True, "message": "Partita ripubblicata con successo sul canale Telegram"})
             else:
                 return jsonify({"success": False, "message": "Errore durante l'invio al canale Telegram"}), 500
@@ -2265,9 +2164,10 @@ def generate_match_image(match_id):
     try:
         # Carica i risultati
         risultati = carica_risultati()
+        indice = _indice_partita(risultati, match_id)
         
-        if 0 <= match_id < len(risultati):
-            partita = risultati[match_id]
+        if indice is not None:
+            partita = risultati[indice]
             
             # Importa le librerie necessarie per generare l'immagine
             from PIL import Image, ImageDraw, ImageFont
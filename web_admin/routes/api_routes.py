@@ -8,7 +8,7 @@ from web_admin.app import app
 from modules.campionati_manager import carica_arbitri, get_partita
 from modules.tutor_manager import carica_tutor_arbitrali
 from modules.disponibilita_manager import (
-    verifica_impegni_arbitro, verifica_impegni_tutor,
+    verifica_impegni_arbitro, verifica_impegni_tutor, verifica_impegni_bulk,
     formatta_impegni_arbitro, formatta_impegni_tutor
 )
 
@@ -144,6 +144,42 @@ def api_verifica_disponibilita_arbitro():
             'impegni_html': ''
         }), 500
         
+@app.route('/api/arbitri/disponibilita')
+@login_required
+def api_disponibilita_arbitri():
+    """API per verificare con una sola chiamata gli impegni di tutti gli arbitri attivi in una data."""
+    try:
+        # Ottieni i parametri
+        data_partita = request.args.get('data_partita')
+        partita_id = request.args.get('partita_id', type=int)
+        
+        if not data_partita:
+            return jsonify({
+                'error': 'Parametri mancanti',
+                'impegni': {}
+            }), 400
+        
+        # Verifica gli impegni di tutti gli arbitri attivi
+        arbitri = [a for a in carica_arbitri() if a.get('attivo', True)]
+        impegni = verifica_impegni_bulk([(a.get('id'), data_partita) for a in arbitri], partita_id)
+        
+        # Restituisce solo gli arbitri già impegnati, con gli impegni in HTML
+        return jsonify({
+            'impegni': {
+                str(arbitro_id): {
+                    'impegni': impegni_arbitro,
+                    'impegni_html': formatta_impegni_arbitro(impegni_arbitro)
+                }
+                for (arbitro_id, _), impegni_arbitro in impegni.items() if impegni_arbitro
+            }
+        })
+    except Exception as e:
+        app.logger.error(f"Errore nella verifica della disponibilità degli arbitri: {e}")
+        return jsonify({
+            'error': str(e),
+            'impegni': {}
+        }), 500
+
 @app.route('/api/tutor/verifica-disponibilita')
 @login_required
 def api_verifica_disponibilita_tutor():